@@ -0,0 +1,75 @@
+import threading
+from concurrent.futures import TimeoutError as FutureTimeoutError
+
+from inference import InferenceBusyError
+
+
+# --- 과부하 제어 (admission control) ---
+# 요청이 몰려 모델 대기열이 길어지면 모든 요청이 끝없이 기다리다 시간 초과되므로,
+#  - 대기열(BatchScheduler.pending)이 max_queue_depth 이상이면 모델에 넣지 않고 바로 거절
+#  - 모델 결과를 deadline_ms 안에 받지 못하면 기다리지 않고 거절 (아직 배치에 들어가지 않은 요청은 취소)
+# 거절된 요청은 호출 측에서 키워드 분석 결과(중립)로 채점하고 재채점 대상으로 표시하거나 503으로 응답합니다.
+class OverloadedError(RuntimeError):
+    def __init__(self, reason, retry_after_s):
+        super().__init__(f"감성 분석 모델이 과부하 상태입니다. ({reason})")
+        self.reason = reason  # queue_full / deadline / pool_busy / loading
+        self.retry_after_s = retry_after_s
+
+
+class AdmissionControl:
+    def __init__(self, scheduler, max_queue_depth=32, deadline_ms=1500, retry_after_s=2):
+        """
+        scheduler: 모델 요청을 모으는 BatchScheduler
+        max_queue_depth: 이 수 이상의 요청이 대기/처리 중이면 새 요청을 받지 않음 (0이면 제한 없음)
+        deadline_ms: 모델 결과를 기다리는 최대 시간(ms) (0이면 제한 없음)
+        retry_after_s: 503 응답의 Retry-After 값(초)
+        """
+        self.scheduler = scheduler
+        self.max_queue_depth = max(0, int(max_queue_depth))
+        self.deadline = max(0.0, float(deadline_ms)) / 1000.0 or None
+        self.retry_after_s = max(1, int(retry_after_s))
+        self._lock = threading.Lock()
+        self._counts = {"admitted": 0, "degraded": 0, "rejected": 0}
+        self._reasons = {}
+
+    def check(self):
+        """대기열이 가득 찼으면 OverloadedError를 발생시킵니다."""
+        if self.max_queue_depth and self.scheduler.pending() >= self.max_queue_depth:
+            raise OverloadedError('queue_full', self.retry_after_s)
+
+    def predict(self, text):
+        """대기열과 마감 시간을 지키는 범위에서 모델 결과를 반환합니다. 지킬 수 없으면 OverloadedError"""
+        self.check()
+        future = self.scheduler.submit(text)
+        try:
+            result = future.result(timeout=self.deadline)
+        except FutureTimeoutError:
+            # 아직 배치에 들어가지 않았다면 모델 부하에서도 빠짐
+            future.cancel()
+            raise OverloadedError('deadline', self.retry_after_s)
+        except InferenceBusyError:
+            raise OverloadedError('pool_busy', self.retry_after_s)
+        self._count('admitted')
+        return result
+
+    def record(self, outcome, reason):
+        """과부하로 처리된 요청을 기록합니다. outcome: degraded(키워드 채점) / rejected(503)"""
+        self._count(outcome, reason)
+
+    def _count(self, outcome, reason=None):
+        with self._lock:
+            self._counts[outcome] += 1
+            if reason:
+                key = f"{outcome}:{reason}"
+                self._reasons[key] = self._reasons.get(key, 0) + 1
+
+    def stats(self):
+        with self._lock:
+            stats = dict(self._counts)
+            stats["reasons"] = dict(self._reasons)
+        stats.update({
+            "queue_depth": self.scheduler.pending(),
+            "max_queue_depth": self.max_queue_depth,
+            "deadline_ms": round(self.deadline * 1000) if self.deadline else 0,
+        })
+        return stats
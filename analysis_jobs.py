@@ -0,0 +1,75 @@
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+
+
+# --- 비동기 분석 작업 ---
+# /analyze 비동기 모드에서 먼저 저장한 기록(record_id)을 워커 스레드에서 채점합니다.
+# 같은 프로세스의 결과는 메모리에서 바로 전달하고(SSE 대기), 다른 프로세스/재시작 후에는
+# 호출 측에서 DB에 저장된 결과를 확인합니다. (DB가 최종 기준)
+class AnalysisJobs:
+    def __init__(self, process_fn, max_workers=2, keep_results=1000):
+        """
+        process_fn: record_id를 받아 채점하고 응답용 결과(dict)를 돌려주는 함수
+        max_workers: 동시에 채점할 워커 스레드 수
+        keep_results: 메모리에 보관할 완료 결과 수 (오래된 것부터 삭제)
+        """
+        self.process_fn = process_fn
+        self.max_workers = max(1, int(max_workers))
+        self.keep_results = max(1, int(keep_results))
+        self._executor = None
+        self._results = OrderedDict()  # record_id → 결과 dict (실패 시 {"success": False, ...})
+        self._pending = set()
+        self._cond = threading.Condition()
+
+    def _get_executor(self):
+        # 워커 스레드는 첫 작업 시점에 만듦 (fork 이후 각 프로세스에서 따로 생성되도록)
+        with self._cond:
+            if self._executor is None:
+                self._executor = ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix="bloom-analyze")
+            return self._executor
+
+    def submit(self, record_id):
+        with self._cond:
+            if record_id in self._pending:
+                return
+            self._pending.add(record_id)
+        self._get_executor().submit(self._run, record_id)
+
+    def _run(self, record_id):
+        try:
+            result = self.process_fn(record_id)
+        except Exception as e:
+            print(f"비동기 분석 처리 중 오류 발생 (기록 {record_id}): {e}")
+            result = {"success": False, "message": "분석 처리 중 오류가 발생했습니다."}
+        with self._cond:
+            self._pending.discard(record_id)
+            if result is not None:
+                self._results[record_id] = result
+                while len(self._results) > self.keep_results:
+                    self._results.popitem(last=False)
+            self._cond.notify_all()
+
+    def queue_depth(self):
+        with self._cond:
+            return len(self._pending)
+
+    def is_pending(self, record_id):
+        with self._cond:
+            return record_id in self._pending
+
+    def get(self, record_id):
+        with self._cond:
+            return self._results.get(record_id)
+
+    def wait(self, record_id, timeout):
+        """이 프로세스에서 처리 중인 작업이면 끝날 때까지(최대 timeout초) 기다린 뒤 결과를 반환합니다."""
+        deadline = time.monotonic() + timeout
+        with self._cond:
+            while record_id not in self._results and record_id in self._pending:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                self._cond.wait(remaining)
+            return self._results.get(record_id)
@@ -1,110 +1,256 @@
 import sqlite3
-import random
 import json
-from flask import Flask, request, jsonify, render_template
-from werkzeug.security import generate_password_hash, check_password_hash
-from transformers import AutoTokenizer, AutoModelForSequenceClassification
-import torch
+import base64
+import hashlib
+from flask import Flask, request, jsonify, render_template, Response, stream_with_context
+import click
 import numpy as np
 from datetime import datetime
 import traceback
+import os
+import time
+import threading
+from concurrent.futures import TimeoutError as FutureTimeoutError
+import metrics
+from admission import AdmissionControl, OverloadedError
+from inference import DEFAULT_MODEL_NAME, BatchScheduler, ModelLoader, predict_proba_length_aware, export_artifacts, verify_backends
+from keywords import POSITIVE_KEYWORDS, NEGATIVE_KEYWORDS, KEYWORDS_VERSION, keyword_matcher
+from challenges import (CHALLENGES_POOL, DEFAULT_CHALLENGE, FALLBACK_CHALLENGE, challenge_catalog, challenge_embedding_texts,
+                        save_challenge_embeddings, load_challenge_embeddings)
+from challenge_store import ChallengeStore, CompactionJob
+from sentiment_cache import SentimentCache
+from db import PENDING_STATUS, get_connection, release_connection, migrate, schema_version, rebuild_challenge_scores, load_or_create_setting
+from rescore import RescoreJob, RescoreRetryError
+from analysis_jobs import AnalysisJobs
+from sessions import SessionTokens, TTLCache, PasswordHasher, PasswordHasherBusy
+import trends
 
 # --- 초기 설정 ---
 app = Flask(__name__)
-DATABASE = 'database.db'
 
-# --- 데이터베이스 연결 함수 ---
-def get_db_connection():
-    conn = sqlite3.connect(DATABASE)
-    conn.row_factory = sqlite3.Row
-    return conn
-
-# --- 텍스트 감성 분석 모델 로드 ---
-print("kcbert-base 모델을 로드하고 있습니다...")
+# --- 데이터베이스 마이그레이션 (서버 시작 시 미적용 버전 자동 적용) ---
 try:
-    MODEL_NAME = "beomi/kcbert-base"
-    tokenizer = AutoTokenizer.from_pretrained(MODEL_NAME)
-    model = AutoModelForSequenceClassification.from_pretrained(MODEL_NAME)
-    print("모델 로드 완료.")
+    migrate()
 except Exception as e:
-    print(f"모델 로드 중 오류 발생: {e}")
-    # exit() # 필요하다면 활성화
+    print(f"데이터베이스 초기화 중 오류 발생: {e}")
+    traceback.print_exc()
+
+# --- 텍스트 감성 분석 모델 로드 ---
+MODEL_NAME = DEFAULT_MODEL_NAME
+# 추론 백엔드: torch(fp32) / int8(동적 양자화) / onnx(ONNX Runtime) / remote(추론 프로세스 풀, inference_pool.py)
+INFERENCE_BACKEND = os.environ.get('BLOOM_INFERENCE_BACKEND', 'torch')
+# `flask export-model`로 저장한 모델 파일 위치 (있으면 오프라인으로 로드)
+MODEL_ARTIFACTS_DIR = os.environ.get('BLOOM_MODEL_DIR', 'model_artifacts')
+
+# 모델은 백그라운드에서 로드하고, 준비되기 전까지는 키워드 분석만 사용
+# BLOOM_PRELOAD_MODEL=1 이면 임포트 시점에 바로 로드 (gunicorn --preload 로 fork 전에 가중치를 올려
+# 워커들이 copy-on-write로 같은 메모리를 공유하도록 할 때 사용)
+model_loader = ModelLoader(INFERENCE_BACKEND, MODEL_NAME, MODEL_ARTIFACTS_DIR)
+print(f"kcbert-base 모델을 로드하고 있습니다... (백엔드: {INFERENCE_BACKEND})")
+if os.environ.get('BLOOM_PRELOAD_MODEL') == '1':
+    model_loader.load()
+else:
+    model_loader.start()
 
 # --- 분석 로직 설정 ---
 labels = ['Negative', 'Neutral', 'Positive']
 emotion_map = {'Negative': 0, 'Neutral': 1, 'Positive': 2}
 
-# 키워드 목록 (오류 방지용 안전장치)
-POSITIVE_KEYWORDS = [
-    "행복", "기쁨", "즐거", "신나", "최고", "좋았", "훌륭", "알찬", "만족", "좋다", "괜찮", 
-    "뿌듯", "감사", "평온", "설렘", "기대", "상쾌", "편안", "활기", "재미있"
-]
-NEGATIVE_KEYWORDS = [
-    "슬픔", "우울", "화나", "짜증", "최악", "힘들", "괴로", "지침", "피곤", "안좋", "별로", 
-    "안 좋다", "속상", "실망", "불안", "걱정", "무기력", "답답", "귀찮", "외롭", "후회"
-]
-
-# 텍스트 감정 분석 함수
-def analyze_text_emotion(text):
+# 배치 추론 설정 (환경 변수로 조정 가능)
+MAX_BATCH_SIZE = int(os.environ.get('BLOOM_MAX_BATCH_SIZE', 16))
+MAX_BATCH_WAIT_MS = float(os.environ.get('BLOOM_MAX_BATCH_WAIT_MS', 10))
+# 동시에 모델에 보낼 수 있는 배치 수. remote 백엔드는 기본값이 추론 풀 프로세스 수
+# (배치를 하나씩만 보내면 웹 프로세스 하나가 풀의 프로세스 하나만 사용)
+if INFERENCE_BACKEND == 'remote':
+    from inference_pool import POOL_PROCESSES as DEFAULT_INFERENCE_CONCURRENCY
+else:
+    DEFAULT_INFERENCE_CONCURRENCY = 1
+INFERENCE_CONCURRENCY = max(1, int(os.environ.get('BLOOM_INFERENCE_CONCURRENCY', DEFAULT_INFERENCE_CONCURRENCY)))
+
+# 길이 인식 모드 설정: 긴 텍스트를 겹치는 구간으로 나눠 분석하고 길이 버킷별로 패딩
+LENGTH_AWARE_MODE = os.environ.get('BLOOM_LENGTH_AWARE') == '1'
+WINDOW_TOKENS = int(os.environ.get('BLOOM_WINDOW_TOKENS', 256))
+WINDOW_OVERLAP = int(os.environ.get('BLOOM_WINDOW_OVERLAP', 32))
+TOKEN_BUDGET = int(os.environ.get('BLOOM_TOKEN_BUDGET', 1024))
+
+# 과부하 제어: 모델 대기열 길이(요청 수)와 결과 대기 시간(ms) 한도. 넘으면 BLOOM_OVERLOAD_MODE에 따라
+# degrade(키워드 분석 결과로 채점하고 재채점 대상으로 표시) 또는 reject(503 + Retry-After)
+ADMISSION_MAX_QUEUE = int(os.environ.get('BLOOM_ADMISSION_MAX_QUEUE', MAX_BATCH_SIZE * (INFERENCE_CONCURRENCY + 1)))
+ADMISSION_DEADLINE_MS = float(os.environ.get('BLOOM_ADMISSION_DEADLINE_MS', 1500))
+OVERLOAD_MODE = os.environ.get('BLOOM_OVERLOAD_MODE', 'degrade')
+OVERLOAD_RETRY_AFTER_S = int(os.environ.get('BLOOM_OVERLOAD_RETRY_AFTER_S', 2))
+
+# 종합 점수 가중치 (기분 35%, 수면 15%, 활동 20%, 텍스트 30%)
+SCORE_WEIGHTS = {'mood': 0.35, 'sleep': 0.15, 'activity': 0.2, 'text': 0.3}
+
+# 채점 버전: 모델, 키워드 목록, 가중치 중 하나라도 바뀌면 값이 바뀜
+# 기록마다 저장해 두고, 현재 버전과 다른 기록은 `flask rescore`로 다시 채점합니다.
+SCORING_VERSION = hashlib.sha256(json.dumps(
+    {"model": MODEL_NAME, "keywords": KEYWORDS_VERSION, "weights": SCORE_WEIGHTS}, sort_keys=True
+).encode('utf-8')).hexdigest()[:12]
+# 과부하로 모델 없이(키워드 분석만으로) 채점한 기록의 채점 버전. 현재 버전과 다르므로 재채점 대상이 됨
+DEGRADED_SCORING_VERSION = SCORING_VERSION + '-degraded'
+
+# 여러 텍스트를 패딩된 배치 하나로 묶어 한 번에 분석하는 함수
+# 같은 forward pass에서 나온 문장 임베딩도 함께 돌려줌: (라벨, 확률, 임베딩 또는 None)
+def predict_sentiment_batch(texts):
+    backend = model_loader.backend
+    if backend is None:
+        raise RuntimeError("감성 분석 모델이 로드되지 않았습니다.")
+    if LENGTH_AWARE_MODE:
+        scores, embeddings = predict_proba_length_aware(backend, texts, window_tokens=WINDOW_TOKENS, overlap=WINDOW_OVERLAP,
+                                                        token_budget=TOKEN_BUDGET, max_batch_size=MAX_BATCH_SIZE, with_embeddings=True)
+    else:
+        scores, embeddings = backend.predict_with_embeddings(texts)
+    results = []
+    for i, row in enumerate(scores):
+        max_idx = np.argmax(row)
+        results.append((labels[max_idx], row[max_idx], embeddings[i] if embeddings is not None else None))
+    return results
+
+# 동시에 들어온 /analyze 요청의 텍스트를 모아서 처리하는 스케줄러
+inference_scheduler = BatchScheduler(predict_sentiment_batch, max_batch_size=MAX_BATCH_SIZE, max_wait_ms=MAX_BATCH_WAIT_MS,
+                                     concurrency=INFERENCE_CONCURRENCY)
+admission = AdmissionControl(inference_scheduler, max_queue_depth=ADMISSION_MAX_QUEUE, deadline_ms=ADMISSION_DEADLINE_MS,
+                             retry_after_s=OVERLOAD_RETRY_AFTER_S)
+
+# 모델 분석 결과 캐시 (같은 텍스트는 다시 forward pass를 하지 않음)
+sentiment_cache = SentimentCache(
+    MODEL_NAME, KEYWORDS_VERSION,
+    max_size=int(os.environ.get('BLOOM_SENTIMENT_CACHE_SIZE', 10000)),
+    db_path=os.environ.get('BLOOM_SENTIMENT_CACHE_DB'),
+)
+
+# 분석 결과를 (라벨, 확률, 임베딩) 형태로 맞춤 (키워드/캐시 결과에는 임베딩이 없을 수 있음)
+def _with_embedding(result):
+    return (result[0], result[1], result[2] if len(result) > 2 else None)
+
+# 텍스트 감정 분석 함수 (모델로 분석한 경우 챌린지 추천용 문장 임베딩도 함께 반환)
+# use_admission=True면 과부하 제어를 거쳐 모델에 요청하고, 한도를 넘거나 모델이 준비되지 않았으면 OverloadedError 발생
+# (모델 오류도 중립으로 바꾸지 않고 그대로 전달해 호출 측에서 재채점 대상으로 표시)
+def analyze_text_emotion_detail(text, use_admission=False):
     try:
         if not text or not isinstance(text, str):
-            return 'Neutral', 0.5
-        
-        text_lower = text.lower()
-        
-        # 1. 긍정 키워드 우선 확인
-        for keyword in POSITIVE_KEYWORDS:
-            if keyword == text_lower:
-                return 'Positive', 1.0
-            
-            # 짧은 키워드 (2글자 이하)
-            if len(keyword) <= 2:
-                 if f" {keyword} " in f" {text_lower} " or text_lower.startswith(keyword + " ") or text_lower.endswith(" " + keyword):
-                      is_negated = False
-                      # "좋다"의 경우 부정형 체크 ("안 좋다" 등)
-                      if keyword == "좋다":
-                          if "안 좋다" in text_lower or "않 좋다" in text_lower or "별로 좋다" in text_lower:
-                              is_negated = True
-                      if not is_negated:
-                          return 'Positive', 1.0
-            # 긴 키워드
-            elif keyword in text_lower:
-                 is_negated = False
-                 if keyword == "좋았":
-                     if "안 좋았" in text_lower or "않 좋았" in text_lower:
-                         is_negated = True
-                 if not is_negated:
-                     return 'Positive', 1.0
-        
-        # 2. 부정 키워드 우선 확인
-        for keyword in NEGATIVE_KEYWORDS:
-             if keyword == text_lower:
-                 return 'Negative', 1.0
-             if keyword != "안 좋다" and (f" {keyword} " in f" {text_lower} " or text_lower.startswith(keyword + " ") or text_lower.endswith(" " + keyword)):
-                 return 'Negative', 1.0
-             if keyword == "안 좋다" and keyword in text_lower:
-                 return 'Negative', 1.0
-
-        # 3. 키워드가 없으면 AI 모델로 분석
-        inputs = tokenizer(text, return_tensors="pt", truncation=True, padding=True, max_length=512)
-        with torch.no_grad():
-            outputs = model(**inputs)
-        
-        probs = torch.nn.functional.softmax(outputs.logits, dim=1)
-        scores = probs.detach().cpu().numpy()[0]
-        max_idx = np.argmax(scores)
-        
-        return labels[max_idx], scores[max_idx]
+            metrics.text_emotion_path.inc('empty')
+            return 'Neutral', 0.5, None
+
+        # 1. 키워드 확인 (긍정 키워드 우선, 다음으로 부정 키워드)
+        with metrics.timed('keyword'):
+            keyword_emotion = keyword_matcher.match(text)
+        if keyword_emotion:
+            metrics.text_emotion_path.inc('keyword')
+            return keyword_emotion, 1.0, None
+
+        # 2. 같은 텍스트를 이미 분석했다면 캐시된 결과 사용
+        with metrics.timed('cache'):
+            cached = sentiment_cache.get(text)
+        if cached:
+            metrics.text_emotion_path.inc('cache')
+            return _with_embedding(cached)
+
+        # 모델이 아직 준비되지 않았다면 기다리지 않고 키워드 분석 결과(중립)로 처리
+        if not model_loader.ready:
+            if use_admission:
+                raise OverloadedError('loading', OVERLOAD_RETRY_AFTER_S)
+            metrics.text_emotion_path.inc('fallback')
+            return 'Neutral', 0.5, None
+
+        # 3. 키워드가 없으면 AI 모델로 분석 (동시 요청과 함께 배치 처리, 대기 시간 포함)
+        with metrics.timed('model'):
+            result = admission.predict(text) if use_admission else inference_scheduler.predict(text)
+        metrics.text_emotion_path.inc('model')
+        sentiment_cache.put(text, result)
+        return _with_embedding(result)
         
+    except OverloadedError:
+        metrics.text_emotion_path.inc('fallback')
+        raise
+    except Exception as e:
+        metrics.text_emotion_path.inc('fallback')
+        if use_admission:
+            raise
+        print(f"텍스트 감성 분석 중 오류 발생: {e}")
+        return 'Neutral', 0.5, None
+
+def analyze_text_emotion(text):
+    label, score, _ = analyze_text_emotion_detail(text)
+    return label, score
+
+# 실시간 분석용: 과부하면 모델을 기다리지 않고 키워드 분석 결과(중립)로 채점해 재채점 대상으로 표시
+# (라벨, 확률, 임베딩, 채점 버전)을 반환. reject 모드에서는 OverloadedError를 그대로 전달 (호출 측에서 503 응답)
+# 모델 로드 중이거나 모델/추론 풀 오류인 경우는 키워드 분석 결과(중립)로 처리 (거절하지 않음)
+def analyze_text_emotion_admitted(text, allow_reject=True):
+    try:
+        label, score, embedding = analyze_text_emotion_detail(text, use_admission=True)
+        return label, score, embedding, SCORING_VERSION
+    except OverloadedError as e:
+        if allow_reject and OVERLOAD_MODE == 'reject' and e.reason != 'loading':
+            admission.record('rejected', e.reason)
+            raise
+        admission.record('degraded', e.reason)
+        return 'Neutral', 0.5, None, DEGRADED_SCORING_VERSION
     except Exception as e:
         print(f"텍스트 감성 분석 중 오류 발생: {e}")
-        return 'Neutral', 0.5
+        return 'Neutral', 0.5, None, DEGRADED_SCORING_VERSION
 
-# 종합 점수 계산 함수 (요청하신 비율 적용: 기분 35%, 수면 15%, 활동 20%, 텍스트 30%)
-def calculate_total_score(mood, sleep, activity, feeling_text):
+# 과부하 거절 응답 (503 + Retry-After)
+def overloaded_response(error):
+    response = jsonify({"success": False, "message": "요청이 많아 잠시 후 다시 시도해주세요.", "retry_after": error.retry_after_s})
+    response.headers['Retry-After'] = str(error.retry_after_s)
+    return response, 503
+
+# 여러 텍스트를 한 번에 분석하는 함수 (일괄 분석용)
+# 키워드/캐시로 결정되지 않은 텍스트만 모아 MAX_BATCH_SIZE 단위로 모델에 전달합니다.
+# with_embeddings=True면 (라벨, 확률, 임베딩 또는 None) 목록을 반환
+# with_versions=True면 항목마다 채점 버전을 덧붙임. 모델이 준비되지 않았거나 오류가 나서
+# 중립으로 대신한 항목은 DEGRADED_SCORING_VERSION (재채점 대상)
+def analyze_text_emotions(texts, with_embeddings=False, with_versions=False):
+    results = [None] * len(texts)
+    pending = []
+    for i, text in enumerate(texts):
+        if not text or not isinstance(text, str):
+            results[i] = ('Neutral', 0.5)
+            metrics.text_emotion_path.inc('empty')
+            continue
+        keyword_emotion = keyword_matcher.match(text)
+        if keyword_emotion:
+            results[i] = (keyword_emotion, 1.0)
+            metrics.text_emotion_path.inc('keyword')
+            continue
+        cached = sentiment_cache.get(text)
+        if cached:
+            results[i] = cached
+            metrics.text_emotion_path.inc('cache')
+            continue
+        pending.append(i)
+
+    if pending and model_loader.ready:
+        try:
+            for start in range(0, len(pending), MAX_BATCH_SIZE):
+                chunk = pending[start:start + MAX_BATCH_SIZE]
+                for i, result in zip(chunk, predict_sentiment_batch([texts[i] for i in chunk])):
+                    results[i] = result
+                    sentiment_cache.put(texts[i], result)
+                    metrics.text_emotion_path.inc('model')
+        except Exception as e:
+            print(f"텍스트 일괄 감성 분석 중 오류 발생: {e}")
+
+    missing = sum(1 for result in results if result is None)
+    if missing:
+        metrics.text_emotion_path.inc('fallback', amount=missing)
+    versions = [SCORING_VERSION if result is not None else DEGRADED_SCORING_VERSION for result in results]
+    results = [_with_embedding(result) if result is not None else ('Neutral', 0.5, None) for result in results]
+    if not with_embeddings:
+        results = [result[:2] for result in results]
+    return [result + (version,) for result, version in zip(results, versions)] if with_versions else results
+
+# 종합 점수 계산 함수 (SCORE_WEIGHTS 비율 적용: 기분 35%, 수면 15%, 활동 20%, 텍스트 30%)
+# text_emotion을 넘기면 (일괄 분석에서 미리 분석한 경우) 텍스트 분석을 다시 하지 않음
+def calculate_total_score(mood, sleep, activity, feeling_text, text_emotion=None):
     try:
         # KCBERT 및 키워드로 텍스트 감정 분석
-        text_emotion, _ = analyze_text_emotion(feeling_text)
+        if text_emotion is None:
+            text_emotion, _ = analyze_text_emotion(feeling_text)
         
         mood = int(mood) if mood is not None else 5
         sleep = int(sleep) if sleep is not None else 6
@@ -118,10 +264,10 @@ def calculate_total_score(mood, sleep, activity, feeling_text):
 
         # --- 점수 계산 로직 ---
         # 기분(35%) + 수면(15%) + 활동(20%) + 텍스트(30%)
-        mood_w = mood * 0.35
-        sleep_w = sleep_adj * 0.15
-        activity_w = activity * 0.2
-        text_w = text_score * 0.3
+        mood_w = mood * SCORE_WEIGHTS['mood']
+        sleep_w = sleep_adj * SCORE_WEIGHTS['sleep']
+        activity_w = activity * SCORE_WEIGHTS['activity']
+        text_w = text_score * SCORE_WEIGHTS['text']
         
         combined_score = mood_w + sleep_w + activity_w + text_w
         
@@ -136,10 +282,10 @@ def calculate_total_score(mood, sleep, activity, feeling_text):
 
         # 계산 내역 생성 (프론트엔드 표시용)
         breakdown = {
-            'mood_calc': f"{mood}점 × 35% = {mood_w:.2f}",
-            'sleep_calc': f"{sleep_adj}시간(보정) × 15% = {sleep_w:.2f}",
-            'activity_calc': f"{activity}점 × 20% = {activity_w:.2f}",
-            'text_calc': f"{text_emotion}({text_score}점) × 30% = {text_w:.2f}",
+            'mood_calc': f"{mood}점 × {SCORE_WEIGHTS['mood']:.0%} = {mood_w:.2f}",
+            'sleep_calc': f"{sleep_adj}시간(보정) × {SCORE_WEIGHTS['sleep']:.0%} = {sleep_w:.2f}",
+            'activity_calc': f"{activity}점 × {SCORE_WEIGHTS['activity']:.0%} = {activity_w:.2f}",
+            'text_calc': f"{text_emotion}({text_score}점) × {SCORE_WEIGHTS['text']:.0%} = {text_w:.2f}",
             'total_raw': f"{mood_w + sleep_w + activity_w + text_w:.2f}",
             'cap_applied': cap_applied
         }
@@ -157,167 +303,372 @@ def classify_emotion_by_combined_score(score):
     elif score <= 8.5: return "긍정적"
     else: return "매우 긍정적"
 
-# --- 챌린지 데이터 풀 (링크 안전성 확보 및 대폭 확장) ---
-CHALLENGES_POOL = {
-    'video': [
-        # Low Energy (차분함, 힐링)
-        {'title': '5분 명상: 불안과 스트레스 해소', 'url': 'https://www.youtube.com/results?search_query=5분+명상+불안+해소', 'energy': 'low'},
-        {'title': '지브리 스튜디오 피아노 음악', 'url': 'https://www.youtube.com/results?search_query=지브리+피아노+모음', 'energy': 'low'},
-        {'title': '마음이 편안해지는 자연 소리 (ASMR)', 'url': 'https://www.youtube.com/results?search_query=자연+소리+ASMR', 'energy': 'low'},
-        {'title': '심신 안정을 위한 힐링 주파수', 'url': 'https://www.youtube.com/results?search_query=힐링+주파수', 'energy': 'low'},
-        # Medium Energy (기분 전환, 흥미)
-        {'title': '기분 전환을 위한 웃긴 동물 영상', 'url': 'https://www.youtube.com/results?search_query=웃긴+동물+영상+모음', 'energy': 'medium'},
-        {'title': '활력을 주는 아침 스트레칭 가이드', 'url': 'https://www.youtube.com/results?search_query=아침+활력+스트레칭', 'energy': 'medium'},
-        {'title': '방구석 콘서트: 신나는 팝송 모음', 'url': 'https://www.youtube.com/results?search_query=신나는+팝송+모음', 'energy': 'medium'},
-        {'title': '짧고 굵은 동기부여 영상', 'url': 'https://www.youtube.com/results?search_query=짧은+동기부여+영상', 'energy': 'medium'},
-        # High Energy (에너지 발산, 성장)
-        {'title': 'TED 강연: 변화와 성장의 이야기', 'url': 'https://www.youtube.com/results?search_query=TED+강연+변화+성장', 'energy': 'high'},
-        {'title': '집에서 즐기는 줌바 댄스', 'url': 'https://www.youtube.com/results?search_query=집에서+줌바댄스', 'energy': 'high'},
-        {'title': '고강도 홈트레이닝 (타바타)', 'url': 'https://www.youtube.com/results?search_query=타바타+운동', 'energy': 'high'},
-        {'title': '세상을 바꾸는 시간 15분 (세바시)', 'url': 'https://www.youtube.com/results?search_query=세바시+레전드', 'energy': 'high'},
-    ],
-    'activity': [
-        # Low Energy (정적 활동)
-        {'title': '창문 열고 5번 깊게 숨쉬기', 'url': '#', 'energy': 'low'},
-        {'title': '따뜻한 차나 물 한 잔 마시기', 'url': '#', 'energy': 'low'},
-        {'title': '눈 감고 3분간 아무 생각 안 하기', 'url': '#', 'energy': 'low'},
-        {'title': '반려식물 물 주기 및 잎 닦아주기', 'url': '#', 'energy': 'low'},
-        {'title': '좋아하는 향수나 캔들 향 맡기', 'url': '#', 'energy': 'low'},
-        # Medium Energy (가벼운 활동)
-        {'title': '가벼운 15분 동네 산책하기', 'url': '#', 'energy': 'medium'},
-        {'title': '좋아하는 노래 크게 틀고 따라부르기', 'url': '#', 'energy': 'medium'},
-        {'title': '책상 위나 지갑 정리하기', 'url': '#', 'energy': 'medium'},
-        {'title': '스마트폰 사진첩 정리하며 추억 여행', 'url': '#', 'energy': 'medium'},
-        {'title': '간단한 셀프 마사지 (목, 어깨)', 'url': 'https://www.youtube.com/results?search_query=셀프+목+어깨+마사지', 'energy': 'medium'},
-        # High Energy (동적 활동)
-        {'title': '오랜만에 친구에게 전화 걸어 수다 떨기', 'url': '#', 'energy': 'high'},
-        {'title': '방 전체 청소기 돌리고 환기하기', 'url': '#', 'energy': 'high'},
-        {'title': '플랭크 1분 도전하기', 'url': 'https://www.youtube.com/results?search_query=올바른+플랭크+자세', 'energy': 'high'},
-        {'title': '가까운 공원이나 뒷산 다녀오기', 'url': '#', 'energy': 'high'},
-        {'title': '새로운 요리 레시피 도전해보기', 'url': 'https://www.10000recipe.com/', 'energy': 'high'},
-    ],
-    'creative': [
-        # Low Energy (사색, 기록)
-        {'title': '지금 드는 감정 3단어로 표현해보기', 'url': '#', 'energy': 'low'},
-        {'title': '좋아하는 시 한 편 필사하기', 'url': 'https://search.naver.com/search.naver?query=좋은+시+추천', 'energy': 'low'},
-        {'title': '내일의 할 일 목록(To-Do List) 작성하기', 'url': '#', 'energy': 'low'},
-        {'title': '감사일기: 오늘 고마웠던 것 3가지 쓰기', 'url': '#', 'energy': 'low'},
-        # Medium Energy (표현, 꾸미기)
-        {'title': '컬러링북이나 만다라 색칠하기', 'url': 'https://search.naver.com/search.naver?query=무료+만다라+도안', 'energy': 'medium'},
-        {'title': '스마트폰으로 하늘이나 풍경 사진 찍기', 'url': '#', 'energy': 'medium'},
-        {'title': '나만의 플레이리스트 만들기', 'url': '#', 'energy': 'medium'},
-        {'title': '블로그에 오늘의 일기 남기기', 'url': 'https://section.blog.naver.com/', 'energy': 'medium'},
-        # High Energy (창작, 기획)
-        {'title': '그림 그리기 (드로잉, 수채화 등)', 'url': 'https://www.youtube.com/results?search_query=초보+드로잉+강좌', 'energy': 'high'},
-        {'title': 'DIY 키트나 종이접기 해보기', 'url': 'https://www.youtube.com/results?search_query=종이접기', 'energy': 'high'},
-        {'title': '나중에 가고 싶은 여행 계획 짜보기', 'url': 'https://www.google.com/maps', 'energy': 'high'},
-        {'title': '짧은 소설이나 에세이 써보기', 'url': '#', 'energy': 'high'},
-    ]
-}
-
 # 피드백 점수 조회 함수
+# challenge_scores 집계 테이블을 읽고, 짧은 시간(TTL) 동안 메모리에 보관
+FEEDBACK_SCORES_TTL = float(os.environ.get('BLOOM_FEEDBACK_SCORES_TTL', 5))
+_feedback_scores_cache = {'scores': None, 'expires': 0.0}
+_feedback_scores_lock = threading.Lock()
+
 def get_challenge_feedback_scores():
-    conn = get_db_connection()
+    with metrics.timed('feedback_scores'):
+        return _load_challenge_feedback_scores()
+
+def _load_challenge_feedback_scores():
+    now = time.monotonic()
+    with _feedback_scores_lock:
+        if _feedback_scores_cache['scores'] is not None and now < _feedback_scores_cache['expires']:
+            return _feedback_scores_cache['scores']
+
+    conn = get_connection()
     try:
-        feedback_data = conn.execute(
-            "SELECT challenge_title, SUM(CASE rating WHEN 1 THEN 1 WHEN -1 THEN -1 ELSE 0 END) as score FROM challenge_feedback GROUP BY challenge_title"
-        ).fetchall()
+        feedback_data = conn.execute("SELECT challenge_title, score FROM challenge_scores").fetchall()
         scores = {row['challenge_title']: row['score'] for row in feedback_data}
     except sqlite3.OperationalError:
         scores = {}
     finally:
-        conn.close()
+        release_connection(conn)
+
+    with _feedback_scores_lock:
+        _feedback_scores_cache['scores'] = scores
+        _feedback_scores_cache['expires'] = now + FEEDBACK_SCORES_TTL
     return scores
 
+# 피드백이 저장되면 이 프로세스의 캐시는 바로 비움 (다른 워커는 TTL 후 반영)
+def invalidate_challenge_feedback_scores():
+    with _feedback_scores_lock:
+        _feedback_scores_cache['scores'] = None
+
+# 챌린지 임베딩 파일 (`flask rebuild-challenge-embeddings`로 생성, 없으면 키워드 규칙으로 추천)
+CHALLENGE_EMBEDDINGS_PATH = os.environ.get('BLOOM_CHALLENGE_EMBEDDINGS', os.path.join(MODEL_ARTIFACTS_DIR, 'challenge_embeddings.npz'))
+load_challenge_embeddings(CHALLENGE_EMBEDDINGS_PATH, challenge_catalog, MODEL_NAME)
+
+# --- 챌린지 카탈로그 테이블 (기록에는 챌린지 ID만 저장, challenge_store.py 참고) ---
+# 예전 형식 기록을 새 형식으로 옮기는 배치 크기와 배치 사이 쉬는 시간
+COMPACT_BATCH_SIZE = int(os.environ.get('BLOOM_COMPACT_BATCH_SIZE', 500))
+COMPACT_PAUSE_MS = float(os.environ.get('BLOOM_COMPACT_PAUSE_MS', 10))
+# 1이면 서버 시작 시 예전 형식 기록을 백그라운드에서 옮김 (0이면 `flask compact-challenges`로 직접 실행)
+COMPACT_ON_START = os.environ.get('BLOOM_COMPACT_ON_START', '1') == '1'
+
+challenge_store = ChallengeStore()
+compaction_job = CompactionJob(challenge_store, batch_size=COMPACT_BATCH_SIZE, pause_s=COMPACT_PAUSE_MS / 1000)
+try:
+    challenge_store.sync(list(challenge_catalog.by_id.values()) + [DEFAULT_CHALLENGE, FALLBACK_CHALLENGE])
+    if COMPACT_ON_START and compaction_job.has_work():
+        compaction_job.start()
+except Exception as e:
+    print(f"챌린지 카탈로그 동기화 중 오류 발생: {e}")
+
 # 동적 챌린지 추천 함수
-def get_dynamic_challenges(mood, sleep, activity, feeling_text):
+# 에너지 수준별로 미리 나눠 둔 카탈로그에서 피드백 가중치에 따라 3개를 뽑음 (challenges.py 참고)
+# text_embedding(감성 분석 forward pass에서 나온 문장 임베딩)이 있으면 일기 내용과 비슷한 챌린지를 우선
+def get_dynamic_challenges(mood, sleep, activity, feeling_text, text_embedding=None):
     try:
         feedback_scores = get_challenge_feedback_scores()
-        
-        # 에너지 레벨 계산
-        avg_score = (int(mood) + int(activity)) / 2
-        sleep_val = int(sleep)
-        
-        if sleep_val < 5 or avg_score < 4:
-            energy_level = 'low'
-        elif avg_score < 7:
-            energy_level = 'medium'
-        else:
-            energy_level = 'high'
-        
-        # 적합한 챌린지 필터링
-        suitable_challenges = []
-        for category in CHALLENGES_POOL.values():
-            suitable_challenges.extend([c for c in category if c.get('energy') == energy_level])
-        
-        # 텍스트 내용 기반 추가 추천
-        feeling_text_safe = feeling_text if feeling_text else ""
-        if "불안" in feeling_text_safe or "걱정" in feeling_text_safe:
-            suitable_challenges.append({'title': '불안감을 다스리는 호흡법 따라하기', 'url': 'https://www.youtube.com/results?search_query=불안+해소+호흡법', 'energy': 'low'})
-        elif "지루" in feeling_text_safe or "심심" in feeling_text_safe:
-            suitable_challenges.append({'title': '흥미로운 단편 소설 읽기', 'url': 'https://brunch.co.kr/keyword/%EB%8B%A8%ED%8E%B8%EC%86%8C%EC%84%A4', 'energy': 'medium'})
-        
-        # 중복 제거
-        unique_challenges = list({frozenset(item.items()): item for item in suitable_challenges}.values())
+        with metrics.timed('challenges'):
+            return challenge_catalog.recommend(mood, sleep, activity, feeling_text, feedback_scores, text_embedding=text_embedding)
+    except Exception:
+        return [dict(FALLBACK_CHALLENGE) for _ in range(3)]
 
-        if not unique_challenges:
-             return [{'title': '가벼운 스트레칭 하기', 'url': '#', 'type': '활동'}] * 3
+# --- 일괄 분석 (배치 API, 가져오기 명령어 공용) ---
+# 재채점할 수 있도록 입력값(mood, sleep, activity)과 텍스트 감정, 채점 버전도 함께 저장
+# 추천 챌린지는 카탈로그 ID 목록으로, 피드백은 비어 있으면 NULL로 저장
+INSERT_RECORD_SQL = ('INSERT INTO records (user_id, date, score, status, text, challenge_ids, feedback_json, '
+                     'mood, sleep, activity, text_emotion, scoring_version) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)')
+RECORD_DATE_FORMATS = ("%Y-%m-%d %H:%M", "%Y-%m-%d %H:%M:%S", "%Y-%m-%d")
 
-        # 가중치 계산 (피드백 반영)
-        weights = [max(0.1, 1 + feedback_scores.get(c['title'], 0)) for c in unique_challenges]
-        
-        if not weights or sum(weights) <= 0:
-             selected_challenges = random.sample(unique_challenges, min(3, len(unique_challenges)))
-        else:
-            selected_challenges = []
-            temp_suitable = list(unique_challenges)
-            temp_weights = list(weights)
-
-            # 가중치 기반 랜덤 선택 (최대 3개)
-            while len(selected_challenges) < 3 and len(temp_suitable) > 0:
-                if sum(temp_weights) <= 0: break
-                try:
-                    chosen_list = random.choices(temp_suitable, weights=temp_weights, k=1)
-                    if chosen_list:
-                        chosen = chosen_list[0]
-                        if chosen not in selected_challenges:
-                             selected_challenges.append(chosen)
-                        idx = temp_suitable.index(chosen)
-                        temp_suitable.pop(idx)
-                        temp_weights.pop(idx)
-                        if not temp_weights: break
-                    else: break
-                except ValueError:
-                    break
-        
-        # 부족한 개수 채우기
-        remaining_candidates = [c for c in unique_challenges if c not in selected_challenges]
-        needed = 3 - len(selected_challenges)
-        if needed > 0 and remaining_candidates:
-            selected_challenges.extend(random.sample(remaining_candidates, min(needed, len(remaining_candidates))))
-
-        # 챌린지 타입 결정 및 최종 리스트 생성
-        final_selection = []
-        for c in selected_challenges[:3]:
-            url = c.get('url', '#')
-            new_c = c.copy()
-            if 'youtube.com' in url or 'youtu.be' in url:
-                new_c['type'] = '유튜브'
-            elif 'search.naver.com' in url or 'brunch.co.kr' in url or 'pinterest.co.kr' in url or 'goodnewsnetwork.org' in url or '10000recipe.com' in url or 'google.com/maps' in url:
-                new_c['type'] = '웹사이트/블로그'
-            elif url == '#':
-                new_c['type'] = '활동'
-            else:
-                new_c['type'] = '기타'
-            final_selection.append(new_c)
-        
-        # 그래도 3개가 안되면 기본 챌린지로 채움
-        while len(final_selection) < 3:
-             final_selection.append({'title': '잠시 눈 감고 휴식하기', 'url': '#', 'type': '활동'})
+# 입력 날짜를 기록 형식("%Y-%m-%d %H:%M")으로 맞춤, 없으면 현재 시각
+def normalize_record_date(value):
+    if not value:
+        return datetime.now().strftime("%Y-%m-%d %H:%M")
+    for fmt in RECORD_DATE_FORMATS:
+        try:
+            return datetime.strptime(str(value), fmt).strftime("%Y-%m-%d %H:%M")
+        except ValueError:
+            continue
+    raise ValueError(f"날짜 형식이 올바르지 않습니다: {value}")
+
+# 항목 목록을 채점해 (저장할 행, 응답용 결과) 목록을 돌려줌. 잘못된 항목은 행 대신 오류 메시지
+def score_entries(entries):
+    texts = [entry.get('feeling_text') if isinstance(entry, dict) else None for entry in entries]
+    emotions = analyze_text_emotions(texts, with_embeddings=True, with_versions=True)
+    scored = []
+    for entry, (text_emotion, _, text_embedding, scoring_version) in zip(entries, emotions):
+        try:
+            if not isinstance(entry, dict):
+                raise ValueError("항목은 JSON 객체여야 합니다.")
+            mood, sleep, activity = entry.get('mood'), entry.get('sleep'), entry.get('activity')
+            if mood is None or sleep is None or activity is None:
+                raise ValueError("필수 입력값이 누락되었습니다.")
+            mood, sleep, activity = int(mood), int(sleep), int(activity)
+            date = normalize_record_date(entry.get('date'))
+        except (ValueError, TypeError) as e:
+            scored.append((None, {"success": False, "message": str(e)}))
+            continue
+
+        feeling_text = entry.get('feeling_text')
+        combined_score, text_emotion, breakdown = calculate_total_score(mood, sleep, activity, feeling_text, text_emotion=text_emotion)
+        emotion_status = classify_emotion_by_combined_score(combined_score)
+        dynamic_challenges = get_dynamic_challenges(mood, sleep, activity, feeling_text, text_embedding)
+        row = (date, round(combined_score, 2), emotion_status, feeling_text, challenge_store.pack(dynamic_challenges), None,
+               mood, sleep, activity, text_emotion, scoring_version)
+        scored.append((row, {
+            "success": True,
+            "date": date,
+            "score": row[1],
+            "text_emotion": text_emotion,
+            "emotion_status": emotion_status,
+            "challenges": dynamic_challenges,
+            "breakdown": breakdown,
+        }))
+    return scored
 
-        return final_selection
+# 채점된 행들을 한 트랜잭션에서 executemany로 저장하고, 저장된 순서대로 기록 ID를 반환
+def insert_scored_rows(conn, user_id, rows):
+    if not rows:
+        return []
+    conn.execute("BEGIN IMMEDIATE")
+    try:
+        # 쓰기 잠금을 잡은 상태이므로 이 값보다 큰 ID는 모두 이번에 저장한 기록
+        last_id = conn.execute("SELECT COALESCE(MAX(id), 0) FROM records").fetchone()[0]
+        conn.executemany(INSERT_RECORD_SQL, [(user_id,) + row for row in rows])
+        record_ids = [r[0] for r in conn.execute("SELECT id FROM records WHERE id > ? ORDER BY id", (last_id,))]
+        conn.commit()
     except Exception:
-        return [{'title': '가벼운 스트레칭 하기', 'url': '#', 'type': '활동'}] * 3
+        conn.rollback()
+        raise
+    return record_ids
+
+# --- 기록 재채점 (채점 버전이 바뀐 기록을 백그라운드에서 다시 채점) ---
+RESCORE_BATCH_SIZE = int(os.environ.get('BLOOM_RESCORE_BATCH_SIZE', 32))
+# 배치 사이 쉬는 시간. 실시간 /analyze 요청이 처리 중이면 끝날 때까지 추가로 쉼
+RESCORE_PAUSE_MS = float(os.environ.get('BLOOM_RESCORE_PAUSE_MS', 50))
+# 재채점 시작/진행률 API 접근 토큰 (비어 있으면 API 비활성화, CLI만 사용 가능)
+ADMIN_TOKEN = os.environ.get('BLOOM_ADMIN_TOKEN', '')
+
+# 저장된 입력값으로 기록을 다시 채점해 UPDATE용 (score, status, text_emotion, scoring_version, id) 목록을 돌려줌
+# 모델 오류(추론 풀 busy 포함)로 중립으로 대신한 기록이 있으면 저장하지 않도록 RescoreRetryError 발생
+# (나머지 기록의 결과와 실패한 기록 ID를 함께 담아, 재시도 횟수를 넘기면 RescoreJob이 채점한 기록만 저장)
+def rescore_records(rows):
+    emotions = analyze_text_emotions([row['text'] for row in rows], with_versions=True)
+    updates, failed_ids = [], []
+    for row, (text_emotion, _, version) in zip(rows, emotions):
+        if version == DEGRADED_SCORING_VERSION:
+            failed_ids.append(row['id'])
+            continue
+        combined_score, text_emotion, _ = calculate_total_score(row['mood'], row['sleep'], row['activity'], row['text'], text_emotion=text_emotion)
+        updates.append((round(combined_score, 2), classify_emotion_by_combined_score(combined_score), text_emotion, SCORING_VERSION, row['id']))
+    if failed_ids:
+        raise RescoreRetryError(f"감성 분석 모델 오류로 {len(failed_ids)}건을 다시 채점하지 못했습니다.", updates, failed_ids)
+    return updates
+
+# 모델이 준비되기 전에 재채점하면 중립으로 잘못 채점되므로 준비될 때까지 기다림
+rescore_job = RescoreJob(SCORING_VERSION, rescore_records, batch_size=RESCORE_BATCH_SIZE, pause_s=RESCORE_PAUSE_MS / 1000,
+                         is_busy=lambda: inference_scheduler.pending() > 0, is_ready=lambda: model_loader.ready)
+
+# --- 비동기 분석 (기록을 먼저 저장하고 워커 스레드에서 채점) ---
+ANALYZE_WORKERS = int(os.environ.get('BLOOM_ANALYZE_WORKERS', 2))
+# 모델이 아직 로드 중이면 채점 전에 기다리는 최대 시간(초). 지나면 키워드 분석만으로 채점
+ANALYZE_MODEL_WAIT_S = float(os.environ.get('BLOOM_ANALYZE_MODEL_WAIT_S', 30))
+# SSE 연결을 유지하는 최대 시간(초)
+ANALYZE_STREAM_TIMEOUT_S = float(os.environ.get('BLOOM_ANALYZE_STREAM_TIMEOUT_S', 60))
+
+ANALYSIS_ROW_SQL = ('SELECT id, user_id, date, score, status, text, challenge_ids, feedback_json, recommended_challenges_json, '
+                    'feedback_given_json, mood, sleep, activity, text_emotion FROM records WHERE id = ?')
+
+# 분석 응답 생성 (새 기록도 /get_data와 같은 형식으로 포함해 클라이언트가 목록을 다시 받지 않도록 함)
+def make_analysis_response(row, text_emotion, challenges, breakdown):
+    return {
+        "success": True,
+        "record_id": row['id'],
+        "score": row['score'],
+        "text_emotion": text_emotion,
+        "emotion_status": row['status'],
+        "challenges": challenges,
+        "breakdown": breakdown,
+        "record": record_view(row, RECORD_FIELDS),
+    }
+
+# 채점이 끝난 기록으로 응답 생성 (다른 워커가 처리했거나 재시작 후 조회하는 경우). 아직 대기 중이면 None
+def analysis_response_from_row(row):
+    if row['status'] == PENDING_STATUS:
+        return None
+    _, _, breakdown = calculate_total_score(row['mood'], row['sleep'], row['activity'], row['text'], text_emotion=row['text_emotion'])
+    challenges = json.loads(challenge_store.record_challenges_json(row))
+    return make_analysis_response(row, row['text_emotion'], challenges, breakdown)
+
+# 대기 중인 기록 하나를 채점해 저장 (분석 워커에서 실행)
+def process_pending_record(record_id):
+    conn = get_connection()
+    try:
+        row = conn.execute(ANALYSIS_ROW_SQL, (record_id,)).fetchone()
+        if row is None:
+            return None
+        if row['status'] != PENDING_STATUS:
+            return analysis_response_from_row(row)
+
+        model_loader.wait(ANALYZE_MODEL_WAIT_S)
+        # 이미 202로 응답했으므로 거절하지 않고, 과부하면 키워드 분석으로 채점해 재채점 대상으로 표시
+        text_emotion, _, text_embedding, scoring_version = analyze_text_emotion_admitted(row['text'], allow_reject=False)
+        combined_score, text_emotion, breakdown = calculate_total_score(row['mood'], row['sleep'], row['activity'], row['text'], text_emotion=text_emotion)
+        emotion_status = classify_emotion_by_combined_score(combined_score)
+        dynamic_challenges = get_dynamic_challenges(row['mood'], row['sleep'], row['activity'], row['text'], text_embedding)
+        challenge_ids = challenge_store.pack(dynamic_challenges)
+
+        # 다른 워커가 먼저 처리했다면 덮어쓰지 않음
+        updated = conn.execute(
+            'UPDATE records SET score = ?, status = ?, challenge_ids = ?, text_emotion = ?, scoring_version = ? WHERE id = ? AND status = ?',
+            (round(combined_score, 2), emotion_status, challenge_ids, text_emotion, scoring_version, record_id, PENDING_STATUS)).rowcount
+        conn.commit()
+        row = conn.execute(ANALYSIS_ROW_SQL, (record_id,)).fetchone()
+        if not updated:
+            return analysis_response_from_row(row)
+        return make_analysis_response(row, text_emotion, dynamic_challenges, breakdown)
+    finally:
+        release_connection(conn)
+
+analysis_jobs = AnalysisJobs(process_pending_record, max_workers=ANALYZE_WORKERS)
+
+# 서버가 중간에 종료되어 채점되지 못한 기록을 다시 작업으로 등록
+def resume_pending_analyses():
+    conn = get_connection()
+    try:
+        pending = [row['id'] for row in conn.execute('SELECT id FROM records WHERE status = ? ORDER BY id', (PENDING_STATUS,))]
+    finally:
+        release_connection(conn)
+    for record_id in pending:
+        analysis_jobs.submit(record_id)
+    return len(pending)
+
+try:
+    resumed = resume_pending_analyses()
+    if resumed:
+        print(f"채점 대기 중이던 기록 {resumed}건을 다시 분석합니다.")
+except Exception as e:
+    print(f"대기 중인 분석 작업 확인 중 오류 발생: {e}")
+
+# --- 세션 토큰 / 사용자 ID 캐시 ---
+# 로그인 시 서명된 세션 토큰을 발급하고, 이후 요청은 토큰(Authorization: Bearer 또는 token 파라미터)만으로
+# 사용자 ID를 확인하므로 요청마다 users 테이블을 조회하지 않습니다.
+# 비어 있으면 처음 시작할 때 임의 키를 만들어 DB(app_settings)에 저장하고, 모든 워커 프로세스와 재시작 후에도 같은 키를 사용
+# (프로세스마다 다른 키를 쓰면 다른 워커가 발급한 토큰을 거부해 로그아웃됨)
+def load_secret_key():
+    key = os.environ.get('BLOOM_SECRET_KEY')
+    if key:
+        return key
+    try:
+        return load_or_create_setting('session_secret_key', lambda: os.urandom(32).hex())
+    except Exception as e:
+        print(f"세션 토큰 서명 키를 DB에서 불러오지 못해 이 프로세스에서만 쓰는 임의 키를 사용합니다. (BLOOM_SECRET_KEY 지정 필요): {e}")
+        return os.urandom(32).hex()
+
+SECRET_KEY = load_secret_key()
+SESSION_TTL_S = int(os.environ.get('BLOOM_SESSION_TTL_S', 30 * 24 * 3600))
+# 아이디 → 사용자 ID 캐시와 토큰 검증 결과 캐시의 크기와 유지 시간(초)
+USER_CACHE_SIZE = int(os.environ.get('BLOOM_USER_CACHE_SIZE', 10000))
+USER_CACHE_TTL_S = float(os.environ.get('BLOOM_USER_CACHE_TTL_S', 300))
+# 비밀번호 해시를 계산하는 전용 스레드 수
+PASSWORD_HASH_WORKERS = int(os.environ.get('BLOOM_PASSWORD_HASH_WORKERS', 2))
+# 해시 스레드를 기다릴 수 있는 요청 수 (넘으면 기다리지 않고 바로 503)
+PASSWORD_HASH_MAX_PENDING = int(os.environ.get('BLOOM_PASSWORD_HASH_MAX_PENDING', PASSWORD_HASH_WORKERS * 4))
+# 1이면 토큰 없이 username만 보낸 요청은 거부 (0이면 기존 클라이언트를 위해 username도 허용)
+REQUIRE_SESSION_TOKEN = os.environ.get('BLOOM_REQUIRE_SESSION_TOKEN') == '1'
+
+session_tokens = SessionTokens(SECRET_KEY, max_age_s=SESSION_TTL_S, cache_size=USER_CACHE_SIZE, cache_ttl_s=USER_CACHE_TTL_S)
+user_id_cache = TTLCache(USER_CACHE_SIZE, USER_CACHE_TTL_S)
+password_hasher = PasswordHasher(workers=PASSWORD_HASH_WORKERS, max_pending=PASSWORD_HASH_MAX_PENDING)
+
+def request_token(req=None):
+    """요청의 세션 토큰 (req를 주지 않으면 현재 Flask 요청, 비동기 모드는 Quart 요청을 전달)"""
+    req = request if req is None else req
+    header = req.headers.get('Authorization', '')
+    if header.startswith('Bearer '):
+        return header[len('Bearer '):].strip() or None
+    # EventSource는 헤더를 보낼 수 없으므로 쿼리 파라미터도 허용
+    return req.args.get('token') or None
+
+def lookup_user_id(conn, username):
+    """아이디로 사용자 ID를 찾습니다. 캐시에 없을 때만 DB를 조회하며, 없는 사용자면 None"""
+    if not username:
+        return None
+    user_id = user_id_cache.get(username)
+    if user_id is None:
+        user = conn.execute('SELECT id FROM users WHERE username = ?', (username,)).fetchone()
+        if not user:
+            return None
+        user_id = user['id']
+        user_id_cache.put(username, user_id)
+    return user_id
+
+def token_user_id(token):
+    """토큰으로 확인한 사용자 ID. 토큰이 없으면 False(아이디로 조회), 유효하지 않으면 None"""
+    if token:
+        identity = session_tokens.verify(token)
+        return identity[0] if identity else None
+    return None if REQUIRE_SESSION_TOKEN else False
+
+def request_user_id(conn, username=None):
+    """요청한 사용자의 ID를 반환합니다. 토큰이 있으면 토큰으로만 확인하고, 유효하지 않으면 None"""
+    user_id = token_user_id(request_token())
+    if user_id is False:
+        return lookup_user_id(conn, username)
+    return user_id
+
+def invalidate_user(username, user_id=None):
+    """사용자 정보가 바뀌었을 때 이 프로세스에 캐시된 아이디 조회와 토큰 검증 결과를 지웁니다."""
+    user_id_cache.pop(username)
+    if user_id is not None:
+        session_tokens.invalidate_user(user_id)
+
+# --- 지표 수집 (/metrics) ---
+# 라우트별 처리 시간은 요청 훅에서, 분석 단계별 시간은 metrics.timed 블록에서 기록합니다.
+# X-Bloom-Trace 헤더를 보낸 요청에는 단계별 시간을 Server-Timing 응답 헤더로 돌려줍니다.
+TRACE_HEADER = 'X-Bloom-Trace'
+
+@app.before_request
+def start_request_metrics():
+    if not metrics.METRICS_ENABLED:
+        return
+    request.environ['bloom.start'] = time.perf_counter()
+    if request.headers.get(TRACE_HEADER):
+        metrics.start_trace()
+
+@app.after_request
+def finish_request_metrics(response):
+    start = request.environ.get('bloom.start')
+    if start is None:
+        return response
+    elapsed = time.perf_counter() - start
+    route = request.url_rule.rule if request.url_rule else 'unmatched'
+    metrics.http_request_seconds.observe(elapsed, route, request.method, str(response.status_code))
+    stages = metrics.finish_trace()
+    if stages is not None:
+        stages['total'] = (elapsed, 1)
+        response.headers['Server-Timing'] = metrics.server_timing_header(stages)
+    return response
+
+# 다른 모듈에서 이미 집계하고 있는 값(캐시 적중률, 과부하 제어, 대기열 길이 등)을 출력 시점에 읽어 옴
+def collect_app_metrics():
+    cache = sentiment_cache.stats()
+    overload = admission.stats()
+    user_cache, session_cache = user_id_cache.stats(), session_tokens.stats()
+    return [
+        ('bloom_sentiment_cache_requests_total', 'counter', "감성 분석 캐시 조회 수",
+         [({'result': 'hit'}, cache['hits']), ({'result': 'miss'}, cache['misses'])]),
+        ('bloom_sentiment_cache_persistent_hits_total', 'counter', "파일 캐시(BLOOM_SENTIMENT_CACHE_DB)에서 찾은 수", [({}, cache['persistent_hits'])]),
+        ('bloom_sentiment_cache_evictions_total', 'counter', "메모리 캐시에서 밀려난 결과 수", [({}, cache['evictions'])]),
+        ('bloom_sentiment_cache_size', 'gauge', "메모리 캐시에 보관 중인 결과 수", [({}, cache['size'])]),
+        ('bloom_sentiment_cache_hit_ratio', 'gauge', "감성 분석 캐시 적중률", [({}, cache['hit_rate'])]),
+        ('bloom_admission_requests_total', 'counter', "과부하 제어 결과 (admitted/degraded/rejected)",
+         [({'outcome': outcome}, overload[outcome]) for outcome in ('admitted', 'degraded', 'rejected')]),
+        ('bloom_model_queue_depth', 'gauge', "모델 대기열에서 대기/처리 중인 요청 수", [({}, overload['queue_depth'])]),
+        ('bloom_analysis_jobs_pending', 'gauge', "채점을 기다리는 비동기 분석 작업 수", [({}, analysis_jobs.queue_depth())]),
+        ('bloom_model_ready', 'gauge', "감성 분석 모델 준비 여부", [({'backend': INFERENCE_BACKEND}, model_loader.ready)]),
+        ('bloom_user_cache_requests_total', 'counter', "사용자 ID / 세션 토큰 캐시 조회 수",
+         [({'cache': name, 'result': result}, stats[key]) for name, stats in (('user_id', user_cache), ('session', session_cache))
+          for result, key in (('hit', 'hits'), ('miss', 'misses'))]),
+    ]
+
+metrics.registry.register_collector(collect_app_metrics)
 
 # --- 챗봇 질문 ---
 options_template = [{"text": "전혀 없음 (0점)", "score": 0}, {"text": "며칠 동안 (1점)", "score": 1}, {"text": "일주일 이상 (2점)", "score": 2}, {"text": "거의 매일 (3점)", "score": 3}]
@@ -328,7 +679,80 @@ PHQ9_QUESTIONS = [{"id": i+1, "text": q, "options": options_template} for i, q i
 def index():
     return render_template('index.html')
 
+# 모델 준비 상태 확인 (로드 중이면 503), 과부하 제어 통계 포함
+def ready_status():
+    status = model_loader.status()
+    status["admission"] = admission.stats()
+    return status
+
+@app.route('/ready', methods=['GET'])
+def ready():
+    status = ready_status()
+    return jsonify(status), (200 if status['ready'] else 503)
+
+# Prometheus 텍스트 형식 지표 (이 프로세스의 값, gunicorn 워커마다 따로 집계됨)
+@app.route('/metrics', methods=['GET'])
+def metrics_route():
+    if not metrics.METRICS_ENABLED:
+        return jsonify({"success": False, "message": "지표 수집이 꺼져 있습니다."}), 404
+    return Response(metrics.registry.render(), mimetype='text/plain; version=0.0.4')
+
+def is_admin(req=None):
+    req = request if req is None else req
+    return bool(ADMIN_TOKEN) and req.headers.get('X-Admin-Token') == ADMIN_TOKEN
+
+# 프로파일러 시작/중지 요청을 처리해 (응답 본문, 상태 코드)를 반환
+def profiler_action(data):
+    if data.get('action') == 'stop':
+        metrics.profiler.stop()
+        return dict(metrics.profiler.status(), success=True), 200
+    try:
+        seconds = min(float(data.get('seconds', 30)), 600)
+    except (TypeError, ValueError):
+        return {"success": False, "message": "seconds 값이 올바르지 않습니다."}, 400
+    started = metrics.profiler.start(duration_s=seconds)
+    return dict(metrics.profiler.status(), success=True, started=started), (202 if started else 200)
+
+# 샘플링 프로파일러 시작/중지(POST {"action": "start"|"stop", "seconds": 30}) 및 결과 조회(GET), X-Admin-Token 헤더 필요
+# 결과는 collapsed stack 형식 텍스트 (flamegraph.pl, speedscope에서 열 수 있음)
+@app.route('/admin/profiler', methods=['GET', 'POST'])
+def admin_profiler():
+    if not is_admin():
+        return jsonify({"success": False, "message": "권한이 없습니다."}), 403
+    if request.method == 'POST':
+        body, status = profiler_action(request.get_json(silent=True) or {})
+        return jsonify(body), status
+    limit = request.args.get('limit', type=int)
+    return Response(metrics.profiler.collapsed(limit), mimetype='text/plain')
+
+# 기록 재채점 시작(POST) 및 진행률/남은 시간 조회(GET), X-Admin-Token 헤더 필요
+@app.route('/admin/rescore', methods=['GET', 'POST'])
+def admin_rescore():
+    if not is_admin():
+        return jsonify({"success": False, "message": "권한이 없습니다."}), 403
+    if request.method == 'POST':
+        started = rescore_job.start()
+        return jsonify(dict(rescore_job.status(), success=True, started=started)), (202 if started else 200)
+    return jsonify(dict(rescore_job.status(), success=True))
+
+# 예전 형식 기록의 챌린지 변환 시작(POST) 및 진행률 조회(GET), X-Admin-Token 헤더 필요
+@app.route('/admin/compact-challenges', methods=['GET', 'POST'])
+def admin_compact_challenges():
+    if not is_admin():
+        return jsonify({"success": False, "message": "권한이 없습니다."}), 403
+    if request.method == 'POST':
+        started = compaction_job.start()
+        return jsonify(dict(compaction_job.status(), success=True, started=started)), (202 if started else 200)
+    return jsonify(dict(compaction_job.status(), success=True))
+
 # --- 사용자 인증 라우트 (회원가입) ---
+INSERT_USER_SQL = ('INSERT INTO users (username, password, name, birthdate, gender, region_si_do, region_gu) '
+                   'VALUES (?, ?, ?, ?, ?, ?, ?)')
+
+def new_user_params(data, hashed_password):
+    return (data.get('username'), hashed_password, data.get('name'), data.get('birthdate'), data.get('gender'),
+            data.get('region_si_do'), data.get('region_gu'))
+
 @app.route('/register', methods=['POST'])
 def register():
     conn = None
@@ -338,66 +762,307 @@ def register():
         if not username or not password:
             return jsonify({"success": False, "message": "아이디와 비밀번호를 모두 입력해주세요."}), 400
         
-        conn = get_db_connection()
+        conn = get_connection()
         user = conn.execute('SELECT * FROM users WHERE username = ?', (username,)).fetchone()
         if user:
             return jsonify({"success": False, "message": "이미 존재하는 아이디입니다."}), 409
             
-        hashed_password = generate_password_hash(password)
-        conn.execute('INSERT INTO users (username, password, name, birthdate, gender, region_si_do, region_gu) VALUES (?, ?, ?, ?, ?, ?, ?)',
-                     (username, hashed_password, data.get('name'), data.get('birthdate'), data.get('gender'), data.get('region_si_do'), data.get('region_gu')))
+        # 해시 계산은 전용 스레드에서 (요청 스레드는 결과만 기다리고, 대기열이 가득 차 있으면 바로 503)
+        hashed_password = password_hasher.hash(password)
+        conn.execute(INSERT_USER_SQL, new_user_params(data, hashed_password))
         conn.commit()
+        invalidate_user(username)
+    except (FutureTimeoutError, PasswordHasherBusy):
+        return jsonify({"success": False, "message": "요청이 많아 처리하지 못했습니다. 잠시 후 다시 시도해주세요."}), 503
     except Exception as e:
         print(f"회원가입 중 오류: {e}")
         print(traceback.format_exc())
         return jsonify({"success": False, "message": "회원가입 처리 중 오류가 발생했습니다."}), 500
     finally:
-        if conn: conn.close()
+        release_connection(conn)
     return jsonify({"success": True, "message": "회원가입이 완료되었습니다."})
 
 # --- 사용자 인증 라우트 (로그인) ---
+# 성공하면 세션 토큰을 발급합니다. 유효한 토큰(Authorization: Bearer)으로 다시 로그인하면
+# 비밀번호 해시를 계산하지 않고 새 토큰만 발급합니다.
 @app.route('/login', methods=['POST'])
 def login():
+    token = request_token()
+    if token:
+        identity = session_tokens.verify(token)
+        if identity:
+            user_id, username = identity
+            return jsonify({"success": True, "message": "로그인 성공!", "username": username, "token": session_tokens.issue(user_id, username)})
+        if not (request.json or {}).get('password'):
+            return jsonify({"success": False, "message": "로그인이 만료되었습니다. 다시 로그인해주세요."}), 401
+
     conn = None
     try:
         data = request.json
         username, password = data.get('username'), data.get('password')
-        conn = get_db_connection()
-        user = conn.execute('SELECT * FROM users WHERE username = ?', (username,)).fetchone()
+        conn = get_connection()
+        user = conn.execute('SELECT id, password FROM users WHERE username = ?', (username,)).fetchone()
     except Exception as e:
         print(f"로그인 DB 조회 중 오류: {e}")
         print(traceback.format_exc())
         return jsonify({"success": False, "message": "로그인 처리 중 오류가 발생했습니다."}), 500
     finally:
-        if conn: conn.close()
+        release_connection(conn)
 
-    if user and check_password_hash(user['password'], password):
-        return jsonify({"success": True, "message": "로그인 성공!"})
+    try:
+        verified = bool(user) and password_hasher.verify(user['password'], password)
+    except (FutureTimeoutError, PasswordHasherBusy):
+        return jsonify({"success": False, "message": "요청이 많아 처리하지 못했습니다. 잠시 후 다시 시도해주세요."}), 503
+    if verified:
+        user_id_cache.put(username, user['id'])
+        return jsonify({"success": True, "message": "로그인 성공!", "username": username, "token": session_tokens.issue(user['id'], username)})
     else:
         return jsonify({"success": False, "message": "아이디 또는 비밀번호가 일치하지 않습니다."}), 401
 
 # --- 데이터 관리 라우트 (조회) ---
+# 조회 가능한 기록 필드와 자주 쓰는 조합 (fields=chart 처럼 사용)
+# recommended_challenges_json / feedback_given_json은 기존 클라이언트용으로 챌린지 내용을 기록마다 담은 문자열이고,
+# challenge_ids / feedback은 챌린지 ID만 담고 챌린지 내용은 응답의 challenges(ID → 챌린지)에 한 번씩만 담음
+RECORD_FIELDS = ['id', 'date', 'score', 'status', 'text', 'recommended_challenges_json', 'feedback_given_json']
+COMPACT_RECORD_FIELDS = ['challenge_ids', 'feedback']
+RECORD_FIELD_PRESETS = {
+    'chart': ['id', 'date', 'score'],
+    'summary': ['id', 'date', 'score', 'status'],
+    'compact': ['id', 'date', 'score', 'status', 'text', 'challenge_ids', 'feedback'],
+}
+# 챌린지 필드를 만들 때 읽는 컬럼 (새 형식과 아직 옮기지 않은 예전 형식 컬럼을 함께 읽음)
+RECORD_FIELD_COLUMNS = {
+    'recommended_challenges_json': ('challenge_ids', 'recommended_challenges_json'),
+    'feedback_given_json': ('challenge_ids', 'feedback_json', 'feedback_given_json'),
+    'challenge_ids': ('challenge_ids', 'recommended_challenges_json'),
+    'feedback': ('challenge_ids', 'feedback_json', 'feedback_given_json'),
+}
+MAX_PAGE_SIZE = 500
+
+def parse_record_fields(value):
+    if not value:
+        return list(RECORD_FIELDS)
+    if value in RECORD_FIELD_PRESETS:
+        return list(RECORD_FIELD_PRESETS[value])
+    fields = [f.strip() for f in value.split(',') if f.strip()]
+    unknown = [f for f in fields if f not in RECORD_FIELDS + COMPACT_RECORD_FIELDS]
+    if unknown:
+        raise ValueError(f"알 수 없는 필드입니다: {', '.join(unknown)}")
+    # 페이지 커서에 필요한 id, date는 항상 포함
+    return [f for f in RECORD_FIELDS + COMPACT_RECORD_FIELDS if f in fields or f in ('id', 'date')]
+
+def record_columns(fields):
+    columns = []
+    for field in fields:
+        for column in RECORD_FIELD_COLUMNS.get(field, (field,)):
+            if column not in columns:
+                columns.append(column)
+    return columns
+
+# 챌린지 필드 값을 만드는 함수 (나머지 필드는 컬럼 값 그대로)
+RECORD_FIELD_VIEWS = {
+    'recommended_challenges_json': challenge_store.record_challenges_json,
+    'feedback_given_json': challenge_store.record_feedback_json,
+    'challenge_ids': challenge_store.record_challenge_ids,
+    'feedback': lambda row: {str(k): v for k, v in challenge_store.record_feedback(row).items()},
+}
+
+# 기록 행(DB 행 또는 같은 키의 dict)을 응답 필드로 변환 (챌린지는 카탈로그 캐시로 채움)
+def record_view(row, fields):
+    return {field: RECORD_FIELD_VIEWS[field](row) if field in RECORD_FIELD_VIEWS else row[field] for field in fields}
+
+# 페이지 커서: 마지막으로 받은 기록의 (date, id)
+def encode_cursor(date, record_id):
+    return base64.urlsafe_b64encode(json.dumps([date, record_id]).encode('utf-8')).decode('ascii')
+
+def decode_cursor(cursor):
+    try:
+        date, record_id = json.loads(base64.urlsafe_b64decode(cursor.encode('ascii')))
+        return str(date), int(record_id)
+    except Exception:
+        raise ValueError("잘못된 cursor 값입니다.")
+
+# 조회 파라미터를 (fields, limit, since, cursor)로 검사 (잘못되면 ValueError)
+def parse_page_args(args):
+    fields = parse_record_fields(args.get('fields'))
+    limit = args.get('limit', type=int)
+    if limit is not None and not 1 <= limit <= MAX_PAGE_SIZE:
+        raise ValueError(f"limit은 1~{MAX_PAGE_SIZE} 사이여야 합니다.")
+    since = args.get('since', type=int)
+    cursor = decode_cursor(args['cursor']) if args.get('cursor') else None
+    return fields, limit, since, cursor
+
+# (date, id) 순서의 keyset 페이지네이션 — idx_records_user_date 인덱스를 그대로 사용
+def records_page_sql(user_id, fields, limit, since, cursor):
+    sql = f"SELECT {', '.join(record_columns(fields))} FROM records WHERE user_id = ?"
+    params = [user_id]
+    if since is not None:
+        sql += " AND id > ?"
+        params.append(since)
+    if cursor:
+        # 행 값 비교를 써야 (user_id, date) 인덱스에서 범위 탐색을 함
+        sql += " AND (date, id) > (?, ?)"
+        params.extend([cursor[0], cursor[1]])
+    sql += " ORDER BY date ASC, id ASC"
+    if limit:
+        sql += " LIMIT ?"
+        params.append(limit + 1)
+    return sql, params
+
+# 한 행 더 읽은 결과로 응답 본문(기록 목록, 다음 페이지 커서)을 만듦
+# challenge_ids / feedback 필드를 요청하면 이 페이지에 나온 챌린지를 challenges에 한 번씩 담음
+def records_page(records, limit, fields):
+    next_cursor = None
+    if limit and len(records) > limit:
+        records = records[:limit]
+        next_cursor = encode_cursor(records[-1]['date'], records[-1]['id'])
+    data_list = [record_view(row, fields) for row in records]
+    body = {"success": True, "data": data_list, "next_cursor": next_cursor}
+    if any(field in COMPACT_RECORD_FIELDS for field in fields):
+        ids = set()
+        for record in data_list:
+            ids.update(record.get('challenge_ids', ()))
+            ids.update(int(k) for k in record.get('feedback', ()))
+        body["challenges"] = {str(k): item for k, item in sorted(challenge_store.items_map(ids).items())}
+    return body
+
+# 사용자의 기록이 바뀔 때마다 data_version이 올라가므로 기록을 읽지 않고도 변경 여부를 알 수 있음
+def data_etag(user, query_string, prefix=''):
+    return hashlib.sha1(f"{prefix}{user['id']}:{user['data_version']}:{query_string.decode('utf-8')}".encode('utf-8')).hexdigest()
+
 @app.route('/get_data', methods=['GET'])
 def get_data():
     conn = None
     try:
         username = request.args.get('username')
-        conn = get_db_connection()
-        user = conn.execute('SELECT id FROM users WHERE username = ?', (username,)).fetchone()
+        try:
+            fields, limit, since, cursor = parse_page_args(request.args)
+        except ValueError as e:
+            return jsonify({"success": False, "message": str(e)}), 400
+
+        conn = get_connection()
+        user_id = request_user_id(conn, username)
+        user = conn.execute('SELECT id, data_version FROM users WHERE id = ?', (user_id,)).fetchone() if user_id else None
         if not user:
             return jsonify({"success": False, "message": "사용자를 찾을 수 없습니다."}), 404
-            
-        records = conn.execute('SELECT id, date, score, status, text, recommended_challenges_json, feedback_given_json FROM records WHERE user_id = ? ORDER BY date ASC', (user['id'],)).fetchall()
-        data_list = [dict(row) for row in records]
+
+        etag = data_etag(user, request.query_string)
+        if request.if_none_match.contains(etag):
+            response = app.response_class(status=304)
+            response.set_etag(etag)
+            response.headers['Cache-Control'] = 'private, no-cache'
+            return response
+
+        sql, params = records_page_sql(user['id'], fields, limit, since, cursor)
+        body = records_page(conn.execute(sql, params).fetchall(), limit, fields)
     except Exception as e:
         print(f"데이터 조회 중 오류: {e}")
         print(traceback.format_exc())
         return jsonify({"success": False, "message": "데이터 조회 중 오류가 발생했습니다."}), 500
     finally:
-        if conn: conn.close()
-    return jsonify({"success": True, "data": data_list})
+        release_connection(conn)
+    response = jsonify(body)
+    response.set_etag(etag)
+    response.headers['Cache-Control'] = 'private, no-cache'
+    return response
+
+# --- 데이터 관리 라우트 (감정 점수 추이) ---
+# 기록 대신 일별 집계(daily_scores)를 읽어 구간(bucket)별 평균/최소/최대/분산과 이동 평균을 계산하고,
+# points개 이하로 줄여(LTTB) 돌려줍니다. 기록이 많아도 응답 크기와 차트 렌더링 비용이 일정합니다.
+DEFAULT_TREND_POINTS = int(os.environ.get('BLOOM_TREND_POINTS', 200))
+MAX_TREND_POINTS = 2000
+
+def parse_trend_date(value, default):
+    if not value:
+        return default
+    try:
+        return datetime.strptime(value, "%Y-%m-%d").strftime("%Y-%m-%d")
+    except ValueError:
+        raise ValueError(f"날짜 형식이 올바르지 않습니다: {value} (YYYY-MM-DD)")
+
+# 추이 파라미터를 (bucket, window, points, since, until)로 검사 (잘못되면 ValueError)
+def parse_trend_args(args):
+    bucket = args.get('bucket', 'day')
+    if bucket not in trends.BUCKETS:
+        raise ValueError(f"bucket은 {', '.join(trends.BUCKETS)} 중 하나여야 합니다.")
+    window = args.get('window', 7, type=int)
+    points = args.get('points', DEFAULT_TREND_POINTS, type=int)
+    if not 1 <= window <= 365:
+        raise ValueError("window는 1~365 사이여야 합니다.")
+    if not 3 <= points <= MAX_TREND_POINTS:
+        raise ValueError(f"points는 3~{MAX_TREND_POINTS} 사이여야 합니다.")
+    since = parse_trend_date(args.get('since'), '0000-01-01')
+    until = parse_trend_date(args.get('until'), '9999-12-31')
+    return bucket, window, points, since, until
+
+def trends_body(rows, bucket, window, points):
+    with metrics.timed('trends'):
+        series, summary = trends.build_trends(rows, window=window, points=points)
+    return {"success": True, "bucket": bucket, "window": window, "total_points": len(rows), "series": series, "summary": summary}
+
+@app.route('/trends', methods=['GET'])
+def trends_route():
+    conn = None
+    try:
+        try:
+            bucket, window, points, since, until = parse_trend_args(request.args)
+        except ValueError as e:
+            return jsonify({"success": False, "message": str(e)}), 400
+
+        conn = get_connection()
+        user_id = request_user_id(conn, request.args.get('username'))
+        user = conn.execute('SELECT id, data_version FROM users WHERE id = ?', (user_id,)).fetchone() if user_id else None
+        if not user:
+            return jsonify({"success": False, "message": "사용자를 찾을 수 없습니다."}), 404
+
+        etag = data_etag(user, request.query_string, prefix='trends:')
+        if request.if_none_match.contains(etag):
+            response = app.response_class(status=304)
+            response.set_etag(etag)
+            response.headers['Cache-Control'] = 'private, no-cache'
+            return response
+
+        rows = conn.execute(trends.trend_rows_sql(bucket), (user['id'], since, until)).fetchall()
+    except Exception as e:
+        print(f"추이 조회 중 오류: {e}")
+        print(traceback.format_exc())
+        return jsonify({"success": False, "message": "추이 조회 중 오류가 발생했습니다."}), 500
+    finally:
+        release_connection(conn)
+    response = jsonify(trends_body(rows, bucket, window, points))
+    response.set_etag(etag)
+    response.headers['Cache-Control'] = 'private, no-cache'
+    return response
 
 # --- 데이터 관리 라우트 (분석 및 저장) ---
+# 비동기 모드에서 채점 전에 먼저 저장할 기록 값
+def pending_record_params(user_id, mood, sleep, activity, feeling_text):
+    return (user_id, datetime.now().strftime("%Y-%m-%d %H:%M"), 0, PENDING_STATUS, feeling_text,
+            '', None, mood, sleep, activity, None, None)
+
+# 일기 하나를 채점해 (저장할 기록, INSERT 파라미터를 만드는 값들)을 반환 (과부하로 거절되면 OverloadedError)
+# 감성 분석 결과의 문장 임베딩은 챌린지 추천에 재사용
+def score_analysis(mood, sleep, activity, feeling_text):
+    text_emotion, _, text_embedding, scoring_version = analyze_text_emotion_admitted(feeling_text)
+    combined_score, text_emotion, breakdown = calculate_total_score(mood, sleep, activity, feeling_text, text_emotion=text_emotion)
+    emotion_status = classify_emotion_by_combined_score(combined_score)
+    dynamic_challenges = get_dynamic_challenges(mood, sleep, activity, feeling_text, text_embedding)
+
+    # DB 저장용 데이터
+    new_record_data = {
+        "date": datetime.now().strftime("%Y-%m-%d %H:%M"),
+        "score": round(combined_score, 2),
+        "status": emotion_status,
+        "text": feeling_text,
+        "challenge_ids": challenge_store.pack(dynamic_challenges),
+        "feedback_json": None
+    }
+    return new_record_data, text_emotion, scoring_version, dynamic_challenges, breakdown
+
+def scored_record_params(user_id, record, mood, sleep, activity, text_emotion, scoring_version):
+    return (user_id, record['date'], record['score'], record['status'], record['text'], record['challenge_ids'],
+            record['feedback_json'], mood, sleep, activity, text_emotion, scoring_version)
+
 @app.route('/analyze', methods=['POST'])
 def analyze_emotion_route():
     conn = None
@@ -409,55 +1074,205 @@ def analyze_emotion_route():
         activity = data.get('activity')
         feeling_text = data.get('feeling_text')
 
-        if not all([username, mood is not None, sleep is not None, activity is not None]):
+        if not all([username or request_token(), mood is not None, sleep is not None, activity is not None]):
             return jsonify({"success": False, "message": "필수 입력값이 누락되었습니다."}), 400
 
-        conn = get_db_connection()
-        user = conn.execute('SELECT id FROM users WHERE username = ?', (username,)).fetchone()
-        if not user:
+        conn = get_connection()
+        user_id = request_user_id(conn, username)
+        if not user_id:
             return jsonify({"success": False, "message": "로그인 정보가 유효하지 않습니다."}), 401
 
-        # 점수 계산 및 감정 분석 (수정된 calculate_total_score 사용)
-        combined_score, text_emotion, breakdown = calculate_total_score(mood, sleep, activity, feeling_text)
-        emotion_status = classify_emotion_by_combined_score(combined_score)
-        dynamic_challenges = get_dynamic_challenges(mood, sleep, activity, feeling_text)
-
-        # DB 저장용 데이터
-        new_record_data = {
-            "date": datetime.now().strftime("%Y-%m-%d %H:%M"),
-            "score": round(combined_score, 2),
-            "status": emotion_status,
-            "text": feeling_text,
-            "recommended_challenges_json": json.dumps(dynamic_challenges, ensure_ascii=False),
-            "feedback_given_json": json.dumps({})
-        }
-        
+        # 비동기 모드: 입력만 저장하고 기록 ID를 바로 반환 (결과는 /analyze/<id> 또는 /analyze/<id>/events로 전달)
+        if data.get('async'):
+            cursor = conn.execute(INSERT_RECORD_SQL, pending_record_params(user_id, mood, sleep, activity, feeling_text))
+            record_id = cursor.lastrowid
+            conn.commit()
+            analysis_jobs.submit(record_id)
+            return jsonify({"success": True, "record_id": record_id, "state": "pending",
+                            "result_url": f"/analyze/{record_id}", "events_url": f"/analyze/{record_id}/events"}), 202
+
+        # 점수 계산 및 감정 분석
+        try:
+            new_record_data, text_emotion, scoring_version, dynamic_challenges, breakdown = score_analysis(mood, sleep, activity, feeling_text)
+        except OverloadedError as e:
+            return overloaded_response(e)
+
         cursor = conn.cursor()
-        cursor.execute('INSERT INTO records (user_id, date, score, status, text, recommended_challenges_json, feedback_given_json) VALUES (?, ?, ?, ?, ?, ?, ?)',
-                     (user['id'], new_record_data['date'], new_record_data['score'], new_record_data['status'], new_record_data['text'], new_record_data['recommended_challenges_json'], new_record_data['feedback_given_json']))
+        cursor.execute(INSERT_RECORD_SQL, scored_record_params(user_id, new_record_data, mood, sleep, activity, text_emotion, scoring_version))
         record_id = cursor.lastrowid
         conn.commit()
         
         # 응답 데이터 생성
-        response_data = {
-            "success": True, 
-            "record_id": record_id, 
-            "score": new_record_data['score'], 
-            "text_emotion": text_emotion, 
-            "emotion_status": emotion_status, 
-            "challenges": dynamic_challenges,
-            "breakdown": breakdown
-        }
+        response_data = make_analysis_response(dict(new_record_data, id=record_id), text_emotion, dynamic_challenges, breakdown)
     except Exception as e:
         print(f"분석 처리 중 오류: {e}")
         traceback.print_exc()
         if conn: conn.rollback()
         return jsonify({"success": False, "message": "분석 처리 중 오류가 발생했습니다."}), 500
     finally:
-        if conn: conn.close()
+        release_connection(conn)
     return jsonify(response_data)
 
+# 비동기 분석 결과 조회 (폴링용): 완료되면 200, 아직 채점 중이면 202
+def _find_user_record(conn, record_id, username):
+    user_id = request_user_id(conn, username)
+    if not user_id:
+        return None
+    return conn.execute('SELECT id FROM records WHERE id = ? AND user_id = ?', (record_id, user_id)).fetchone()
+
+@app.route('/analyze/<int:record_id>', methods=['GET'])
+def analyze_result_route(record_id):
+    conn = None
+    try:
+        conn = get_connection()
+        if not _find_user_record(conn, record_id, request.args.get('username')):
+            return jsonify({"success": False, "message": "기록을 찾을 수 없습니다."}), 404
+        result = analysis_jobs.get(record_id)
+        if result is None:
+            result = analysis_response_from_row(conn.execute(ANALYSIS_ROW_SQL, (record_id,)).fetchone())
+    finally:
+        release_connection(conn)
+    if result is None:
+        return jsonify({"success": True, "record_id": record_id, "state": "pending"}), 202
+    if not result.get('success'):
+        return jsonify(result), 500
+    return jsonify(dict(result, state="done"))
+
+# 비동기 분석 결과 스트리밍 (Server-Sent Events): 완료되면 result 이벤트 하나를 보내고 종료
+@app.route('/analyze/<int:record_id>/events', methods=['GET'])
+def analyze_events_route(record_id):
+    conn = get_connection()
+    try:
+        found = _find_user_record(conn, record_id, request.args.get('username'))
+    finally:
+        release_connection(conn)
+    if not found:
+        return jsonify({"success": False, "message": "기록을 찾을 수 없습니다."}), 404
+
+    def lookup():
+        result = analysis_jobs.wait(record_id, timeout=1.0)
+        if result is not None:
+            return result
+        conn = get_connection()
+        try:
+            return analysis_response_from_row(conn.execute(ANALYSIS_ROW_SQL, (record_id,)).fetchone())
+        finally:
+            release_connection(conn)
+
+    def events():
+        deadline = time.monotonic() + ANALYZE_STREAM_TIMEOUT_S
+        last_sent = time.monotonic()
+        while time.monotonic() < deadline:
+            result = lookup()
+            if result is not None:
+                event = 'result' if result.get('success') else 'error'
+                yield f"event: {event}\ndata: {json.dumps(result, ensure_ascii=False)}\n\n"
+                return
+            # 다른 프로세스가 처리 중인 작업이면 DB를 주기적으로 확인
+            if not analysis_jobs.is_pending(record_id):
+                time.sleep(0.25)
+            if time.monotonic() - last_sent > 15:
+                yield ": keepalive\n\n"
+                last_sent = time.monotonic()
+        yield f"event: timeout\ndata: {json.dumps({'record_id': record_id})}\n\n"
+
+    return Response(stream_with_context(events()), mimetype='text/event-stream',
+                    headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'})
+
+# --- 데이터 관리 라우트 (일괄 분석 및 저장) ---
+# {"username": ..., "entries": [{"mood", "sleep", "activity", "feeling_text", "date"(선택)}, ...]}
+MAX_BATCH_ENTRIES = int(os.environ.get('BLOOM_MAX_BATCH_ENTRIES', 500))
+
+@app.route('/analyze/batch', methods=['POST'])
+def analyze_batch_route():
+    conn = None
+    try:
+        data = request.json or {}
+        username = data.get('username')
+        entries = data.get('entries')
+        if not (username or request_token()) or not isinstance(entries, list) or not entries:
+            return jsonify({"success": False, "message": "필수 입력값이 누락되었습니다."}), 400
+        if len(entries) > MAX_BATCH_ENTRIES:
+            return jsonify({"success": False, "message": f"한 번에 최대 {MAX_BATCH_ENTRIES}개까지 분석할 수 있습니다."}), 413
+
+        conn = get_connection()
+        user_id = request_user_id(conn, username)
+        if not user_id:
+            return jsonify({"success": False, "message": "로그인 정보가 유효하지 않습니다."}), 401
+
+        scored = score_entries(entries)
+        record_ids = iter(insert_scored_rows(conn, user_id, [row for row, _ in scored if row is not None]))
+        results = []
+        for row, result in scored:
+            if row is not None:
+                result = dict(result, record_id=next(record_ids))
+            results.append(result)
+    except Exception as e:
+        print(f"일괄 분석 처리 중 오류: {e}")
+        traceback.print_exc()
+        if conn and conn.in_transaction: conn.rollback()
+        return jsonify({"success": False, "message": "일괄 분석 처리 중 오류가 발생했습니다."}), 500
+    finally:
+        release_connection(conn)
+    return jsonify({"success": True, "inserted": sum(1 for r in results if r['success']), "results": results})
+
 # --- 피드백 처리 라우트 ---
+# 기록의 피드백 JSON은 읽어서 고쳐 쓰지 않고 UPDATE 한 문장 안에서 json_patch로 병합합니다.
+# (같은 기록에 피드백이 동시에 들어와도 서로 덮어쓰지 않고, 왕복 쿼리도 하나 줄어듦)
+# 새 형식 기록은 feedback_json에 챌린지 ID로, 아직 옮기지 않은 예전 기록은 feedback_given_json에 제목으로 병합
+# 제목은 이미 등록된 카탈로그 챌린지(예전 기록은 그 기록에 추천된 챌린지도)만 받으며, 사용자 확인과 함께
+# 쓰기 트랜잭션 안에서 찾으므로 없는 기록이나 모르는 제목으로 요청해도 카탈로그에는 아무것도 추가되지 않음
+# 파라미터: ?1 제목, ?2 평가, ?3 기록 ID, ?4 사용자 ID
+UPDATE_FEEDBACK_SQL = ("UPDATE records SET "
+                       "feedback_json = CASE WHEN challenge_ids IS NULL THEN feedback_json "
+                       "ELSE json_patch(COALESCE(feedback_json, '{}'), "
+                       "json_object(CAST((SELECT id FROM challenges WHERE title = ?1) AS TEXT), ?2)) END, "
+                       "feedback_given_json = CASE WHEN challenge_ids IS NULL "
+                       "THEN json_patch(COALESCE(NULLIF(feedback_given_json, ''), '{}'), json_object(?1, ?2)) ELSE feedback_given_json END "
+                       "WHERE id = ?3 AND user_id = ?4 AND (EXISTS (SELECT 1 FROM challenges WHERE title = ?1) "
+                       "OR (challenge_ids IS NULL AND json_valid(recommended_challenges_json) AND EXISTS "
+                       "(SELECT 1 FROM json_tree(recommended_challenges_json) WHERE key = 'title' AND atom = ?1)))")
+INSERT_FEEDBACK_SQL = "INSERT INTO challenge_feedback (user_id, record_id, challenge_title, rating, timestamp) VALUES (?, ?, ?, ?, ?)"
+# POST /feedback/batch 한 번에 받을 최대 피드백 수
+MAX_FEEDBACK_BATCH = int(os.environ.get('BLOOM_MAX_FEEDBACK_BATCH', 100))
+
+# 일괄 피드백 항목을 검사해 (항목별 결과, 저장할 (record_id, challenge_title, rating) 목록)을 반환
+def parse_feedback_ratings(ratings):
+    results, items = [], []
+    for item in ratings:
+        item = item if isinstance(item, dict) else {}
+        record_id, challenge_title, rating = item.get('record_id'), item.get('challenge_title'), item.get('rating')
+        if not all([record_id, challenge_title, rating is not None]):
+            results.append({"success": False, "message": "필수 정보가 누락되었습니다."})
+            continue
+        results.append({"success": True, "record_id": record_id, "challenge_title": challenge_title})
+        items.append((record_id, challenge_title, rating))
+    return results, items
+
+# 저장되지 않은 항목(사용자의 기록이 아님)을 결과에 표시
+def mark_unsaved_feedback(results, saved):
+    saved = iter(saved)
+    for result in results:
+        if result['success'] and not next(saved):
+            result.update(success=False, message="해당 기록 또는 챌린지를 찾을 수 없습니다.")
+
+# 피드백 항목의 UPDATE_FEEDBACK_SQL 파라미터 (제목 → 챌린지 ID는 UPDATE 안에서 찾음)
+def feedback_update_params(user_id, item):
+    record_id, challenge_title, rating = item
+    return (str(challenge_title), rating, record_id, user_id)
+
+def save_feedback(conn, user_id, items):
+    """(record_id, challenge_title, rating) 목록을 한 트랜잭션으로 저장하고 항목별 저장 여부를 반환합니다.
+    사용자의 기록이 아니면 해당 항목만 저장하지 않습니다. (커밋은 호출 측에서)"""
+    timestamp = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+    saved = []
+    for record_id, challenge_title, rating in items:
+        updated = conn.execute(UPDATE_FEEDBACK_SQL, feedback_update_params(user_id, (record_id, challenge_title, rating))).rowcount
+        if updated:
+            conn.execute(INSERT_FEEDBACK_SQL, (user_id, record_id, challenge_title, rating, timestamp))
+        saved.append(bool(updated))
+    return saved
+
 @app.route('/feedback', methods=['POST'])
 def handle_feedback():
     conn = None
@@ -468,53 +1283,70 @@ def handle_feedback():
         challenge_title = data.get('challenge_title')
         rating = data.get('rating')
 
-        if not all([username, record_id, challenge_title, rating is not None]):
+        if not all([username or request_token(), record_id, challenge_title, rating is not None]):
             return jsonify({"success": False, "message": "필수 정보가 누락되었습니다."}), 400
 
-        conn = get_db_connection()
-        user = conn.execute('SELECT id FROM users WHERE username = ?', (username,)).fetchone()
-        if not user:
+        conn = get_connection()
+        user_id = request_user_id(conn, username)
+        if not user_id:
             return jsonify({"success": False, "message": "사용자를 찾을 수 없습니다."}), 404
 
-        user_id = user['id']
-        timestamp = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-
-        # 피드백 테이블에 저장
-        conn.execute("INSERT INTO challenge_feedback (user_id, record_id, challenge_title, rating, timestamp) VALUES (?, ?, ?, ?, ?)", 
-                     (user_id, record_id, challenge_title, rating, timestamp))
-        
-        # 기록 테이블의 피드백 JSON 업데이트
-        record = conn.execute("SELECT feedback_given_json FROM records WHERE id = ? AND user_id = ?", (record_id, user_id)).fetchone()
-        if record:
-             current_feedback_json = record['feedback_given_json']
-             feedback_given = json.loads(current_feedback_json) if current_feedback_json else {}
-             feedback_given[challenge_title] = rating
-             conn.execute("UPDATE records SET feedback_given_json = ? WHERE id = ?", 
-                          (json.dumps(feedback_given, ensure_ascii=False), record_id))
-             conn.commit()
-        else:
-             conn.rollback()
-             return jsonify({"success": False, "message": "해당 기록을 찾을 수 없습니다."}), 404
-             
+        if not save_feedback(conn, user_id, [(record_id, challenge_title, rating)])[0]:
+            conn.rollback()
+            return jsonify({"success": False, "message": "해당 기록 또는 챌린지를 찾을 수 없습니다."}), 404
+        conn.commit()
+        invalidate_challenge_feedback_scores()
     except Exception as e:
         print(f"피드백 저장 중 오류 발생: {e}")
         print(traceback.format_exc())
         if conn: conn.rollback()
         return jsonify({"success": False, "message": "피드백 저장 중 오류가 발생했습니다."}), 500
     finally:
-         if conn: conn.close()
+         release_connection(conn)
     return jsonify({"success": True, "message": "피드백이 저장되었습니다."})
 
+# 피드백 여러 개를 한 번에 저장 (한 트랜잭션, 커밋 한 번)
+# {"ratings": [{"record_id", "challenge_title", "rating"}, ...]} → 항목별 결과를 같은 순서로 반환
+@app.route('/feedback/batch', methods=['POST'])
+def handle_feedback_batch():
+    conn = None
+    try:
+        data = request.json or {}
+        username = data.get('username')
+        ratings = data.get('ratings')
+        if not (username or request_token()) or not isinstance(ratings, list) or not ratings:
+            return jsonify({"success": False, "message": "필수 정보가 누락되었습니다."}), 400
+        if len(ratings) > MAX_FEEDBACK_BATCH:
+            return jsonify({"success": False, "message": f"한 번에 최대 {MAX_FEEDBACK_BATCH}개까지 저장할 수 있습니다."}), 413
+
+        conn = get_connection()
+        user_id = request_user_id(conn, username)
+        if not user_id:
+            return jsonify({"success": False, "message": "사용자를 찾을 수 없습니다."}), 404
+
+        results, items = parse_feedback_ratings(ratings)
+        mark_unsaved_feedback(results, save_feedback(conn, user_id, items))
+        conn.commit()
+        if any(result['success'] for result in results):
+            invalidate_challenge_feedback_scores()
+    except Exception as e:
+        print(f"피드백 일괄 저장 중 오류 발생: {e}")
+        print(traceback.format_exc())
+        if conn and conn.in_transaction: conn.rollback()
+        return jsonify({"success": False, "message": "피드백 저장 중 오류가 발생했습니다."}), 500
+    finally:
+        release_connection(conn)
+    return jsonify({"success": True, "saved": sum(1 for r in results if r['success']), "results": results})
+
 # --- 챗봇 라우트 ---
 @app.route('/chatbot/start', methods=['GET'])
 def chatbot_start():
     return jsonify({"questions": PHQ9_QUESTIONS})
 
-@app.route('/chatbot/result', methods=['POST'])
-def chatbot_result():
-    data = request.json
-    total_score = sum(data.get('answers', []))
-    suicidal_thoughts = len(data.get('answers', [])) == 9 and data['answers'][8] > 0
+# PHQ-9 응답 점수 목록으로 결과 메시지와 상담 안내를 만듦
+def phq9_result(answers):
+    total_score = sum(answers)
+    suicidal_thoughts = len(answers) == 9 and answers[8] > 0
     
     if total_score <= 4:
         result_message = f"총점 {total_score}점. 정상 범위이며 우울 증상이 거의 없습니다."
@@ -534,54 +1366,164 @@ def chatbot_result():
     elif total_score > 14:
         hospital_info = "가까운 정신건강의학과나 정신건강복지센터에 방문하여 상담받아보세요."
         
-    return jsonify({"total_score": total_score, "message": result_message, "hospital_info": hospital_info})
-
-# --- 데이터베이스 스키마 정의 ---
-SCHEMA = """
-CREATE TABLE IF NOT EXISTS users (
-    id INTEGER PRIMARY KEY AUTOINCREMENT, 
-    username TEXT UNIQUE NOT NULL, 
-    password TEXT NOT NULL, 
-    name TEXT, 
-    birthdate TEXT, 
-    gender TEXT, 
-    region_si_do TEXT, 
-    region_gu TEXT
-);
-CREATE TABLE IF NOT EXISTS records (
-    id INTEGER PRIMARY KEY AUTOINCREMENT, 
-    user_id INTEGER NOT NULL, 
-    date TEXT NOT NULL, 
-    score REAL NOT NULL, 
-    status TEXT NOT NULL, 
-    text TEXT, 
-    recommended_challenges_json TEXT, 
-    feedback_given_json TEXT, 
-    FOREIGN KEY (user_id) REFERENCES users (id)
-);
-CREATE TABLE IF NOT EXISTS challenge_feedback (
-    id INTEGER PRIMARY KEY AUTOINCREMENT, 
-    user_id INTEGER NOT NULL, 
-    record_id INTEGER NOT NULL, 
-    challenge_title TEXT NOT NULL, 
-    rating INTEGER NOT NULL, 
-    timestamp TEXT NOT NULL, 
-    FOREIGN KEY (user_id) REFERENCES users (id), 
-    FOREIGN KEY (record_id) REFERENCES records (id)
-);
-"""
+    return {"total_score": total_score, "message": result_message, "hospital_info": hospital_info}
 
-# --- 서버 실행 ---
-if __name__ == '__main__':
-    conn = None
+@app.route('/chatbot/result', methods=['POST'])
+def chatbot_result():
+    data = request.json
+    return jsonify(phq9_result(data.get('answers', [])))
+
+# --- 관리용 명령어 ---
+# 모델 파일을 내보내고 각 백엔드의 결과를 fp32 기준으로 검증 (예: flask export-model)
+@app.cli.command('export-model')
+@click.option('--output', default=MODEL_ARTIFACTS_DIR, show_default=True, help="모델 파일을 저장할 폴더")
+@click.option('--corpus', default=os.path.join('benchmarks', 'fixtures', 'sentiment_corpus.txt'), show_default=True, help="검증용 문장 파일 (한 줄에 한 문장)")
+def export_model_command(output, corpus):
+    print(f"{MODEL_NAME} 모델을 '{output}' 폴더로 내보내는 중...")
+    onnx_path = export_artifacts(MODEL_NAME, output)
+    print(f"ONNX 모델 저장 완료: {onnx_path}")
+
+    with open(corpus, encoding='utf-8') as f:
+        texts = [line.strip() for line in f if line.strip()]
+    report = verify_backends(MODEL_NAME, output, texts)
+    print(f"검증 결과 (문장 {len(texts)}개, fp32 기준):")
+    for name, result in report.items():
+        print(f"  {name:<6} 라벨 일치율 {result['label_agreement'] * 100:.1f}%, 최대 확률 차이 {result['max_prob_diff']:.4f}")
+
+# 적용된 DB 마이그레이션 목록 출력 및 미적용 마이그레이션 적용 (예: flask migrate-db)
+@app.cli.command('migrate-db')
+def migrate_db_command():
+    applied = migrate()
+    print(f"새로 적용된 마이그레이션: {applied if applied else '없음'}")
+    print(f"현재 스키마 버전: {schema_version()}")
+
+# 챌린지 제목의 문장 임베딩을 다시 계산해 저장 (챌린지 목록이나 모델이 바뀐 뒤 실행, 예: flask rebuild-challenge-embeddings)
+@app.cli.command('rebuild-challenge-embeddings')
+@click.option('--output', default=CHALLENGE_EMBEDDINGS_PATH, show_default=True, help="임베딩 파일 경로")
+def rebuild_challenge_embeddings_command(output):
+    if not model_loader.wait():
+        print("감성 분석 모델을 사용할 수 없어 임베딩을 만들 수 없습니다.")
+        return
+    ids, texts = challenge_embedding_texts(challenge_catalog)
+    start = time.perf_counter()
+    chunks = []
+    for i in range(0, len(texts), MAX_BATCH_SIZE):
+        _, embeddings = model_loader.backend.predict_with_embeddings(texts[i:i + MAX_BATCH_SIZE])
+        if embeddings is None:
+            print(f"'{INFERENCE_BACKEND}' 백엔드는 임베딩을 제공하지 않습니다. (onnx라면 `flask export-model`로 다시 내보내주세요)")
+            return
+        chunks.append(embeddings)
+    matrix = np.concatenate(chunks)
+    save_challenge_embeddings(output, challenge_catalog, MODEL_NAME, ids, matrix)
+    print(f"챌린지 임베딩 저장 완료: {output} ({matrix.shape[0]}개 × {matrix.shape[1]}차원, {time.perf_counter() - start:.1f}초)")
+
+# challenge_feedback 전체를 다시 집계해 challenge_scores 테이블을 채움 (예: flask rebuild-challenge-scores)
+@app.cli.command('rebuild-challenge-scores')
+def rebuild_challenge_scores_command():
+    count = rebuild_challenge_scores()
+    invalidate_challenge_feedback_scores()
+    print(f"챌린지 점수 재계산 완료: {count}개 챌린지")
+
+# JSONL 파일(한 줄에 항목 하나)의 일기를 일괄 분석해 저장 (예: flask import-entries diary.jsonl --username bloom)
+@app.cli.command('import-entries')
+@click.argument('path', type=click.Path(exists=True, dir_okay=False, allow_dash=True))
+@click.option('--username', required=True, help="기록을 저장할 사용자 아이디")
+@click.option('--chunk-size', default=500, show_default=True, help="한 번에 분석/저장할 항목 수 (메모리 사용량 상한)")
+def import_entries_command(path, username, chunk_size):
+    conn = get_connection()
     try:
-        # 서버 시작 시 DB 스키마 확인 및 생성
-        conn = get_db_connection()
-        conn.executescript(SCHEMA)
-        conn.commit()
-    except Exception as e:
-        print(f"데이터베이스 초기화 중 오류 발생: {e}")
-        traceback.print_exc()
+        user = conn.execute('SELECT id FROM users WHERE username = ?', (username,)).fetchone()
+        if not user:
+            print(f"사용자를 찾을 수 없습니다: {username}")
+            return
+        if not model_loader.wait():
+            print("감성 분석 모델을 사용할 수 없어 키워드 분석만으로 저장합니다. (모델이 준비되면 flask rescore로 다시 채점)")
+
+        inserted = skipped = 0
+        start = time.perf_counter()
+
+        def flush(chunk):
+            nonlocal inserted, skipped
+            scored = score_entries([entry for _, entry in chunk])
+            for (line_no, _), (row, result) in zip(chunk, scored):
+                if row is None:
+                    skipped += 1
+                    print(f"  {line_no}번째 줄 건너뜀: {result['message']}")
+            inserted += len(insert_scored_rows(conn, user['id'], [row for row, _ in scored if row is not None]))
+            elapsed = time.perf_counter() - start
+            print(f"  {inserted}건 저장, {skipped}건 건너뜀 ({inserted / elapsed:.1f}건/초)")
+
+        chunk = []
+        with click.open_file(path, encoding='utf-8') as f:
+            for line_no, line in enumerate(f, 1):
+                if not line.strip():
+                    continue
+                try:
+                    chunk.append((line_no, json.loads(line)))
+                except json.JSONDecodeError:
+                    skipped += 1
+                    print(f"  {line_no}번째 줄 건너뜀: JSON 형식이 아닙니다.")
+                    continue
+                if len(chunk) >= chunk_size:
+                    flush(chunk)
+                    chunk = []
+        if chunk:
+            flush(chunk)
+
+        elapsed = time.perf_counter() - start
+        print(f"가져오기 완료: {inserted}건 저장, {skipped}건 건너뜀, {elapsed:.1f}초 ({inserted / elapsed if elapsed else 0:.1f}건/초)")
     finally:
-        if conn: conn.close()
+        release_connection(conn)
+
+# 채점 버전이 현재와 다른 기록을 다시 채점 (예: flask rescore). 중단해도 다시 실행하면 이어서 진행
+@app.cli.command('rescore')
+@click.option('--batch-size', default=RESCORE_BATCH_SIZE, show_default=True, help="한 번에 다시 채점할 기록 수")
+@click.option('--pause-ms', default=0.0, show_default=True, help="배치 사이 쉬는 시간(ms), 서버와 같은 DB를 쓸 때 사용")
+def rescore_command(batch_size, pause_ms):
+    if not model_loader.wait():
+        print("감성 분석 모델을 사용할 수 없어 재채점을 중단합니다.")
+        return
+    job = RescoreJob(SCORING_VERSION, rescore_records, batch_size=batch_size, pause_s=pause_ms / 1000)
+
+    def report(status):
+        eta = f"{status['eta_seconds']:.0f}초" if status['eta_seconds'] is not None else "-"
+        print(f"  {status['processed']}/{status['total']}건 ({status['rows_per_second']}건/초, 남은 시간 {eta})")
+
+    print(f"채점 버전 {SCORING_VERSION} 기준으로 재채점을 시작합니다...")
+    try:
+        status = job.run(on_progress=report)
+    except KeyboardInterrupt:
+        job.stop()
+        print(f"중단됨: {job.last_record_id}번 기록까지 저장되었습니다. 다시 실행하면 이어서 진행합니다.")
+        return
+    print(f"재채점 {status['state']}: {status['processed']}/{status['total']}건")
+    if status['unscorable']:
+        print(f"입력값이 저장되지 않은 예전 기록 {status['unscorable']}건은 다시 채점할 수 없어 건너뛰었습니다.")
+    if status['skipped']:
+        print(f"모델 오류가 계속된 기록 {status['skipped']}건은 건너뛰었습니다. (다음 실행 때 다시 시도)")
+
+# 예전 형식(챌린지 JSON) 기록을 챌린지 ID 형식으로 옮김 (예: flask compact-challenges). 중단해도 다시 실행하면 이어서 진행
+@app.cli.command('compact-challenges')
+@click.option('--batch-size', default=COMPACT_BATCH_SIZE, show_default=True, help="한 트랜잭션에서 옮길 기록 수")
+@click.option('--pause-ms', default=0.0, show_default=True, help="배치 사이 쉬는 시간(ms), 서버와 같은 DB를 쓸 때 사용")
+def compact_challenges_command(batch_size, pause_ms):
+    job = CompactionJob(challenge_store, batch_size=batch_size, pause_s=pause_ms / 1000)
+    last_report = 0.0
+
+    def report(status):
+        nonlocal last_report
+        if time.monotonic() - last_report >= 1.0:
+            last_report = time.monotonic()
+            print(f"  {status['processed']}/{status['total']}건 ({status['rows_per_second']}건/초)")
+
+    try:
+        status = job.run(on_progress=report)
+    except KeyboardInterrupt:
+        job.stop()
+        print(f"중단됨: {job.last_record_id}번 기록까지 옮겼습니다. 다시 실행하면 이어서 진행합니다.")
+        return
+    print(f"챌린지 형식 변환 {status['state']}: {status['processed']}/{status['total']}건, 카탈로그 챌린지 {len(challenge_store.items_by_id)}개")
+
+# --- 서버 실행 ---
+if __name__ == '__main__':
     app.run(debug=True)
\ No newline at end of file
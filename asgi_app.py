@@ -0,0 +1,541 @@
+import asyncio
+import json
+import os
+import sqlite3
+import threading
+import time
+import traceback
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from functools import partial
+
+try:
+    from quart import Quart, Response, g, jsonify, render_template, request
+except ImportError:
+    raise RuntimeError("비동기 모드를 사용하려면 quart 패키지를 설치해야 합니다. (pip install quart aiosqlite hypercorn)")
+from werkzeug.security import check_password_hash, generate_password_hash
+
+import app as core
+import metrics
+import trends
+from admission import OverloadedError
+from db import AsyncConnectionPool
+
+# --- 비동기(ASGI) 실행 모드 ---
+# app.py와 같은 라우트, 같은 JSON 형식을 Quart로 제공합니다. (예: hypercorn asgi_app:app)
+# 이벤트 루프 하나가 모든 연결을 받고, 요청을 막는 작업은 각각 크기가 정해진 스레드로 보냅니다.
+#   - SQLite 쿼리: aiosqlite 연결 풀 (BLOOM_ASYNC_DB_CONNECTIONS)
+#   - 감성 분석(모델 forward), 일괄 분석: 분석 실행기 (BLOOM_ASYNC_ANALYZE_WORKERS)
+#   - 비밀번호 해시: 해시 실행기 (BLOOM_PASSWORD_HASH_WORKERS)
+#   - 챌린지 카탈로그 캐시로 응답 채우기: asyncio 기본 실행기 (캐시에 없는 챌린지를 만나면 동기 sqlite 연결로 읽고 등록하므로)
+# 느린 분석 요청이 몰려도 /chatbot/start, /get_data 같은 가벼운 요청은 요청 스레드가 빌 때까지 기다리지 않습니다.
+# 마이그레이션, 모델 로드, 캐시, 세션 토큰, 과부하 제어, 비동기 분석 워커는 app.py의 것을 그대로 사용합니다.
+
+# aiosqlite 연결 수 (연결마다 쿼리를 실행하는 스레드 하나)
+ASYNC_DB_CONNECTIONS = int(os.environ.get('BLOOM_ASYNC_DB_CONNECTIONS', 4))
+# 동시에 분석을 실행할 스레드 수. 배치 스케줄러가 요청을 모아 한 번에 처리할 수 있도록 기본값은 모델 배치 크기
+ASYNC_ANALYZE_WORKERS = int(os.environ.get('BLOOM_ASYNC_ANALYZE_WORKERS', core.MAX_BATCH_SIZE))
+# 실행기마다 스레드를 기다릴 수 있는 최대 작업 수 (넘으면 기다리지 않고 503 + Retry-After)
+ASYNC_MAX_PENDING = int(os.environ.get('BLOOM_ASYNC_MAX_PENDING', 64))
+
+app = Quart(__name__)
+
+
+# --- 크기가 정해진 실행기 ---
+# 스레드 수(workers)와 스레드를 기다리는 작업 수(max_pending)에 상한이 있는 ThreadPoolExecutor.
+# 상한을 넘으면 작업을 쌓아 두지 않고 OverloadedError를 바로 발생시킵니다.
+# 작업 수는 스레드에서 작업이 실제로 끝날 때 줄임 (기다리다 시간이 초과되어도 스레드가 계속 실행 중이면 자리를 차지)
+class BoundedExecutor:
+    def __init__(self, name, workers, max_pending, timeout_s=None):
+        self.name = name
+        self.workers = max(1, int(workers))
+        self.max_pending = max(0, int(max_pending))
+        self.timeout_s = timeout_s
+        self.running = 0  # 실행 중 + 대기 중인 작업 수
+        self.rejected = 0
+        self._executor = None
+        self._lock = threading.Lock()
+
+    def _release(self, _future):
+        with self._lock:
+            self.running -= 1
+
+    async def run(self, fn, *args):
+        with self._lock:
+            if self.running >= self.workers + self.max_pending:
+                self.rejected += 1
+                raise OverloadedError(f"{self.name}_busy", core.OVERLOAD_RETRY_AFTER_S)
+            self.running += 1
+        try:
+            if self._executor is None:
+                self._executor = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix=f"bloom-async-{self.name}")
+            future = self._executor.submit(partial(fn, *args))
+        except Exception:
+            self._release(None)
+            raise
+        # 작업이 끝나거나(오류 포함) 시작 전에 취소되면 호출됨
+        future.add_done_callback(self._release)
+        # 시간이 초과되면 아직 시작하지 않은 작업은 취소됨 (asyncio.TimeoutError)
+        return await asyncio.wait_for(asyncio.wrap_future(future), self.timeout_s)
+
+    def shutdown(self):
+        if self._executor is not None:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = None
+
+
+db_pool = AsyncConnectionPool(ASYNC_DB_CONNECTIONS)
+analyze_executor = BoundedExecutor('analyze', ASYNC_ANALYZE_WORKERS, ASYNC_MAX_PENDING)
+password_executor = BoundedExecutor('password', core.PASSWORD_HASH_WORKERS, ASYNC_MAX_PENDING, timeout_s=core.password_hasher.timeout_s)
+
+@app.before_serving
+async def open_pools():
+    await db_pool.open()
+
+@app.after_serving
+async def close_pools():
+    await db_pool.close()
+    analyze_executor.shutdown()
+    password_executor.shutdown()
+
+async def fetchone(conn, sql, params=()):
+    async with conn.execute(sql, params) as cursor:
+        return await cursor.fetchone()
+
+async def fetchall(conn, sql, params=()):
+    return list(await conn.execute_fetchall(sql, params))
+
+# --- 사용자 확인 (app.request_user_id의 비동기 버전) ---
+async def lookup_user_id(conn, username):
+    if not username:
+        return None
+    user_id = core.user_id_cache.get(username)
+    if user_id is None:
+        user = await fetchone(conn, 'SELECT id FROM users WHERE username = ?', (username,))
+        if not user:
+            return None
+        user_id = user['id']
+        core.user_id_cache.put(username, user_id)
+    return user_id
+
+async def request_user_id(conn, username=None):
+    user_id = core.token_user_id(core.request_token(request))
+    if user_id is False:
+        return await lookup_user_id(conn, username)
+    return user_id
+
+def overloaded_response(error):
+    response = jsonify({"success": False, "message": "요청이 많아 잠시 후 다시 시도해주세요.", "retry_after": error.retry_after_s})
+    response.headers['Retry-After'] = str(error.retry_after_s)
+    return response, 503
+
+def busy_response():
+    return jsonify({"success": False, "message": "요청이 많아 처리하지 못했습니다. 잠시 후 다시 시도해주세요."}), 503
+
+def with_etag(response, etag):
+    response.set_etag(etag)
+    response.headers['Cache-Control'] = 'private, no-cache'
+    return response
+
+# --- 지표 수집 (/metrics) ---
+# 라우트별 처리 시간은 Flask 모드와 같은 지표에 기록합니다. 분석 단계별 시간은 실행기 스레드에서 기록되므로
+# X-Bloom-Trace(Server-Timing)는 지원하지 않습니다.
+@app.before_request
+async def start_request_metrics():
+    if metrics.METRICS_ENABLED:
+        g.bloom_start = time.perf_counter()
+
+@app.after_request
+async def finish_request_metrics(response):
+    start = g.get('bloom_start')
+    if start is not None:
+        route = request.url_rule.rule if request.url_rule else 'unmatched'
+        metrics.http_request_seconds.observe(time.perf_counter() - start, route, request.method, str(response.status_code))
+    return response
+
+def collect_async_metrics():
+    executors = (analyze_executor, password_executor)
+    return [
+        ('bloom_async_executor_tasks', 'gauge', "비동기 모드 실행기에서 실행/대기 중인 작업 수",
+         [({'executor': executor.name}, executor.running) for executor in executors]),
+        ('bloom_async_executor_rejected_total', 'counter', "대기 작업이 가득 차 거절한 작업 수",
+         [({'executor': executor.name}, executor.rejected) for executor in executors]),
+        ('bloom_async_db_connections_in_use', 'gauge', "사용 중인 aiosqlite 연결 수", [({}, db_pool.in_use())]),
+    ]
+
+metrics.registry.register_collector(collect_async_metrics)
+
+# --- API 라우트 정의 ---
+@app.route('/')
+async def index():
+    return await render_template('index.html')
+
+@app.route('/ready', methods=['GET'])
+async def ready():
+    status = core.ready_status()
+    return jsonify(status), (200 if status['ready'] else 503)
+
+@app.route('/metrics', methods=['GET'])
+async def metrics_route():
+    if not metrics.METRICS_ENABLED:
+        return jsonify({"success": False, "message": "지표 수집이 꺼져 있습니다."}), 404
+    return Response(metrics.registry.render(), mimetype='text/plain; version=0.0.4')
+
+@app.route('/admin/profiler', methods=['GET', 'POST'])
+async def admin_profiler():
+    if not core.is_admin(request):
+        return jsonify({"success": False, "message": "권한이 없습니다."}), 403
+    if request.method == 'POST':
+        body, status = core.profiler_action(await request.get_json(silent=True) or {})
+        return jsonify(body), status
+    limit = request.args.get('limit', type=int)
+    return Response(metrics.profiler.collapsed(limit), mimetype='text/plain')
+
+@app.route('/admin/rescore', methods=['GET', 'POST'])
+async def admin_rescore():
+    if not core.is_admin(request):
+        return jsonify({"success": False, "message": "권한이 없습니다."}), 403
+    if request.method == 'POST':
+        started = core.rescore_job.start()
+        return jsonify(dict(core.rescore_job.status(), success=True, started=started)), (202 if started else 200)
+    return jsonify(dict(core.rescore_job.status(), success=True))
+
+@app.route('/admin/compact-challenges', methods=['GET', 'POST'])
+async def admin_compact_challenges():
+    if not core.is_admin(request):
+        return jsonify({"success": False, "message": "권한이 없습니다."}), 403
+    if request.method == 'POST':
+        started = core.compaction_job.start()
+        return jsonify(dict(core.compaction_job.status(), success=True, started=started)), (202 if started else 200)
+    return jsonify(dict(core.compaction_job.status(), success=True))
+
+# --- 사용자 인증 라우트 ---
+# 해시를 계산하는 동안에는 DB 연결을 잡고 있지 않음 (같은 아이디가 동시에 가입하면 UNIQUE 제약으로 409)
+@app.route('/register', methods=['POST'])
+async def register():
+    try:
+        data = await request.get_json()
+        username, password = data.get('username'), data.get('password')
+        if not username or not password:
+            return jsonify({"success": False, "message": "아이디와 비밀번호를 모두 입력해주세요."}), 400
+
+        async with db_pool.connection() as conn:
+            if await fetchone(conn, 'SELECT id FROM users WHERE username = ?', (username,)):
+                return jsonify({"success": False, "message": "이미 존재하는 아이디입니다."}), 409
+        hashed_password = await password_executor.run(generate_password_hash, password)
+        async with db_pool.connection() as conn:
+            await conn.execute(core.INSERT_USER_SQL, core.new_user_params(data, hashed_password))
+            await conn.commit()
+        core.invalidate_user(username)
+    except sqlite3.IntegrityError:
+        return jsonify({"success": False, "message": "이미 존재하는 아이디입니다."}), 409
+    except (asyncio.TimeoutError, OverloadedError):
+        return busy_response()
+    except Exception as e:
+        print(f"회원가입 중 오류: {e}")
+        print(traceback.format_exc())
+        return jsonify({"success": False, "message": "회원가입 처리 중 오류가 발생했습니다."}), 500
+    return jsonify({"success": True, "message": "회원가입이 완료되었습니다."})
+
+@app.route('/login', methods=['POST'])
+async def login():
+    token = core.request_token(request)
+    if token:
+        identity = core.session_tokens.verify(token)
+        if identity:
+            user_id, username = identity
+            return jsonify({"success": True, "message": "로그인 성공!", "username": username, "token": core.session_tokens.issue(user_id, username)})
+        if not (await request.get_json(silent=True) or {}).get('password'):
+            return jsonify({"success": False, "message": "로그인이 만료되었습니다. 다시 로그인해주세요."}), 401
+
+    try:
+        data = await request.get_json()
+        username, password = data.get('username'), data.get('password')
+        async with db_pool.connection() as conn:
+            user = await fetchone(conn, 'SELECT id, password FROM users WHERE username = ?', (username,))
+    except Exception as e:
+        print(f"로그인 DB 조회 중 오류: {e}")
+        print(traceback.format_exc())
+        return jsonify({"success": False, "message": "로그인 처리 중 오류가 발생했습니다."}), 500
+
+    try:
+        verified = bool(user) and await password_executor.run(check_password_hash, user['password'], password)
+    except (asyncio.TimeoutError, OverloadedError):
+        return busy_response()
+    if verified:
+        core.user_id_cache.put(username, user['id'])
+        return jsonify({"success": True, "message": "로그인 성공!", "username": username, "token": core.session_tokens.issue(user['id'], username)})
+    return jsonify({"success": False, "message": "아이디 또는 비밀번호가 일치하지 않습니다."}), 401
+
+# --- 데이터 관리 라우트 (조회, 감정 점수 추이) ---
+@app.route('/get_data', methods=['GET'])
+async def get_data():
+    try:
+        try:
+            fields, limit, since, cursor = core.parse_page_args(request.args)
+        except ValueError as e:
+            return jsonify({"success": False, "message": str(e)}), 400
+
+        async with db_pool.connection() as conn:
+            user_id = await request_user_id(conn, request.args.get('username'))
+            user = await fetchone(conn, 'SELECT id, data_version FROM users WHERE id = ?', (user_id,)) if user_id else None
+            if not user:
+                return jsonify({"success": False, "message": "사용자를 찾을 수 없습니다."}), 404
+            etag = core.data_etag(user, request.query_string)
+            if request.if_none_match.contains(etag):
+                return with_etag(Response('', status=304), etag)
+            sql, params = core.records_page_sql(user['id'], fields, limit, since, cursor)
+            rows = await fetchall(conn, sql, params)
+        # 챌린지는 메모리 캐시로 채움 (다른 워커가 새로 등록한 챌린지를 만나면 동기 쿼리를 하므로 스레드에서)
+        body = await asyncio.to_thread(core.records_page, rows, limit, fields)
+    except Exception as e:
+        print(f"데이터 조회 중 오류: {e}")
+        print(traceback.format_exc())
+        return jsonify({"success": False, "message": "데이터 조회 중 오류가 발생했습니다."}), 500
+    return with_etag(jsonify(body), etag)
+
+@app.route('/trends', methods=['GET'])
+async def trends_route():
+    try:
+        try:
+            bucket, window, points, since, until = core.parse_trend_args(request.args)
+        except ValueError as e:
+            return jsonify({"success": False, "message": str(e)}), 400
+
+        async with db_pool.connection() as conn:
+            user_id = await request_user_id(conn, request.args.get('username'))
+            user = await fetchone(conn, 'SELECT id, data_version FROM users WHERE id = ?', (user_id,)) if user_id else None
+            if not user:
+                return jsonify({"success": False, "message": "사용자를 찾을 수 없습니다."}), 404
+            etag = core.data_etag(user, request.query_string, prefix='trends:')
+            if request.if_none_match.contains(etag):
+                return with_etag(Response('', status=304), etag)
+            rows = await fetchall(conn, trends.trend_rows_sql(bucket), (user['id'], since, until))
+    except Exception as e:
+        print(f"추이 조회 중 오류: {e}")
+        print(traceback.format_exc())
+        return jsonify({"success": False, "message": "추이 조회 중 오류가 발생했습니다."}), 500
+    # 일별 집계 행 수만큼만 계산하므로 (10년치도 수 ms) 이벤트 루프에서 바로 처리
+    return with_etag(jsonify(core.trends_body(rows, bucket, window, points)), etag)
+
+# --- 데이터 관리 라우트 (분석 및 저장) ---
+# 채점(모델 forward 포함)은 분석 실행기에서 하고, 그동안 DB 연결은 잡고 있지 않음
+@app.route('/analyze', methods=['POST'])
+async def analyze_emotion_route():
+    try:
+        data = await request.get_json()
+        username = data.get('username')
+        mood, sleep, activity = data.get('mood'), data.get('sleep'), data.get('activity')
+        feeling_text = data.get('feeling_text')
+
+        if not all([username or core.request_token(request), mood is not None, sleep is not None, activity is not None]):
+            return jsonify({"success": False, "message": "필수 입력값이 누락되었습니다."}), 400
+
+        async with db_pool.connection() as conn:
+            user_id = await request_user_id(conn, username)
+            if not user_id:
+                return jsonify({"success": False, "message": "로그인 정보가 유효하지 않습니다."}), 401
+            if data.get('async'):
+                cursor = await conn.execute(core.INSERT_RECORD_SQL, core.pending_record_params(user_id, mood, sleep, activity, feeling_text))
+                record_id = cursor.lastrowid
+                await conn.commit()
+                core.analysis_jobs.submit(record_id)
+                return jsonify({"success": True, "record_id": record_id, "state": "pending",
+                                "result_url": f"/analyze/{record_id}", "events_url": f"/analyze/{record_id}/events"}), 202
+
+        try:
+            new_record_data, text_emotion, scoring_version, dynamic_challenges, breakdown = await analyze_executor.run(
+                core.score_analysis, mood, sleep, activity, feeling_text)
+        except OverloadedError as e:
+            return overloaded_response(e)
+
+        async with db_pool.connection() as conn:
+            cursor = await conn.execute(core.INSERT_RECORD_SQL,
+                                        core.scored_record_params(user_id, new_record_data, mood, sleep, activity, text_emotion, scoring_version))
+            record_id = cursor.lastrowid
+            await conn.commit()
+        response_data = core.make_analysis_response(dict(new_record_data, id=record_id), text_emotion, dynamic_challenges, breakdown)
+    except Exception as e:
+        print(f"분석 처리 중 오류: {e}")
+        traceback.print_exc()
+        return jsonify({"success": False, "message": "분석 처리 중 오류가 발생했습니다."}), 500
+    return jsonify(response_data)
+
+async def find_user_record(conn, record_id, username):
+    user_id = await request_user_id(conn, username)
+    if not user_id:
+        return None
+    return await fetchone(conn, 'SELECT id FROM records WHERE id = ? AND user_id = ?', (record_id, user_id))
+
+async def stored_analysis_result(record_id):
+    async with db_pool.connection() as conn:
+        row = await fetchone(conn, core.ANALYSIS_ROW_SQL, (record_id,))
+    return await asyncio.to_thread(core.analysis_response_from_row, row)
+
+@app.route('/analyze/<int:record_id>', methods=['GET'])
+async def analyze_result_route(record_id):
+    async with db_pool.connection() as conn:
+        if not await find_user_record(conn, record_id, request.args.get('username')):
+            return jsonify({"success": False, "message": "기록을 찾을 수 없습니다."}), 404
+    result = core.analysis_jobs.get(record_id)
+    if result is None:
+        result = await stored_analysis_result(record_id)
+    if result is None:
+        return jsonify({"success": True, "record_id": record_id, "state": "pending"}), 202
+    if not result.get('success'):
+        return jsonify(result), 500
+    return jsonify(dict(result, state="done"))
+
+# SSE 연결마다 스레드를 잡고 기다리지 않고, 이벤트 루프에서 짧게 쉬며 결과를 확인
+# (이 프로세스에서 처리 중이면 메모리만, 아니면 다른 프로세스가 처리하도록 DB를 확인)
+@app.route('/analyze/<int:record_id>/events', methods=['GET'])
+async def analyze_events_route(record_id):
+    async with db_pool.connection() as conn:
+        found = await find_user_record(conn, record_id, request.args.get('username'))
+    if not found:
+        return jsonify({"success": False, "message": "기록을 찾을 수 없습니다."}), 404
+
+    async def events():
+        deadline = time.monotonic() + core.ANALYZE_STREAM_TIMEOUT_S
+        last_sent = time.monotonic()
+        while time.monotonic() < deadline:
+            result = core.analysis_jobs.get(record_id)
+            pending = result is None and core.analysis_jobs.is_pending(record_id)
+            if result is None and not pending:
+                result = await stored_analysis_result(record_id)
+            if result is not None:
+                event = 'result' if result.get('success') else 'error'
+                yield f"event: {event}\ndata: {json.dumps(result, ensure_ascii=False)}\n\n".encode('utf-8')
+                return
+            await asyncio.sleep(0.05 if pending else 0.25)
+            if time.monotonic() - last_sent > 15:
+                yield b": keepalive\n\n"
+                last_sent = time.monotonic()
+        yield f"event: timeout\ndata: {json.dumps({'record_id': record_id})}\n\n".encode('utf-8')
+
+    response = Response(events(), mimetype='text/event-stream', headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'})
+    response.timeout = None  # 스트림 길이는 ANALYZE_STREAM_TIMEOUT_S로 제한
+    return response
+
+# 채점된 행들을 한 트랜잭션에서 저장하고 저장된 순서대로 기록 ID를 반환 (app.insert_scored_rows의 비동기 버전)
+async def insert_scored_rows(conn, user_id, rows):
+    if not rows:
+        return []
+    await conn.execute("BEGIN IMMEDIATE")
+    try:
+        last_id = (await fetchone(conn, "SELECT COALESCE(MAX(id), 0) FROM records"))[0]
+        await conn.executemany(core.INSERT_RECORD_SQL, [(user_id,) + row for row in rows])
+        record_ids = [r[0] for r in await fetchall(conn, "SELECT id FROM records WHERE id > ? ORDER BY id", (last_id,))]
+        await conn.commit()
+    except Exception:
+        await conn.rollback()
+        raise
+    return record_ids
+
+@app.route('/analyze/batch', methods=['POST'])
+async def analyze_batch_route():
+    try:
+        data = await request.get_json() or {}
+        username = data.get('username')
+        entries = data.get('entries')
+        if not (username or core.request_token(request)) or not isinstance(entries, list) or not entries:
+            return jsonify({"success": False, "message": "필수 입력값이 누락되었습니다."}), 400
+        if len(entries) > core.MAX_BATCH_ENTRIES:
+            return jsonify({"success": False, "message": f"한 번에 최대 {core.MAX_BATCH_ENTRIES}개까지 분석할 수 있습니다."}), 413
+
+        async with db_pool.connection() as conn:
+            user_id = await request_user_id(conn, username)
+        if not user_id:
+            return jsonify({"success": False, "message": "로그인 정보가 유효하지 않습니다."}), 401
+
+        try:
+            scored = await analyze_executor.run(core.score_entries, entries)
+        except OverloadedError as e:
+            return overloaded_response(e)
+        async with db_pool.connection() as conn:
+            record_ids = iter(await insert_scored_rows(conn, user_id, [row for row, _ in scored if row is not None]))
+        results = []
+        for row, result in scored:
+            if row is not None:
+                result = dict(result, record_id=next(record_ids))
+            results.append(result)
+    except Exception as e:
+        print(f"일괄 분석 처리 중 오류: {e}")
+        traceback.print_exc()
+        return jsonify({"success": False, "message": "일괄 분석 처리 중 오류가 발생했습니다."}), 500
+    return jsonify({"success": True, "inserted": sum(1 for r in results if r['success']), "results": results})
+
+# --- 피드백 처리 라우트 ---
+# 항목별 저장 여부를 반환 (app.save_feedback의 비동기 버전, 커밋은 호출 측에서)
+async def save_feedback(conn, user_id, items):
+    timestamp = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+    saved = []
+    for record_id, challenge_title, rating in items:
+        cursor = await conn.execute(core.UPDATE_FEEDBACK_SQL, core.feedback_update_params(user_id, (record_id, challenge_title, rating)))
+        if cursor.rowcount:
+            await conn.execute(core.INSERT_FEEDBACK_SQL, (user_id, record_id, challenge_title, rating, timestamp))
+        saved.append(bool(cursor.rowcount))
+    return saved
+
+@app.route('/feedback', methods=['POST'])
+async def handle_feedback():
+    try:
+        data = await request.get_json()
+        username = data.get('username')
+        record_id, challenge_title, rating = data.get('record_id'), data.get('challenge_title'), data.get('rating')
+        if not all([username or core.request_token(request), record_id, challenge_title, rating is not None]):
+            return jsonify({"success": False, "message": "필수 정보가 누락되었습니다."}), 400
+
+        async with db_pool.connection() as conn:
+            user_id = await request_user_id(conn, username)
+            if not user_id:
+                return jsonify({"success": False, "message": "사용자를 찾을 수 없습니다."}), 404
+            if not (await save_feedback(conn, user_id, [(record_id, challenge_title, rating)]))[0]:
+                return jsonify({"success": False, "message": "해당 기록 또는 챌린지를 찾을 수 없습니다."}), 404
+            await conn.commit()
+        core.invalidate_challenge_feedback_scores()
+    except Exception as e:
+        print(f"피드백 저장 중 오류 발생: {e}")
+        print(traceback.format_exc())
+        return jsonify({"success": False, "message": "피드백 저장 중 오류가 발생했습니다."}), 500
+    return jsonify({"success": True, "message": "피드백이 저장되었습니다."})
+
+@app.route('/feedback/batch', methods=['POST'])
+async def handle_feedback_batch():
+    try:
+        data = await request.get_json() or {}
+        username = data.get('username')
+        ratings = data.get('ratings')
+        if not (username or core.request_token(request)) or not isinstance(ratings, list) or not ratings:
+            return jsonify({"success": False, "message": "필수 정보가 누락되었습니다."}), 400
+        if len(ratings) > core.MAX_FEEDBACK_BATCH:
+            return jsonify({"success": False, "message": f"한 번에 최대 {core.MAX_FEEDBACK_BATCH}개까지 저장할 수 있습니다."}), 413
+
+        async with db_pool.connection() as conn:
+            user_id = await request_user_id(conn, username)
+            if not user_id:
+                return jsonify({"success": False, "message": "사용자를 찾을 수 없습니다."}), 404
+            results, items = core.parse_feedback_ratings(ratings)
+            core.mark_unsaved_feedback(results, await save_feedback(conn, user_id, items))
+            await conn.commit()
+        if any(result['success'] for result in results):
+            core.invalidate_challenge_feedback_scores()
+    except Exception as e:
+        print(f"피드백 일괄 저장 중 오류 발생: {e}")
+        print(traceback.format_exc())
+        return jsonify({"success": False, "message": "피드백 저장 중 오류가 발생했습니다."}), 500
+    return jsonify({"success": True, "saved": sum(1 for r in results if r['success']), "results": results})
+
+# --- 챗봇 라우트 ---
+@app.route('/chatbot/start', methods=['GET'])
+async def chatbot_start():
+    return jsonify({"questions": core.PHQ9_QUESTIONS})
+
+@app.route('/chatbot/result', methods=['POST'])
+async def chatbot_result():
+    data = await request.get_json()
+    return jsonify(core.phq9_result(data.get('answers', [])))
+
+# --- 서버 실행 ---
+if __name__ == '__main__':
+    app.run(debug=True)
@@ -0,0 +1,214 @@
+"""
+실행 방식 비교: Flask(gunicorn gthread) vs 비동기 모드(asgi_app.py, hypercorn)
+
+  python benchmarks/bench_async.py [--clients 8 32 128] [--duration 10] [--delay-ms 50] [--threads 8]
+
+클라이언트 수마다 서버를 새로 띄우고(임시 DB, 워커 프로세스 1개) 다음 부하를 동시에 보냅니다.
+  - clients개 연결이 쉬지 않고 POST /analyze (모델을 거치는 느린 요청)
+  - 연결 하나가 probe-interval마다 GET /chatbot/start, GET /get_data (가벼운 요청)
+느린 요청의 처리량(200 응답/초)과 p50/p99, 가벼운 요청의 p50/p99를 비교합니다. 가벼운 요청의 지연 시간이 곧
+요청 스레드(Flask) 또는 이벤트 루프(비동기)가 빌 때까지 기다린 시간입니다.
+
+모델 대신 결정적 스텁(forward 한 번에 --delay-ms)을 사용하며, 두 방식이 같은 양의 모델 연산을 하도록
+과부하 제어(키워드 채점으로 대체)는 끕니다. Flask 모드는 gunicorn, 비동기 모드는 quart / aiosqlite / hypercorn이 필요합니다.
+"""
+import argparse
+import asyncio
+import json
+import os
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+
+import common
+from common import latency_summary
+
+MODES = ["flask", "async"]
+
+
+# --- 서버 실행 (--serve, 별도 프로세스) ---
+def serve(mode, port, threads, delay_ms):
+    common.install_stub_backend(delay_ms=delay_ms)
+    if mode == 'flask':
+        from gunicorn.app.base import BaseApplication
+
+        class Server(BaseApplication):
+            def load_config(self):
+                for key, value in {'bind': f'127.0.0.1:{port}', 'workers': 1, 'threads': threads,
+                                   'worker_class': 'gthread', 'loglevel': 'warning'}.items():
+                    self.cfg.set(key, value)
+
+            def load(self):
+                import app
+                return app.app
+
+        Server().run()
+    else:
+        from hypercorn.asyncio import serve as hypercorn_serve
+        from hypercorn.config import Config
+        import asgi_app
+        config = Config()
+        config.bind = [f'127.0.0.1:{port}']
+        config.loglevel = 'WARNING'
+        asyncio.run(hypercorn_serve(asgi_app.app, config))
+
+
+def free_port():
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+
+# --- 부하 클라이언트 ---
+# keep-alive 연결 하나로 요청을 순서대로 보내는 최소한의 HTTP/1.1 클라이언트 (Content-Length 응답만 처리)
+class Connection:
+    def __init__(self, port):
+        self.port = port
+        self.reader = self.writer = None
+
+    async def request(self, method, path, body=None):
+        if self.writer is None:
+            self.reader, self.writer = await asyncio.open_connection('127.0.0.1', self.port)
+        payload = json.dumps(body).encode('utf-8') if body is not None else b''
+        self.writer.write(f"{method} {path} HTTP/1.1\r\nHost: bench\r\nContent-Type: application/json\r\n"
+                          f"Content-Length: {len(payload)}\r\n\r\n".encode('ascii') + payload)
+        await self.writer.drain()
+        status = int((await self.reader.readline()).split()[1])
+        length, close = 0, False
+        while True:
+            line = await self.reader.readline()
+            if line in (b'\r\n', b''):
+                break
+            name, _, value = line.decode('latin-1').partition(':')
+            if name.lower() == 'content-length':
+                length = int(value)
+            elif name.lower() == 'connection' and value.strip().lower() == 'close':
+                close = True
+        data = await self.reader.readexactly(length)
+        if close:
+            self.close()
+        return status, data
+
+    def close(self):
+        if self.writer is not None:
+            self.writer.close()
+            self.reader = self.writer = None
+
+
+async def timed_request(conn, method, path, body=None):
+    start = time.perf_counter()
+    try:
+        status, _ = await conn.request(method, path, body)
+    except (OSError, asyncio.IncompleteReadError, IndexError, ValueError):
+        conn.close()
+        status = 'error'
+    return (time.perf_counter() - start) * 1000, status
+
+
+async def run_load(port, clients, duration, probe_interval_ms):
+    from keywords import keyword_matcher
+    # 모델을 거치도록 키워드가 없는 문장만 사용
+    texts = [text for text in common.load_corpus() if keyword_matcher.match(text) is None]
+    setup = Connection(port)
+    await setup.request('POST', '/register', {"username": "bench", "password": "bench"})
+    await setup.request('POST', '/analyze/batch', {"username": "bench", "entries": [
+        {"mood": 5, "sleep": 7, "activity": 5, "feeling_text": texts[i % len(texts)], "date": f"2024-01-{i % 28 + 1:02d}"} for i in range(50)]})
+    setup.close()
+
+    deadline = time.monotonic() + duration
+    results = {'analyze': [], 'chatbot': [], 'get_data': []}
+    statuses = {}
+
+    async def analyze_client(n):
+        conn, i = Connection(port), 0
+        while time.monotonic() < deadline:
+            # 캐시에 걸리지 않도록 요청마다 번호를 붙임
+            body = {"username": "bench", "mood": 5, "sleep": 7, "activity": 5, "feeling_text": f"{texts[(n + i) % len(texts)]} {n}-{i}"}
+            elapsed, status = await timed_request(conn, 'POST', '/analyze', body)
+            results['analyze'].append(elapsed)
+            statuses[status] = statuses.get(status, 0) + 1
+            i += 1
+        conn.close()
+
+    async def probe():
+        conn = Connection(port)
+        while time.monotonic() < deadline:
+            for name, path in (('chatbot', '/chatbot/start'), ('get_data', '/get_data?username=bench&fields=chart&limit=50')):
+                elapsed, status = await timed_request(conn, 'GET', path)
+                results[name].append(elapsed)
+                if status != 200:
+                    statuses[f'{name} {status}'] = statuses.get(f'{name} {status}', 0) + 1
+            await asyncio.sleep(probe_interval_ms / 1000)
+        conn.close()
+
+    start = time.monotonic()
+    await asyncio.gather(probe(), *(analyze_client(n) for n in range(clients)))
+    elapsed = time.monotonic() - start
+    return {name: latency_summary(samples) for name, samples in results.items()}, statuses.get(200, 0) / elapsed, statuses
+
+
+def wait_ready(port, proc, timeout=120):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if proc.poll() is not None:
+            raise RuntimeError("서버가 시작되지 못했습니다.")
+        try:
+            with socket.create_connection(('127.0.0.1', port), timeout=1):
+                return
+        except OSError:
+            time.sleep(0.2)
+    raise RuntimeError("서버 시작 대기 시간 초과")
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--clients', type=int, nargs='+', default=[8, 32, 128], help="동시에 /analyze를 보내는 연결 수")
+    parser.add_argument('--duration', type=float, default=10.0, help="설정별 부하 시간(초)")
+    parser.add_argument('--delay-ms', type=float, default=50.0, help="스텁 모델 forward 한 번의 시간(ms)")
+    parser.add_argument('--threads', type=int, default=8, help="Flask 모드 gunicorn 스레드 수 (gunicorn.conf.py 기본값)")
+    parser.add_argument('--probe-interval-ms', type=float, default=20.0)
+    parser.add_argument('--modes', nargs='+', choices=MODES, default=MODES)
+    parser.add_argument('--serve', choices=MODES, help="(내부용) 서버 실행")
+    parser.add_argument('--port', type=int, help="(내부용)")
+    args = parser.parse_args()
+
+    if args.serve:
+        serve(args.serve, args.port, args.threads, args.delay_ms)
+        return
+
+    print(f"스텁 모델 forward {args.delay_ms:.0f}ms, Flask 스레드 {args.threads}개, 부하 {args.duration:.0f}초")
+    print(f"{'mode':<7}{'clients':>8}{'analyze/s':>11}{'analyze p50':>13}{'p99':>9}{'chatbot p50':>13}{'p99':>9}"
+          f"{'get_data p50':>14}{'p99':>9}  (ms)  응답 코드")
+    for clients in args.clients:
+        for mode in args.modes:
+            with tempfile.TemporaryDirectory() as tmp:
+                port = free_port()
+                log = open(os.path.join(tmp, 'server.log'), 'w+b')
+                env = dict(os.environ, BLOOM_DATABASE=os.path.join(tmp, 'bench.db'), BLOOM_INFERENCE_BACKEND='stub',
+                           BLOOM_MODEL_DIR=os.path.join(tmp, 'none'), BLOOM_ADMISSION_MAX_QUEUE='0', BLOOM_ADMISSION_DEADLINE_MS='0')
+                proc = subprocess.Popen([sys.executable, __file__, '--serve', mode, '--port', str(port), '--threads', str(args.threads),
+                                         '--delay-ms', str(args.delay_ms)], cwd=common.ROOT_DIR, env=env,
+                                        stdout=subprocess.DEVNULL, stderr=log)
+                try:
+                    wait_ready(port, proc)
+                    summary, rps, statuses = asyncio.run(run_load(port, clients, args.duration, args.probe_interval_ms))
+                except RuntimeError as e:
+                    log.seek(0)
+                    print(f"{mode:<7}{clients:>8}  실패: {e}\n{log.read().decode('utf-8', 'replace')[-1000:]}")
+                    continue
+                finally:
+                    proc.terminate()
+                    try:
+                        proc.wait(10)
+                    except subprocess.TimeoutExpired:
+                        proc.kill()
+                    log.close()
+            a, c, d = summary['analyze'], summary['chatbot'], summary['get_data']
+            print(f"{mode:<7}{clients:>8}{rps:>11.1f}{a['p50_ms']:>13.1f}{a['p99_ms']:>9.1f}{c['p50_ms']:>13.1f}{c['p99_ms']:>9.1f}"
+                  f"{d['p50_ms']:>14.1f}{d['p99_ms']:>9.1f}        {statuses}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,66 @@
+"""
+추론 백엔드(torch / int8 / onnx) 지연 시간 및 메모리 비교
+
+  python benchmarks/bench_backends.py [--model-dir model_artifacts] [--repeat 5]
+
+백엔드마다 별도 프로세스에서 실행해 모델 로드 후 RSS 증가량을 따로 측정합니다.
+onnx 백엔드는 먼저 `flask export-model`로 모델을 내보내야 합니다.
+"""
+import argparse
+import json
+import subprocess
+import sys
+import time
+
+import common
+from common import latency_summary, timed_ms, rss_mb, load_corpus
+
+
+def measure(backend_name, model_name, model_dir, repeat):
+    from inference import load_backend
+
+    texts = load_corpus()
+    rss_before = rss_mb()
+    start = time.perf_counter()
+    backend = load_backend(backend_name, model_name, model_dir)
+    load_s = time.perf_counter() - start
+    backend.predict_proba(texts[:2])  # 워밍업
+
+    result = {"backend": backend_name, "load_s": round(load_s, 2), "rss_mb": round(rss_mb() - rss_before, 1)}
+    for batch_size in (1, 8):
+        samples = []
+        for _ in range(repeat):
+            for i in range(0, len(texts), batch_size):
+                ms, _ = timed_ms(backend.predict_proba, texts[i:i + batch_size])
+                samples.append(ms)
+        result[f"batch{batch_size}"] = latency_summary(samples)
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--model-name', default="beomi/kcbert-base")
+    parser.add_argument('--model-dir', default="model_artifacts")
+    parser.add_argument('--repeat', type=int, default=5)
+    parser.add_argument('--backend', help="(내부용) 한 백엔드만 측정해 JSON으로 출력")
+    args = parser.parse_args()
+
+    if args.backend:
+        print(json.dumps(measure(args.backend, args.model_name, args.model_dir, args.repeat)))
+        return
+
+    from inference import BACKENDS
+    print(f"{'backend':<8}{'load(s)':>9}{'RSS(MB)':>9}{'b1 p50':>9}{'b1 p95':>9}{'b8 p50':>9}{'b8 p95':>9}  (ms)")
+    for name in BACKENDS:
+        proc = subprocess.run([sys.executable, __file__, '--backend', name, '--model-name', args.model_name,
+                               '--model-dir', args.model_dir, '--repeat', str(args.repeat)],
+                              capture_output=True, text=True, cwd=common.ROOT_DIR)
+        if proc.returncode != 0:
+            print(f"{name:<8} 실패: {proc.stderr.strip().splitlines()[-1] if proc.stderr.strip() else '알 수 없는 오류'}")
+            continue
+        r = json.loads(proc.stdout.strip().splitlines()[-1])
+        print(f"{name:<8}{r['load_s']:>9}{r['rss_mb']:>9}{r['batch1']['p50_ms']:>9}{r['batch1']['p95_ms']:>9}{r['batch8']['p50_ms']:>9}{r['batch8']['p95_ms']:>9}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,170 @@
+"""
+챌린지 저장 형식 비교: 기록마다 챌린지 JSON(이전) vs 챌린지 카탈로그 ID(현재, challenge_store.py)
+
+  python benchmarks/bench_challenge_storage.py [--users 200] [--records-per-user 1000] [--repeat 100]
+
+1. 임시 DB에 예전 형식 기록을 넣습니다. (추천 챌린지 3개를 json.dumps(..., ensure_ascii=False)로,
+   3개 중 1개꼴로 제목을 키로 쓴 피드백 JSON — 이전 /analyze, /feedback이 저장하던 값과 같음)
+2. DB 파일 크기(VACUUM 후), records 테이블 크기와 /get_data 응답 시간 / 크기를 측정합니다.
+3. CompactionJob으로 기록을 옮기는 동안 다른 스레드에서 /get_data, /feedback을 계속 보내
+   응답 시간을 측정합니다. (서버를 멈추지 않고 옮길 수 있는지 확인)
+4. 옮긴 뒤 같은 항목을 다시 측정합니다. (지워진 JSON이 남긴 빈 페이지는 VACUUM해야 파일 크기가 줄어듦)
+"""
+import argparse
+import json
+import os
+import random
+import sqlite3
+import tempfile
+import threading
+import time
+
+import common
+from common import latency_summary, load_corpus, timed_ms
+
+QUERIES = [
+    ("전체 기록", ""),
+    ("limit=200", "&limit=200"),
+    ("compact, limit=200", "&fields=compact&limit=200"),
+]
+
+
+def seed(app, users, records_per_user, rng):
+    from challenges import DEFAULT_CHALLENGE, challenge_catalog
+    from db import get_connection, release_connection
+
+    catalog = list(challenge_catalog.by_id.values())
+    corpus = load_corpus()
+    conn = get_connection()
+    try:
+        conn.executemany("INSERT INTO users (username, password) VALUES (?, 'x')", [(f"bench{u}",) for u in range(users)])
+        user_ids = [row[0] for row in conn.execute("SELECT id FROM users ORDER BY id")]
+        rows = []
+        for r in range(records_per_user):
+            for user_id in user_ids:
+                challenges = [dict(c) for c in rng.sample(catalog, 3 if r % 20 else 2)]
+                if len(challenges) < 3:
+                    challenges.append(dict(DEFAULT_CHALLENGE))
+                feedback = {c['title']: rng.choice([1, -1]) for c in challenges[:rng.randint(1, 2)]} if r % 3 == 0 else {}
+                date = f"{2020 + r // 360:04d}-{r // 30 % 12 + 1:02d}-{r % 30 % 28 + 1:02d} {9 + rng.randint(0, 12):02d}:00"
+                rows.append((user_id, date, round(rng.uniform(0, 10), 2), "보통", rng.choice(corpus),
+                             json.dumps(challenges, ensure_ascii=False),
+                             json.dumps(feedback, ensure_ascii=False, separators=(',', ':')) if feedback else json.dumps({})))
+            if len(rows) >= 50000:
+                conn.executemany("INSERT INTO records (user_id, date, score, status, text, recommended_challenges_json, feedback_given_json) "
+                                 "VALUES (?, ?, ?, ?, ?, ?, ?)", rows)
+                rows = []
+        conn.executemany("INSERT INTO records (user_id, date, score, status, text, recommended_challenges_json, feedback_given_json) "
+                         "VALUES (?, ?, ?, ?, ?, ?, ?)", rows)
+        conn.commit()
+    finally:
+        release_connection(conn)
+    return user_ids
+
+
+def sizes(path, vacuum=False):
+    import db_viewer
+    conn = sqlite3.connect(path)
+    if vacuum:
+        conn.execute("VACUUM")
+    conn.row_factory = sqlite3.Row
+    tables = db_viewer.table_sizes(conn)
+    free = conn.execute("PRAGMA freelist_count").fetchone()[0] * conn.execute("PRAGMA page_size").fetchone()[0]
+    conn.close()
+    return {"file": os.path.getsize(path), "records": tables.get('records', 0), "challenges": tables.get('challenges', 0), "free": free}
+
+
+def measure(client, users, repeat, rng):
+    results = {}
+    for name, query in QUERIES:
+        samples, size = [], 0
+        for _ in range(repeat):
+            elapsed, resp = timed_ms(client.get, f"/get_data?username={rng.choice(users)}{query}")
+            assert resp.status_code == 200, resp.data
+            samples.append(elapsed)
+            size += len(resp.data)
+        results[name] = dict(latency_summary(samples), kb=size / repeat / 1024)
+    return results
+
+
+def print_sizes(label, s):
+    mb = 1024 * 1024
+    print(f"  {label:<22} 파일 {s['file'] / mb:>8.1f}MB   records(인덱스 포함) {s['records'] / mb:>8.1f}MB"
+          f"   challenges {s['challenges'] / 1024:>6.1f}KB   빈 페이지 {s['free'] / mb:>7.1f}MB")
+
+
+def print_latency(label, results):
+    for name, r in results.items():
+        print(f"  {label:<8}{name:<22}{r['p50_ms']:>9}{r['p95_ms']:>9}{r['p99_ms']:>9}{r['kb']:>11.1f}KB")
+
+
+def compact_online(app, client, users, rng):
+    """변환 작업을 백그라운드에서 돌리는 동안 /get_data, /feedback 응답 시간을 측정"""
+    from db import get_connection, release_connection
+    job = app.CompactionJob(app.challenge_store, batch_size=app.COMPACT_BATCH_SIZE, pause_s=app.COMPACT_PAUSE_MS / 1000)
+    conn = get_connection()
+    record_ids = [row[0] for row in conn.execute("SELECT id FROM records ORDER BY random() LIMIT 1000")]
+    release_connection(conn)
+    titles = [item['title'] for item in app.challenge_store.items_by_id.values()]
+
+    thread = threading.Thread(target=job.run)
+    start = time.perf_counter()
+    thread.start()
+    reads, writes, errors = [], [], 0
+    while thread.is_alive():
+        elapsed, resp = timed_ms(client.get, f"/get_data?username={rng.choice(users)}&fields=compact&limit=200")
+        reads.append(elapsed)
+        record_id = rng.choice(record_ids)
+        # 기록 ID로 주인을 찾지 않고 사용자 ID = (record_id - 1) % users + 1 로 넣었으므로 바로 계산
+        body = {"username": users[(record_id - 1) % len(users)], "record_id": record_id, "challenge_title": rng.choice(titles), "rating": 1}
+        elapsed, resp = timed_ms(client.post, '/feedback', json=body)
+        writes.append(elapsed)
+        errors += resp.status_code != 200
+    thread.join()
+    return job.status(), time.perf_counter() - start, latency_summary(reads), latency_summary(writes), errors
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--users', type=int, default=200)
+    parser.add_argument('--records-per-user', type=int, default=1000)
+    parser.add_argument('--repeat', type=int, default=100, help="조회 종류별 요청 수")
+    args = parser.parse_args()
+
+    tmp = tempfile.TemporaryDirectory()
+    path = os.path.join(tmp.name, 'bench.db')
+    os.environ.update(BLOOM_DATABASE=path, BLOOM_COMPACT_ON_START='0', BLOOM_METRICS='0')
+    os.environ.setdefault('BLOOM_MODEL_DIR', os.path.join(tmp.name, 'none'))
+    import app
+    import db
+
+    rng = random.Random(0)
+    users = [f"bench{u}" for u in range(args.users)]
+    seed(app, args.users, args.records_per_user, rng)
+    client = app.app.test_client()
+    total = args.users * args.records_per_user
+    print(f"사용자 {args.users}명 × 기록 {args.records_per_user}개 = {total}건, 카탈로그 챌린지 {len(app.challenge_store.items_by_id)}개")
+
+    print("DB 크기")
+    print_sizes("이전 (VACUUM 후)", sizes(path, vacuum=True))
+    before = measure(client, users, args.repeat, rng)
+
+    status, elapsed, reads, writes, errors = compact_online(app, client, users, rng)
+    print(f"변환: {status['processed']}건, {elapsed:.1f}초 ({status['processed'] / elapsed:.0f}건/초), 상태 {status['state']}")
+    print(f"  변환 중 /get_data p50 {reads['p50_ms']} / p99 {reads['p99_ms']} ms ({reads['count']}건), "
+          f"/feedback p50 {writes['p50_ms']} / p99 {writes['p99_ms']} ms ({writes['count']}건, 실패 {errors}건)")
+
+    print_sizes("현재 (VACUUM 전)", sizes(path))
+    print_sizes("현재 (VACUUM 후)", sizes(path, vacuum=True))
+    db.pool.close_all()
+    after = measure(client, users, args.repeat, rng)
+
+    print(f"/get_data (사용자당 기록 {args.records_per_user}개, 요청 {args.repeat}번)")
+    print(f"  {'형식':<8}{'조회':<22}{'p50':>9}{'p95':>9}{'p99':>9}  (ms) 응답 크기")
+    print_latency("이전", before)
+    print_latency("현재", after)
+    tmp.cleanup()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,167 @@
+"""
+챌린지 추천 검증 및 벤치마크
+
+  python benchmarks/bench_challenges.py
+
+1) 기존 get_dynamic_challenges(legacy_dynamic_challenges)와 ChallengeCatalog의
+   챌린지별 추천 빈도가 같은 분포인지 확인합니다. (피드백 점수가 치우친 경우 포함)
+2) 같은 seed로 만든 카탈로그가 항상 같은 결과를 내는지 확인합니다.
+3) 챌린지 수를 늘려 가며 호출당 처리 시간을 비교합니다.
+4) 임베딩 유사도 기반 추천(행렬 곱 + 가중치 샘플링)의 호출당 지연 시간이
+   예산(SIMILARITY_BUDGET_MS) 안인지 확인합니다. (kcbert 임베딩 768차원 기준, 임의 벡터 사용)
+"""
+import sys
+import random
+import timeit
+from collections import Counter
+
+import numpy as np
+
+import common
+from challenges import CHALLENGES_POOL, TEXT_CHALLENGES, ChallengeCatalog
+
+# 유사도 기반 추천의 호출당 p99 지연 시간 예산 (챌린지 5000개까지)
+SIMILARITY_BUDGET_MS = 1.0
+SIMILARITY_BUDGET_MAX_SIZE = 5000
+EMBEDDING_DIM = 768
+
+
+# 기존 app.py의 추천 로직 (비교 기준용으로 그대로 보존, 풀과 피드백 점수만 인자로 받음)
+def legacy_dynamic_challenges(pool, feedback_scores, mood, sleep, activity, feeling_text):
+    avg_score = (int(mood) + int(activity)) / 2
+    sleep_val = int(sleep)
+    if sleep_val < 5 or avg_score < 4:
+        energy_level = 'low'
+    elif avg_score < 7:
+        energy_level = 'medium'
+    else:
+        energy_level = 'high'
+
+    suitable_challenges = []
+    for category in pool.values():
+        suitable_challenges.extend([c for c in category if c.get('energy') == energy_level])
+
+    feeling_text_safe = feeling_text if feeling_text else ""
+    if "불안" in feeling_text_safe or "걱정" in feeling_text_safe:
+        suitable_challenges.append({'title': '불안감을 다스리는 호흡법 따라하기', 'url': 'https://www.youtube.com/results?search_query=불안+해소+호흡법', 'energy': 'low'})
+    elif "지루" in feeling_text_safe or "심심" in feeling_text_safe:
+        suitable_challenges.append({'title': '흥미로운 단편 소설 읽기', 'url': 'https://brunch.co.kr/keyword/%EB%8B%A8%ED%8E%B8%EC%86%8C%EC%84%A4', 'energy': 'medium'})
+
+    unique_challenges = list({frozenset(item.items()): item for item in suitable_challenges}.values())
+    weights = [max(0.1, 1 + feedback_scores.get(c['title'], 0)) for c in unique_challenges]
+
+    selected_challenges = []
+    temp_suitable = list(unique_challenges)
+    temp_weights = list(weights)
+    while len(selected_challenges) < 3 and len(temp_suitable) > 0:
+        chosen = random.choices(temp_suitable, weights=temp_weights, k=1)[0]
+        if chosen not in selected_challenges:
+            selected_challenges.append(chosen)
+        idx = temp_suitable.index(chosen)
+        temp_suitable.pop(idx)
+        temp_weights.pop(idx)
+
+    final_selection = []
+    for c in selected_challenges[:3]:
+        url = c.get('url', '#')
+        new_c = c.copy()
+        if 'youtube.com' in url or 'youtu.be' in url:
+            new_c['type'] = '유튜브'
+        elif 'search.naver.com' in url or 'brunch.co.kr' in url or 'pinterest.co.kr' in url or 'goodnewsnetwork.org' in url or '10000recipe.com' in url or 'google.com/maps' in url:
+            new_c['type'] = '웹사이트/블로그'
+        elif url == '#':
+            new_c['type'] = '활동'
+        else:
+            new_c['type'] = '기타'
+        final_selection.append(new_c)
+    return final_selection
+
+
+# 피드백 점수가 고르지 않은 경우 (좋아요가 몰린 항목, 싫어요가 많은 항목)
+SKEWED_SCORES = {
+    '5분 명상: 불안과 스트레스 해소': 12,
+    '창문 열고 5번 깊게 숨쉬기': 4,
+    '따뜻한 차나 물 한 잔 마시기': -5,
+    '불안감을 다스리는 호흡법 따라하기': 3,
+    '가벼운 15분 동네 산책하기': 30,
+}
+
+CASES = [
+    ("low", (2, 4, 2, "오늘은 불안하다")),
+    ("medium", (5, 7, 5, "너무 심심하다")),
+    ("high", (9, 8, 9, "")),
+]
+
+
+def check_distribution(trials=60000, tolerance=0.01):
+    catalog = ChallengeCatalog(CHALLENGES_POOL, TEXT_CHALLENGES, seed=1)
+    random.seed(2)
+    ok = True
+    for name, args in CASES:
+        legacy, new = Counter(), Counter()
+        for _ in range(trials):
+            legacy.update((i, c['title']) for i, c in enumerate(legacy_dynamic_challenges(CHALLENGES_POOL, SKEWED_SCORES, *args)))
+            new.update((i, c['title']) for i, c in enumerate(catalog.recommend(*args, feedback_scores=SKEWED_SCORES)))
+        # 위치(첫 번째/두 번째/세 번째 추천)별 빈도 차이
+        max_diff = max(abs(legacy[key] - new[key]) / trials for key in set(legacy) | set(new))
+        ok = ok and max_diff < tolerance
+        print(f"{name:<8} 추천 빈도 최대 차이 {max_diff:.4f} (허용 {tolerance})")
+    return ok
+
+
+def check_seeded():
+    runs = []
+    for _ in range(2):
+        catalog = ChallengeCatalog(CHALLENGES_POOL, TEXT_CHALLENGES, seed=42)
+        runs.append([[c['title'] for c in catalog.recommend(*args, feedback_scores=SKEWED_SCORES)] for _, args in CASES * 50])
+    same = runs[0] == runs[1]
+    print(f"seed 고정 시 결과 재현: {'예' if same else '아니오'}")
+    return same
+
+
+def _synthetic_pool(size):
+    pool = {'activity': []}
+    for i in range(size):
+        pool['activity'].append({'title': f'챌린지 {i}', 'url': '#' if i % 2 else f'https://www.youtube.com/results?search_query={i}',
+                                 'energy': ('low', 'medium', 'high')[i % 3]})
+    return pool
+
+
+def run_benchmark(number=2000):
+    print(f"\n{'챌린지 수':>10}{'legacy (us)':>14}{'catalog (us)':>14}{'speedup':>10}")
+    for size in (sum(len(category) for category in CHALLENGES_POOL.values()), 1000, 5000, 20000):
+        pool = _synthetic_pool(size)
+        scores = {f'챌린지 {i}': (i % 7) - 3 for i in range(0, size, 5)}
+        catalog = ChallengeCatalog(pool, TEXT_CHALLENGES, seed=0)
+        catalog.refresh(scores)
+        n = max(20, number * 40 // size)
+        legacy = timeit.timeit(lambda: legacy_dynamic_challenges(pool, scores, 5, 7, 5, "불안"), number=n) / n * 1e6
+        new = timeit.timeit(lambda: catalog.recommend(5, 7, 5, "불안", feedback_scores=scores), number=number) / number * 1e6
+        print(f"{size:>10}{legacy:>14.1f}{new:>14.1f}{legacy / new:>9.1f}x")
+
+
+def run_similarity_benchmark(number=500):
+    print(f"\n{'챌린지 수':>10}{'p50 (ms)':>10}{'p99 (ms)':>10}  예산 {SIMILARITY_BUDGET_MS}ms")
+    rng = np.random.default_rng(0)
+    ok = True
+    for size in (sum(len(category) for category in CHALLENGES_POOL.values()), 1000, 5000, 20000):
+        catalog = ChallengeCatalog(_synthetic_pool(size), TEXT_CHALLENGES, seed=0)
+        catalog.attach_embeddings(list(catalog.by_id), rng.standard_normal((len(catalog), EMBEDDING_DIM), dtype=np.float32))
+        catalog.refresh({f'챌린지 {i}': (i % 7) - 3 for i in range(0, size, 5)})
+        query = rng.standard_normal(EMBEDDING_DIM, dtype=np.float32)
+        catalog.recommend(5, 7, 5, "", text_embedding=query)
+        samples = [common.timed_ms(catalog.recommend, 5, 7, 5, "", text_embedding=query)[0] for _ in range(number)]
+        summary = common.latency_summary(samples)
+        within = summary['p99_ms'] <= SIMILARITY_BUDGET_MS
+        if size <= SIMILARITY_BUDGET_MAX_SIZE:
+            ok = ok and within
+        print(f"{size:>10}{summary['p50_ms']:>10.3f}{summary['p99_ms']:>10.3f}  {'OK' if within else '초과'}")
+    return ok
+
+
+if __name__ == '__main__':
+    ok = check_distribution()
+    ok = check_seeded() and ok
+    run_benchmark()
+    ok = run_similarity_benchmark() and ok
+    sys.exit(0 if ok else 1)
@@ -0,0 +1,64 @@
+"""
+콜드 스타트 측정: 서버 프로세스 시작부터 첫 응답 / 모델 준비 완료까지 걸린 시간
+
+  python benchmarks/bench_cold_start.py [--port 5055] [--preload]
+
+--preload 를 주면 BLOOM_PRELOAD_MODEL=1 (임포트 시 동기 로드) 로 실행해 기존 방식과 비교할 수 있습니다.
+"""
+import argparse
+import os
+import subprocess
+import sys
+import time
+import urllib.request
+import urllib.error
+
+import common
+
+
+def wait_for(url, deadline, expect_ok=True):
+    while time.perf_counter() < deadline:
+        try:
+            with urllib.request.urlopen(url, timeout=1) as resp:
+                if resp.status == 200:
+                    return time.perf_counter()
+        except urllib.error.HTTPError as e:
+            if not expect_ok:
+                return time.perf_counter()
+        except (urllib.error.URLError, ConnectionError, OSError):
+            pass
+        time.sleep(0.05)
+    return None
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--port', type=int, default=5055)
+    parser.add_argument('--preload', action='store_true')
+    parser.add_argument('--timeout', type=float, default=300)
+    args = parser.parse_args()
+
+    env = dict(os.environ)
+    if args.preload:
+        env['BLOOM_PRELOAD_MODEL'] = '1'
+    base = f"http://127.0.0.1:{args.port}"
+
+    start = time.perf_counter()
+    proc = subprocess.Popen([sys.executable, '-m', 'flask', '--app', 'app', 'run', '--port', str(args.port)],
+                            cwd=common.ROOT_DIR, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    try:
+        deadline = start + args.timeout
+        first = wait_for(f"{base}/chatbot/start", deadline)
+        ready = wait_for(f"{base}/ready", deadline)
+    finally:
+        proc.terminate()
+        proc.wait()
+
+    mode = "preload (동기 로드)" if args.preload else "background (백그라운드 로드)"
+    print(f"모드: {mode}")
+    print(f"  첫 응답까지:      {(first - start):.2f}초" if first else "  첫 응답 없음 (시간 초과)")
+    print(f"  모델 준비까지:    {(ready - start):.2f}초" if ready else "  모델 준비 안 됨 (시간 초과)")
+
+
+if __name__ == '__main__':
+    main()
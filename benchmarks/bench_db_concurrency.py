@@ -0,0 +1,104 @@
+"""
+/analyze 와 /feedback 동시 쓰기 부하 테스트 (기존 연결 방식 vs 연결 풀 + WAL)
+
+  python benchmarks/bench_db_concurrency.py [--threads 8] [--requests 200]
+
+모드마다 별도 프로세스와 임시 DB 파일을 사용합니다.
+모델 대기 시간이 섞이지 않도록 /analyze 텍스트에는 키워드가 포함된 문장만 사용합니다.
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+
+import common
+from common import latency_summary
+
+MODES = {
+    "legacy (요청마다 연결, DELETE 저널)": {"BLOOM_DB_POOL": "0", "BLOOM_DB_JOURNAL_MODE": "DELETE", "BLOOM_DB_SYNCHRONOUS": "FULL"},
+    "pooled (스레드별 연결, WAL)": {"BLOOM_DB_POOL": "1", "BLOOM_DB_JOURNAL_MODE": "WAL", "BLOOM_DB_SYNCHRONOUS": "NORMAL"},
+}
+TEXTS = ["오늘 정말 행복 했다", "너무 피곤 하다", "그냥 최고", "회의가 길어서 짜증"]
+
+
+def run(threads, requests):
+    import app
+    from db import get_connection, release_connection
+
+    conn = get_connection()
+    conn.execute("INSERT INTO users (username, password) VALUES ('bench', 'x')")
+    conn.commit()
+    release_connection(conn)
+
+    client = app.app.test_client()
+    record_ids = []
+    for text in TEXTS:
+        resp = client.post('/analyze', json={"username": "bench", "mood": 5, "sleep": 7, "activity": 5, "feeling_text": text})
+        record_ids.append(resp.get_json()['record_id'])
+
+    latencies = {"/analyze": [], "/feedback": []}
+    errors = {"/analyze": 0, "/feedback": 0}
+    lock = threading.Lock()
+
+    def worker(route, n, seed):
+        local_client = app.app.test_client()
+        for i in range(n):
+            if route == "/analyze":
+                body = {"username": "bench", "mood": (seed + i) % 10, "sleep": 7, "activity": 5, "feeling_text": TEXTS[i % len(TEXTS)]}
+            else:
+                body = {"username": "bench", "record_id": record_ids[i % len(record_ids)], "challenge_title": f"챌린지 {i % 5}", "rating": 1 if i % 2 else -1}
+            start = time.perf_counter()
+            resp = local_client.post(route, json=body)
+            elapsed = (time.perf_counter() - start) * 1000
+            with lock:
+                latencies[route].append(elapsed)
+                if resp.status_code != 200:
+                    errors[route] += 1
+
+    workers = [threading.Thread(target=worker, args=("/analyze" if i % 2 == 0 else "/feedback", requests, i)) for i in range(threads)]
+    start = time.perf_counter()
+    for w in workers:
+        w.start()
+    for w in workers:
+        w.join()
+    total_s = time.perf_counter() - start
+
+    total = sum(len(v) for v in latencies.values())
+    return {
+        "throughput_rps": round(total / total_s, 1),
+        "routes": {route: dict(latency_summary(samples), errors=errors[route]) for route, samples in latencies.items()},
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--threads', type=int, default=8)
+    parser.add_argument('--requests', type=int, default=200, help="스레드당 요청 수")
+    parser.add_argument('--run', action='store_true', help="(내부용) 현재 환경 변수 설정으로 한 번 실행")
+    args = parser.parse_args()
+
+    if args.run:
+        print(json.dumps(run(args.threads, args.requests)))
+        return
+
+    print(f"스레드 {args.threads}개 (절반 /analyze, 절반 /feedback), 스레드당 {args.requests}건")
+    for name, env_overrides in MODES.items():
+        with tempfile.TemporaryDirectory() as tmp:
+            env = dict(os.environ, BLOOM_DATABASE=os.path.join(tmp, 'bench.db'), **env_overrides)
+            proc = subprocess.run([sys.executable, __file__, '--run', '--threads', str(args.threads), '--requests', str(args.requests)],
+                                  capture_output=True, text=True, cwd=common.ROOT_DIR, env=env)
+        if proc.returncode != 0:
+            print(f"{name}: 실패\n{proc.stderr[-2000:]}")
+            continue
+        r = json.loads(proc.stdout.strip().splitlines()[-1])
+        print(f"\n{name}: {r['throughput_rps']} req/s")
+        for route, s in r['routes'].items():
+            print(f"  {route:<10} p50 {s['p50_ms']:>8}ms  p95 {s['p95_ms']:>8}ms  p99 {s['p99_ms']:>8}ms  오류 {s['errors']}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,164 @@
+"""
+DB 내보내기 처리량 / 메모리 비교: 이전 db_viewer 방식(fetchall) vs db_viewer.py export (fetchmany 스트리밍)
+
+  python benchmarks/bench_export.py [--records 2000000] [--users 1000] [--db /tmp/bench_export.db]
+
+1. 마이그레이션을 적용한 DB에 records를 재귀 CTE로 한 번에 넣습니다. (--db 파일이 이미 있으면 재사용)
+2. 모드마다 별도 프로세스로 records 전체를 읽어 쓰고, 처리량(행/초, MB/초)과 최대 RSS를 비교합니다.
+   내보내는 동안 다른 연결에서 10ms마다 기록을 하나씩 저장해 쓰기 지연(p50/max)도 함께 측정합니다.
+3. stats 명령(SQL 집계) 실행 시간을 측정합니다.
+"""
+import argparse
+import json
+import os
+import resource
+import sqlite3
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+
+import common
+from common import latency_summary
+
+sys.path.insert(0, common.ROOT_DIR)
+
+MODES = ["fetchall (이전 db_viewer)", "export jsonl", "export csv", "export jsonl --snapshot", "export csv --user --since"]
+
+
+def build_database(path, records, users):
+    import db
+    db.set_database(path)
+    db.migrate()
+    conn = db.get_connection()
+    try:
+        if conn.execute("SELECT COUNT(*) FROM records").fetchone()[0] >= records:
+            return
+        conn.execute("DELETE FROM records")
+        conn.execute("DELETE FROM daily_scores")
+        conn.execute("DELETE FROM users")
+        conn.execute("""WITH RECURSIVE n(i) AS (SELECT 1 UNION ALL SELECT i + 1 FROM n WHERE i < ?)
+                        INSERT INTO users (id, username, password) SELECT i, 'user' || i, 'x' FROM n""", (users,))
+        # 행마다 실행되는 트리거(일별 집계, data_version)를 잠시 빼고 넣은 뒤 일별 집계는 한 번에 채움
+        triggers = conn.execute("SELECT name, sql FROM sqlite_master WHERE type = 'trigger' AND tbl_name = 'records'").fetchall()
+        for trigger in triggers:
+            conn.execute(f"DROP TRIGGER {trigger['name']}")
+        # 사용자마다 기록을 2020년부터 약 4년에 걸쳐 고르게 배치
+        conn.execute("""WITH RECURSIVE n(i) AS (SELECT 1 UNION ALL SELECT i + 1 FROM n WHERE i < ?)
+                        INSERT INTO records (user_id, date, score, status, text, recommended_challenges_json, feedback_given_json,
+                                             mood, sleep, activity, text_emotion, scoring_version)
+                        SELECT 1 + i % ?, strftime('%Y-%m-%d %H:%M', '2020-01-01', '+' || ((i / ?) * ?) || ' minutes'),
+                               round(abs(random() % 1000) / 100.0, 2), '보통', '오늘은 평범한 하루였다 ' || i,
+                               '[{"title": "산책 10분", "url": "#"}]', '{}', 5, 7, 5, '중립', 'bench'
+                        FROM n""", (records, users, users, max(1, 4 * 365 * 24 * 60 * users // records)))
+        conn.execute("""INSERT INTO daily_scores (user_id, day, record_count, score_sum, score_sq_sum, score_min, score_max)
+                        SELECT user_id, substr(date, 1, 10), COUNT(*), SUM(score), SUM(score * score), MIN(score), MAX(score)
+                        FROM records GROUP BY user_id, substr(date, 1, 10)""")
+        for trigger in triggers:
+            conn.execute(trigger['sql'])
+        conn.commit()
+    finally:
+        db.release_connection(conn)
+        db.pool.close_all()
+
+
+def peak_rss_mb():
+    """이 프로세스의 최대 RSS(MB). ru_maxrss는 exec 전 부모 프로세스 값을 물려받으므로 VmHWM을 우선 사용"""
+    try:
+        with open('/proc/self/status') as f:
+            for line in f:
+                if line.startswith('VmHWM:'):
+                    return int(line.split()[1]) / 1024
+    except OSError:
+        pass
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+def run_mode(mode, path, output):
+    import db_viewer
+    start = time.perf_counter()
+    if mode.startswith("fetchall"):
+        conn = sqlite3.connect(path)
+        rows = conn.execute("SELECT * FROM records ORDER BY id").fetchall()
+        with open(output, 'w', encoding='utf-8') as out:
+            for row in rows:
+                out.write(json.dumps(row, ensure_ascii=False) + '\n')
+        count = len(rows)
+        conn.close()
+    else:
+        args = ['--db', path] + (['--snapshot'] if '--snapshot' in mode else []) + ['export', 'records', '-o', output]
+        args += ['--format', 'csv' if 'csv' in mode else 'jsonl']
+        if '--user' in mode:
+            args += ['--user', 'user1', '--since', '2021-01-01']
+        devnull = open(os.devnull, 'w')
+        stderr, sys.stderr = sys.stderr, devnull
+        try:
+            db_viewer.main(args)
+        finally:
+            sys.stderr = stderr
+        with open(output, encoding='utf-8') as f:
+            count = sum(1 for _ in f) - (1 if 'csv' in mode else 0)
+    elapsed = time.perf_counter() - start
+    size = os.path.getsize(output)
+    return {"rows": count, "seconds": round(elapsed, 2), "rows_per_s": round(count / elapsed),
+            "mb_per_s": round(size / 1024 / 1024 / elapsed, 1), "max_rss_mb": round(peak_rss_mb(), 1)}
+
+
+def writer(path, stop, latencies):
+    """내보내는 동안 다른 연결에서 10ms마다 기록을 저장 (쓰기가 막히는지 확인)"""
+    conn = sqlite3.connect(path, timeout=30)
+    while not stop.wait(0.01):
+        start = time.perf_counter()
+        conn.execute("INSERT INTO records (user_id, date, score, status, text) VALUES (1, '2030-01-01 00:00', 5, '보통', 'writer')")
+        conn.commit()
+        latencies.append((time.perf_counter() - start) * 1000)
+    conn.execute("DELETE FROM records WHERE text = 'writer'")
+    conn.commit()
+    conn.close()
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--records', type=int, default=2000000)
+    parser.add_argument('--users', type=int, default=1000)
+    parser.add_argument('--db', default=os.path.join(tempfile.gettempdir(), 'bench_export.db'))
+    parser.add_argument('--run', choices=MODES, help="(내부용) 한 모드만 실행")
+    parser.add_argument('--output', help="(내부용)")
+    args = parser.parse_args()
+
+    if args.run:
+        print(json.dumps(run_mode(args.run, args.db, args.output)))
+        return
+
+    start = time.perf_counter()
+    build_database(args.db, args.records, args.users)
+    print(f"DB 준비: {args.db} ({os.path.getsize(args.db) / 1024 / 1024:.0f}MB, {time.perf_counter() - start:.0f}초)")
+    print(f"{'mode':<28}{'행 수':>10}{'초':>8}{'행/초':>10}{'MB/초':>8}{'최대 RSS':>10}   쓰기 지연 p50 / max (ms)")
+    with tempfile.TemporaryDirectory() as tmp:
+        for mode in MODES:
+            latencies, stop = [], threading.Event()
+            thread = threading.Thread(target=writer, args=(args.db, stop, latencies))
+            thread.start()
+            proc = subprocess.run([sys.executable, __file__, '--run', mode, '--db', args.db, '--output', os.path.join(tmp, 'out')],
+                                  capture_output=True, text=True, cwd=common.ROOT_DIR)
+            stop.set()
+            thread.join()
+            if proc.returncode != 0:
+                print(f"{mode:<28} 실패\n{proc.stderr[-2000:]}")
+                continue
+            r = json.loads(proc.stdout.strip().splitlines()[-1])
+            w = latency_summary(latencies)
+            print(f"{mode:<28}{r['rows']:>10}{r['seconds']:>8}{r['rows_per_s']:>10}{r['mb_per_s']:>8}{r['max_rss_mb']:>8}MB"
+                  f"   {w['p50_ms']} / {max(latencies) if latencies else 0:.1f}")
+
+    import db_viewer
+    conn = db_viewer.open_readonly(args.db)
+    start = time.perf_counter()
+    db_viewer.collect_stats(conn)
+    print(f"stats (SQL 집계): {time.perf_counter() - start:.2f}초")
+    conn.close()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,55 @@
+"""
+챌린지 피드백 점수 조회 비용: 피드백 기록이 늘어날 때 기존 GROUP BY 집계 vs challenge_scores 집계 테이블
+
+  python benchmarks/bench_feedback_scores.py [--sizes 10000,100000,1000000]
+"""
+import argparse
+import os
+import random
+import tempfile
+
+import common
+from common import latency_summary, timed_ms
+
+LEGACY_SQL = "SELECT challenge_title, SUM(CASE rating WHEN 1 THEN 1 WHEN -1 THEN -1 ELSE 0 END) as score FROM challenge_feedback GROUP BY challenge_title"
+
+
+def seed_feedback(conn, target, rng, titles):
+    current = conn.execute("SELECT COUNT(*) FROM challenge_feedback").fetchone()[0]
+    rows = ((1, 1, rng.choice(titles), rng.choice((1, -1)), "2024-01-01 00:00:00") for _ in range(target - current))
+    conn.executemany("INSERT INTO challenge_feedback (user_id, record_id, challenge_title, rating, timestamp) VALUES (?, ?, ?, ?, ?)", rows)
+    conn.commit()
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--sizes', default="10000,100000,1000000")
+    parser.add_argument('--repeat', type=int, default=20)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        os.environ['BLOOM_DATABASE'] = os.path.join(tmp, 'feedback.db')
+        import app
+        from db import get_connection, release_connection
+
+        titles = [c['title'] for category in app.CHALLENGES_POOL.values() for c in category]
+        rng = random.Random(0)
+        conn = get_connection()
+        print(f"{'피드백 수':>10}  {'기존 GROUP BY p50':>18}  {'집계 테이블 p50':>16}  {'TTL 캐시 p50':>14}  (ms)")
+        for size in (int(s) for s in args.sizes.split(',')):
+            seed_feedback(conn, size, rng, titles)
+            legacy = [timed_ms(lambda: conn.execute(LEGACY_SQL).fetchall())[0] for _ in range(args.repeat)]
+            table = []
+            for _ in range(args.repeat):
+                app.invalidate_challenge_feedback_scores()
+                table.append(timed_ms(app.get_challenge_feedback_scores)[0])
+            cached = [timed_ms(app.get_challenge_feedback_scores)[0] for _ in range(args.repeat)]
+            assert app.get_challenge_feedback_scores() == {r[0]: r[1] for r in conn.execute(LEGACY_SQL)}
+            print(f"{size:>10}  {latency_summary(legacy)['p50_ms']:>18}  {latency_summary(table)['p50_ms']:>16}  {latency_summary(cached)['p50_ms']:>14}")
+        release_connection(conn)
+        import db
+        db.pool.close_all()
+
+
+if __name__ == '__main__':
+    main()
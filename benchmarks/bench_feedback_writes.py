@@ -0,0 +1,136 @@
+"""
+피드백 동시 쓰기 테스트: 유실된 업데이트(lost update) 확인 + 초당 저장 수 비교
+
+  python benchmarks/bench_feedback_writes.py [--threads 8] [--writes 300] [--records 4] [--batch-size 10]
+
+스레드 여러 개가 적은 수의 기록에 서로 다른 챌린지 피드백을 동시에 저장한 뒤,
+각 기록의 피드백 JSON에 남은 항목 수를 실제 저장 요청 수와 비교합니다. (차이 = 유실된 업데이트)
+  - read-modify-write: 이전 방식 (INSERT → SELECT → json.loads → 수정 → UPDATE, 제목을 키로 쓰는 예전 형식 기록)
+  - read-before-write: 같은 방식이지만 SELECT를 먼저 하는 경우 (두 탭에서 거의 동시에 누를 때의 경합을 재현)
+  - json_patch: 현재 /feedback (UPDATE 한 문장으로 병합)
+  - json_patch batch: 현재 /feedback/batch (batch-size개를 한 트랜잭션으로)
+모드마다 별도 프로세스와 임시 DB 파일을 사용합니다.
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from datetime import datetime
+
+import common
+
+MODES = ["read-modify-write", "read-before-write", "json_patch", "json_patch batch"]
+
+
+def legacy_feedback(conn, user_id, record_id, challenge_title, rating, select_first=False):
+    """이전 /feedback 처리 방식 (비교용)"""
+    timestamp = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+    if select_first:
+        record = conn.execute("SELECT feedback_given_json FROM records WHERE id = ? AND user_id = ?", (record_id, user_id)).fetchone()
+    conn.execute("INSERT INTO challenge_feedback (user_id, record_id, challenge_title, rating, timestamp) VALUES (?, ?, ?, ?, ?)",
+                 (user_id, record_id, challenge_title, rating, timestamp))
+    if not select_first:
+        record = conn.execute("SELECT feedback_given_json FROM records WHERE id = ? AND user_id = ?", (record_id, user_id)).fetchone()
+    feedback_given = json.loads(record['feedback_given_json']) if record['feedback_given_json'] else {}
+    feedback_given[challenge_title] = rating
+    conn.execute("UPDATE records SET feedback_given_json = ? WHERE id = ?", (json.dumps(feedback_given, ensure_ascii=False), record_id))
+    conn.commit()
+
+
+def run(mode, threads, writes, records, batch_size):
+    import app
+    from db import get_connection, release_connection
+
+    conn = get_connection()
+    user_id = conn.execute("INSERT INTO users (username, password) VALUES ('bench', 'x')").lastrowid
+    # 이전 방식은 예전 형식(challenge_ids NULL), 현재 방식은 챌린지 ID 형식 기록에 저장
+    challenge_ids = "" if mode.startswith("json_patch") else None
+    record_ids = [conn.execute(app.INSERT_RECORD_SQL, (user_id, "2024-01-01 00:00", 5, "보통", "", challenge_ids, None, 5, 7, 5, "중립", app.SCORING_VERSION)).lastrowid
+                  for _ in range(records)]
+    conn.commit()
+    release_connection(conn)
+    # 실제 챌린지처럼 카탈로그에 미리 등록해 둠 (측정 중 등록 쓰기가 섞이지 않도록)
+    app.challenge_store.ensure([{'title': f"챌린지 {t}-{i}"} for t in range(threads) for i in range(writes)])
+
+    errors = []
+    lock = threading.Lock()
+
+    def worker(t):
+        items = [(record_ids[i % records], f"챌린지 {t}-{i}", 1 if i % 2 else -1) for i in range(writes)]
+        conn = get_connection()
+        try:
+            if mode == "json_patch batch":
+                for i in range(0, len(items), batch_size):
+                    app.save_feedback(conn, user_id, items[i:i + batch_size])
+                    conn.commit()
+            elif mode == "json_patch":
+                for item in items:
+                    app.save_feedback(conn, user_id, [item])
+                    conn.commit()
+            else:
+                for record_id, title, rating in items:
+                    legacy_feedback(conn, user_id, record_id, title, rating, select_first=(mode == "read-before-write"))
+        except Exception as e:
+            with lock:
+                errors.append(str(e))
+        finally:
+            release_connection(conn)
+
+    workers = [threading.Thread(target=worker, args=(t,)) for t in range(threads)]
+    start = time.perf_counter()
+    for w in workers:
+        w.start()
+    for w in workers:
+        w.join()
+    total_s = time.perf_counter() - start
+
+    conn = get_connection()
+    stored = sum(len(app.challenge_store.record_feedback(row)) for row in conn.execute(
+        f"SELECT challenge_ids, feedback_json, feedback_given_json FROM records WHERE id IN ({','.join('?' * records)})", record_ids))
+    feedback_rows = conn.execute("SELECT COUNT(*) FROM challenge_feedback").fetchone()[0]
+    release_connection(conn)
+    return {"writes_per_s": round(feedback_rows / total_s, 1), "requested": threads * writes, "feedback_rows": feedback_rows,
+            "stored": stored, "lost": feedback_rows - stored, "errors": len(errors), "error": errors[0] if errors else None}
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--threads', type=int, default=8)
+    parser.add_argument('--writes', type=int, default=300, help="스레드당 저장할 피드백 수")
+    parser.add_argument('--records', type=int, default=4, help="피드백이 몰리는 기록 수")
+    parser.add_argument('--batch-size', type=int, default=10, help="/feedback/batch 한 번에 보낼 피드백 수")
+    parser.add_argument('--run', choices=MODES, help="(내부용) 한 모드만 실행")
+    args = parser.parse_args()
+
+    if args.run:
+        print(json.dumps(run(args.run, args.threads, args.writes, args.records, args.batch_size), ensure_ascii=False))
+        return
+
+    print(f"스레드 {args.threads}개 × {args.writes}건, 기록 {args.records}개에 집중")
+    print(f"{'mode':<22}{'writes/s':>10}{'저장 요청':>10}{'JSON 항목':>10}{'유실':>8}{'오류':>6}")
+    failed = False
+    for mode in MODES:
+        with tempfile.TemporaryDirectory() as tmp:
+            env = dict(os.environ, BLOOM_DATABASE=os.path.join(tmp, 'bench.db'), BLOOM_METRICS='0')
+            proc = subprocess.run([sys.executable, __file__, '--run', mode, '--threads', str(args.threads), '--writes', str(args.writes),
+                                   '--records', str(args.records), '--batch-size', str(args.batch_size)],
+                                  capture_output=True, text=True, cwd=common.ROOT_DIR, env=env)
+        if proc.returncode != 0:
+            print(f"{mode:<22} 실패\n{proc.stderr[-2000:]}")
+            failed = True
+            continue
+        r = json.loads(proc.stdout.strip().splitlines()[-1])
+        print(f"{mode:<22}{r['writes_per_s']:>10}{r['feedback_rows']:>10}{r['stored']:>10}{r['lost']:>8}{r['errors']:>6}"
+              + (f"  ({r['error']})" if r['error'] else ''))
+        # 현재 방식에서 업데이트가 유실되면 실패로 종료
+        if mode.startswith("json_patch") and (r['lost'] or r['errors']):
+            failed = True
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == '__main__':
+    main()
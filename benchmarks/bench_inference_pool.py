@@ -0,0 +1,132 @@
+"""
+추론 프로세스 풀 설정(프로세스 수 × 스레드 수)별 처리량 / 지연 시간 비교
+
+  python benchmarks/bench_inference_pool.py [--configs 1x1,1x2,2x1,2x2,4x1] [--clients 8] [--requests 200] [--via scheduler]
+
+설정마다 `inference_pool.py`를 별도 프로세스로 띄우고, 동시 클라이언트 스레드로 한 문장씩 요청을 보냅니다.
+처리량이 더 이상 늘지 않는데 p99만 커지기 시작하는 지점(knee)이 해당 머신에 맞는 설정의 한계입니다.
+
+--via direct(기본)는 클라이언트 스레드가 RemoteBackend를 직접 호출하고, --via scheduler는 웹 서버처럼
+BatchScheduler를 거칩니다. scheduler 모드는 --concurrency(스케줄러가 동시에 보내는 배치 수, 0은 풀 프로세스 수)별로
+측정하며, 1이면 웹 프로세스 하나에서 풀 프로세스를 하나만 사용하는 한계가 그대로 드러납니다.
+"""
+import argparse
+import os
+import signal
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+
+import common
+from common import latency_summary, load_corpus
+
+
+def measure(predict, args, texts, busy_error):
+    samples, busy = [], [0]
+    lock = threading.Lock()
+    counter = iter(range(args.requests))
+
+    def client():
+        while True:
+            with lock:
+                i = next(counter, None)
+            if i is None:
+                return
+            start = time.perf_counter()
+            try:
+                predict(texts[i % len(texts)])
+            except busy_error:
+                with lock:
+                    busy[0] += 1
+                continue
+            ms = (time.perf_counter() - start) * 1000
+            with lock:
+                samples.append(ms)
+
+    workers = [threading.Thread(target=client) for _ in range(args.clients)]
+    start = time.perf_counter()
+    for t in workers:
+        t.start()
+    for t in workers:
+        t.join()
+    elapsed = time.perf_counter() - start
+
+    result = latency_summary(samples)
+    result.update({"throughput": round(len(samples) / elapsed, 1), "busy": busy[0]})
+    return result
+
+
+
+def run_config(processes, threads, args, texts):
+    from inference import BatchScheduler
+    from inference_pool import InferenceBusyError, RemoteBackend
+
+    address = os.path.join(tempfile.gettempdir(), f"bloom-bench-{os.getpid()}-{processes}x{threads}.sock")
+    server = subprocess.Popen([sys.executable, os.path.join(common.ROOT_DIR, 'inference_pool.py'),
+                               '--processes', str(processes), '--threads', str(threads), '--queue-size', str(args.queue_size),
+                               '--address', address, '--backend', args.backend, '--model', args.model_name, '--model-dir', args.model_dir],
+                              cwd=common.ROOT_DIR, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    try:
+        backend = RemoteBackend(args.model_name, args.model_dir, address=address)
+        backend.predict_proba(texts[:2])  # 연결 + 워밍업
+        for _ in range(processes * 2):
+            backend.predict_proba(texts[:1])
+
+        results = []
+        if args.via == 'direct':
+            results.append(dict(measure(lambda text: backend.predict_proba([text]), args, texts, InferenceBusyError), config=f"{processes}x{threads}"))
+        else:
+            for concurrency in args.concurrency:
+                concurrency = concurrency or processes
+                scheduler = BatchScheduler(lambda batch: list(backend.predict_proba(batch)), max_batch_size=args.max_batch_size,
+                                           max_wait_ms=args.max_batch_wait_ms, concurrency=concurrency)
+                results.append(dict(measure(scheduler.predict, args, texts, InferenceBusyError), config=f"{processes}x{threads} c{concurrency}"))
+        return results
+    finally:
+        server.send_signal(signal.SIGINT)
+        try:
+            server.wait(10)
+        except subprocess.TimeoutExpired:
+            server.kill()
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--model-name', default="beomi/kcbert-base")
+    parser.add_argument('--model-dir', default="model_artifacts")
+    parser.add_argument('--backend', default="torch", help="풀 워커가 사용할 백엔드 (torch / int8 / onnx)")
+    parser.add_argument('--configs', default="1x1,1x2,2x1,2x2,4x1", help="프로세스x스레드 목록")
+    parser.add_argument('--clients', type=int, default=8, help="동시 요청 스레드 수")
+    parser.add_argument('--requests', type=int, default=200, help="설정별 총 요청 수")
+    parser.add_argument('--queue-size', type=int, default=64)
+    parser.add_argument('--via', choices=['direct', 'scheduler'], default='direct', help="RemoteBackend 직접 호출 / BatchScheduler 경유 (웹 서버 경로)")
+    parser.add_argument('--concurrency', type=int, nargs='+', default=[1, 0], help="scheduler 모드의 동시 배치 수 목록 (0은 풀 프로세스 수)")
+    parser.add_argument('--max-batch-size', type=int, default=16)
+    parser.add_argument('--max-batch-wait-ms', type=float, default=10.0)
+    args = parser.parse_args()
+
+    texts = load_corpus()
+    print(f"CPU 코어 {os.cpu_count()}개, 동시 클라이언트 {args.clients}개, 설정별 요청 {args.requests}개")
+    print(f"{'config':<12}{'texts/s':>9}{'p50':>9}{'p95':>9}{'p99':>9}{'busy':>6}  (ms)")
+    best = None
+    for config in args.configs.split(','):
+        processes, threads = (int(v) for v in config.strip().split('x'))
+        try:
+            results = run_config(processes, threads, args, texts)
+        except Exception as e:
+            print(f"{config:<12} 실패: {e}")
+            continue
+        for r in results:
+            # 처리량이 5% 이상 늘지 않으면서 p99가 커지면 knee로 표시
+            knee = best is not None and r['throughput'] < best['throughput'] * 1.05 and r['p99_ms'] > best['p99_ms']
+            print(f"{r['config']:<12}{r['throughput']:>9}{r['p50_ms']:>9}{r['p95_ms']:>9}{r['p99_ms']:>9}{r['busy']:>6}"
+                  + ("  ← knee (처리량 정체, 꼬리 지연 증가)" if knee else ""))
+            if best is None or r['throughput'] > best['throughput']:
+                best = r
+    if best:
+        print(f"가장 높은 처리량: {best['config']} ({best['throughput']} texts/s)")
+
+
+if __name__ == '__main__':
+    main()
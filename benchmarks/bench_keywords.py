@@ -0,0 +1,110 @@
+"""
+키워드 매처 검증 및 마이크로 벤치마크
+
+  python benchmarks/bench_keywords.py
+
+1) 기존 analyze_text_emotion의 키워드 반복문(legacy_keyword_emotion)과
+   사전 컴파일된 KeywordMatcher의 결과가 코퍼스 전체에서 같은지 확인합니다.
+2) 긴 일기 텍스트에서 두 방식의 처리 시간을 비교합니다.
+"""
+import sys
+import random
+import timeit
+
+import common
+from keywords import POSITIVE_KEYWORDS, NEGATIVE_KEYWORDS, keyword_matcher
+
+
+# 기존 app.py의 키워드 확인 로직 (비교 기준용으로 그대로 보존)
+def legacy_keyword_emotion(text):
+    text_lower = text.lower()
+
+    for keyword in POSITIVE_KEYWORDS:
+        if keyword == text_lower:
+            return 'Positive'
+        if len(keyword) <= 2:
+            if f" {keyword} " in f" {text_lower} " or text_lower.startswith(keyword + " ") or text_lower.endswith(" " + keyword):
+                is_negated = False
+                if keyword == "좋다":
+                    if "안 좋다" in text_lower or "않 좋다" in text_lower or "별로 좋다" in text_lower:
+                        is_negated = True
+                if not is_negated:
+                    return 'Positive'
+        elif keyword in text_lower:
+            is_negated = False
+            if keyword == "좋았":
+                if "안 좋았" in text_lower or "않 좋았" in text_lower:
+                    is_negated = True
+            if not is_negated:
+                return 'Positive'
+
+    for keyword in NEGATIVE_KEYWORDS:
+        if keyword == text_lower:
+            return 'Negative'
+        if keyword != "안 좋다" and (f" {keyword} " in f" {text_lower} " or text_lower.startswith(keyword + " ") or text_lower.endswith(" " + keyword)):
+            return 'Negative'
+        if keyword == "안 좋다" and keyword in text_lower:
+            return 'Negative'
+
+    return None
+
+
+# --- 검증용 코퍼스 ---
+PARITY_CORPUS = [
+    "", " ", "행복", "행복해", "오늘은 행복", "행복 했다", "정말 행복 ", " 행복",
+    "좋다", "안 좋다", "않 좋다", "별로 좋다", "별로", "별로 좋다 좋다", "안 좋다 좋다", "좋다 안 좋다",
+    "좋았", "안 좋았", "않 좋았", "오늘 좋았", "좋았다",
+    "재미있", "재미있었다", "너무재미있어", "재미있 어", "안좋", "안좋아", "기분 안좋",
+    "무기력", "무기력해", "너무 무기력", "피곤", "피곤 행복", "행복 피곤", "피곤\t행복",
+    "최고 최악", "최악 최고", "그냥 그래", "HAPPY 행복", "행복\n", "\n행복", "행복  ",
+    "오늘 회사에서 일했다", "기대 반 걱정 반", "걱정", "걱정이 많다", "불안 불안",
+    "안 좋다고 생각했는데 재미있었다", "별로 좋다 별로", "별로좋다", "안  좋다",
+]
+
+
+def _random_corpus(n, seed=0):
+    rng = random.Random(seed)
+    pieces = POSITIVE_KEYWORDS + NEGATIVE_KEYWORDS + [
+        "안", "않", "별로", "좋", "다", "았", "오늘", "그냥", "회사", " ", " ", " ", "\t", "!", "요", "었다",
+    ]
+    corpus = []
+    for _ in range(n):
+        parts = [rng.choice(pieces) for _ in range(rng.randint(1, 8))]
+        joiner = rng.choice(["", " ", " "])
+        corpus.append(joiner.join(parts))
+    return corpus
+
+
+FILLER = "오늘은 회사에서 하루 종일 회의를 했고 점심으로 김치찌개를 먹었다 저녁에는 집에 와서 빨래를 했다 "
+
+
+def _long_entries():
+    return {
+        "no_keyword (2k chars)": (FILLER * 40)[:2000],
+        "keyword_at_end (2k chars)": (FILLER * 40)[:2000] + " 피곤",
+        "no_keyword (10k chars)": (FILLER * 200)[:10000],
+    }
+
+
+def check_parity():
+    corpus = PARITY_CORPUS + _random_corpus(20000) + list(_long_entries().values())
+    mismatches = [(t, legacy_keyword_emotion(t), keyword_matcher.match(t))
+                  for t in corpus if legacy_keyword_emotion(t) != keyword_matcher.match(t)]
+    print(f"검증 코퍼스 {len(corpus)}건, 불일치 {len(mismatches)}건")
+    for text, legacy, new in mismatches[:20]:
+        print(f"  {text!r}: legacy={legacy}, matcher={new}")
+    return not mismatches
+
+
+def run_benchmark(number=200):
+    print(f"\n{'입력':<28}{'legacy (us)':>14}{'matcher (us)':>14}{'speedup':>10}")
+    for name, text in _long_entries().items():
+        legacy = timeit.timeit(lambda: legacy_keyword_emotion(text), number=number) / number * 1e6
+        new = timeit.timeit(lambda: keyword_matcher.match(text), number=number) / number * 1e6
+        print(f"{name:<28}{legacy:>14.1f}{new:>14.1f}{legacy / new:>9.1f}x")
+
+
+if __name__ == '__main__':
+    ok = check_parity()
+    run_benchmark()
+    sys.exit(0 if ok else 1)
@@ -0,0 +1,74 @@
+"""
+입력 길이별 감성 분석 지연 시간 (기존 512 토큰 한 번 처리 vs 길이 인식 모드)
+
+  python benchmarks/bench_length.py [--backend torch] [--model-dir model_artifacts] [--repeat 10]
+
+합성 한국어 일기 텍스트를 길이별로 만들어 p50 / p95 / p99 지연 시간을 출력합니다.
+"""
+import argparse
+import random
+
+import common
+from common import latency_summary, timed_ms
+
+SENTENCES = [
+    "오늘은 아침 일찍 일어나서 산책을 했다", "회사에서 회의가 길어져 점심을 늦게 먹었다",
+    "저녁에는 친구와 통화를 하며 이런저런 이야기를 나눴다", "비가 와서 하루 종일 창밖을 바라봤다",
+    "읽던 책을 마저 읽고 잠자리에 들었다", "버스가 늦게 와서 한참을 기다렸다",
+    "주말에 무엇을 할지 계획을 세워 보았다", "오랜만에 방 정리를 하고 빨래를 했다",
+]
+
+
+def synthetic_text(target_chars, rng):
+    parts = []
+    while sum(len(p) + 1 for p in parts) < target_chars:
+        parts.append(rng.choice(SENTENCES))
+    return " ".join(parts)[:target_chars]
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--backend', default='torch')
+    parser.add_argument('--model-name', default="beomi/kcbert-base")
+    parser.add_argument('--model-dir', default="model_artifacts")
+    parser.add_argument('--repeat', type=int, default=10)
+    parser.add_argument('--window-tokens', type=int, default=256)
+    parser.add_argument('--overlap', type=int, default=32)
+    parser.add_argument('--token-budget', type=int, default=1024)
+    args = parser.parse_args()
+
+    from inference import load_backend, predict_proba_length_aware
+    backend = load_backend(args.backend, args.model_name, args.model_dir)
+    rng = random.Random(0)
+
+    modes = {
+        "기존(512 truncation)": lambda text: backend.predict_proba([text]),
+        "길이 인식": lambda text: predict_proba_length_aware(backend, [text], window_tokens=args.window_tokens,
+                                                         overlap=args.overlap, token_budget=args.token_budget),
+    }
+    print(f"{'글자 수':>8}{'토큰 수':>8}  {'모드':<22}{'p50':>9}{'p95':>9}{'p99':>9}  (ms)")
+    for chars in (50, 200, 500, 1000, 2000, 4000):
+        texts = [synthetic_text(chars, rng) for _ in range(args.repeat)]
+        tokens = sum(len(ids) for ids in backend.encode(texts)) // len(texts)
+        for name, fn in modes.items():
+            fn(texts[0])  # 워밍업
+            samples = [timed_ms(fn, text)[0] for text in texts]
+            r = latency_summary(samples)
+            print(f"{chars:>8}{tokens:>8}  {name:<22}{r['p50_ms']:>9}{r['p95_ms']:>9}{r['p99_ms']:>9}")
+
+    # 짧은 글과 긴 글이 한 배치에 섞인 경우 (배치 스케줄러에서 흔한 상황)
+    batch_modes = {
+        "기존(512 truncation)": lambda batch: backend.predict_proba(batch),
+        "길이 인식": lambda batch: predict_proba_length_aware(backend, batch, window_tokens=args.window_tokens,
+                                                          overlap=args.overlap, token_budget=args.token_budget),
+    }
+    batches = [[synthetic_text(50, rng)] * 7 + [synthetic_text(2000, rng)] for _ in range(args.repeat)]
+    print("\n혼합 배치 (50자 7개 + 2000자 1개)")
+    for name, fn in batch_modes.items():
+        fn(batches[0])
+        r = latency_summary([timed_ms(fn, batch)[0] for batch in batches])
+        print(f"{'':>16}  {name:<22}{r['p50_ms']:>9}{r['p95_ms']:>9}{r['p99_ms']:>9}")
+
+
+if __name__ == '__main__':
+    main()
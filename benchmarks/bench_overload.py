@@ -0,0 +1,156 @@
+"""
+과부하 부하 테스트: 평소 처리량의 N배(기본 5배) 요청이 몰릴 때 /analyze 지연 시간 비교
+
+  python benchmarks/bench_overload.py [--multiplier 5] [--duration 10] [--sentences 3] [--model-dir model_artifacts]
+
+1. 동시 클라이언트 8개로 /analyze 처리량(nominal, req/s)을 측정합니다.
+2. 그 N배 속도로 요청을 일정 간격으로 보내며(open loop) 과부하 제어 설정별로 p50/p95/p99를 비교합니다.
+   지연 시간은 예정된 전송 시각부터 측정하므로 서버가 밀려 늦게 보낸 요청의 대기 시간도 포함됩니다.
+설정마다 별도 프로세스와 임시 DB 파일을 사용하며, 모델을 거치도록 키워드가 없는 문장만 보냅니다.
+작은 테스트 모델로 실행할 때는 --sentences 를 늘려 모델 연산이 병목이 되도록 맞춥니다.
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import common
+from common import latency_summary, load_corpus
+
+MODES = {
+    "제한 없음": {"BLOOM_ADMISSION_MAX_QUEUE": "0", "BLOOM_ADMISSION_DEADLINE_MS": "0"},
+    "degrade (키워드 채점 + 재채점 표시)": {"BLOOM_OVERLOAD_MODE": "degrade"},
+    "reject (503 + Retry-After)": {"BLOOM_OVERLOAD_MODE": "reject"},
+}
+
+
+def setup_app():
+    import app
+    from db import get_connection, release_connection
+    from keywords import keyword_matcher
+
+    if not app.model_loader.wait(300):
+        raise RuntimeError(f"모델을 로드하지 못했습니다: {app.model_loader.error}")
+    conn = get_connection()
+    conn.execute("INSERT INTO users (username, password) VALUES ('bench', 'x')")
+    conn.commit()
+    release_connection(conn)
+    texts = [text for text in load_corpus() if keyword_matcher.match(text) is None]
+    return app, texts
+
+
+def body(texts, i, sentences):
+    # 문장 여러 개를 이어 일기 하나로 만들고, 캐시에 걸리지 않도록 요청마다 번호를 붙임
+    text = ' '.join(texts[(i + j) % len(texts)] for j in range(sentences))
+    return {"username": "bench", "mood": 5, "sleep": 7, "activity": 5, "feeling_text": f"{text} {i}"}
+
+
+def measure_nominal(clients, requests, sentences):
+    app, texts = setup_app()
+    counter = iter(range(requests))
+    lock = threading.Lock()
+
+    def client():
+        local_client = app.app.test_client()
+        while True:
+            with lock:
+                i = next(counter, None)
+            if i is None:
+                return
+            local_client.post('/analyze', json=body(texts, i, sentences))
+
+    workers = [threading.Thread(target=client) for _ in range(clients)]
+    start = time.perf_counter()
+    for w in workers:
+        w.start()
+    for w in workers:
+        w.join()
+    return {"nominal_rps": round(requests / (time.perf_counter() - start), 1)}
+
+
+def run_open_loop(rate, duration, sentences):
+    app, texts = setup_app()
+    total = int(rate * duration)
+    latencies, statuses = [], {}
+    lock = threading.Lock()
+    local = threading.local()
+
+    def send(i, scheduled):
+        if not hasattr(local, 'client'):
+            local.client = app.app.test_client()
+        resp = local.client.post('/analyze', json=body(texts, i, sentences))
+        elapsed = (time.perf_counter() - scheduled) * 1000
+        with lock:
+            latencies.append(elapsed)
+            statuses[resp.status_code] = statuses.get(resp.status_code, 0) + 1
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=256) as executor:
+        for i in range(total):
+            scheduled = start + i / rate
+            delay = scheduled - time.perf_counter()
+            if delay > 0:
+                time.sleep(delay)
+            executor.submit(send, i, scheduled)
+    elapsed = time.perf_counter() - start
+
+    from db import get_connection, release_connection
+    conn = get_connection()
+    flagged = conn.execute("SELECT COUNT(*) FROM records WHERE scoring_version = ?", (app.DEGRADED_SCORING_VERSION,)).fetchone()[0]
+    release_connection(conn)
+    stats = app.admission.stats()
+    return dict(latency_summary(latencies), sent=total, completed_rps=round(total / elapsed, 1),
+                statuses={str(k): v for k, v in sorted(statuses.items())},
+                degraded=stats["degraded"], rejected=stats["rejected"], reasons=stats["reasons"], flagged_for_rescore=flagged)
+
+
+def run_subprocess(args, env_overrides, extra):
+    with tempfile.TemporaryDirectory() as tmp:
+        env = dict(os.environ, BLOOM_DATABASE=os.path.join(tmp, 'bench.db'), BLOOM_MODEL_DIR=args.model_dir, **env_overrides)
+        proc = subprocess.run([sys.executable, __file__] + extra, capture_output=True, text=True, cwd=common.ROOT_DIR, env=env)
+    if proc.returncode != 0:
+        raise RuntimeError(proc.stderr.strip().splitlines()[-1] if proc.stderr.strip() else '알 수 없는 오류')
+    return json.loads(proc.stdout.strip().splitlines()[-1])
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--model-dir', default="model_artifacts")
+    parser.add_argument('--multiplier', type=float, default=5.0, help="평소 처리량의 몇 배로 보낼지")
+    parser.add_argument('--duration', type=float, default=10.0, help="설정별 부하 시간(초)")
+    parser.add_argument('--sentences', type=int, default=3, help="일기 하나에 이어 붙일 문장 수")
+    parser.add_argument('--clients', type=int, default=8, help="평소 처리량 측정 시 동시 클라이언트 수")
+    parser.add_argument('--nominal-requests', type=int, default=200)
+    parser.add_argument('--measure', action='store_true', help="(내부용) 평소 처리량 측정")
+    parser.add_argument('--rate', type=float, help="(내부용) 이 속도(req/s)로 부하 실행")
+    args = parser.parse_args()
+
+    if args.measure:
+        print(json.dumps(measure_nominal(args.clients, args.nominal_requests, args.sentences)))
+        return
+    if args.rate:
+        print(json.dumps(run_open_loop(args.rate, args.duration, args.sentences), ensure_ascii=False))
+        return
+
+    nominal = run_subprocess(args, {}, ['--measure', '--clients', str(args.clients), '--nominal-requests', str(args.nominal_requests),
+                                                     '--sentences', str(args.sentences)])['nominal_rps']
+    rate = nominal * args.multiplier
+    print(f"평소 처리량 {nominal} req/s → {args.multiplier}배인 {rate:.1f} req/s로 {args.duration}초 동안 전송")
+    print(f"{'mode':<36}{'p50':>10}{'p95':>10}{'p99':>10}  (ms)  응답 코드 / 키워드 채점 / 재채점 표시")
+    for name, env_overrides in MODES.items():
+        try:
+            r = run_subprocess(args, env_overrides, ['--rate', str(rate), '--duration', str(args.duration), '--sentences', str(args.sentences)])
+        except RuntimeError as e:
+            print(f"{name:<36} 실패: {e}")
+            continue
+        print(f"{name:<36}{r['p50_ms']:>10}{r['p95_ms']:>10}{r['p99_ms']:>10}        "
+              f"{r['statuses']} / {r['degraded']} / {r['flagged_for_rescore']}  {r['reasons']}")
+
+
+if __name__ == '__main__':
+    main()
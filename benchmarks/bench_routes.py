@@ -0,0 +1,288 @@
+"""
+전체 라우트 부하 테스트 + 주요 함수 마이크로벤치마크 (오프라인, 재현 가능)
+
+  python benchmarks/bench_routes.py [--stub] [--users 50] [--records-per-user 100] [--requests 2000] [--threads 4]
+                                    [--output result.json] [--baseline baseline.json] [--tolerance 0.2]
+
+1. 임시 SQLite DB에 사용자 / 기록 / 피드백을 seed 값으로 만들어 넣습니다.
+2. 미리 정해 둔 비율(ROUTE_MIX)로 /login, /analyze, /feedback, /get_data, /chatbot/start, /chatbot/result 요청 목록을
+   seed로 만들고, Flask test client 스레드 여러 개로 재생합니다. 라우트별 처리량과 p50/p95/p99를 측정합니다.
+3. analyze_text_emotion, calculate_total_score, get_dynamic_challenges 호출당 시간을 측정합니다.
+
+--stub 을 주면 kcbert 대신 결정적 스텁 모델(같은 텍스트 → 같은 결과)을 사용해 네트워크/모델 파일 없이 실행합니다.
+(--stub-ms 로 forward pass 시간을 흉내 낼 수 있음)
+--output 으로 결과를 JSON으로 저장하고, --baseline 으로 저장해 둔 결과와 비교해 p50/p95/p99가
+tolerance 비율 이상 느려진 항목이 있으면 종료 코드 1로 끝납니다.
+"""
+import argparse
+import json
+import os
+import platform
+import random
+import sys
+import tempfile
+import threading
+import time
+
+import common
+from common import latency_summary, load_corpus, timed_ms
+
+# 라우트별 요청 비율 (합계 100)
+ROUTE_MIX = {
+    "/get_data": 35,
+    "/analyze": 20,
+    "/feedback": 15,
+    "/login": 10,
+    "/chatbot/start": 10,
+    "/chatbot/result": 10,
+}
+PASSWORD = "bench-password"
+# 키워드로 바로 감정이 결정되는 문장 (모델을 거치지 않는 경로 측정용)
+KEYWORD_TEXTS = ["오늘 정말 행복 했다", "너무 피곤 하다", "그냥 최고", "회의가 길어서 짜증"]
+
+
+# --- DB 준비 ---
+def seed_database(app, rng, users, records_per_user, feedback_per_user):
+    from datetime import datetime, timedelta
+    from werkzeug.security import generate_password_hash
+    from challenges import CHALLENGES_POOL
+    from challenge_store import unpack_ids
+    from db import get_connection, release_connection
+
+    corpus = load_corpus()
+    all_challenges = [challenge for category in CHALLENGES_POOL.values() for challenge in category]
+    # 비밀번호 해시는 느리므로 한 번만 만들어 모든 사용자에 사용
+    password_hash = generate_password_hash(PASSWORD)
+    start_date = datetime(2024, 1, 1, 9, 0)
+    conn = get_connection()
+    try:
+        conn.execute("BEGIN")
+        conn.executemany("INSERT INTO users (username, password) VALUES (?, ?)",
+                         [(f"bench{u}", password_hash) for u in range(users)])
+        user_ids = [row['id'] for row in conn.execute("SELECT id FROM users WHERE username LIKE 'bench%' ORDER BY id")]
+
+        rows = []
+        for user_id in user_ids:
+            for r in range(records_per_user):
+                mood, sleep, activity = rng.randint(0, 10), rng.randint(3, 10), rng.randint(0, 10)
+                text_emotion = rng.choice(['Negative', 'Neutral', 'Positive'])
+                text = rng.choice(corpus)
+                score, text_emotion, _ = app.calculate_total_score(mood, sleep, activity, text, text_emotion=text_emotion)
+                challenges = [dict(c) for c in rng.sample(all_challenges, 3)]
+                date = (start_date + timedelta(days=r, minutes=rng.randint(0, 600))).strftime("%Y-%m-%d %H:%M")
+                rows.append((user_id, date, round(score, 2), app.classify_emotion_by_combined_score(score), text,
+                             app.challenge_store.pack(challenges), None, mood, sleep, activity, text_emotion, app.SCORING_VERSION))
+        conn.executemany(app.INSERT_RECORD_SQL, rows)
+
+        records_by_user = {}
+        for row in conn.execute("SELECT id, user_id, challenge_ids FROM records ORDER BY id"):
+            challenges = list(app.challenge_store.items_map(unpack_ids(row['challenge_ids'])).values())
+            records_by_user.setdefault(row['user_id'], []).append((row['id'], challenges))
+        feedback = []
+        for user_id in user_ids:
+            for _ in range(min(feedback_per_user, len(records_by_user.get(user_id, [])))):
+                record_id, challenges = rng.choice(records_by_user[user_id])
+                feedback.append((user_id, record_id, rng.choice(challenges)['title'], rng.choice([1, -1]),
+                                 start_date.strftime("%Y-%m-%d %H:%M:%S")))
+        # challenge_scores는 트리거로 함께 갱신됨
+        conn.executemany("INSERT INTO challenge_feedback (user_id, record_id, challenge_title, rating, timestamp) VALUES (?, ?, ?, ?, ?)",
+                         feedback)
+        conn.commit()
+    finally:
+        release_connection(conn)
+    return records_by_user, user_ids, corpus
+
+
+# --- 요청 목록 ---
+# 브라우저 클라이언트처럼 로그인 때 받은 세션 토큰을 Authorization 헤더로 보냄
+# (/login은 절반은 비밀번호 로그인, 절반은 저장된 토큰으로 다시 로그인)
+def build_plan(app, rng, requests, user_ids, records_by_user, corpus):
+    routes = list(ROUTE_MIX)
+    weights = [ROUTE_MIX[r] for r in routes]
+    index_of = {user_id: i for i, user_id in enumerate(user_ids)}
+    plan = []
+    for n in range(requests):
+        route = rng.choices(routes, weights)[0]
+        user_id = rng.choice(user_ids)
+        username = f"bench{index_of[user_id]}"
+        auth = {"Authorization": f"Bearer {app.session_tokens.issue(user_id, username)}"}
+        if route == "/login":
+            if rng.random() < 0.5:
+                plan.append(("POST", route, "/login", {"username": username, "password": PASSWORD}, None))
+            else:
+                plan.append(("POST", route, "/login", {}, auth))
+        elif route == "/analyze":
+            # 일부는 같은 문장(캐시 적중), 나머지는 요청마다 다른 문장
+            text = rng.choice(corpus) if rng.random() < 0.3 else f"{rng.choice(corpus)} {n}"
+            plan.append(("POST", route, "/analyze", {"mood": rng.randint(0, 10), "sleep": rng.randint(3, 10),
+                                                     "activity": rng.randint(0, 10), "feeling_text": text}, auth))
+        elif route == "/feedback":
+            record_id, challenges = rng.choice(records_by_user[user_id])
+            plan.append(("POST", route, "/feedback", {"record_id": record_id,
+                                                      "challenge_title": rng.choice(challenges)['title'], "rating": rng.choice([1, -1])}, auth))
+        elif route == "/get_data":
+            query = rng.choice(["", "?limit=30", "?fields=chart", "?fields=summary&limit=100", "?fields=compact&limit=200"])
+            plan.append(("GET", route, f"/get_data{query}", None, auth))
+        elif route == "/chatbot/start":
+            plan.append(("GET", route, "/chatbot/start", None, None))
+        else:
+            plan.append(("POST", route, "/chatbot/result", {"answers": [rng.randint(0, 3) for _ in range(9)]}, None))
+    return plan
+
+
+def replay(app, plan, threads):
+    latencies = {route: [] for route in ROUTE_MIX}
+    errors = {route: 0 for route in ROUTE_MIX}
+    lock = threading.Lock()
+    counter = iter(range(len(plan)))
+
+    def worker():
+        client = app.app.test_client()
+        while True:
+            with lock:
+                i = next(counter, None)
+            if i is None:
+                return
+            method, route, url, body, headers = plan[i]
+            start = time.perf_counter()
+            resp = client.get(url, headers=headers) if method == "GET" else client.post(url, json=body, headers=headers)
+            elapsed = (time.perf_counter() - start) * 1000
+            with lock:
+                latencies[route].append(elapsed)
+                if resp.status_code >= 400:
+                    errors[route] += 1
+
+    workers = [threading.Thread(target=worker) for _ in range(threads)]
+    start = time.perf_counter()
+    for w in workers:
+        w.start()
+    for w in workers:
+        w.join()
+    total_s = time.perf_counter() - start
+    routes = {}
+    for route, samples in latencies.items():
+        routes[route] = dict(latency_summary(samples), errors=errors[route],
+                             rps=round(len(samples) / total_s, 1) if total_s else 0.0)
+    return {"throughput_rps": round(len(plan) / total_s, 1), "routes": routes}
+
+
+# --- 함수 마이크로벤치마크 ---
+def micro_benchmarks(app, rng, corpus, repeat):
+    def measure(fn, make_args):
+        samples = []
+        for i in range(repeat):
+            args = make_args(i)
+            ms, _ = timed_ms(fn, *args)
+            samples.append(ms)
+        return latency_summary(samples)
+
+    model_texts = [text for text in corpus if not app.keyword_matcher.match(text)]
+    app.analyze_text_emotion(model_texts[0])  # 캐시에 넣어 둠
+    inputs = [(rng.randint(0, 10), rng.randint(3, 10), rng.randint(0, 10), rng.choice(corpus)) for _ in range(repeat)]
+    return {
+        "analyze_text_emotion[keyword]": measure(app.analyze_text_emotion, lambda i: (KEYWORD_TEXTS[i % len(KEYWORD_TEXTS)],)),
+        "analyze_text_emotion[cached]": measure(app.analyze_text_emotion, lambda i: (model_texts[0],)),
+        "analyze_text_emotion[model]": measure(app.analyze_text_emotion, lambda i: (f"{model_texts[i % len(model_texts)]} micro{i}",)),
+        "calculate_total_score": measure(app.calculate_total_score, lambda i: inputs[i] + ('Neutral',)),
+        "get_dynamic_challenges": measure(app.get_dynamic_challenges, lambda i: inputs[i]),
+    }
+
+
+# --- 기준 결과와 비교 ---
+# 비율이 tolerance를 넘고, 차이가 잡음 수준(min_delta_ms)보다 클 때만 느려진 것으로 판단
+def compare(result, baseline, tolerance, route_min_delta_ms, micro_min_delta_ms):
+    regressions = []
+    pairs = [(f"route {name}", stats, baseline.get("routes", {}).get(name), route_min_delta_ms) for name, stats in result["routes"].items()]
+    pairs += [(f"micro {name}", stats, baseline.get("micro", {}).get(name), micro_min_delta_ms) for name, stats in result["micro"].items()]
+    print(f"\n기준 결과와 비교 (허용 {tolerance:.0%}, 라우트 {route_min_delta_ms}ms / 함수 {micro_min_delta_ms}ms 이하 차이는 무시)")
+    for label, stats, base, min_delta_ms in pairs:
+        if not base:
+            print(f"  {label:<40} 기준 없음")
+            continue
+        cells = []
+        for key in ("p50_ms", "p95_ms", "p99_ms"):
+            ratio = stats[key] / base[key] if base[key] else 1.0
+            cells.append(f"{key[:3]} {ratio:>5.2f}x")
+            if ratio > 1 + tolerance and stats[key] - base[key] > min_delta_ms:
+                regressions.append(f"{label} {key}: {base[key]} → {stats[key]}")
+        print(f"  {label:<40} " + "  ".join(cells))
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--stub', action='store_true', help="kcbert 대신 결정적 스텁 모델 사용")
+    parser.add_argument('--stub-ms', type=float, default=0.0, help="스텁 모델 forward pass 한 번에 걸리는 시간(ms)")
+    parser.add_argument('--model-dir', default=os.environ.get('BLOOM_MODEL_DIR', 'model_artifacts'))
+    parser.add_argument('--users', type=int, default=50)
+    parser.add_argument('--records-per-user', type=int, default=100)
+    parser.add_argument('--feedback-per-user', type=int, default=20)
+    parser.add_argument('--requests', type=int, default=2000)
+    parser.add_argument('--threads', type=int, default=4)
+    parser.add_argument('--micro-repeat', type=int, default=500)
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--output', help="결과 JSON 저장 경로")
+    parser.add_argument('--baseline', help="비교할 기준 결과 JSON")
+    parser.add_argument('--tolerance', type=float, default=0.2, help="기준 대비 허용하는 지연 증가 비율")
+    parser.add_argument('--route-min-delta-ms', type=float, default=5.0, help="라우트 지연 차이가 이 값 이하면 잡음으로 보고 무시")
+    parser.add_argument('--micro-min-delta-ms', type=float, default=0.02, help="함수 호출 시간 차이가 이 값 이하면 잡음으로 보고 무시")
+    args = parser.parse_args()
+
+    tmp = tempfile.TemporaryDirectory()
+    # app 임포트 전에 설정해야 하는 값들 (임시 DB, 모델, 추천 seed)
+    os.environ['BLOOM_DATABASE'] = os.path.join(tmp.name, 'bench.db')
+    os.environ['BLOOM_MODEL_DIR'] = args.model_dir
+    os.environ['BLOOM_CHALLENGE_SEED'] = str(args.seed)
+    os.environ.pop('BLOOM_SENTIMENT_CACHE_DB', None)
+    if args.stub:
+        common.install_stub_backend(args.stub_ms)
+        os.environ['BLOOM_INFERENCE_BACKEND'] = 'stub'
+        os.environ['BLOOM_CHALLENGE_EMBEDDINGS'] = os.path.join(tmp.name, 'none.npz')
+
+    import app
+    if not app.model_loader.wait(300):
+        print(f"모델을 로드하지 못했습니다: {app.model_loader.error}")
+        sys.exit(1)
+
+    rng = random.Random(args.seed)
+    start = time.perf_counter()
+    records_by_user, user_ids, corpus = seed_database(app, rng, args.users, args.records_per_user, args.feedback_per_user)
+    seed_s = time.perf_counter() - start
+    plan = build_plan(app, rng, args.requests, user_ids, records_by_user, corpus)
+    print(f"DB 준비: 사용자 {args.users}명, 기록 {args.users * args.records_per_user}개 ({seed_s:.1f}초) / "
+          f"요청 {args.requests}개, 스레드 {args.threads}개, 모델 {'stub' if args.stub else app.INFERENCE_BACKEND}")
+
+    result = replay(app, plan, args.threads)
+    result["micro"] = micro_benchmarks(app, rng, corpus, args.micro_repeat)
+    result["meta"] = {
+        "stub": args.stub, "stub_ms": args.stub_ms, "backend": app.INFERENCE_BACKEND, "users": args.users,
+        "records_per_user": args.records_per_user, "feedback_per_user": args.feedback_per_user, "requests": args.requests,
+        "threads": args.threads, "seed": args.seed, "python": platform.python_version(), "cpus": os.cpu_count(),
+    }
+
+    print(f"\n전체 처리량 {result['throughput_rps']} req/s")
+    print(f"{'route':<18}{'req/s':>8}{'p50':>10}{'p95':>10}{'p99':>10}{'errors':>8}  (ms)")
+    for route, s in result["routes"].items():
+        print(f"{route:<18}{s['rps']:>8}{s['p50_ms']:>10}{s['p95_ms']:>10}{s['p99_ms']:>10}{s['errors']:>8}")
+    print(f"\n{'function':<34}{'p50':>10}{'p95':>10}{'p99':>10}  (ms)")
+    for name, s in result["micro"].items():
+        print(f"{name:<34}{s['p50_ms']:>10}{s['p95_ms']:>10}{s['p99_ms']:>10}")
+
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump(result, f, ensure_ascii=False, indent=2)
+        print(f"\n결과를 {args.output}에 저장했습니다.")
+    if args.baseline:
+        with open(args.baseline, encoding='utf-8') as f:
+            baseline = json.load(f)
+        regressions = compare(result, baseline, args.tolerance, args.route_min_delta_ms, args.micro_min_delta_ms)
+        if regressions:
+            print("\n느려진 항목:")
+            for line in regressions:
+                print(f"  {line}")
+            sys.exit(1)
+        print("\n기준 대비 느려진 항목이 없습니다.")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,80 @@
+"""
+기록 기간에 따른 차트 데이터 비용: /get_data(전체 기록) vs /trends(일별 집계 + LTTB)
+
+  python benchmarks/bench_trends.py [--years 1 3 10] [--per-day 3] [--points 200] [--repeat 20]
+
+기간마다 임시 DB에 사용자 한 명의 기록을 하루 per-day개씩 넣고(트리거로 일별 집계도 함께 갱신),
+두 라우트의 응답 시간(p50/p95)과 응답 크기, 차트에 그릴 점 수를 비교합니다.
+"""
+import argparse
+import os
+import random
+import sys
+import tempfile
+from datetime import datetime, timedelta
+
+import common
+from common import latency_summary, timed_ms
+
+
+def seed(app, years, per_day, rng):
+    from db import get_connection, release_connection
+    conn = get_connection()
+    try:
+        user_id = conn.execute("INSERT INTO users (username, password) VALUES ('bench', 'x')").lastrowid
+        start = datetime(2024, 1, 1) - timedelta(days=365 * years)
+        rows = []
+        for day in range(365 * years):
+            for k in range(per_day):
+                date = (start + timedelta(days=day, hours=8 + k * 4)).strftime("%Y-%m-%d %H:%M")
+                score = round(rng.uniform(0, 10), 2)
+                rows.append((user_id, date, score, "보통", "", "", None, 5, 7, 5, "중립", app.SCORING_VERSION))
+        conn.executemany(app.INSERT_RECORD_SQL, rows)
+        conn.commit()
+    finally:
+        release_connection(conn)
+    return len(rows)
+
+
+def measure(client, url, repeat):
+    samples, size = [], 0
+    for _ in range(repeat):
+        elapsed, resp = timed_ms(client.get, url)
+        samples.append(elapsed)
+        size = len(resp.data)
+    return latency_summary(samples), size, resp.get_json()
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--years', type=int, nargs='+', default=[1, 3, 10])
+    parser.add_argument('--per-day', type=int, default=3)
+    parser.add_argument('--points', type=int, default=200)
+    parser.add_argument('--repeat', type=int, default=20)
+    args = parser.parse_args()
+
+    tmp = tempfile.TemporaryDirectory()
+    os.environ['BLOOM_DATABASE'] = os.path.join(tmp.name, 'bench.db')
+    os.environ.setdefault('BLOOM_MODEL_DIR', os.path.join(tmp.name, 'none'))
+    import app
+    import db
+
+    rng = random.Random(0)
+    client = app.app.test_client()
+    print(f"{'기간':<8}{'기록 수':>8}  {'route':<22}{'p50':>9}{'p95':>9}  (ms){'응답 크기':>12}{'차트 점 수':>10}")
+    for years in args.years:
+        db.set_database(os.path.join(tmp.name, f'bench-{years}.db'))
+        db.migrate()
+        count = seed(app, years, args.per_day, rng)
+        for name, url in [("/get_data?fields=chart", "/get_data?username=bench&fields=chart"),
+                          (f"/trends?points={args.points}", f"/trends?username=bench&points={args.points}")]:
+            summary, size, body = measure(client, url, args.repeat)
+            points = len(body.get('data') or body.get('series') or [])
+            print(f"{str(years) + '년':<8}{count:>8}  {name:<22}{summary['p50_ms']:>9}{summary['p95_ms']:>9}      {size / 1024:>9.1f}KB{points:>10}")
+    db.pool.close_all()
+    tmp.cleanup()
+    sys.exit(0)
+
+
+if __name__ == '__main__':
+    main()
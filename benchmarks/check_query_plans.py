@@ -0,0 +1,81 @@
+"""
+주요 조회 쿼리의 실행 계획(EXPLAIN QUERY PLAN) 확인
+
+  python benchmarks/check_query_plans.py
+
+임시 DB에 마이그레이션을 적용한 뒤 각 쿼리가 기대한 인덱스를 사용하는지 확인합니다.
+전체 테이블 스캔(SCAN <table>)이나 임시 정렬(USE TEMP B-TREE)이 보이면 실패로 종료합니다.
+"""
+import os
+import sys
+import tempfile
+
+import common
+import db
+
+# (설명, 쿼리, 파라미터, 사용해야 하는 인덱스)
+QUERIES = [
+    ("/get_data 기록 조회",
+     "SELECT id, date, score, status, text, challenge_ids, recommended_challenges_json, feedback_json, feedback_given_json "
+     "FROM records WHERE user_id = ? ORDER BY date ASC",
+     (1,), "idx_records_user_date"),
+    ("/get_data 커서 페이지",
+     "SELECT id, date, score FROM records WHERE user_id = ? AND (date, id) > (?, ?) ORDER BY date ASC, id ASC LIMIT ?",
+     (1, "2024-01-01 00:00", 10, 201), "idx_records_user_date (user_id=? AND date>?)"),
+    ("챌린지 피드백 집계",
+     "SELECT challenge_title, SUM(CASE rating WHEN 1 THEN 1 WHEN -1 THEN -1 ELSE 0 END) as score FROM challenge_feedback GROUP BY challenge_title",
+     (), "idx_challenge_feedback_title_rating"),
+    ("채점 대기 중인 기록 (비동기 분석 재개)",
+     "SELECT id FROM records WHERE status = ? ORDER BY id",
+     (db.PENDING_STATUS,), "idx_records_pending"),
+    ("예전 형식 기록 변환 (챌린지 ID로 옮기기)",
+     "SELECT id, recommended_challenges_json, feedback_given_json FROM records WHERE challenge_ids IS NULL AND id > ? ORDER BY id LIMIT ?",
+     (0, 500), "idx_records_legacy_challenges"),
+    ("/trends 일별 추이",
+     "SELECT day, record_count, score_sum, score_sq_sum, score_min, score_max "
+     "FROM daily_scores WHERE user_id = ? AND day >= ? AND day <= ? ORDER BY day",
+     (1, "0000-01-01", "9999-12-31"), "PRIMARY KEY"),
+    ("일별 집계 다시 계산 (기록 수정/삭제 트리거)",
+     "SELECT COUNT(*), SUM(score), MIN(score), MAX(score) FROM records "
+     "WHERE user_id = ? AND date >= ? AND date < date(?, '+1 day') AND status != ? HAVING COUNT(*) > 0",
+     (1, "2024-01-01", "2024-01-01 10:00", db.PENDING_STATUS), "idx_records_user_date (user_id=? AND date>? AND date<?)"),
+]
+
+
+def query_plan(conn, sql, params):
+    return [row['detail'] for row in conn.execute("EXPLAIN QUERY PLAN " + sql, params)]
+
+
+def plan_uses_index(plan, index):
+    """기대한 인덱스를 사용하고 전체 테이블 스캔이나 임시 정렬이 없으면 True (tests/test_migrations.py에서도 사용)"""
+    bad = [d for d in plan if (d.startswith('SCAN ') and 'INDEX' not in d) or 'TEMP B-TREE' in d]
+    return any(index in detail for detail in plan) and not bad
+
+
+def check(conn):
+    ok = True
+    for name, sql, params, index in QUERIES:
+        plan = query_plan(conn, sql, params)
+        passed = plan_uses_index(plan, index)
+        ok = ok and passed
+        print(f"[{'OK' if passed else '실패'}] {name} (기대 인덱스: {index})")
+        for detail in plan:
+            print(f"       {detail}")
+    return ok
+
+
+def main():
+    with tempfile.TemporaryDirectory() as tmp:
+        db.set_database(os.path.join(tmp, 'plans.db'))
+        db.migrate()
+        conn = db.get_connection()
+        try:
+            ok = check(conn)
+        finally:
+            db.release_connection(conn)
+            db.pool.close_all()
+    sys.exit(0 if ok else 1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,97 @@
+"""벤치마크 스크립트에서 공통으로 쓰는 함수 모음"""
+import os
+import sys
+import time
+
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+FIXTURES_DIR = os.path.join(ROOT_DIR, 'benchmarks', 'fixtures')
+
+if ROOT_DIR not in sys.path:
+    sys.path.insert(0, ROOT_DIR)
+
+
+def percentile(values, p):
+    """정렬 후 선형 보간으로 p(0~100) 백분위 값을 계산합니다."""
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    k = (len(ordered) - 1) * p / 100
+    lo, hi = int(k), min(int(k) + 1, len(ordered) - 1)
+    return ordered[lo] + (ordered[hi] - ordered[lo]) * (k - lo)
+
+
+def latency_summary(samples_ms):
+    return {
+        "count": len(samples_ms),
+        "p50_ms": round(percentile(samples_ms, 50), 3),
+        "p95_ms": round(percentile(samples_ms, 95), 3),
+        "p99_ms": round(percentile(samples_ms, 99), 3),
+    }
+
+
+def timed_ms(fn, *args, **kwargs):
+    start = time.perf_counter()
+    result = fn(*args, **kwargs)
+    return (time.perf_counter() - start) * 1000, result
+
+
+def rss_mb():
+    """현재 프로세스의 RSS(MB). /proc 가 없으면 최대 RSS로 대신합니다."""
+    try:
+        with open('/proc/self/status') as f:
+            for line in f:
+                if line.startswith('VmRSS:'):
+                    return int(line.split()[1]) / 1024
+    except OSError:
+        pass
+    import resource
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+def load_corpus(name='sentiment_corpus.txt'):
+    with open(os.path.join(FIXTURES_DIR, name), encoding='utf-8') as f:
+        return [line.strip() for line in f if line.strip()]
+
+
+# --- 결정적 스텁 모델 ---
+# kcbert 없이(오프라인) 벤치마크를 돌릴 때 사용합니다. 같은 텍스트에는 항상 같은 확률/임베딩을 돌려주며,
+# delay_ms를 주면 forward pass 한 번마다 그만큼 기다려 모델 연산 시간을 흉내 냅니다.
+# app을 임포트하기 전에 install_stub_backend()를 호출하고 BLOOM_INFERENCE_BACKEND=stub 으로 설정합니다.
+def install_stub_backend(delay_ms=0.0, dim=32):
+    import hashlib
+    import numpy as np
+    import inference
+
+    def vector(text, size):
+        seed = int.from_bytes(hashlib.sha256(text.encode('utf-8')).digest()[:8], 'little')
+        return np.random.default_rng(seed).standard_normal(size).astype(np.float32)
+
+    class StubBackend(inference.BaseBackend):
+        name = 'stub'
+
+        def __init__(self, model_name, artifacts_dir=None, threads=None):
+            pass
+
+        def _tokenize(self, texts):
+            return {'texts': list(texts)}
+
+        def encode(self, texts):
+            return [[ord(ch) for ch in text] for text in texts]
+
+        def predict_ids(self, id_lists, with_embeddings=False):
+            texts = [''.join(chr(i) for i in ids) for ids in id_lists]
+            return self._forward_embed({'texts': texts}) if with_embeddings else self._forward({'texts': texts})
+
+        def _forward(self, inputs):
+            return self._forward_embed(inputs)[0]
+
+        def _forward_embed(self, inputs):
+            if delay_ms:
+                time.sleep(delay_ms / 1000)
+            texts = inputs['texts']
+            logits = np.stack([vector(text, 3) for text in texts])
+            probs = np.exp(logits) / np.exp(logits).sum(axis=1, keepdims=True)
+            return probs.astype(np.float32), np.stack([vector(text + '#', dim) for text in texts])
+
+    inference.BACKENDS['stub'] = StubBackend
+    return StubBackend
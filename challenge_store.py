@@ -0,0 +1,327 @@
+import json
+import os
+import threading
+import time
+import uuid
+
+from db import get_connection, open_connection, release_connection
+
+
+# --- 챌린지 카탈로그 테이블 / 메모리 캐시 ---
+# 챌린지 내용(제목, 링크, 타입 등)은 challenges 테이블에 한 번만 저장하고, 기록에는 정수 ID만 남깁니다.
+#  - records.challenge_ids: 추천된 챌린지 ID를 쉼표로 이은 문자열 (예: "3,17,42")
+#  - records.feedback_json: 챌린지 ID → 평가 (예: {"17":1}), /feedback이 json_patch로 병합
+# 응답을 만들 때는 프로세스마다 들고 있는 캐시(ID → 챌린지)로 다시 채웁니다.
+# 카탈로그 행은 바뀌지 않고 ID는 늘어나기만 하므로(AUTOINCREMENT), 모르는 ID가 보이면
+# (다른 워커가 등록한 챌린지) 마지막으로 읽은 ID 이후의 행만 읽어 캐시에 더합니다.
+# challenge_ids가 NULL인 예전 기록은 recommended_challenges_json / feedback_given_json을 그대로 읽고,
+# CompactionJob이 조금씩 새 형식으로 옮깁니다.
+INSERT_CHALLENGE_SQL = "INSERT OR IGNORE INTO challenges (title, item_json) VALUES (?, ?)"
+LOAD_CHALLENGES_SQL = "SELECT id, item_json FROM challenges WHERE id > ? ORDER BY id"
+
+
+def pack_ids(ids):
+    return ','.join(str(i) for i in ids)
+
+
+def unpack_ids(text):
+    return [int(i) for i in text.split(',')] if text else []
+
+
+def _loads(text, default):
+    # 예전 기록의 JSON 컬럼은 비어 있거나 형식이 다를 수 있음
+    try:
+        value = json.loads(text) if text else default
+    except ValueError:
+        return default
+    return value if isinstance(value, type(default)) else default
+
+
+# challenges.py 카탈로그의 내부 ID(제목 해시)는 저장하지 않음 — 응답과 DB에는 challenges 테이블의 정수 ID만 사용
+def _without_catalog_id(item):
+    return {key: value for key, value in item.items() if key != 'id'}
+
+
+class ChallengeStore:
+    def __init__(self):
+        self.items_by_id = {}
+        self.json_by_id = {}  # 저장된 item_json 그대로 (예전 recommended_challenges_json 형식으로 이어 붙임)
+        self.id_by_title = {}
+        self.max_id = 0
+        self._lock = threading.Lock()
+
+    def _load(self, conn):
+        rows = conn.execute(LOAD_CHALLENGES_SQL, (self.max_id,)).fetchall()
+        for challenge_id, item_json in rows:
+            item = json.loads(item_json)
+            if 'id' in item:
+                # 카탈로그 내부 ID까지 저장되어 있던 행
+                item = _without_catalog_id(item)
+                item_json = json.dumps(item, ensure_ascii=False)
+            self.items_by_id[challenge_id] = item
+            self.json_by_id[challenge_id] = item_json
+            self.id_by_title[item['title']] = challenge_id
+            self.max_id = max(self.max_id, challenge_id)
+
+    # 캐시를 바꾸는 작업은 모두 별도 연결로 바로 커밋하므로, 요청 연결이 쓰기 트랜잭션을 잡기 전에 호출합니다.
+    def _update(self, params=()):
+        with self._lock:
+            conn = open_connection()
+            try:
+                if params:
+                    conn.executemany(INSERT_CHALLENGE_SQL, params)
+                    conn.commit()
+                self._load(conn)
+            finally:
+                conn.close()
+
+    def refresh(self):
+        """다른 워커가 등록한 챌린지를 캐시에 더합니다."""
+        self._update()
+
+    def ensure(self, items):
+        """카탈로그에 없는 챌린지를 등록합니다. (같은 제목이 이미 있으면 기존 ID를 그대로 사용)"""
+        params, seen = [], set()
+        for item in items:
+            title = item.get('title') if isinstance(item, dict) else None
+            if isinstance(title, str) and title not in self.id_by_title and title not in seen:
+                seen.add(title)
+                params.append((title, json.dumps(_without_catalog_id(item), ensure_ascii=False)))
+        if params:
+            self._update(params)
+
+    def sync(self, items):
+        """서버 시작 시 코드의 챌린지 목록을 카탈로그에 등록하고 캐시 전체를 읽습니다."""
+        self.ensure(items)
+        self.refresh()
+
+    # --- 챌린지 ↔ ID ---
+    def ids_for(self, items):
+        """챌린지 목록 → ID 목록 (제목으로 찾고, 없으면 등록)"""
+        items = [item for item in items if isinstance(item, dict) and isinstance(item.get('title'), str)]
+        if any(item['title'] not in self.id_by_title for item in items):
+            self.ensure(items)
+        return [self.id_by_title[item['title']] for item in items]
+
+    def pack(self, items):
+        return pack_ids(self.ids_for(items))
+
+    def items_map(self, ids):
+        """ID 목록 → {ID: 챌린지} (복사본, 없는 ID는 빠짐)"""
+        if any(i not in self.items_by_id for i in ids):
+            self.refresh()
+        return {i: dict(self.items_by_id[i]) for i in ids if i in self.items_by_id}
+
+    def items_json(self, ids):
+        if any(i not in self.json_by_id for i in ids):
+            self.refresh()
+        return '[' + ', '.join(self.json_by_id[i] for i in ids if i in self.json_by_id) + ']'
+
+    def title(self, challenge_id):
+        if challenge_id not in self.items_by_id:
+            self.refresh()
+        item = self.items_by_id.get(challenge_id)
+        return item['title'] if item else None
+
+    # --- 기록 행 → 응답 필드 ---
+    # 새 형식(challenge_ids가 NULL이 아님)과 예전 형식 기록 모두 같은 값을 돌려줌
+    def record_challenge_ids(self, row):
+        if row['challenge_ids'] is not None:
+            return unpack_ids(row['challenge_ids'])
+        return self.ids_for(_loads(row['recommended_challenges_json'], []))
+
+    def record_feedback(self, row):
+        """{챌린지 ID: 평가}"""
+        if row['challenge_ids'] is not None:
+            return {int(k): v for k, v in _loads(row['feedback_json'], {}).items()}
+        given = _loads(row['feedback_given_json'], {})
+        ids = self.ids_for([{'title': title} for title in given])
+        return dict(zip(ids, given.values()))
+
+    def record_challenges_json(self, row):
+        """예전 recommended_challenges_json과 같은 문자열"""
+        if row['challenge_ids'] is not None:
+            return self.items_json(unpack_ids(row['challenge_ids']))
+        text = row['recommended_challenges_json'] or '[]'
+        items = _loads(text, []) if '"id"' in text else None
+        if not items:
+            return text
+        # 카탈로그 내부 ID가 함께 저장된 예전 기록 → 옮긴 뒤와 같은 형식으로 빼고 돌려줌
+        return json.dumps([_without_catalog_id(item) if isinstance(item, dict) else item for item in items], ensure_ascii=False)
+
+    def record_feedback_json(self, row):
+        """예전 feedback_given_json과 같은 문자열 (제목 → 평가)"""
+        if row['challenge_ids'] is not None:
+            if not row['feedback_json']:
+                return '{}'
+            feedback = {self.title(int(k)): v for k, v in _loads(row['feedback_json'], {}).items()}
+            return json.dumps({title: v for title, v in feedback.items() if title is not None}, ensure_ascii=False)
+        return row['feedback_given_json'] or '{}'
+
+    # --- 예전 형식 기록 → 새 형식 ---
+    def legacy_items(self, row):
+        """예전 기록에 나오는 챌린지 (추천 목록, 피드백 제목)"""
+        return _loads(row['recommended_challenges_json'], []) + [{'title': title} for title in _loads(row['feedback_given_json'], {})]
+
+    def compact_values(self, row):
+        """(challenge_ids, feedback_json) — 캐시만 사용하며 카탈로그에 없는 제목이 있으면 KeyError"""
+        challenges = [item for item in _loads(row['recommended_challenges_json'], [])
+                      if isinstance(item, dict) and isinstance(item.get('title'), str)]
+        feedback = {str(self.id_by_title[title]): rating for title, rating in _loads(row['feedback_given_json'], {}).items()}
+        return (pack_ids(self.id_by_title[item['title']] for item in challenges),
+                json.dumps(feedback, separators=(',', ':')) if feedback else None)
+
+
+# --- 예전 기록 옮기기 (온라인 마이그레이션) ---
+# challenge_ids가 NULL인 기록을 id 순서(keyset)로 batch_size개씩 새 형식으로 바꾸고 예전 JSON 컬럼을 비웁니다.
+# 배치마다 짧은 쓰기 트랜잭션 하나만 잡으므로 서버가 요청을 처리하는 중에도 실행할 수 있고,
+# 옮기는 도중에도 조회는 두 형식을 모두 읽으므로 응답이 같습니다.
+# 옮긴 기록은 조건에서 빠지므로 중단해도 다시 실행하면 남은 기록부터 진행합니다. (idx_records_legacy_challenges)
+# 워커 프로세스마다 작업을 시작해도 job_leases의 임대를 잡은 한 곳에서만 실행되고, 나머지는 'locked'로 끝납니다.
+# 임대는 배치마다 같은 트랜잭션에서 연장하며, 실행하던 프로세스가 죽으면 LEASE_TTL_S 뒤에 다른 실행이 가져갈 수 있습니다.
+# 옮긴 기록도 trg_records_update_version으로 사용자의 data_version이 올라가므로, 옮기기 전의 ETag로는 304가 나가지 않습니다.
+LEGACY_SELECT_SQL = ("SELECT id, recommended_challenges_json, feedback_given_json FROM records "
+                     "WHERE challenge_ids IS NULL AND id > ? ORDER BY id LIMIT ?")
+COMPACT_UPDATE_SQL = ("UPDATE records SET challenge_ids = ?, feedback_json = ?, recommended_challenges_json = NULL, "
+                      "feedback_given_json = NULL WHERE id = ? AND challenge_ids IS NULL")
+LEASE_NAME = 'compact-challenges'
+LEASE_TTL_S = 60.0
+ACQUIRE_LEASE_SQL = ("INSERT INTO job_leases (name, owner, expires_at) VALUES (?, ?, ?) "
+                     "ON CONFLICT (name) DO UPDATE SET owner = excluded.owner, expires_at = excluded.expires_at "
+                     "WHERE job_leases.owner = excluded.owner OR job_leases.expires_at < ?")
+RENEW_LEASE_SQL = "UPDATE job_leases SET expires_at = ? WHERE name = ? AND owner = ?"
+RELEASE_LEASE_SQL = "DELETE FROM job_leases WHERE name = ? AND owner = ?"
+
+
+class CompactionJob:
+    def __init__(self, store, batch_size=500, pause_s=0.01):
+        self.store = store
+        self.batch_size = max(1, int(batch_size))
+        self.pause_s = max(0.0, float(pause_s))
+        self.state = 'idle'  # idle / running / done / failed / stopped / locked(다른 프로세스가 실행 중)
+        self.error = None
+        self.total = 0
+        self.processed = 0
+        self.last_record_id = 0
+        self.started_at = None
+        self.owner = f"{os.getpid()}:{uuid.uuid4().hex[:8]}"
+        self._thread = None
+        self._stop = threading.Event()
+        self._lock = threading.Lock()
+
+    def start(self):
+        """백그라운드 스레드에서 시작합니다. 이미 실행 중이면 아무것도 하지 않습니다."""
+        with self._lock:
+            if self._thread is not None and self._thread.is_alive():
+                return False
+            self._stop.clear()
+            self.state = 'running'
+            self._thread = threading.Thread(target=self.run, name="bloom-compact-challenges", daemon=True)
+            self._thread.start()
+            return True
+
+    def stop(self):
+        self._stop.set()
+
+    def has_work(self):
+        conn = get_connection()
+        try:
+            return conn.execute("SELECT 1 FROM records WHERE challenge_ids IS NULL LIMIT 1").fetchone() is not None
+        finally:
+            release_connection(conn)
+
+    # --- 임대 (여러 프로세스 중 한 곳에서만 실행) ---
+    def _acquire_lease(self, conn):
+        now = time.time()
+        acquired = conn.execute(ACQUIRE_LEASE_SQL, (LEASE_NAME, self.owner, now + LEASE_TTL_S, now)).rowcount > 0
+        conn.commit()
+        return acquired
+
+    def _release_lease(self, conn):
+        try:
+            conn.rollback()
+            conn.execute(RELEASE_LEASE_SQL, (LEASE_NAME, self.owner))
+            conn.commit()
+        except Exception as e:
+            print(f"챌린지 형식 변환 임대 해제 중 오류 발생: {e}")
+
+    def _compact_batch(self, conn):
+        rows = conn.execute(LEGACY_SELECT_SQL, (self.last_record_id, self.batch_size)).fetchall()
+        if not rows:
+            return 0
+        # 카탈로그에 없는 제목(카탈로그에서 빠진 예전 챌린지 등)은 쓰기 트랜잭션 전에 등록
+        self.store.ensure([item for row in rows for item in self.store.legacy_items(row)])
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            # 읽은 뒤 들어온 피드백까지 옮기도록 쓰기 잠금을 잡고 다시 읽음
+            rows = conn.execute(LEGACY_SELECT_SQL, (self.last_record_id, self.batch_size)).fetchall()
+            conn.executemany(COMPACT_UPDATE_SQL, [self.store.compact_values(row) + (row['id'],) for row in rows])
+            if not conn.execute(RENEW_LEASE_SQL, (time.time() + LEASE_TTL_S, LEASE_NAME, self.owner)).rowcount:
+                # 오래 멈춰 있던 사이 임대가 만료되어 다른 프로세스가 가져감
+                conn.rollback()
+                return None
+            conn.commit()
+        except KeyError:
+            # 그사이 새 제목으로 피드백이 저장됨 → 다음 반복에서 등록 후 다시 시도
+            conn.rollback()
+            return -1
+        except Exception:
+            conn.rollback()
+            raise
+        if rows:
+            self.last_record_id = rows[-1]['id']
+        return len(rows)
+
+    def run(self, on_progress=None):
+        """현재 스레드에서 끝까지 진행합니다. (CLI에서는 직접 호출)"""
+        conn = get_connection()
+        leased = False
+        try:
+            self.error = None
+            self.last_record_id = 0
+            self.processed = 0
+            leased = self._acquire_lease(conn)
+            if not leased:
+                self.state = 'locked'
+                return self.status()
+            self.state = 'running'
+            self.total = conn.execute("SELECT COUNT(*) FROM records WHERE challenge_ids IS NULL").fetchone()[0]
+            self.started_at = time.monotonic()
+            while not self._stop.is_set():
+                count = self._compact_batch(conn)
+                if count is None:
+                    self.state = 'locked'
+                    leased = False
+                    break
+                if count == 0:
+                    self.state = 'done'
+                    break
+                if count > 0:
+                    self.processed += count
+                    if on_progress:
+                        on_progress(self.status())
+                if self.pause_s:
+                    self._stop.wait(self.pause_s)
+            else:
+                self.state = 'stopped'
+        except Exception as e:
+            self.state = 'failed'
+            self.error = str(e)
+            print(f"기록 챌린지 형식 변환 중 오류 발생: {e}")
+        finally:
+            if leased:
+                self._release_lease(conn)
+            release_connection(conn)
+        return self.status()
+
+    def status(self):
+        elapsed = time.monotonic() - self.started_at if self.started_at else 0.0
+        return {
+            "state": self.state,
+            "processed": self.processed,
+            "total": self.total,
+            "remaining": max(0, self.total - self.processed),
+            "last_record_id": self.last_record_id,
+            "rows_per_second": round(self.processed / elapsed, 1) if elapsed > 0 else 0.0,
+            "error": self.error,
+        }
@@ -0,0 +1,360 @@
+import heapq
+import hashlib
+import os
+import random
+import threading
+
+import numpy as np
+
+
+# --- 챌린지 데이터 풀 (링크 안전성 확보 및 대폭 확장) ---
+CHALLENGES_POOL = {
+    'video': [
+        # Low Energy (차분함, 힐링)
+        {'title': '5분 명상: 불안과 스트레스 해소', 'url': 'https://www.youtube.com/results?search_query=5분+명상+불안+해소', 'energy': 'low'},
+        {'title': '지브리 스튜디오 피아노 음악', 'url': 'https://www.youtube.com/results?search_query=지브리+피아노+모음', 'energy': 'low'},
+        {'title': '마음이 편안해지는 자연 소리 (ASMR)', 'url': 'https://www.youtube.com/results?search_query=자연+소리+ASMR', 'energy': 'low'},
+        {'title': '심신 안정을 위한 힐링 주파수', 'url': 'https://www.youtube.com/results?search_query=힐링+주파수', 'energy': 'low'},
+        # Medium Energy (기분 전환, 흥미)
+        {'title': '기분 전환을 위한 웃긴 동물 영상', 'url': 'https://www.youtube.com/results?search_query=웃긴+동물+영상+모음', 'energy': 'medium'},
+        {'title': '활력을 주는 아침 스트레칭 가이드', 'url': 'https://www.youtube.com/results?search_query=아침+활력+스트레칭', 'energy': 'medium'},
+        {'title': '방구석 콘서트: 신나는 팝송 모음', 'url': 'https://www.youtube.com/results?search_query=신나는+팝송+모음', 'energy': 'medium'},
+        {'title': '짧고 굵은 동기부여 영상', 'url': 'https://www.youtube.com/results?search_query=짧은+동기부여+영상', 'energy': 'medium'},
+        # High Energy (에너지 발산, 성장)
+        {'title': 'TED 강연: 변화와 성장의 이야기', 'url': 'https://www.youtube.com/results?search_query=TED+강연+변화+성장', 'energy': 'high'},
+        {'title': '집에서 즐기는 줌바 댄스', 'url': 'https://www.youtube.com/results?search_query=집에서+줌바댄스', 'energy': 'high'},
+        {'title': '고강도 홈트레이닝 (타바타)', 'url': 'https://www.youtube.com/results?search_query=타바타+운동', 'energy': 'high'},
+        {'title': '세상을 바꾸는 시간 15분 (세바시)', 'url': 'https://www.youtube.com/results?search_query=세바시+레전드', 'energy': 'high'},
+    ],
+    'activity': [
+        # Low Energy (정적 활동)
+        {'title': '창문 열고 5번 깊게 숨쉬기', 'url': '#', 'energy': 'low'},
+        {'title': '따뜻한 차나 물 한 잔 마시기', 'url': '#', 'energy': 'low'},
+        {'title': '눈 감고 3분간 아무 생각 안 하기', 'url': '#', 'energy': 'low'},
+        {'title': '반려식물 물 주기 및 잎 닦아주기', 'url': '#', 'energy': 'low'},
+        {'title': '좋아하는 향수나 캔들 향 맡기', 'url': '#', 'energy': 'low'},
+        # Medium Energy (가벼운 활동)
+        {'title': '가벼운 15분 동네 산책하기', 'url': '#', 'energy': 'medium'},
+        {'title': '좋아하는 노래 크게 틀고 따라부르기', 'url': '#', 'energy': 'medium'},
+        {'title': '책상 위나 지갑 정리하기', 'url': '#', 'energy': 'medium'},
+        {'title': '스마트폰 사진첩 정리하며 추억 여행', 'url': '#', 'energy': 'medium'},
+        {'title': '간단한 셀프 마사지 (목, 어깨)', 'url': 'https://www.youtube.com/results?search_query=셀프+목+어깨+마사지', 'energy': 'medium'},
+        # High Energy (동적 활동)
+        {'title': '오랜만에 친구에게 전화 걸어 수다 떨기', 'url': '#', 'energy': 'high'},
+        {'title': '방 전체 청소기 돌리고 환기하기', 'url': '#', 'energy': 'high'},
+        {'title': '플랭크 1분 도전하기', 'url': 'https://www.youtube.com/results?search_query=올바른+플랭크+자세', 'energy': 'high'},
+        {'title': '가까운 공원이나 뒷산 다녀오기', 'url': '#', 'energy': 'high'},
+        {'title': '새로운 요리 레시피 도전해보기', 'url': 'https://www.10000recipe.com/', 'energy': 'high'},
+    ],
+    'creative': [
+        # Low Energy (사색, 기록)
+        {'title': '지금 드는 감정 3단어로 표현해보기', 'url': '#', 'energy': 'low'},
+        {'title': '좋아하는 시 한 편 필사하기', 'url': 'https://search.naver.com/search.naver?query=좋은+시+추천', 'energy': 'low'},
+        {'title': '내일의 할 일 목록(To-Do List) 작성하기', 'url': '#', 'energy': 'low'},
+        {'title': '감사일기: 오늘 고마웠던 것 3가지 쓰기', 'url': '#', 'energy': 'low'},
+        # Medium Energy (표현, 꾸미기)
+        {'title': '컬러링북이나 만다라 색칠하기', 'url': 'https://search.naver.com/search.naver?query=무료+만다라+도안', 'energy': 'medium'},
+        {'title': '스마트폰으로 하늘이나 풍경 사진 찍기', 'url': '#', 'energy': 'medium'},
+        {'title': '나만의 플레이리스트 만들기', 'url': '#', 'energy': 'medium'},
+        {'title': '블로그에 오늘의 일기 남기기', 'url': 'https://section.blog.naver.com/', 'energy': 'medium'},
+        # High Energy (창작, 기획)
+        {'title': '그림 그리기 (드로잉, 수채화 등)', 'url': 'https://www.youtube.com/results?search_query=초보+드로잉+강좌', 'energy': 'high'},
+        {'title': 'DIY 키트나 종이접기 해보기', 'url': 'https://www.youtube.com/results?search_query=종이접기', 'energy': 'high'},
+        {'title': '나중에 가고 싶은 여행 계획 짜보기', 'url': 'https://www.google.com/maps', 'energy': 'high'},
+        {'title': '짧은 소설이나 에세이 써보기', 'url': '#', 'energy': 'high'},
+    ]
+}
+
+
+
+# 일기 내용에 따라 에너지 수준과 상관없이 후보에 추가되는 챌린지 (앞의 규칙부터 확인, 하나만 적용)
+TEXT_CHALLENGES = [
+    (("불안", "걱정"), {'title': '불안감을 다스리는 호흡법 따라하기', 'url': 'https://www.youtube.com/results?search_query=불안+해소+호흡법', 'energy': 'low'}),
+    (("지루", "심심"), {'title': '흥미로운 단편 소설 읽기', 'url': 'https://brunch.co.kr/keyword/%EB%8B%A8%ED%8E%B8%EC%86%8C%EC%84%A4', 'energy': 'medium'}),
+]
+
+DEFAULT_CHALLENGE = {'title': '잠시 눈 감고 휴식하기', 'url': '#', 'type': '활동'}
+FALLBACK_CHALLENGE = {'title': '가벼운 스트레칭 하기', 'url': '#', 'type': '활동'}
+
+WEBSITE_DOMAINS = ('search.naver.com', 'brunch.co.kr', 'pinterest.co.kr', 'goodnewsnetwork.org', '10000recipe.com', 'google.com/maps')
+
+
+# 링크 주소로 챌린지 타입 결정 (카탈로그를 만들 때 한 번만 계산)
+def challenge_type(url):
+    if 'youtube.com' in url or 'youtu.be' in url:
+        return '유튜브'
+    if any(domain in url for domain in WEBSITE_DOMAINS):
+        return '웹사이트/블로그'
+    if url == '#':
+        return '활동'
+    return '기타'
+
+
+# 제목으로 만든 고정 ID (목록 순서가 바뀌거나 항목이 추가되어도 유지됨)
+def challenge_id(title):
+    return hashlib.sha1(title.encode('utf-8')).hexdigest()[:10]
+
+
+# 카탈로그 안에서만 쓰는 ID를 뺀 응답용 챌린지
+# (API와 DB는 challenges 테이블의 정수 ID만 사용하므로 두 ID 체계가 한 응답에 섞이지 않도록 함)
+def public_challenge(entry):
+    return {key: value for key, value in entry.items() if key != 'id'}
+
+
+# 기분/활동 평균과 수면 시간으로 추천할 에너지 수준 결정
+def energy_level(mood, sleep, activity):
+    avg_score = (int(mood) + int(activity)) / 2
+    if int(sleep) < 5 or avg_score < 4:
+        return 'low'
+    if avg_score < 7:
+        return 'medium'
+    return 'high'
+
+
+# 피드백 점수 → 샘플링 가중치 (싫어요가 많아도 완전히 제외하지는 않음)
+def feedback_weight(score):
+    return max(0.1, 1 + score)
+
+
+# --- 가중치 샘플링 ---
+# Vose 별칭(alias) 테이블: O(n)으로 만들고 한 번 뽑는 데 O(1)
+def build_alias_table(weights):
+    n = len(weights)
+    total = float(sum(weights))
+    prob = [w * n / total for w in weights]
+    alias = list(range(n))
+    small = [i for i, p in enumerate(prob) if p < 1.0]
+    large = [i for i, p in enumerate(prob) if p >= 1.0]
+    while small and large:
+        s, l = small.pop(), large.pop()
+        alias[s] = l
+        prob[l] -= 1.0 - prob[s]
+        (small if prob[l] < 1.0 else large).append(l)
+    for i in small + large:
+        prob[i] = 1.0
+    return prob, alias
+
+
+# Efraimidis–Spirakis: 항목마다 u^(1/w) 키를 뽑아 큰 순서대로 k개 (가중치 비복원 추출, O(n log k))
+def weighted_sample_es(items, weights, k, rng):
+    keyed = [(rng.random() ** (1.0 / w), i) for i, w in enumerate(weights)]
+    return [items[i] for _, i in heapq.nlargest(k, keyed)]
+
+
+# 일기 임베딩과 챌린지 임베딩의 코사인 유사도를 후보 안에서 표준화한 뒤 exp(α·z)를 가중치에 곱함
+# α가 클수록 일기 내용과 비슷한 챌린지가 더 자주 뽑힘 (0이면 유사도 무시)
+def similarity_weights(matrix, embedding, base_weights, alpha):
+    query = np.asarray(embedding, dtype=np.float32)
+    query = query / (np.linalg.norm(query) or 1.0)
+    sims = matrix @ query
+    z = (sims - sims.mean()) / (sims.std() + 1e-6)
+    return base_weights * np.exp(alpha * z)
+
+
+# Efraimidis–Spirakis를 numpy로 한 번에 계산 (log(u)/w가 큰 순서대로 k개)
+def weighted_sample_es_np(weights, k, rng):
+    keys = np.log(rng.random(len(weights))) / weights
+    top = np.argpartition(-keys, k - 1)[:k]
+    return top[np.argsort(-keys[top])]
+
+
+# --- 챌린지 카탈로그 ---
+# 시작 시 한 번 만들어 두는 챌린지 목록
+#  - 모든 항목에 고정 ID와 타입(유튜브/웹사이트/활동)을 미리 계산
+#  - 에너지 수준별로 항목을 나눠 두고, 피드백 가중치로 만든 별칭 테이블을 보관
+#  - 피드백 점수가 바뀌었을 때만 별칭 테이블을 다시 만듦
+# 추천 시에는 별칭 테이블에서 뽑고 이미 뽑은 항목이면 다시 뽑습니다.
+# (기존 "하나 뽑고 후보에서 제거" 반복과 같은 확률 분포이며, 호출당 비용은 후보 수와 무관한 O(k))
+class ChallengeCatalog:
+    # 다시 뽑기가 이 횟수를 넘으면 (가중치가 한 항목에 쏠린 경우) Efraimidis–Spirakis로 전환
+    MAX_REJECTIONS = 32
+
+    def __init__(self, pool, text_challenges=(), seed=None, similarity_alpha=1.0):
+        self.by_id = {}
+        self.by_energy = {}
+        for category in pool.values():
+            for item in category:
+                entry = self._add(item)
+                if entry is not None:
+                    self.by_energy.setdefault(entry['energy'], []).append(entry)
+        self.text_rules = [(tuple(words), self._add(item) or self.by_id[challenge_id(item['title'])])
+                           for words, item in text_challenges]
+        self.ids_by_title = {entry['title']: cid for cid, entry in self.by_id.items()}
+        self.version = hashlib.sha256("\n".join(f"{cid}\t{entry['title']}" for cid, entry in sorted(self.by_id.items()))
+                                      .encode('utf-8')).hexdigest()[:12]
+        self.rng = random.Random(seed) if seed is not None else random.Random()
+        self.np_rng = np.random.default_rng(seed)
+        self.similarity_alpha = similarity_alpha
+        self._lock = threading.Lock()
+        self._scores = None
+        self._weights = {}
+        self._tables = {}
+        # 임베딩 기반 추천용: 에너지 수준별 (후보 목록, 정규화된 임베딩 행렬, 피드백 가중치 배열)
+        self._embedding_index = {}
+        self._similarity_base = {}
+        self.refresh({})
+
+    def _add(self, item):
+        cid = challenge_id(item['title'])
+        if cid in self.by_id:
+            return None
+        entry = dict(item, id=cid, type=challenge_type(item.get('url', '#')))
+        self.by_id[cid] = entry
+        return entry
+
+    def __len__(self):
+        return len(self.by_id)
+
+    def refresh(self, feedback_scores):
+        """피드백 점수(제목 → 점수)로 가중치와 별칭 테이블을 다시 만듭니다. 같은 객체면 건너뜁니다."""
+        if feedback_scores is self._scores:
+            return
+        weights = {cid: feedback_weight(feedback_scores.get(entry['title'], 0)) for cid, entry in self.by_id.items()}
+        tables = {}
+        for level, entries in self.by_energy.items():
+            level_weights = [weights[entry['id']] for entry in entries]
+            prob, alias = build_alias_table(level_weights)
+            tables[level] = (entries, {entry['id'] for entry in entries}, level_weights, float(sum(level_weights)), prob, alias)
+        base = self._similarity_base_weights(weights, self._embedding_index)
+        with self._lock:
+            self._weights, self._tables, self._scores, self._similarity_base = weights, tables, feedback_scores, base
+
+    @staticmethod
+    def _similarity_base_weights(weights, index):
+        return {level: np.array([weights[entry['id']] for entry in candidates]) for level, (candidates, _) in index.items()}
+
+    # --- 임베딩 기반 추천 ---
+    @property
+    def has_embeddings(self):
+        return bool(self._embedding_index)
+
+    def attach_embeddings(self, ids, matrix):
+        """챌린지 ID 순서에 맞춘 임베딩 행렬을 연결합니다. 카탈로그의 챌린지가 하나라도 빠져 있으면 False."""
+        rows = {cid: i for i, cid in enumerate(ids)}
+        if any(cid not in rows for cid in self.by_id):
+            return False
+        matrix = np.asarray(matrix, dtype=np.float32)
+        matrix = matrix / np.maximum(np.linalg.norm(matrix, axis=1, keepdims=True), 1e-12)
+        text_entries = [entry for _, entry in self.text_rules]
+        index = {}
+        for level, entries in self.by_energy.items():
+            # 에너지 수준의 챌린지 + 일기 내용 기반 챌린지 (키워드 규칙 대신 유사도로 판단)
+            level_ids = {entry['id'] for entry in entries}
+            candidates = entries + [entry for entry in text_entries if entry['id'] not in level_ids]
+            index[level] = (candidates, matrix[[rows[entry['id']] for entry in candidates]])
+        with self._lock:
+            base = self._similarity_base_weights(self._weights, index)
+            self._embedding_index, self._similarity_base = index, base
+        return True
+
+    def sample_by_similarity(self, level, embedding, k=3, rng=None):
+        """피드백 가중치 × 일기 임베딩과의 유사도로 에너지 수준의 챌린지 k개를 뽑습니다."""
+        rng = rng or self.np_rng
+        with self._lock:
+            candidates, matrix = self._embedding_index.get(level, ((), None))
+            base = self._similarity_base.get(level)
+        k = min(k, len(candidates))
+        if k == 0:
+            return []
+        weights = similarity_weights(matrix, embedding, base, self.similarity_alpha)
+        return [dict(candidates[i]) for i in weighted_sample_es_np(weights, k, rng)]
+
+    def extras_for_text(self, text):
+        text = text or ""
+        for words, entry in self.text_rules:
+            if any(word in text for word in words):
+                return [entry]
+        return []
+
+    def sample(self, level, k=3, extras=(), rng=None):
+        """에너지 수준의 챌린지와 추가 후보(extras) 중에서 가중치에 따라 서로 다른 k개를 뽑습니다."""
+        rng = rng or self.rng
+        with self._lock:
+            weights = self._weights
+            entries, level_ids, level_weights, level_total, prob, alias = self._tables.get(level, ((), set(), (), 0.0, (), ()))
+        # 추가 후보 중 이미 에너지 수준 목록에 있는 항목은 제외 (중복 추천 방지)
+        extras = [entry for entry in extras if entry['id'] not in level_ids]
+        extra_weights = [weights.get(entry['id'], 1.0) for entry in extras]
+        n = len(entries) + len(extras)
+        k = min(k, n)
+        if k == 0:
+            return []
+
+        total = level_total + sum(extra_weights)
+        chosen, seen = [], set()
+        rejections = 0
+        while len(chosen) < k:
+            # 추가 후보는 몇 개뿐이므로 가중치 구간으로 먼저 확인하고, 나머지는 별칭 테이블에서 뽑음
+            r = rng.random() * total
+            if r >= level_total and extras:
+                r -= level_total
+                for entry, w in zip(extras, extra_weights):
+                    if r < w:
+                        break
+                    r -= w
+            else:
+                i = int(rng.random() * len(entries))
+                entry = entries[i] if rng.random() < prob[i] else entries[alias[i]]
+            if entry['id'] in seen:
+                rejections += 1
+                if rejections > self.MAX_REJECTIONS:
+                    rest = [(e, w) for e, w in zip(list(entries) + extras, list(level_weights) + extra_weights) if e['id'] not in seen]
+                    chosen.extend(weighted_sample_es([e for e, _ in rest], [w for _, w in rest], k - len(chosen), rng))
+                    break
+                continue
+            seen.add(entry['id'])
+            chosen.append(entry)
+        return [dict(entry) for entry in chosen]
+
+    def recommend(self, mood, sleep, activity, feeling_text, feedback_scores=None, k=3, rng=None, text_embedding=None):
+        """기분/수면/활동과 일기 내용에 맞는 챌린지 k개를 추천합니다. (부족하면 기본 챌린지로 채움)
+        text_embedding이 있고 챌린지 임베딩이 로드되어 있으면 유사도 기반으로, 아니면 키워드 규칙으로 추천합니다."""
+        if feedback_scores is not None:
+            self.refresh(feedback_scores)
+        level = energy_level(mood, sleep, activity)
+        if text_embedding is not None and self.has_embeddings:
+            selection = self.sample_by_similarity(level, text_embedding, k, rng)
+        else:
+            selection = self.sample(level, k, self.extras_for_text(feeling_text), rng)
+        selection = [public_challenge(entry) for entry in selection]
+        while len(selection) < k:
+            selection.append(dict(DEFAULT_CHALLENGE))
+        return selection
+
+
+# --- 챌린지 임베딩 파일 ---
+# 챌린지 제목의 문장 임베딩을 미리 계산해 .npz로 저장 (`flask rebuild-challenge-embeddings`)
+# 카탈로그 버전이나 모델이 다르면 사용하지 않고 키워드 규칙으로 추천합니다.
+def challenge_embedding_texts(catalog):
+    """(챌린지 ID 목록, 임베딩할 문장 목록)"""
+    ids = list(catalog.by_id)
+    return ids, [catalog.by_id[cid]['title'] for cid in ids]
+
+
+def save_challenge_embeddings(path, catalog, model_name, ids, matrix):
+    os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+    tmp_path = path + '.tmp.npz'
+    np.savez(tmp_path, ids=np.array(ids), matrix=np.asarray(matrix, dtype=np.float32),
+             catalog_version=catalog.version, model=model_name)
+    os.replace(tmp_path, path)
+
+
+def load_challenge_embeddings(path, catalog, model_name):
+    """임베딩 파일을 읽어 카탈로그에 연결합니다. 사용할 수 없으면 이유를 출력하고 False."""
+    if not os.path.exists(path):
+        return False
+    try:
+        with np.load(path) as data:
+            if str(data['model']) != model_name or str(data['catalog_version']) != catalog.version:
+                print(f"챌린지 임베딩 파일 '{path}'이 현재 모델/챌린지 목록과 맞지 않습니다. `flask rebuild-challenge-embeddings`를 실행해주세요.")
+                return False
+            return catalog.attach_embeddings([str(cid) for cid in data['ids']], data['matrix'])
+    except (OSError, KeyError, ValueError) as e:
+        print(f"챌린지 임베딩 파일을 읽을 수 없습니다: {e}")
+        return False
+
+
+# BLOOM_CHALLENGE_SEED를 지정하면 추천 순서가 매번 같아짐 (테스트, 데모용)
+_seed = os.environ.get('BLOOM_CHALLENGE_SEED')
+challenge_catalog = ChallengeCatalog(CHALLENGES_POOL, TEXT_CHALLENGES, seed=int(_seed) if _seed else None,
+                                     similarity_alpha=float(os.environ.get('BLOOM_CHALLENGE_SIMILARITY', 1.0)))
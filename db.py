@@ -0,0 +1,519 @@
+import asyncio
+import contextlib
+import os
+import sqlite3
+import threading
+import time
+
+import metrics
+
+
+# --- 데이터베이스 설정 ---
+DATABASE = os.environ.get('BLOOM_DATABASE', 'database.db')
+# WAL 모드에서는 쓰기 중에도 읽기가 막히지 않고, 동시 쓰기도 짧게 대기 후 처리됩니다.
+JOURNAL_MODE = os.environ.get('BLOOM_DB_JOURNAL_MODE', 'WAL')
+# WAL 모드에서는 NORMAL로도 충돌 시 데이터가 깨지지 않음 (마지막 커밋 일부만 유실 가능)
+SYNCHRONOUS = os.environ.get('BLOOM_DB_SYNCHRONOUS', 'NORMAL')
+CACHE_SIZE_KB = int(os.environ.get('BLOOM_DB_CACHE_SIZE_KB', 20000))
+BUSY_TIMEOUT_MS = int(os.environ.get('BLOOM_DB_BUSY_TIMEOUT_MS', 5000))
+# 연결마다 재사용할 prepared statement 개수 (sqlite3 모듈의 statement 캐시)
+STATEMENT_CACHE_SIZE = int(os.environ.get('BLOOM_DB_STATEMENT_CACHE', 256))
+# 0이면 기존처럼 요청마다 새 연결을 열고 닫음 (비교/디버깅용)
+POOL_ENABLED = os.environ.get('BLOOM_DB_POOL', '1') != '0'
+
+
+# --- 쿼리 지표 ---
+# execute / executemany / commit 시간을 SQL 종류(SELECT, INSERT 등)별로 /metrics에 기록합니다.
+# (SELECT는 첫 행을 가져오기까지의 시간이며, 나머지 행을 읽는 fetch 시간은 포함하지 않음)
+SQL_OPS = {'SELECT', 'INSERT', 'UPDATE', 'DELETE', 'BEGIN', 'PRAGMA', 'CREATE', 'DROP', 'ALTER', 'WITH'}
+
+
+def _sql_op(sql):
+    words = sql.split(None, 1)
+    op = words[0].upper() if words else ''
+    return op if op in SQL_OPS else 'OTHER'
+
+
+class InstrumentedCursor(sqlite3.Cursor):
+    def execute(self, sql, parameters=()):
+        start = time.perf_counter()
+        try:
+            return super().execute(sql, parameters)
+        finally:
+            metrics.observe_db(_sql_op(sql), time.perf_counter() - start)
+
+    def executemany(self, sql, seq_of_parameters):
+        start = time.perf_counter()
+        try:
+            return super().executemany(sql, seq_of_parameters)
+        finally:
+            metrics.observe_db(_sql_op(sql), time.perf_counter() - start)
+
+
+class InstrumentedConnection(sqlite3.Connection):
+    def cursor(self, factory=InstrumentedCursor):
+        return super().cursor(factory)
+
+    def execute(self, sql, parameters=()):
+        start = time.perf_counter()
+        try:
+            return super().execute(sql, parameters)
+        finally:
+            metrics.observe_db(_sql_op(sql), time.perf_counter() - start)
+
+    def executemany(self, sql, seq_of_parameters):
+        start = time.perf_counter()
+        try:
+            return super().executemany(sql, seq_of_parameters)
+        finally:
+            metrics.observe_db(_sql_op(sql), time.perf_counter() - start)
+
+    def commit(self):
+        start = time.perf_counter()
+        try:
+            return super().commit()
+        finally:
+            metrics.observe_db('COMMIT', time.perf_counter() - start)
+
+
+# 새 연결마다 실행하는 설정 (동기/비동기 연결 풀 공용)
+def connection_pragmas():
+    return [
+        f"PRAGMA journal_mode={JOURNAL_MODE}",
+        f"PRAGMA synchronous={SYNCHRONOUS}",
+        f"PRAGMA cache_size=-{CACHE_SIZE_KB}",
+        f"PRAGMA busy_timeout={BUSY_TIMEOUT_MS}",
+        "PRAGMA temp_store=MEMORY",
+    ]
+
+
+def connection_factory():
+    return InstrumentedConnection if metrics.METRICS_ENABLED else sqlite3.Connection
+
+
+# --- 스레드별 연결 풀 ---
+# 스레드마다 연결 하나를 만들어 계속 재사용합니다.
+# 연결을 오래 유지하므로 PRAGMA 설정과 prepared statement 캐시가 요청 간에 유지됩니다.
+class ConnectionPool:
+    def __init__(self, path, pooled=True):
+        self.path = path
+        self.pooled = pooled
+        self._local = threading.local()
+        self._connections = []
+        self._lock = threading.Lock()
+        if hasattr(os, 'register_at_fork'):
+            os.register_at_fork(after_in_child=self._after_fork)
+
+    def _connect(self):
+        conn = sqlite3.connect(self.path, timeout=BUSY_TIMEOUT_MS / 1000, check_same_thread=False,
+                               cached_statements=STATEMENT_CACHE_SIZE, factory=connection_factory())
+        conn.row_factory = sqlite3.Row
+        for pragma in connection_pragmas():
+            conn.execute(pragma)
+        return conn
+
+    def get(self):
+        if not self.pooled:
+            return self._connect()
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = self._connect()
+            self._local.conn = conn
+            with self._lock:
+                self._connections.append(conn)
+        return conn
+
+    def release(self, conn):
+        # 커밋되지 않은 작업은 되돌리고 연결은 다음 요청을 위해 남겨 둠
+        if conn is None:
+            return
+        if conn.in_transaction:
+            conn.rollback()
+        if not self.pooled:
+            conn.close()
+
+    def close_all(self):
+        with self._lock:
+            for conn in self._connections:
+                try:
+                    conn.close()
+                except sqlite3.Error:
+                    pass
+            self._connections = []
+        self._local = threading.local()
+
+    def _after_fork(self):
+        # 부모 프로세스의 연결은 자식에서 사용하면 안 되므로 버리고 새로 만듦
+        self._lock = threading.Lock()
+        self._connections = []
+        self._local = threading.local()
+
+
+pool = ConnectionPool(DATABASE, pooled=POOL_ENABLED)
+
+
+# --- 비동기 연결 풀 (asgi_app.py 전용, aiosqlite 필요) ---
+# aiosqlite 연결은 각자 전용 스레드에서 쿼리를 실행하므로, 이벤트 루프는 SQLite I/O를 기다리는 동안 다른 요청을 처리합니다.
+# 정해진 개수의 연결을 돌려 쓰며, 모두 사용 중이면 반납될 때까지 기다립니다. (WAL이므로 읽기 연결끼리는 막지 않음)
+class AsyncConnectionPool:
+    def __init__(self, size=4):
+        self.size = max(1, int(size))
+        self._idle = None
+        self._connections = []
+
+    async def open(self, path=None):
+        try:
+            import aiosqlite
+        except ImportError:
+            raise RuntimeError("비동기 모드를 사용하려면 aiosqlite 패키지를 설치해야 합니다.")
+        self._idle = asyncio.Queue()
+        for _ in range(self.size):
+            conn = await aiosqlite.connect(path or DATABASE, timeout=BUSY_TIMEOUT_MS / 1000,
+                                           cached_statements=STATEMENT_CACHE_SIZE, factory=connection_factory())
+            conn.row_factory = sqlite3.Row
+            for pragma in connection_pragmas():
+                await conn.execute(pragma)
+            self._connections.append(conn)
+            self._idle.put_nowait(conn)
+
+    @contextlib.asynccontextmanager
+    async def connection(self):
+        conn = await self._idle.get()
+        try:
+            yield conn
+        finally:
+            # 커밋되지 않은 작업은 되돌리고 다음 요청을 위해 반납
+            try:
+                if conn.in_transaction:
+                    await conn.rollback()
+            finally:
+                self._idle.put_nowait(conn)
+
+    def in_use(self):
+        return self.size - self._idle.qsize() if self._idle is not None else 0
+
+    async def close(self):
+        for conn in self._connections:
+            try:
+                await conn.close()
+            except sqlite3.Error:
+                pass
+        self._connections = []
+        self._idle = None
+
+
+def get_connection():
+    return pool.get()
+
+
+def release_connection(conn):
+    pool.release(conn)
+
+
+def open_connection():
+    """풀과 별개의 새 연결 (요청 연결의 트랜잭션과 따로 짧게 쓰고 바로 닫을 때 사용)"""
+    return pool._connect()
+
+
+def set_database(path):
+    """다른 DB 파일을 사용하도록 변경합니다. (벤치마크, 관리 명령어용)"""
+    global DATABASE
+    pool.close_all()
+    DATABASE = pool.path = path
+
+
+# 비동기 분석 모드에서 채점 전에 먼저 저장된 기록의 상태 값
+PENDING_STATUS = '분석 중'
+
+
+# challenge_feedback 전체를 다시 집계해 challenge_scores를 채우는 SQL (마이그레이션, 재계산 명령어에서 사용)
+REBUILD_CHALLENGE_SCORES_SQL = """
+    INSERT INTO challenge_scores (challenge_title, score, feedback_count)
+    SELECT challenge_title, SUM(CASE rating WHEN 1 THEN 1 WHEN -1 THEN -1 ELSE 0 END), COUNT(*)
+    FROM challenge_feedback GROUP BY challenge_title
+"""
+
+
+# 기록 한 건(OLD / NEW)이 속한 날짜의 daily_scores 행을 기록에서 다시 집계하는 트리거 문장
+# (idx_records_user_date로 그날 기록만 범위 탐색)
+def _refresh_daily_sql(row):
+    return f"""DELETE FROM daily_scores WHERE user_id = {row}.user_id AND day = substr({row}.date, 1, 10);
+            INSERT INTO daily_scores (user_id, day, record_count, score_sum, score_sq_sum, score_min, score_max)
+            SELECT {row}.user_id, substr({row}.date, 1, 10), COUNT(*), SUM(score), SUM(score * score), MIN(score), MAX(score)
+            FROM records WHERE user_id = {row}.user_id AND date >= substr({row}.date, 1, 10) AND date < date({row}.date, '+1 day')
+                AND status != '{PENDING_STATUS}'
+            HAVING COUNT(*) > 0;"""
+
+
+# --- 데이터베이스 스키마 마이그레이션 ---
+# (버전, 설명, SQL 문 목록) — 새 변경은 항상 목록 끝에 다음 버전으로 추가합니다.
+# 적용된 버전은 schema_migrations 테이블에 기록되며, 서버 시작 시 미적용 버전만 순서대로 적용됩니다.
+MIGRATIONS = [
+    (1, "초기 스키마 (users, records, challenge_feedback)", [
+        """CREATE TABLE IF NOT EXISTS users (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            username TEXT UNIQUE NOT NULL,
+            password TEXT NOT NULL,
+            name TEXT,
+            birthdate TEXT,
+            gender TEXT,
+            region_si_do TEXT,
+            region_gu TEXT
+        )""",
+        """CREATE TABLE IF NOT EXISTS records (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            user_id INTEGER NOT NULL,
+            date TEXT NOT NULL,
+            score REAL NOT NULL,
+            status TEXT NOT NULL,
+            text TEXT,
+            recommended_challenges_json TEXT,
+            feedback_given_json TEXT,
+            FOREIGN KEY (user_id) REFERENCES users (id)
+        )""",
+        """CREATE TABLE IF NOT EXISTS challenge_feedback (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            user_id INTEGER NOT NULL,
+            record_id INTEGER NOT NULL,
+            challenge_title TEXT NOT NULL,
+            rating INTEGER NOT NULL,
+            timestamp TEXT NOT NULL,
+            FOREIGN KEY (user_id) REFERENCES users (id),
+            FOREIGN KEY (record_id) REFERENCES records (id)
+        )""",
+    ]),
+    (2, "조회용 인덱스 (/get_data 기록 조회, 챌린지 피드백 집계)", [
+        # WHERE user_id = ? ORDER BY date 를 정렬 없이 인덱스 순서로 읽음
+        "CREATE INDEX IF NOT EXISTS idx_records_user_date ON records (user_id, date)",
+        # GROUP BY challenge_title 집계를 테이블 접근 없이 인덱스만으로 처리 (covering index)
+        "CREATE INDEX IF NOT EXISTS idx_challenge_feedback_title_rating ON challenge_feedback (challenge_title, rating)",
+    ]),
+    (3, "챌린지별 피드백 점수 집계 테이블 (트리거로 자동 갱신)", [
+        """CREATE TABLE IF NOT EXISTS challenge_scores (
+            challenge_title TEXT PRIMARY KEY,
+            score INTEGER NOT NULL DEFAULT 0,
+            feedback_count INTEGER NOT NULL DEFAULT 0
+        )""",
+        # challenge_feedback에 쓰는 같은 트랜잭션 안에서 집계가 함께 갱신됨
+        """CREATE TRIGGER IF NOT EXISTS trg_challenge_feedback_insert AFTER INSERT ON challenge_feedback
+        BEGIN
+            INSERT INTO challenge_scores (challenge_title, score, feedback_count)
+            VALUES (NEW.challenge_title, CASE NEW.rating WHEN 1 THEN 1 WHEN -1 THEN -1 ELSE 0 END, 1)
+            ON CONFLICT (challenge_title) DO UPDATE SET
+                score = score + excluded.score,
+                feedback_count = feedback_count + 1;
+        END""",
+        """CREATE TRIGGER IF NOT EXISTS trg_challenge_feedback_delete AFTER DELETE ON challenge_feedback
+        BEGIN
+            UPDATE challenge_scores SET
+                score = score - CASE OLD.rating WHEN 1 THEN 1 WHEN -1 THEN -1 ELSE 0 END,
+                feedback_count = feedback_count - 1
+            WHERE challenge_title = OLD.challenge_title;
+        END""",
+        # 기존 피드백 기록으로 집계 채우기
+        REBUILD_CHALLENGE_SCORES_SQL,
+    ]),
+    (4, "사용자별 기록 변경 버전 (/get_data ETag용)", [
+        "ALTER TABLE users ADD COLUMN data_version INTEGER NOT NULL DEFAULT 0",
+        """CREATE TRIGGER IF NOT EXISTS trg_records_insert_version AFTER INSERT ON records
+        BEGIN
+            UPDATE users SET data_version = data_version + 1 WHERE id = NEW.user_id;
+        END""",
+        """CREATE TRIGGER IF NOT EXISTS trg_records_update_version AFTER UPDATE ON records
+        BEGIN
+            UPDATE users SET data_version = data_version + 1 WHERE id IN (OLD.user_id, NEW.user_id);
+        END""",
+        """CREATE TRIGGER IF NOT EXISTS trg_records_delete_version AFTER DELETE ON records
+        BEGIN
+            UPDATE users SET data_version = data_version + 1 WHERE id = OLD.user_id;
+        END""",
+    ]),
+    (5, "기록별 채점 입력값/버전 및 재채점 체크포인트", [
+        # 기존 기록은 입력값이 없으므로 NULL (재채점 대상에서 제외됨)
+        "ALTER TABLE records ADD COLUMN mood INTEGER",
+        "ALTER TABLE records ADD COLUMN sleep INTEGER",
+        "ALTER TABLE records ADD COLUMN activity INTEGER",
+        "ALTER TABLE records ADD COLUMN text_emotion TEXT",
+        "ALTER TABLE records ADD COLUMN scoring_version TEXT",
+        # 채점 버전별 재채점 진행 위치 (id 순서로 여기까지 처리함)
+        """CREATE TABLE IF NOT EXISTS rescore_jobs (
+            scoring_version TEXT PRIMARY KEY,
+            last_record_id INTEGER NOT NULL DEFAULT 0,
+            processed INTEGER NOT NULL DEFAULT 0,
+            started_at TEXT NOT NULL,
+            updated_at TEXT NOT NULL,
+            finished_at TEXT
+        )""",
+    ]),
+    (6, "채점 대기 중인 기록 조회용 부분 인덱스 (비동기 분석)", [
+        # 대기 중인 기록만 담으므로 크기가 작고, 서버 시작 시 미처리 작업을 바로 찾을 수 있음
+        f"CREATE INDEX IF NOT EXISTS idx_records_pending ON records (id) WHERE status = '{PENDING_STATUS}'",
+    ]),
+    (7, "사용자별 일별 점수 집계 테이블 (/trends용, 트리거로 자동 갱신)", [
+        # 분산은 점수 합과 제곱 합으로 계산 (채점 대기 중인 기록은 제외)
+        """CREATE TABLE IF NOT EXISTS daily_scores (
+            user_id INTEGER NOT NULL,
+            day TEXT NOT NULL,
+            record_count INTEGER NOT NULL,
+            score_sum REAL NOT NULL,
+            score_sq_sum REAL NOT NULL,
+            score_min REAL NOT NULL,
+            score_max REAL NOT NULL,
+            PRIMARY KEY (user_id, day)
+        ) WITHOUT ROWID""",
+        # 새 기록은 해당 날짜 집계에 바로 더함
+        f"""CREATE TRIGGER IF NOT EXISTS trg_records_insert_daily AFTER INSERT ON records
+        WHEN NEW.status != '{PENDING_STATUS}'
+        BEGIN
+            INSERT INTO daily_scores (user_id, day, record_count, score_sum, score_sq_sum, score_min, score_max)
+            VALUES (NEW.user_id, substr(NEW.date, 1, 10), 1, NEW.score, NEW.score * NEW.score, NEW.score, NEW.score)
+            ON CONFLICT (user_id, day) DO UPDATE SET
+                record_count = record_count + 1,
+                score_sum = score_sum + excluded.score_sum,
+                score_sq_sum = score_sq_sum + excluded.score_sq_sum,
+                score_min = MIN(score_min, excluded.score_min),
+                score_max = MAX(score_max, excluded.score_max);
+        END""",
+        # 점수가 바뀌거나(재채점, 비동기 채점 완료) 기록이 지워지면 최소/최대를 되돌릴 수 없으므로
+        # 해당 날짜 하나만 기록에서 다시 집계 (피드백 저장처럼 다른 컬럼만 바꾸는 UPDATE에는 실행되지 않음)
+        f"""CREATE TRIGGER IF NOT EXISTS trg_records_update_daily AFTER UPDATE OF user_id, date, score, status ON records
+        BEGIN
+            {_refresh_daily_sql('OLD')}
+            {_refresh_daily_sql('NEW')}
+        END""",
+        f"""CREATE TRIGGER IF NOT EXISTS trg_records_delete_daily AFTER DELETE ON records
+        BEGIN
+            {_refresh_daily_sql('OLD')}
+        END""",
+        # 기존 기록으로 집계 채우기
+        f"""INSERT INTO daily_scores (user_id, day, record_count, score_sum, score_sq_sum, score_min, score_max)
+        SELECT user_id, substr(date, 1, 10), COUNT(*), SUM(score), SUM(score * score), MIN(score), MAX(score)
+        FROM records WHERE status != '{PENDING_STATUS}' GROUP BY user_id, substr(date, 1, 10)""",
+    ]),
+    (8, "챌린지 카탈로그 테이블, 기록에는 챌린지 ID만 저장 (challenge_store.py)", [
+        # ID를 다시 쓰지 않도록 AUTOINCREMENT (캐시는 마지막으로 읽은 ID 이후만 다시 읽음)
+        """CREATE TABLE IF NOT EXISTS challenges (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            title TEXT UNIQUE NOT NULL,
+            item_json TEXT NOT NULL
+        )""",
+        "ALTER TABLE records ADD COLUMN challenge_ids TEXT",
+        "ALTER TABLE records ADD COLUMN feedback_json TEXT",
+        # 아직 옮기지 않은 예전 기록만 담는 부분 인덱스 (변환 작업이 끝나면 비어 있음)
+        "CREATE INDEX IF NOT EXISTS idx_records_legacy_challenges ON records (id) WHERE challenge_ids IS NULL",
+    ]),
+    (9, "백그라운드 작업 임대(lease) 테이블, 챌린지 형식 변환은 data_version을 올리지 않음", [
+        # 여러 워커 프로세스 중 한 곳에서만 실행할 작업 (이름별로 실행 중인 프로세스와 만료 시각)
+        """CREATE TABLE IF NOT EXISTS job_leases (
+            name TEXT PRIMARY KEY,
+            owner TEXT NOT NULL,
+            expires_at REAL NOT NULL
+        )""",
+        # 예전 형식 → 챌린지 ID 형식 변환(challenge_ids가 NULL에서 값으로 바뀜)은 응답 내용이 같으므로 ETag를 유지
+        "DROP TRIGGER IF EXISTS trg_records_update_version",
+        """CREATE TRIGGER IF NOT EXISTS trg_records_update_version AFTER UPDATE ON records
+        WHEN NOT (OLD.challenge_ids IS NULL AND NEW.challenge_ids IS NOT NULL)
+        BEGIN
+            UPDATE users SET data_version = data_version + 1 WHERE id IN (OLD.user_id, NEW.user_id);
+        END""",
+    ]),
+    (10, "서버 설정값 테이블 (환경 변수로 지정하지 않은 세션 토큰 서명 키 등)", [
+        """CREATE TABLE IF NOT EXISTS app_settings (
+            name TEXT PRIMARY KEY,
+            value TEXT NOT NULL
+        )""",
+    ]),
+    (11, "챌린지 형식 변환도 data_version을 올림 (변환 전후 응답의 챌린지 항목이 달라질 수 있음)", [
+        "DROP TRIGGER IF EXISTS trg_records_update_version",
+        """CREATE TRIGGER IF NOT EXISTS trg_records_update_version AFTER UPDATE ON records
+        BEGIN
+            UPDATE users SET data_version = data_version + 1 WHERE id IN (OLD.user_id, NEW.user_id);
+        END""",
+    ]),
+]
+
+
+def _ensure_migrations_table(conn):
+    conn.execute("CREATE TABLE IF NOT EXISTS schema_migrations (version INTEGER PRIMARY KEY, name TEXT NOT NULL, applied_at TEXT NOT NULL)")
+    conn.commit()
+
+
+def schema_version(conn=None):
+    own = conn is None
+    conn = conn or get_connection()
+    try:
+        _ensure_migrations_table(conn)
+        row = conn.execute("SELECT MAX(version) FROM schema_migrations").fetchone()
+        return row[0] or 0
+    finally:
+        if own:
+            release_connection(conn)
+
+
+def migrate(conn=None):
+    """미적용 마이그레이션을 버전 순서대로 적용하고, 새로 적용한 버전 목록을 반환합니다."""
+    own = conn is None
+    conn = conn or get_connection()
+    applied = []
+    try:
+        _ensure_migrations_table(conn)
+        done = {row[0] for row in conn.execute("SELECT version FROM schema_migrations")}
+        for version, name, statements in MIGRATIONS:
+            if version in done:
+                continue
+            # 여러 워커가 동시에 시작해도 한 곳에서만 적용되도록 쓰기 잠금을 잡은 뒤 다시 확인
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                if conn.execute("SELECT 1 FROM schema_migrations WHERE version = ?", (version,)).fetchone():
+                    conn.rollback()
+                    continue
+                for statement in statements:
+                    conn.execute(statement)
+                conn.execute("INSERT INTO schema_migrations (version, name, applied_at) VALUES (?, ?, datetime('now', 'localtime'))",
+                             (version, name))
+                conn.commit()
+                applied.append(version)
+            except Exception:
+                conn.rollback()
+                raise
+    finally:
+        if own:
+            release_connection(conn)
+    return applied
+
+
+def load_or_create_setting(name, create, conn=None):
+    """app_settings의 값을 읽고, 없으면 create()로 만들어 저장합니다.
+    여러 프로세스가 동시에 처음 시작해도 먼저 저장된 값 하나를 함께 사용합니다."""
+    own = conn is None
+    conn = conn or get_connection()
+    try:
+        row = conn.execute("SELECT value FROM app_settings WHERE name = ?", (name,)).fetchone()
+        if row is None:
+            conn.execute("INSERT OR IGNORE INTO app_settings (name, value) VALUES (?, ?)", (name, create()))
+            conn.commit()
+            row = conn.execute("SELECT value FROM app_settings WHERE name = ?", (name,)).fetchone()
+        return row[0]
+    finally:
+        if own:
+            release_connection(conn)
+
+
+def rebuild_challenge_scores(conn=None):
+    """challenge_scores를 challenge_feedback 기준으로 다시 계산합니다. (백필, 데이터 보정용)"""
+    own = conn is None
+    conn = conn or get_connection()
+    try:
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            conn.execute("DELETE FROM challenge_scores")
+            conn.execute(REBUILD_CHALLENGE_SCORES_SQL)
+            count = conn.execute("SELECT COUNT(*) FROM challenge_scores").fetchone()[0]
+            conn.commit()
+        except Exception:
+            conn.rollback()
+            raise
+    finally:
+        if own:
+            release_connection(conn)
+    return count
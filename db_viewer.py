@@ -1,50 +1,316 @@
-import sqlite3
+"""
+DB 조회 / 내보내기 / 통계 도구 (운영 중인 DB에서도 쓰기를 막지 않음)
+
+  python db_viewer.py show [--limit 20]                       # 사용자 / 최근 기록을 터미널에 출력
+  python db_viewer.py export records --format jsonl -o records.jsonl [--user bloom] [--since 2024-01-01] [--until 2024-12-31]
+                                     [--columns id,date,score]
+  python db_viewer.py stats [--user bloom]                    # 행 수, 테이블 크기, 점수 분포 (SQL로 집계)
+  python db_viewer.py snapshot backup.db                      # 온라인 백업 API로 일관된 스냅숏 파일 만들기
+
+기본은 읽기 전용 연결 하나로 트랜잭션을 열어 모든 조회가 같은 시점의 데이터를 보게 합니다. (WAL 모드라 쓰기는 막히지 않음)
+오래 걸리는 내보내기는 --snapshot 을 주면 백업 API로 임시 파일에 복사한 뒤 복사본에서 읽으므로,
+원본 WAL 파일이 체크포인트되지 못하고 커지는 일도 없습니다.
+행은 fetchmany로 --batch-size개씩 읽어 바로 쓰므로 메모리 사용량이 테이블 크기와 관계없이 일정합니다.
+"""
+import argparse
+import csv
+import json
 import os
+import sqlite3
+import sys
+import tempfile
+import time
 
-DATABASE_FILE = 'database.db'
+from db import DATABASE
+
+# 내보낼 수 있는 테이블과 날짜 필터에 쓰는 컬럼 (users.password는 내보내지 않음)
+EXPORT_TABLES = {
+    'records': {'date_column': 'date', 'user_column': 'user_id', 'order': 'id'},
+    'users': {'date_column': None, 'user_column': 'id', 'order': 'id', 'exclude': {'password'}},
+    'challenge_feedback': {'date_column': 'timestamp', 'user_column': 'user_id', 'order': 'id'},
+    'daily_scores': {'date_column': 'day', 'user_column': 'user_id', 'order': 'user_id, day'},
+    # records.challenge_ids가 가리키는 챌린지 카탈로그
+    'challenges': {'date_column': None, 'user_column': None, 'order': 'id'},
+}
+SCORE_BUCKETS = 10
 
-def view_database():
-    """
-    database.db 파일의 모든 내용을 읽어서 터미널에 출력합니다.
-    """
-    if not os.path.exists(DATABASE_FILE):
-        print(f"'{DATABASE_FILE}' 파일을 찾을 수 없습니다.")
-        print("먼저 app.py를 실행하여 데이터베이스를 생성하고 데이터를 추가해주세요.")
-        return
 
-    conn = sqlite3.connect(DATABASE_FILE)
+# --- 연결 / 스냅숏 ---
+def open_readonly(path):
+    """읽기 전용 연결을 열고 읽기 트랜잭션을 시작합니다. 이후 조회는 모두 이 시점의 데이터를 봅니다."""
+    if not os.path.exists(path):
+        raise FileNotFoundError(f"'{path}' 파일을 찾을 수 없습니다.")
+    conn = sqlite3.connect(f"file:{path}?mode=ro", uri=True, isolation_level=None)
     conn.row_factory = sqlite3.Row
+    conn.execute("BEGIN")
+    # 첫 읽기에서 스냅숏이 고정됨
+    conn.execute("SELECT COUNT(*) FROM sqlite_master").fetchone()
+    return conn
+
+
+def take_snapshot(source_path, target_path, pages=-1, pause_s=0.0):
+    """온라인 백업 API로 source를 target에 복사합니다. 결과는 항상 한 시점의 데이터입니다.
+    pages가 0 이하면 읽기 트랜잭션 하나로 한 번에 복사합니다. (WAL 모드면 복사 중에도 쓰기가 막히지 않음)
+    pages개씩 나눠 복사하면 단계 사이에 잠금을 놓지만, 그사이 다른 연결이 쓰면 처음부터 다시 복사하므로
+    쓰기가 잦은 DB에서는 끝나지 않을 수 있습니다. (WAL이 아닌 DB에서 쓰기를 오래 막지 않으려 할 때 사용)"""
+    source = sqlite3.connect(f"file:{source_path}?mode=ro", uri=True)
+    target = sqlite3.connect(target_path)
+    try:
+        source.backup(target, pages=pages, sleep=pause_s)
+    finally:
+        target.close()
+        source.close()
+
+
+# --- 필터 ---
+def table_columns(conn, table):
+    return [row['name'] for row in conn.execute(f"PRAGMA table_info({table})")]
+
+
+def resolve_user_id(conn, user):
+    """아이디 또는 숫자 ID로 사용자 ID를 찾습니다."""
+    row = conn.execute("SELECT id FROM users WHERE username = ?", (user,)).fetchone()
+    if row is None and user.isdigit():
+        row = conn.execute("SELECT id FROM users WHERE id = ?", (int(user),)).fetchone()
+    if row is None:
+        raise ValueError(f"사용자를 찾을 수 없습니다: {user}")
+    return row['id']
+
+
+def build_export_query(conn, table, columns=None, user=None, since=None, until=None):
+    spec = EXPORT_TABLES[table]
+    available = [c for c in table_columns(conn, table) if c not in spec.get('exclude', ())]
+    if columns:
+        unknown = [c for c in columns if c not in available]
+        if unknown:
+            raise ValueError(f"알 수 없는 컬럼입니다: {', '.join(unknown)} (가능: {', '.join(available)})")
+    else:
+        columns = available
+    where, params = [], []
+    if user:
+        if not spec['user_column']:
+            raise ValueError(f"{table} 테이블에는 사용자 필터를 사용할 수 없습니다.")
+        where.append(f"{spec['user_column']} = ?")
+        params.append(resolve_user_id(conn, user))
+    if since or until:
+        if not spec['date_column']:
+            raise ValueError(f"{table} 테이블에는 날짜 필터를 사용할 수 없습니다.")
+        if since:
+            where.append(f"{spec['date_column']} >= ?")
+            params.append(since)
+        if until:
+            # until 날짜 하루 전체 포함 ('2024-12-31 23:59' < '2024-12-31~')
+            where.append(f"{spec['date_column']} < ?")
+            params.append(until + '~')
+    sql = f"SELECT {', '.join(columns)} FROM {table}"
+    if where:
+        sql += " WHERE " + " AND ".join(where)
+    sql += f" ORDER BY {spec['order']}"
+    return sql, params, columns
+
+
+# --- 내보내기 ---
+def stream_rows(conn, sql, params, batch_size):
     cursor = conn.cursor()
+    cursor.row_factory = None
+    cursor.arraysize = batch_size
+    cursor.execute(sql, params)
+    while True:
+        rows = cursor.fetchmany()
+        if not rows:
+            return
+        yield rows
+
+
+def export_table(conn, out, table, fmt='jsonl', batch_size=5000, **filters):
+    """조건에 맞는 행을 out에 CSV / JSONL로 씁니다. 쓴 행 수를 반환합니다."""
+    sql, params, columns = build_export_query(conn, table, **filters)
+    count = 0
+    if fmt == 'csv':
+        writer = csv.writer(out)
+        writer.writerow(columns)
+        for rows in stream_rows(conn, sql, params, batch_size):
+            writer.writerows(rows)
+            count += len(rows)
+    else:
+        dumps = json.JSONEncoder(ensure_ascii=False, separators=(',', ':')).encode
+        for rows in stream_rows(conn, sql, params, batch_size):
+            out.write(''.join(dumps(dict(zip(columns, row))) + '\n' for row in rows))
+            count += len(rows)
+    return count
+
+
+# --- 통계 (모두 SQL로 집계) ---
+def table_sizes(conn):
+    """테이블(인덱스 포함)별 크기(byte). dbstat이 없는 SQLite면 DB 전체 크기만 반환"""
+    try:
+        rows = conn.execute("SELECT COALESCE(m.tbl_name, s.name) AS name, SUM(s.pgsize) AS size FROM dbstat s "
+                            "LEFT JOIN sqlite_master m ON m.name = s.name GROUP BY 1 ORDER BY 2 DESC").fetchall()
+        return {row['name']: row['size'] for row in rows}
+    except sqlite3.OperationalError:
+        page_count = conn.execute("PRAGMA page_count").fetchone()[0]
+        page_size = conn.execute("PRAGMA page_size").fetchone()[0]
+        return {'(전체)': page_count * page_size}
+
 
+def collect_stats(conn, user=None):
+    user_id = resolve_user_id(conn, user) if user else None
+    user_filter, params = ("WHERE user_id = ?", (user_id,)) if user_id else ("", ())
+    tables = [row['name'] for row in conn.execute("SELECT name FROM sqlite_master WHERE type = 'table' AND name NOT LIKE 'sqlite_%' ORDER BY name")]
+    stats = {
+        'row_counts': {table: conn.execute(f"SELECT COUNT(*) FROM {table}").fetchone()[0] for table in tables},
+        'table_sizes': table_sizes(conn),
+    }
+    if 'records' not in tables:
+        return stats
+    row = conn.execute(f"SELECT COUNT(*) AS n, AVG(score) AS mean, MIN(score) AS min, MAX(score) AS max, "
+                       f"AVG(score * score) - AVG(score) * AVG(score) AS variance, MIN(date) AS first, MAX(date) AS last "
+                       f"FROM records {user_filter}", params).fetchone()
+    stats['scores'] = dict(row)
+    # 점수 구간(0~1, 1~2, ..., 9~10)별 기록 수
+    stats['score_histogram'] = {
+        f"{bucket}-{bucket + 1}": count for bucket, count in conn.execute(
+            f"SELECT MIN(CAST(score AS INTEGER), {SCORE_BUCKETS - 1}) AS bucket, COUNT(*) FROM records {user_filter} GROUP BY bucket ORDER BY bucket", params)}
+    stats['status_counts'] = {status: count for status, count in conn.execute(
+        f"SELECT status, COUNT(*) FROM records {user_filter} GROUP BY status ORDER BY 2 DESC", params)}
+    stats['records_per_month'] = {month: count for month, count in conn.execute(
+        f"SELECT substr(date, 1, 7) AS month, COUNT(*) FROM records {user_filter} GROUP BY month ORDER BY month DESC LIMIT 12", params)}
+    if not user_id:
+        stats['top_users'] = [dict(row) for row in conn.execute(
+            "SELECT u.username, r.n AS records FROM (SELECT user_id, COUNT(*) AS n FROM records GROUP BY user_id ORDER BY n DESC LIMIT 10) r "
+            "JOIN users u ON u.id = r.user_id ORDER BY r.n DESC")]
+    return stats
+
+
+def print_stats(stats):
+    print("행 수")
+    for table, count in stats['row_counts'].items():
+        print(f"  {table:<24}{count:>12,}")
+    print("크기 (인덱스 포함)")
+    for table, size in stats['table_sizes'].items():
+        print(f"  {table:<24}{size / 1024 / 1024:>10.2f}MB")
+    if 'scores' not in stats:
+        return
+    s = stats['scores']
+    if s['n']:
+        print(f"점수: 기록 {s['n']:,}개, 평균 {s['mean']:.2f}, 최소 {s['min']}, 최대 {s['max']}, 분산 {s['variance']:.3f} ({s['first']} ~ {s['last']})")
+        peak = max(stats['score_histogram'].values())
+        for bucket, count in stats['score_histogram'].items():
+            print(f"  {bucket:>5}  {count:>10,}  {'#' * max(1, round(40 * count / peak))}")
+    print("상태별 기록 수: " + ", ".join(f"{status} {count:,}" for status, count in stats['status_counts'].items()))
+    print("최근 월별 기록 수: " + ", ".join(f"{month} {count:,}" for month, count in stats['records_per_month'].items()))
+    if stats.get('top_users'):
+        print("기록이 많은 사용자: " + ", ".join(f"{u['username']} {u['records']:,}" for u in stats['top_users']))
+
+
+# --- 터미널 출력 (기존 db_viewer 화면) ---
+def show(conn, limit):
     print("=" * 30)
     print("        USERS 테이블 내용")
     print("=" * 30)
-    try:
-        users = cursor.execute("SELECT id, username, name, birthdate, gender FROM users").fetchall()
-        if not users:
-            print("사용자 정보가 없습니다.")
-        else:
-            for user in users:
-                print(f"ID: {user['id']}, 아이디: {user['username']}, 이름: {user['name']}, 생년월일: {user['birthdate']}, 성별: {user['gender']}")
-    except sqlite3.OperationalError:
-        print("users 테이블을 찾을 수 없습니다.")
-    
+    count = 0
+    for rows in stream_rows(conn, "SELECT id, username, name, birthdate, gender FROM users ORDER BY id", (), 500):
+        for user_id, username, name, birthdate, gender in rows:
+            print(f"ID: {user_id}, 아이디: {username}, 이름: {name}, 생년월일: {birthdate}, 성별: {gender}")
+        count += len(rows)
+    if not count:
+        print("사용자 정보가 없습니다.")
+
     print("\n" + "=" * 30)
-    print("       RECORDS 테이블 내용")
+    print(f"       RECORDS 테이블 내용 (최근 {limit}개)")
     print("=" * 30)
+    # 전체 기록을 날짜 순으로 정렬하지 않도록 최근 limit개만 id 역순으로 읽음
+    rows = conn.execute("SELECT id, user_id, date, score, status, text FROM records ORDER BY id DESC LIMIT ?", (limit,)).fetchall()
+    if not rows:
+        print("감정 기록이 없습니다.")
+    for record in reversed(rows):
+        print(f"ID: {record['id']}, 사용자ID: {record['user_id']}, 날짜: {record['date']}, 점수: {record['score']}, 상태: {record['status']}")
+        print(f"  └ 텍스트: {record['text']}")
+    print("\n" + "=" * 30)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Bloom DB 조회 / 내보내기 / 통계")
+    parser.add_argument('--db', default=DATABASE, help="DB 파일 경로 (기본: BLOOM_DATABASE)")
+    parser.add_argument('--snapshot', action='store_true', help="백업 API로 임시 스냅숏을 만든 뒤 스냅숏에서 읽기")
+    sub = parser.add_subparsers(dest='command')
+
+    p_show = sub.add_parser('show', help="사용자와 최근 기록 출력")
+    p_show.add_argument('--limit', type=int, default=20)
+
+    p_export = sub.add_parser('export', help="테이블을 CSV / JSONL로 내보내기")
+    p_export.add_argument('table', choices=sorted(EXPORT_TABLES))
+    p_export.add_argument('--format', choices=['jsonl', 'csv'], default='jsonl')
+    p_export.add_argument('-o', '--output', help="출력 파일 (없으면 표준 출력)")
+    p_export.add_argument('--user', help="아이디 또는 사용자 ID")
+    p_export.add_argument('--since', help="이 날짜부터 (YYYY-MM-DD)")
+    p_export.add_argument('--until', help="이 날짜까지 (YYYY-MM-DD, 당일 포함)")
+    p_export.add_argument('--columns', help="내보낼 컬럼 (쉼표로 구분)")
+    p_export.add_argument('--batch-size', type=int, default=5000, help="fetchmany로 한 번에 읽을 행 수")
+
+    p_stats = sub.add_parser('stats', help="행 수, 테이블 크기, 점수 분포")
+    p_stats.add_argument('--user', help="아이디 또는 사용자 ID (점수 통계만 해당 사용자로 제한)")
+    p_stats.add_argument('--json', action='store_true', help="JSON으로 출력")
+
+    p_snapshot = sub.add_parser('snapshot', help="온라인 백업 API로 스냅숏 파일 만들기")
+    p_snapshot.add_argument('output')
+    p_snapshot.add_argument('--pages', type=int, default=-1, help="한 번에 복사할 페이지 수 (0 이하면 한 번에 전체)")
+    p_snapshot.add_argument('--pause-ms', type=float, default=0.0, help="페이지 묶음 사이에 쉬는 시간(ms)")
+
+    args = parser.parse_args(argv)
+    command = args.command or 'show'
+
+    if command == 'snapshot':
+        start = time.perf_counter()
+        take_snapshot(args.db, args.output, pages=args.pages, pause_s=args.pause_ms / 1000)
+        print(f"스냅숏 저장: {args.output} ({os.path.getsize(args.output) / 1024 / 1024:.1f}MB, {time.perf_counter() - start:.1f}초)")
+        return 0
+
+    tmp = None
+    path = args.db
+    try:
+        if args.snapshot:
+            tmp = tempfile.TemporaryDirectory()
+            path = os.path.join(tmp.name, 'snapshot.db')
+            take_snapshot(args.db, path)
+        conn = open_readonly(path)
+    except (FileNotFoundError, sqlite3.Error) as e:
+        print(f"DB를 열 수 없습니다: {e}", file=sys.stderr)
+        return 1
+
     try:
-        records = cursor.execute("SELECT id, user_id, date, score, status, text FROM records ORDER BY date").fetchall()
-        if not records:
-            print("감정 기록이 없습니다.")
+        if command == 'show':
+            show(conn, getattr(args, 'limit', 20))
+        elif command == 'stats':
+            stats = collect_stats(conn, user=args.user)
+            if args.json:
+                print(json.dumps(stats, ensure_ascii=False, indent=2))
+            else:
+                print_stats(stats)
         else:
-            for record in records:
-                print(f"ID: {record['id']}, 사용자ID: {record['user_id']}, 날짜: {record['date']}, 점수: {record['score']}, 상태: {record['status']}")
-                print(f"  └ 텍스트: {record['text']}")
-    except sqlite3.OperationalError:
-        print("records 테이블을 찾을 수 없습니다.")
+            columns = [c.strip() for c in args.columns.split(',') if c.strip()] if args.columns else None
+            out = open(args.output, 'w', encoding='utf-8', newline='') if args.output else sys.stdout
+            start = time.perf_counter()
+            try:
+                count = export_table(conn, out, args.table, fmt=args.format, batch_size=args.batch_size,
+                                     columns=columns, user=args.user, since=args.since, until=args.until)
+            finally:
+                if args.output:
+                    out.close()
+            elapsed = time.perf_counter() - start
+            print(f"{args.table} {count:,}행 내보냄 ({elapsed:.1f}초, {count / elapsed if elapsed else 0:,.0f}행/초)", file=sys.stderr)
+    except ValueError as e:
+        print(e, file=sys.stderr)
+        return 1
+    except BrokenPipeError:
+        # head 등으로 일부만 읽고 파이프를 닫은 경우 (남은 출력은 버림)
+        sys.stdout = open(os.devnull, 'w')
+    finally:
+        conn.close()
+        if tmp:
+            tmp.cleanup()
+    return 0
 
-    conn.close()
-    print("\n" + "=" * 30)
 
 if __name__ == '__main__':
-    view_database()
\ No newline at end of file
+    sys.exit(main())
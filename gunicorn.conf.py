@@ -0,0 +1,11 @@
+# gunicorn 실행 설정 (예: gunicorn -c gunicorn.conf.py app:app)
+# 마스터 프로세스에서 모델을 미리 로드한 뒤 fork 하므로
+# 워커들은 가중치 메모리를 copy-on-write로 공유합니다.
+import os
+
+os.environ.setdefault('BLOOM_PRELOAD_MODEL', '1')
+
+preload_app = True
+workers = int(os.environ.get('BLOOM_WORKERS', 2))
+threads = int(os.environ.get('BLOOM_THREADS', 8))
+bind = os.environ.get('BLOOM_BIND', '127.0.0.1:5000')
@@ -0,0 +1,482 @@
+import os
+import threading
+import queue
+import time
+from concurrent.futures import Future
+import numpy as np
+
+import metrics
+
+
+# --- 마이크로 배치 추론 스케줄러 ---
+# 여러 요청 스레드에서 동시에 들어온 텍스트를 잠시 모았다가
+# 한 번의 forward pass(패딩된 배치)로 처리하고, 각 호출자에게 자기 결과만 돌려줍니다.
+# concurrency개의 워커 스레드가 같은 대기열에서 배치를 꺼내므로 최대 concurrency개 배치가 동시에 처리됩니다.
+# (remote 백엔드는 추론 풀 프로세스 수만큼 동시에 보내야 풀 전체를 사용)
+class BatchScheduler:
+    def __init__(self, predict_batch, max_batch_size=16, max_wait_ms=10, concurrency=1):
+        """
+        predict_batch: 텍스트 리스트를 받아 같은 길이의 결과 리스트를 돌려주는 함수
+        max_batch_size: 한 번에 묶을 최대 텍스트 수
+        max_wait_ms: 첫 요청이 들어온 뒤 배치를 채우기 위해 기다리는 최대 시간(ms)
+        concurrency: 동시에 predict_batch를 호출할 수 있는 배치 수 (워커 스레드 수)
+        """
+        self.predict_batch = predict_batch
+        self.max_batch_size = max(1, int(max_batch_size))
+        self.max_wait = max(0, float(max_wait_ms)) / 1000.0
+        self.concurrency = max(1, int(concurrency))
+        self._queue = queue.Queue()
+        self._workers = []
+        self._lock = threading.Lock()
+        # 제출되었지만 아직 결과가 나오지 않은 요청 수 (대기 중 + 처리 중)
+        self._pending = 0
+
+    def _ensure_worker(self):
+        # 워커 스레드는 첫 요청 시점에 시작 (fork 이후 각 프로세스에서 따로 생성되도록)
+        if len(self._workers) == self.concurrency and all(worker.is_alive() for worker in self._workers):
+            return
+        with self._lock:
+            self._workers = [worker for worker in self._workers if worker.is_alive()]
+            while len(self._workers) < self.concurrency:
+                worker = threading.Thread(target=self._run, name=f"bloom-batch-scheduler-{len(self._workers)}", daemon=True)
+                worker.start()
+                self._workers.append(worker)
+
+    def submit(self, text):
+        future = Future()
+        self._ensure_worker()
+        with self._lock:
+            self._pending += 1
+        future.add_done_callback(self._on_done)
+        self._queue.put((text, future, time.perf_counter()))
+        return future
+
+    def _on_done(self, future):
+        with self._lock:
+            self._pending -= 1
+
+    def pending(self):
+        """아직 처리가 끝나지 않은 요청 수 (백그라운드 작업이 실시간 요청에 양보할 때 사용)"""
+        return self._pending
+
+    def predict(self, text, timeout=None):
+        return self.submit(text).result(timeout=timeout)
+
+    def _collect_batch(self):
+        batch = [self._queue.get()]
+        deadline = time.monotonic() + self.max_wait
+        while len(batch) < self.max_batch_size:
+            remaining = deadline - time.monotonic()
+            try:
+                if remaining <= 0:
+                    batch.append(self._queue.get_nowait())
+                else:
+                    batch.append(self._queue.get(timeout=remaining))
+            except queue.Empty:
+                break
+        return batch
+
+    def _run(self):
+        while True:
+            # 이미 취소된 요청은 배치에서 제외
+            batch = [(text, future, queued_at) for text, future, queued_at in self._collect_batch() if future.set_running_or_notify_cancel()]
+            if not batch:
+                continue
+            if metrics.METRICS_ENABLED:
+                started = time.perf_counter()
+                for _, _, queued_at in batch:
+                    metrics.stage_seconds.observe(started - queued_at, 'queue_wait')
+                metrics.model_batch_size.observe(len(batch))
+            texts = [text for text, _, _ in batch]
+            futures = [future for _, future, _ in batch]
+            try:
+                results = self.predict_batch(texts)
+                for future, result in zip(futures, results):
+                    future.set_result(result)
+            except Exception as e:
+                for future in futures:
+                    future.set_exception(e)
+
+
+# --- 추론 백엔드 ---
+# BLOOM_INFERENCE_BACKEND 설정값으로 선택합니다.
+#  - torch: 기존 PyTorch fp32 모델
+#  - int8: Linear 레이어를 동적 int8 양자화한 PyTorch 모델
+#  - onnx: `flask export-model`로 내보낸 ONNX 모델을 ONNX Runtime으로 실행
+# torch / transformers 임포트는 수 초가 걸리므로 서버 시작을 막지 않도록 실제로 로드할 때 가져옵니다.
+ONNX_FILE_NAME = 'model.onnx'
+DEFAULT_MODEL_NAME = "beomi/kcbert-base"
+
+
+class InferenceBusyError(RuntimeError):
+    """추론 풀(remote 백엔드)의 요청 큐가 가득 찼을 때 발생합니다."""
+
+
+def _model_source(model_name, artifacts_dir):
+    # export-model로 저장해 둔 파일이 있으면 네트워크 없이 그 파일을 사용
+    if artifacts_dir and os.path.exists(os.path.join(artifacts_dir, 'config.json')):
+        return artifacts_dir
+    return model_name
+
+
+# 패딩을 제외한 토큰들의 마지막 은닉층 평균 (문장 임베딩)
+def _mean_pool(hidden, attention_mask):
+    mask = attention_mask.unsqueeze(-1).to(hidden.dtype)
+    return (hidden * mask).sum(dim=1) / mask.sum(dim=1).clamp(min=1)
+
+
+def _softmax(logits):
+    exp = np.exp(logits - logits.max(axis=1, keepdims=True))
+    return exp / exp.sum(axis=1, keepdims=True)
+
+
+# 모든 백엔드가 공유하는 토크나이저 관련 기능
+class BaseBackend:
+    name = None
+    max_length = 512
+
+    def _tokenize(self, texts):
+        inputs = self.tokenizer(texts, return_tensors="np", truncation=True, padding=True, max_length=self.max_length)
+        return {k: v.astype(np.int64) for k, v in inputs.items()}
+
+    def predict_proba(self, texts):
+        """텍스트 리스트의 클래스별 확률을 (배치 크기, 클래스 수) numpy 배열로 반환합니다."""
+        with metrics.timed('tokenize'):
+            inputs = self._tokenize(texts)
+        with metrics.timed('forward'):
+            return self._forward(inputs)
+
+    def predict_with_embeddings(self, texts):
+        """같은 forward pass에서 클래스별 확률과 문장 임베딩(마지막 은닉층 평균)을 함께 반환합니다.
+        임베딩을 만들 수 없는 백엔드는 임베딩 대신 None을 반환합니다."""
+        with metrics.timed('tokenize'):
+            inputs = self._tokenize(texts)
+        with metrics.timed('forward'):
+            return self._forward_embed(inputs)
+
+    def encode(self, texts):
+        """특수 토큰 없이 토큰 ID 리스트로 변환합니다."""
+        with metrics.timed('tokenize'):
+            return self.tokenizer(texts, add_special_tokens=False)['input_ids']
+
+    def predict_ids(self, id_lists, with_embeddings=False):
+        """토큰 ID 리스트(특수 토큰 제외)들을 [CLS] ... [SEP]로 감싸 가장 긴 길이에 맞춰 패딩한 뒤 분석합니다."""
+        sequences = [[self.tokenizer.cls_token_id] + ids + [self.tokenizer.sep_token_id] for ids in id_lists]
+        length = max(len(seq) for seq in sequences)
+        input_ids = np.full((len(sequences), length), self.tokenizer.pad_token_id, dtype=np.int64)
+        attention_mask = np.zeros((len(sequences), length), dtype=np.int64)
+        for i, seq in enumerate(sequences):
+            input_ids[i, :len(seq)] = seq
+            attention_mask[i, :len(seq)] = 1
+        inputs = {'input_ids': input_ids, 'attention_mask': attention_mask}
+        if 'token_type_ids' in self.tokenizer.model_input_names:
+            inputs['token_type_ids'] = np.zeros_like(input_ids)
+        with metrics.timed('forward'):
+            return self._forward_embed(inputs) if with_embeddings else self._forward(inputs)
+
+    def _forward(self, inputs):
+        raise NotImplementedError
+
+    def _forward_embed(self, inputs):
+        return self._forward(inputs), None
+
+
+class TorchBackend(BaseBackend):
+    name = 'torch'
+
+    def __init__(self, model_name, artifacts_dir=None, threads=None):
+        from transformers import AutoTokenizer, AutoModelForSequenceClassification
+        if threads:
+            import torch
+            torch.set_num_threads(threads)
+        source = _model_source(model_name, artifacts_dir)
+        self.tokenizer = AutoTokenizer.from_pretrained(source)
+        self.model = AutoModelForSequenceClassification.from_pretrained(source)
+        self.model.eval()
+
+    def _forward(self, inputs):
+        import torch
+        with torch.no_grad():
+            outputs = self.model(**{k: torch.from_numpy(v) for k, v in inputs.items()})
+        return torch.nn.functional.softmax(outputs.logits, dim=1).detach().cpu().numpy()
+
+    def _forward_embed(self, inputs):
+        import torch
+        tensors = {k: torch.from_numpy(v) for k, v in inputs.items()}
+        with torch.no_grad():
+            outputs = self.model(**tensors, output_hidden_states=True)
+            embeddings = _mean_pool(outputs.hidden_states[-1], tensors['attention_mask'])
+        probs = torch.nn.functional.softmax(outputs.logits, dim=1).cpu().numpy()
+        return probs, embeddings.cpu().numpy()
+
+
+class QuantizedTorchBackend(TorchBackend):
+    name = 'int8'
+
+    def __init__(self, model_name, artifacts_dir=None, threads=None):
+        import torch
+        super().__init__(model_name, artifacts_dir, threads)
+        self.model = torch.ao.quantization.quantize_dynamic(self.model, {torch.nn.Linear}, dtype=torch.qint8)
+
+
+class OnnxBackend(BaseBackend):
+    name = 'onnx'
+
+    def __init__(self, model_name, artifacts_dir=None, threads=None):
+        try:
+            import onnxruntime
+        except ImportError:
+            raise RuntimeError("onnx 백엔드를 사용하려면 onnxruntime 패키지를 설치해야 합니다.")
+        from transformers import AutoTokenizer
+
+        onnx_path = os.path.join(artifacts_dir or '.', ONNX_FILE_NAME)
+        if not os.path.exists(onnx_path):
+            raise RuntimeError(f"'{onnx_path}' 파일이 없습니다. 먼저 `flask export-model`을 실행해주세요.")
+
+        self.tokenizer = AutoTokenizer.from_pretrained(_model_source(model_name, artifacts_dir))
+        options = onnxruntime.SessionOptions()
+        if threads:
+            options.intra_op_num_threads = threads
+        self.session = onnxruntime.InferenceSession(onnx_path, sess_options=options, providers=['CPUExecutionProvider'])
+        self.input_names = {i.name for i in self.session.get_inputs()}
+        # 예전에 내보낸 모델에는 embedding 출력이 없을 수 있음 (다시 export-model 하면 생김)
+        self.has_embedding = 'embedding' in {o.name for o in self.session.get_outputs()}
+
+    def _forward(self, inputs):
+        feed = {k: v for k, v in inputs.items() if k in self.input_names}
+        logits = self.session.run(['logits'], feed)[0]
+        return _softmax(logits)
+
+    def _forward_embed(self, inputs):
+        if not self.has_embedding:
+            return self._forward(inputs), None
+        feed = {k: v for k, v in inputs.items() if k in self.input_names}
+        logits, embeddings = self.session.run(['logits', 'embedding'], feed)
+        return _softmax(logits), embeddings
+
+
+BACKENDS = {backend.name: backend for backend in (TorchBackend, QuantizedTorchBackend, OnnxBackend)}
+
+
+def load_backend(name, model_name, artifacts_dir=None, threads=None):
+    if name == 'remote':
+        # 별도 프로세스의 추론 풀(inference_pool.py)에 요청 (모델을 이 프로세스에 올리지 않음)
+        from inference_pool import RemoteBackend
+        return RemoteBackend(model_name, artifacts_dir)
+    if name not in BACKENDS:
+        raise ValueError(f"알 수 없는 추론 백엔드입니다: {name} (사용 가능: {', '.join(BACKENDS)}, remote)")
+    return BACKENDS[name](model_name, artifacts_dir, threads)
+
+
+# --- 길이 인식(length-aware) 분석 ---
+# 긴 일기를 512 토큰 한 번에 처리하면 어텐션 비용이 길이의 제곱으로 늘어나므로
+#  1) 요청당 토큰 예산(token_budget)까지만 사용하고
+#  2) window_tokens 크기의 겹치는 구간(sliding window)으로 나눠 각각 분석한 뒤 토큰 수 가중 평균으로 합치고
+#  3) 구간 길이를 버킷(32, 64, ...) 단위로 묶어 비슷한 길이끼리만 패딩합니다.
+#     (짧은 텍스트가 같은 배치의 긴 텍스트 길이만큼 패딩되지 않도록)
+LENGTH_BUCKETS = (32, 64, 128, 256, 512)
+
+
+def split_windows(ids, window_tokens, overlap):
+    if len(ids) <= window_tokens:
+        return [ids]
+    step = max(1, window_tokens - overlap)
+    windows = []
+    for start in range(0, len(ids), step):
+        windows.append(ids[start:start + window_tokens])
+        if start + window_tokens >= len(ids):
+            break
+    return windows
+
+
+def _bucket_for(length, buckets):
+    for bucket in buckets:
+        if length <= bucket:
+            return bucket
+    return buckets[-1]
+
+
+def predict_proba_length_aware(backend, texts, window_tokens=256, overlap=32, token_budget=1024,
+                               max_batch_size=16, buckets=LENGTH_BUCKETS, with_embeddings=False):
+    """texts의 클래스별 확률을 predict_proba와 같은 형태로 반환합니다.
+    with_embeddings=True면 구간별 임베딩도 같은 가중치로 평균해 (확률, 임베딩)으로 반환합니다."""
+    # [CLS], [SEP] 자리를 빼고 모델 최대 길이를 넘지 않도록 제한
+    window_tokens = max(1, min(window_tokens, backend.max_length - 2))
+    overlap = min(max(0, overlap), window_tokens - 1)
+
+    chunks = []  # (텍스트 번호, 토큰 ID 리스트)
+    for owner, ids in enumerate(backend.encode(texts)):
+        ids = ids[:token_budget] if token_budget else ids
+        for window in split_windows(ids, window_tokens, overlap):
+            chunks.append((owner, window))
+
+    by_bucket = {}
+    for owner, window in chunks:
+        by_bucket.setdefault(_bucket_for(len(window) + 2, buckets), []).append((owner, window))
+
+    totals = None
+    embedding_totals = None
+    weights = np.zeros(len(texts))
+    for bucket, items in sorted(by_bucket.items()):
+        for i in range(0, len(items), max_batch_size):
+            part = items[i:i + max_batch_size]
+            if with_embeddings:
+                probs, embeddings = backend.predict_ids([window for _, window in part], with_embeddings=True)
+            else:
+                probs, embeddings = backend.predict_ids([window for _, window in part]), None
+            if totals is None:
+                totals = np.zeros((len(texts), probs.shape[1]))
+            if embeddings is not None and embedding_totals is None:
+                embedding_totals = np.zeros((len(texts), embeddings.shape[1]))
+            for j, ((owner, window), p) in enumerate(zip(part, probs)):
+                # 빈 텍스트도 [CLS][SEP]만으로 한 번은 분석되도록 최소 가중치 1
+                w = max(1, len(window))
+                totals[owner] += p * w
+                weights[owner] += w
+                if embeddings is not None:
+                    embedding_totals[owner] += embeddings[j] * w
+    if not with_embeddings:
+        return totals / weights[:, None]
+    return totals / weights[:, None], (embedding_totals / weights[:, None] if embedding_totals is not None else None)
+
+
+# --- 백그라운드 모델 로더 ---
+# 모델 로드를 별도 스레드에서 진행해 Flask가 바로 요청을 받을 수 있게 합니다.
+# 로드가 끝나기 전에는 backend가 None이므로 호출 측에서 키워드 분석만 사용해야 합니다.
+class ModelLoader:
+    def __init__(self, backend_name, model_name, artifacts_dir=None):
+        self.backend_name = backend_name
+        self.model_name = model_name
+        self.artifacts_dir = artifacts_dir
+        self.backend = None
+        self.state = 'idle'  # idle / loading / ready / failed
+        self.error = None
+        self.load_seconds = None
+        self._thread = None
+        self._ready_event = threading.Event()
+        self._lock = threading.Lock()
+        # fork 전에 로드 중이던 스레드는 자식 프로세스로 복제되지 않으므로 자식에서 다시 시작
+        if hasattr(os, 'register_at_fork'):
+            os.register_at_fork(after_in_child=self._after_fork)
+
+    @property
+    def ready(self):
+        return self.state == 'ready'
+
+    def load(self, warmup=False):
+        """현재 스레드에서 모델을 로드합니다. (fork 전에 미리 로드할 때 사용)"""
+        with self._lock:
+            if self.state == 'ready':
+                return self.backend
+            self.state = 'loading'
+        return self._load(warmup)
+
+    def _load(self, warmup):
+        start = time.perf_counter()
+        try:
+            backend = load_backend(self.backend_name, self.model_name, self.artifacts_dir)
+            if warmup:
+                # 첫 요청이 느려지지 않도록 한 번 실행해 둠
+                backend.predict_with_embeddings(["모델 준비 중"])
+            self.backend = backend
+            self.load_seconds = time.perf_counter() - start
+            self.state = 'ready'
+            print(f"모델 로드 완료. ({self.load_seconds:.1f}초)")
+        except Exception as e:
+            self.error = str(e)
+            self.state = 'failed'
+            print(f"모델 로드 중 오류 발생: {e}")
+        finally:
+            self._ready_event.set()
+        return self.backend
+
+    def start(self):
+        """백그라운드 스레드에서 모델 로드(및 워밍업)를 시작합니다."""
+        with self._lock:
+            if self.state in ('loading', 'ready'):
+                return
+            self.state = 'loading'
+            self._thread = threading.Thread(target=self._load, args=(True,), name="bloom-model-loader", daemon=True)
+            self._thread.start()
+
+    def wait(self, timeout=None):
+        self._ready_event.wait(timeout)
+        return self.ready
+
+    def _after_fork(self):
+        self._lock = threading.Lock()
+        if self.state == 'loading':
+            self.state = 'idle'
+            self._ready_event = threading.Event()
+            self.start()
+
+    def status(self):
+        status = {
+            "ready": self.ready,
+            "state": self.state,
+            "backend": self.backend_name,
+            "load_seconds": round(self.load_seconds, 2) if self.load_seconds is not None else None,
+            "error": self.error,
+        }
+        # 추론 풀(remote)을 사용하면 워커 상태도 함께 표시
+        if self.ready and hasattr(self.backend, 'health'):
+            try:
+                status["pool"] = self.backend.health()
+            except Exception as e:
+                status["pool"] = {"error": str(e)}
+        return status
+
+
+# --- 오프라인 모델 내보내기 및 검증 ---
+def export_artifacts(model_name, artifacts_dir):
+    """fp32 모델/토크나이저를 artifacts_dir에 저장하고 ONNX 모델로 내보냅니다."""
+    import torch
+    from transformers import AutoTokenizer, AutoModelForSequenceClassification
+    os.makedirs(artifacts_dir, exist_ok=True)
+    tokenizer = AutoTokenizer.from_pretrained(model_name)
+    model = AutoModelForSequenceClassification.from_pretrained(model_name)
+    model.eval()
+    tokenizer.save_pretrained(artifacts_dir)
+    model.save_pretrained(artifacts_dir)
+
+    # logits와 함께 문장 임베딩(마지막 은닉층 평균)도 출력하도록 감싸서 내보냄
+    class LogitsAndEmbedding(torch.nn.Module):
+        def __init__(self, model, input_names):
+            super().__init__()
+            self.model = model
+            self.input_names = input_names
+
+        def forward(self, *args):
+            inputs = dict(zip(self.input_names, args))
+            outputs = self.model(**inputs, output_hidden_states=True)
+            return outputs.logits, _mean_pool(outputs.hidden_states[-1], inputs['attention_mask'])
+
+    sample = tokenizer(["샘플 문장입니다", "두 번째 샘플"], return_tensors="pt", padding=True)
+    input_names = [k for k in ('input_ids', 'attention_mask', 'token_type_ids') if k in sample]
+    dynamic_axes = {k: {0: 'batch', 1: 'sequence'} for k in input_names}
+    dynamic_axes['logits'] = {0: 'batch'}
+    dynamic_axes['embedding'] = {0: 'batch'}
+    onnx_path = os.path.join(artifacts_dir, ONNX_FILE_NAME)
+    torch.onnx.export(
+        LogitsAndEmbedding(model, input_names), tuple(sample[k] for k in input_names), onnx_path,
+        input_names=input_names, output_names=['logits', 'embedding'], dynamic_axes=dynamic_axes,
+        opset_version=17, dynamo=False,
+    )
+    return onnx_path
+
+
+def verify_backends(model_name, artifacts_dir, texts, batch_size=16):
+    """fp32(torch) 결과를 기준으로 각 백엔드의 라벨 일치율과 최대 확률 차이를 계산합니다."""
+    probs = {}
+    for name in BACKENDS:
+        backend = load_backend(name, model_name, artifacts_dir)
+        probs[name] = np.concatenate([backend.predict_proba(texts[i:i + batch_size]) for i in range(0, len(texts), batch_size)])
+
+    reference = probs['torch']
+    report = {}
+    for name, p in probs.items():
+        report[name] = {
+            "label_agreement": float(np.mean(p.argmax(axis=1) == reference.argmax(axis=1))),
+            "max_prob_diff": float(np.abs(p - reference).max()),
+        }
+    return report
@@ -0,0 +1,354 @@
+"""
+감성 분석 추론 전용 프로세스 풀
+
+  python inference_pool.py --processes 2 --threads 2
+
+웹 서버(gunicorn 워커들)와 분리된 프로세스에서 모델을 실행합니다.
+ - 부모 프로세스가 모델을 한 번 로드한 뒤 워커 프로세스 N개를 fork → 가중치는 copy-on-write로 공유
+ - 워커마다 torch.set_num_threads(T)로 연산 스레드 수를 고정 (N × T ≈ CPU 코어 수 권장)
+ - 요청 큐 크기를 제한하고, 가득 차면 바로 busy 오류를 돌려줌 (대기열이 끝없이 쌓이지 않도록)
+ - 워커 상태(heartbeat)를 감시해 종료된 워커는 다시 시작하고, 처리 중이던 요청은 오류로 응답
+웹 서버는 BLOOM_INFERENCE_BACKEND=remote 로 이 풀에 로컬 소켓(IPC)으로 요청을 보냅니다.
+"""
+import argparse
+import itertools
+import multiprocessing
+import os
+import queue
+import signal
+import threading
+import time
+from multiprocessing.connection import Client, Listener
+
+import metrics
+from inference import BaseBackend, DEFAULT_MODEL_NAME, InferenceBusyError, load_backend
+
+
+# --- 풀 설정 ---
+POOL_ADDRESS = os.environ.get('BLOOM_INFERENCE_POOL', '/tmp/bloom-inference.sock')
+# 연결 인증 키. 요청/응답을 pickle로 주고받으므로 host:port 주소에서는 반드시 지정해야 함
+# (로컬 소켓은 지정하지 않으면 기본 키 사용)
+POOL_AUTHKEY = os.environ.get('BLOOM_INFERENCE_AUTHKEY', '').encode('utf-8')
+DEFAULT_UNIX_AUTHKEY = b'bloom-inference'
+POOL_PROCESSES = int(os.environ.get('BLOOM_INFERENCE_PROCESSES', 2))
+POOL_THREADS = int(os.environ.get('BLOOM_INFERENCE_THREADS', 1))
+POOL_QUEUE_SIZE = int(os.environ.get('BLOOM_INFERENCE_QUEUE', 64))
+# 웹 서버 쪽에서 풀 응답을 기다리는 최대 시간(초), 풀이 뜰 때까지 연결을 재시도하는 시간(초)
+POOL_TIMEOUT_S = float(os.environ.get('BLOOM_INFERENCE_TIMEOUT_S', 30))
+POOL_CONNECT_TIMEOUT_S = float(os.environ.get('BLOOM_INFERENCE_CONNECT_TIMEOUT_S', 60))
+# 이 시간(초) 동안 heartbeat가 없는 워커는 응답 없음으로 표시
+HEARTBEAT_STALE_S = 30.0
+
+
+def _address_family(address):
+    return 'AF_UNIX' if '/' in address else 'AF_INET'
+
+
+def _parse_address(address):
+    if _address_family(address) == 'AF_UNIX':
+        return address
+    host, port = address.rsplit(':', 1)
+    return host, int(port)
+
+
+def _resolve_authkey(address, authkey):
+    if authkey:
+        return authkey
+    if _address_family(address) == 'AF_INET':
+        raise ValueError(f"추론 풀을 TCP 주소({address})로 사용하려면 BLOOM_INFERENCE_AUTHKEY를 지정해야 합니다.")
+    return DEFAULT_UNIX_AUTHKEY
+
+
+# --- 워커 프로세스 ---
+def _run_op(backend, op, payload):
+    if op == 'predict':
+        return backend.predict_with_embeddings(payload)
+    if op == 'predict_ids':
+        return backend.predict_ids(payload, with_embeddings=True)
+    raise ValueError(f"알 수 없는 요청입니다: {op}")
+
+
+def _worker_main(index, backend, backend_args, threads, requests, results, heartbeats, current):
+    # Ctrl+C는 부모 프로세스가 처리하고 워커를 정리함
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    try:
+        import torch
+        torch.set_num_threads(threads)
+    except ImportError:
+        pass
+    if backend is None:
+        # fork 후 공유하기 어려운 백엔드(onnx)는 워커마다 따로 로드
+        backend = load_backend(*backend_args, threads=threads)
+    while True:
+        heartbeats[index] = time.time()
+        try:
+            req_id, op, payload = requests.get(timeout=1.0)
+        except queue.Empty:
+            continue
+        current[index] = req_id
+        try:
+            results.put((req_id, 'ok', _run_op(backend, op, payload)))
+        except Exception as e:
+            results.put((req_id, 'error', str(e)))
+        current[index] = 0
+
+
+# --- 풀 서버 ---
+class InferencePool:
+    def __init__(self, backend_name, model_name, artifacts_dir=None, processes=POOL_PROCESSES, threads=POOL_THREADS,
+                 queue_size=POOL_QUEUE_SIZE, address=POOL_ADDRESS, authkey=POOL_AUTHKEY):
+        self.backend_args = (backend_name, model_name, artifacts_dir)
+        self.processes = max(1, int(processes))
+        self.threads = max(1, int(threads))
+        self.queue_size = max(1, int(queue_size))
+        self.address = address
+        self.authkey = _resolve_authkey(address, authkey)
+        self.restarts = 0
+        self._ctx = multiprocessing.get_context('fork')
+        self._requests = self._ctx.Queue(maxsize=self.queue_size)
+        self._results = self._ctx.Queue()
+        self._heartbeats = self._ctx.Array('d', self.processes, lock=False)
+        self._current = self._ctx.Array('q', self.processes, lock=False)
+        self._workers = [None] * self.processes
+        self._waiting = {}  # 요청 번호 → (연결, 연결 쪽 요청 번호, 전송 잠금)
+        self._waiting_lock = threading.Lock()
+        self._next_id = 0
+        self._backend = None
+        self._stopping = threading.Event()
+
+    def start(self):
+        backend_name = self.backend_args[0]
+        if backend_name != 'onnx':
+            # 부모에서 한 번만 로드하고 fork → 워커들이 가중치 메모리를 공유
+            # (부모에서는 추론을 실행하지 않아 fork 전에 연산 스레드 풀이 만들어지지 않도록 함)
+            self._backend = load_backend(*self.backend_args)
+        for index in range(self.processes):
+            self._start_worker(index)
+        threading.Thread(target=self._dispatch_results, name="bloom-pool-results", daemon=True).start()
+        threading.Thread(target=self._monitor, name="bloom-pool-monitor", daemon=True).start()
+
+    def _start_worker(self, index):
+        self._heartbeats[index] = time.time()
+        self._current[index] = 0
+        process = self._ctx.Process(
+            target=_worker_main, name=f"bloom-inference-{index}", daemon=True,
+            args=(index, self._backend, self.backend_args, self.threads, self._requests, self._results, self._heartbeats, self._current))
+        process.start()
+        self._workers[index] = process
+
+    def _monitor(self):
+        while not self._stopping.wait(1.0):
+            for index, process in enumerate(self._workers):
+                if process.is_alive() or self._stopping.is_set():
+                    continue
+                # 처리 중이던 요청은 결과가 오지 않으므로 오류로 응답
+                lost = self._current[index]
+                if lost:
+                    self._reply(lost, 'error', "추론 워커가 비정상 종료되었습니다.")
+                print(f"추론 워커 {index}번이 종료되어 다시 시작합니다. (종료 코드 {process.exitcode})")
+                self.restarts += 1
+                self._start_worker(index)
+
+    def _dispatch_results(self):
+        while True:
+            req_id, status, result = self._results.get()
+            self._reply(req_id, status, result)
+
+    def _reply(self, req_id, status, result):
+        with self._waiting_lock:
+            waiting = self._waiting.pop(req_id, None)
+        if waiting is None:
+            return
+        conn, client_id, send_lock = waiting
+        try:
+            with send_lock:
+                conn.send((client_id, status, result))
+        except (OSError, EOFError):
+            pass
+
+    def status(self):
+        now = time.time()
+        ages = [round(now - self._heartbeats[i], 2) for i in range(self.processes)]
+        alive = [p is not None and p.is_alive() for p in self._workers]
+        try:
+            depth = self._requests.qsize()
+        except NotImplementedError:
+            depth = None
+        return {
+            "backend": self.backend_args[0],
+            "processes": self.processes,
+            "threads": self.threads,
+            "alive": sum(alive),
+            "healthy": sum(1 for a, age in zip(alive, ages) if a and age < HEARTBEAT_STALE_S),
+            "queue_depth": depth,
+            "queue_size": self.queue_size,
+            "heartbeat_age_s": ages,
+            "restarts": self.restarts,
+        }
+
+    # --- 로컬 소켓 연결 처리 ---
+    def _handle_connection(self, conn):
+        send_lock = threading.Lock()
+        try:
+            while True:
+                client_id, op, payload = conn.recv()
+                if op == 'status':
+                    with send_lock:
+                        conn.send((client_id, 'ok', self.status()))
+                    continue
+                with self._waiting_lock:
+                    self._next_id += 1
+                    req_id = self._next_id
+                    self._waiting[req_id] = (conn, client_id, send_lock)
+                try:
+                    self._requests.put_nowait((req_id, op, payload))
+                except queue.Full:
+                    with self._waiting_lock:
+                        self._waiting.pop(req_id, None)
+                    with send_lock:
+                        conn.send((client_id, 'busy', "추론 요청 큐가 가득 찼습니다."))
+        except (EOFError, OSError):
+            pass
+        finally:
+            # 연결이 끊긴 클라이언트의 대기 중인 요청은 응답하지 않음
+            with self._waiting_lock:
+                for req_id in [r for r, waiting in self._waiting.items() if waiting[0] is conn]:
+                    del self._waiting[req_id]
+            conn.close()
+
+    def serve_forever(self):
+        if _address_family(self.address) == 'AF_UNIX' and os.path.exists(self.address):
+            os.unlink(self.address)
+        with Listener(_parse_address(self.address), authkey=self.authkey) as listener:
+            print(f"추론 풀 시작: {self.address} (프로세스 {self.processes}개 × 스레드 {self.threads}개, 큐 {self.queue_size})")
+            while not self._stopping.is_set():
+                try:
+                    conn = listener.accept()
+                except (OSError, EOFError) as e:
+                    print(f"추론 풀 연결 수락 중 오류: {e}")
+                    continue
+                threading.Thread(target=self._handle_connection, args=(conn,), daemon=True).start()
+
+    def stop(self):
+        self._stopping.set()
+        for process in self._workers:
+            if process is not None and process.is_alive():
+                process.terminate()
+
+
+# --- 웹 서버 쪽 클라이언트 (BLOOM_INFERENCE_BACKEND=remote) ---
+# 스레드마다 풀과 연결 하나를 유지합니다. 토크나이저는 길이 인식 모드에서 토큰 수를 셀 때만 로드합니다.
+class RemoteBackend(BaseBackend):
+    name = 'remote'
+
+    def __init__(self, model_name, artifacts_dir=None, address=POOL_ADDRESS, authkey=POOL_AUTHKEY,
+                 timeout=POOL_TIMEOUT_S, connect_timeout=POOL_CONNECT_TIMEOUT_S):
+        self.model_name = model_name
+        self.artifacts_dir = artifacts_dir
+        self.address = address
+        self.authkey = _resolve_authkey(address, authkey)
+        self.timeout = timeout
+        self._local = threading.local()
+        self._tokenizer = None
+        self._request_ids = itertools.count(1)
+        if hasattr(os, 'register_at_fork'):
+            os.register_at_fork(after_in_child=self._after_fork)
+        # 풀이 아직 시작 중이면 연결될 때까지 재시도 (그동안 모델 상태는 loading)
+        deadline = time.monotonic() + connect_timeout
+        while True:
+            try:
+                self.health()
+                break
+            except (OSError, EOFError):
+                if time.monotonic() > deadline:
+                    raise RuntimeError(f"추론 풀({address})에 연결할 수 없습니다. `python inference_pool.py`로 먼저 시작해주세요.")
+                time.sleep(0.5)
+
+    @property
+    def tokenizer(self):
+        if self._tokenizer is None:
+            from transformers import AutoTokenizer
+            from inference import _model_source
+            self._tokenizer = AutoTokenizer.from_pretrained(_model_source(self.model_name, self.artifacts_dir))
+        return self._tokenizer
+
+    def _after_fork(self):
+        self._local = threading.local()
+
+    def _connection(self):
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = Client(_parse_address(self.address), authkey=self.authkey)
+            self._local.conn = conn
+        return conn
+
+    def _call(self, op, payload):
+        conn = self._connection()
+        client_id = next(self._request_ids)
+        try:
+            conn.send((client_id, op, payload))
+            while True:
+                if not conn.poll(self.timeout):
+                    raise TimeoutError(f"추론 풀 응답이 {self.timeout}초 안에 오지 않았습니다.")
+                reply_id, status, result = conn.recv()
+                # 시간 초과로 버린 이전 요청의 늦은 응답은 무시
+                if reply_id == client_id:
+                    break
+        except (OSError, EOFError, TimeoutError):
+            # 연결이 끊겼거나 응답 순서를 알 수 없게 되면 다음 요청에서 새로 연결
+            self._local.conn = None
+            conn.close()
+            raise
+        if status == 'busy':
+            raise InferenceBusyError(result)
+        if status != 'ok':
+            raise RuntimeError(f"추론 풀 오류: {result}")
+        return result
+
+    def health(self):
+        return self._call('status', None)
+
+    # 풀까지 왕복한 시간(토큰화 + 대기 + forward pass)은 remote_forward 단계로 기록
+    def predict_proba(self, texts):
+        with metrics.timed('remote_forward'):
+            return self._call('predict', list(texts))[0]
+
+    def predict_with_embeddings(self, texts):
+        with metrics.timed('remote_forward'):
+            return self._call('predict', list(texts))
+
+    def predict_ids(self, id_lists, with_embeddings=False):
+        with metrics.timed('remote_forward'):
+            probs, embeddings = self._call('predict_ids', [list(ids) for ids in id_lists])
+        return (probs, embeddings) if with_embeddings else probs
+
+
+def main():
+    parser = argparse.ArgumentParser(description="감성 분석 추론 프로세스 풀")
+    parser.add_argument('--processes', type=int, default=POOL_PROCESSES, help="추론 워커 프로세스 수")
+    parser.add_argument('--threads', type=int, default=POOL_THREADS, help="워커당 torch 연산 스레드 수")
+    parser.add_argument('--queue-size', type=int, default=POOL_QUEUE_SIZE, help="대기할 수 있는 최대 요청 수")
+    parser.add_argument('--address', default=POOL_ADDRESS, help="로컬 소켓 경로 또는 host:port")
+    parser.add_argument('--backend', default=os.environ.get('BLOOM_INFERENCE_BACKEND', 'torch'), help="torch / int8 / onnx")
+    parser.add_argument('--model', default=DEFAULT_MODEL_NAME, help="모델 이름 또는 경로")
+    parser.add_argument('--model-dir', default=os.environ.get('BLOOM_MODEL_DIR', 'model_artifacts'), help="export-model로 저장한 모델 폴더")
+    args = parser.parse_args()
+    if args.backend == 'remote':
+        parser.error("추론 풀의 백엔드로 remote를 사용할 수 없습니다.")
+
+    try:
+        pool = InferencePool(args.backend, args.model, args.model_dir, processes=args.processes, threads=args.threads,
+                             queue_size=args.queue_size, address=args.address)
+    except ValueError as e:
+        parser.error(str(e))
+    pool.start()
+    try:
+        pool.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        pool.stop()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,106 @@
+import re
+import json
+import hashlib
+
+
+# --- 감정 키워드 목록 ---
+POSITIVE_KEYWORDS = [
+    "행복", "기쁨", "즐거", "신나", "최고", "좋았", "훌륭", "알찬", "만족", "좋다", "괜찮",
+    "뿌듯", "감사", "평온", "설렘", "기대", "상쾌", "편안", "활기", "재미있"
+]
+NEGATIVE_KEYWORDS = [
+    "슬픔", "우울", "화나", "짜증", "최악", "힘들", "괴로", "지침", "피곤", "안좋", "별로",
+    "안 좋다", "속상", "실망", "불안", "걱정", "무기력", "답답", "귀찮", "외롭", "후회"
+]
+
+# 긍정 키워드의 부정형 ("안 좋다" 등이 있으면 "좋다"는 긍정으로 보지 않음)
+# 주의: 기존 로직과 동일하게, 부정형 검사는 키워드의 매칭 방식(mode)이 일치할 때만 적용됩니다.
+#       "좋았"은 2글자라 단어 단위로 매칭되므로 아래 substring 규칙은 현재 적용되지 않습니다.
+POSITIVE_NEGATIONS = {
+    ('token', "좋다"): ("안 좋다", "않 좋다", "별로 좋다"),
+    ('substring', "좋았"): ("안 좋았", "않 좋았"),
+}
+
+# 키워드 목록 버전 (목록이나 부정형 규칙이 바뀌면 값이 달라짐 → 감성 분석 캐시 무효화에 사용)
+KEYWORDS_VERSION = hashlib.sha256(json.dumps(
+    [POSITIVE_KEYWORDS, NEGATIVE_KEYWORDS, sorted([list(k), list(v)] for k, v in POSITIVE_NEGATIONS.items())],
+    ensure_ascii=False).encode('utf-8')).hexdigest()[:12]
+
+
+# 기존 반복문과 같은 기준으로 키워드별 매칭 방식을 결정
+#  - token: 공백으로 구분된 단어 전체가 키워드와 같아야 함
+#  - substring: 텍스트 어디에든 포함되면 됨
+def _positive_mode(keyword):
+    return 'token' if len(keyword) <= 2 else 'substring'
+
+def _negative_mode(keyword):
+    return 'substring' if keyword == "안 좋다" else 'token'
+
+
+# --- 사전 컴파일된 키워드 매처 ---
+# 모든 키워드와 부정형 구문을 하나의 정규식으로 묶어 텍스트를 한 번만 훑습니다.
+# 매칭된 위치 바로 다음부터 다시 검색하므로 서로 겹치는 키워드도 모두 찾습니다.
+class KeywordMatcher:
+    def __init__(self, positive_keywords, negative_keywords, negations=None):
+        negations = POSITIVE_NEGATIONS if negations is None else negations
+        # 패턴 -> [(종류, 매칭 방식, 키워드)]
+        self._rules = {}
+        for keyword in positive_keywords:
+            self._rules.setdefault(keyword, []).append(('Positive', _positive_mode(keyword), keyword))
+        for keyword in negative_keywords:
+            self._rules.setdefault(keyword, []).append(('Negative', _negative_mode(keyword), keyword))
+
+        self._negations = {}
+        for (mode, keyword), phrases in negations.items():
+            self._negations[(mode, keyword)] = frozenset(phrases)
+            for phrase in phrases:
+                self._rules.setdefault(phrase, [])
+
+        # 같은 위치에서 시작하는 짧은 패턴(접두사)은 정규식이 놓치므로 미리 계산해 둠
+        patterns = sorted(self._rules, key=len, reverse=True)
+        self._prefixes = {p: [q for q in patterns if q != p and p.startswith(q)] for p in patterns}
+        self._regex = re.compile("|".join(re.escape(p) for p in patterns))
+
+    def find_hits(self, text_lower):
+        """텍스트에서 찾은 (위치, 패턴) 목록을 반환합니다."""
+        hits = []
+        m = self._regex.search(text_lower)
+        while m:
+            pos, pattern = m.start(), m.group()
+            hits.append((pos, pattern))
+            for prefix in self._prefixes[pattern]:
+                hits.append((pos, prefix))
+            m = self._regex.search(text_lower, pos + 1)
+        return hits
+
+    def match(self, text):
+        """기존 우선순위(긍정 > 부정)대로 'Positive', 'Negative' 또는 None을 반환합니다."""
+        text_lower = text.lower()
+        hits = self.find_hits(text_lower)
+        if not hits:
+            return None
+
+        found = {pattern for _, pattern in hits}
+        positive = negative = False
+        for pos, pattern in hits:
+            for kind, mode, keyword in self._rules[pattern]:
+                if mode == 'token' and not _is_token(text_lower, pos, len(keyword)):
+                    continue
+                if kind == 'Positive':
+                    if not (self._negations.get((mode, keyword), frozenset()) & found):
+                        positive = True
+                else:
+                    negative = True
+            if positive:
+                return 'Positive'
+        return 'Negative' if negative else None
+
+
+# 키워드 앞뒤가 공백 또는 문자열 끝인지 확인
+def _is_token(text, start, length):
+    end = start + length
+    return (start == 0 or text[start - 1] == ' ') and (end == len(text) or text[end] == ' ')
+
+
+# 모듈 임포트 시 한 번만 생성
+keyword_matcher = KeywordMatcher(POSITIVE_KEYWORDS, NEGATIVE_KEYWORDS)
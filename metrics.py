@@ -0,0 +1,277 @@
+import bisect
+import os
+import sys
+import threading
+import time
+from collections import Counter as _StackCounter
+
+
+# --- 지표 수집 설정 ---
+# 0이면 지표를 기록하지 않고 /metrics도 비활성화 (타이머는 아무것도 하지 않음)
+METRICS_ENABLED = os.environ.get('BLOOM_METRICS', '1') != '0'
+
+# 지연 시간 히스토그램 구간(초): 0.1ms ~ 10s
+LATENCY_BUCKETS = (0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+BATCH_SIZE_BUCKETS = (1, 2, 4, 8, 16, 32, 64)
+
+
+# --- 지표 종류 ---
+# Prometheus 텍스트 형식(0.0.4)으로 출력하는 간단한 카운터 / 히스토그램 (외부 패키지 없이 사용)
+# 카운터 이름은 _total까지 포함해 지정하며, HELP / TYPE 줄과 샘플에 같은 이름을 사용합니다.
+# 라벨 값 조합마다 값을 따로 보관하며, 한 번의 기록은 잠금 하나와 덧셈 몇 번이면 끝납니다.
+class Counter:
+    kind = 'counter'
+
+    def __init__(self, name, help_text, labelnames=()):
+        self.name = name
+        self.help_text = help_text
+        self.labelnames = tuple(labelnames)
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def inc(self, *labels, amount=1):
+        with self._lock:
+            self._values[labels] = self._values.get(labels, 0) + amount
+
+    def samples(self):
+        with self._lock:
+            values = dict(self._values)
+        for labels, value in sorted(values.items()):
+            yield self.name, dict(zip(self.labelnames, labels)), value
+
+
+class Histogram:
+    kind = 'histogram'
+
+    def __init__(self, name, help_text, labelnames=(), buckets=LATENCY_BUCKETS):
+        self.name = name
+        self.help_text = help_text
+        self.labelnames = tuple(labelnames)
+        self.buckets = tuple(buckets)
+        self._values = {}  # labels → [구간별 개수..., 합계, 개수]
+        self._lock = threading.Lock()
+
+    def observe(self, value, *labels):
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            entry = self._values.get(labels)
+            if entry is None:
+                entry = self._values[labels] = [0] * (len(self.buckets) + 2)
+            if index < len(self.buckets):
+                entry[index] += 1
+            entry[-2] += value
+            entry[-1] += 1
+
+    def samples(self):
+        with self._lock:
+            values = {labels: list(entry) for labels, entry in self._values.items()}
+        for labels, entry in sorted(values.items()):
+            base = dict(zip(self.labelnames, labels))
+            cumulative = 0
+            for bound, count in zip(self.buckets, entry):
+                cumulative += count
+                yield self.name + '_bucket', dict(base, le=_format_value(bound)), cumulative
+            yield self.name + '_bucket', dict(base, le='+Inf'), entry[-1]
+            yield self.name + '_sum', base, entry[-2]
+            yield self.name + '_count', base, entry[-1]
+
+
+class Registry:
+    def __init__(self):
+        self._metrics = []
+        self._collectors = []
+
+    def counter(self, name, help_text, labelnames=()):
+        metric = Counter(name, help_text, labelnames)
+        self._metrics.append(metric)
+        return metric
+
+    def histogram(self, name, help_text, labelnames=(), buckets=LATENCY_BUCKETS):
+        metric = Histogram(name, help_text, labelnames, buckets)
+        self._metrics.append(metric)
+        return metric
+
+    def register_collector(self, fn):
+        """출력할 때마다 호출되어 (이름, 종류, 설명, [(라벨 dict, 값), ...]) 목록을 돌려주는 함수를 등록합니다.
+        캐시 적중률처럼 다른 모듈이 이미 집계하고 있는 값을 그대로 내보낼 때 사용합니다."""
+        self._collectors.append(fn)
+
+    def render(self):
+        lines = []
+        for metric in self._metrics:
+            lines.append(f"# HELP {metric.name} {metric.help_text}")
+            lines.append(f"# TYPE {metric.name} {metric.kind}")
+            for name, labels, value in metric.samples():
+                lines.append(_format_sample(name, labels, value))
+        for collector in self._collectors:
+            try:
+                families = collector()
+            except Exception as e:
+                print(f"지표 수집 중 오류 발생: {e}")
+                continue
+            for name, kind, help_text, samples in families:
+                lines.append(f"# HELP {name} {help_text}")
+                lines.append(f"# TYPE {name} {kind}")
+                for labels, value in samples:
+                    lines.append(_format_sample(name, labels, value))
+        return '\n'.join(lines) + '\n'
+
+
+def _format_value(value):
+    if isinstance(value, bool):
+        return '1' if value else '0'
+    if isinstance(value, int):
+        return str(value)
+    return repr(float(value))
+
+
+def _format_sample(name, labels, value):
+    if value is None:
+        value = float('nan')
+    if not labels:
+        return f"{name} {_format_value(value)}"
+    label_text = ','.join(f'{k}="{_escape(v)}"' for k, v in labels.items())
+    return f"{name}{{{label_text}}} {_format_value(value)}"
+
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('\n', '\\n').replace('"', '\\"')
+
+
+registry = Registry()
+
+# --- 공용 지표 ---
+http_request_seconds = registry.histogram('bloom_http_request_duration_seconds', "라우트별 요청 처리 시간", ('route', 'method', 'status'))
+stage_seconds = registry.histogram('bloom_stage_duration_seconds', "분석 단계별 처리 시간", ('stage',))
+db_query_seconds = registry.histogram('bloom_db_query_duration_seconds', "SQLite 쿼리 실행(execute/commit) 시간", ('op',))
+model_batch_size = registry.histogram('bloom_model_batch_size', "모델 forward pass 한 번에 처리한 텍스트 수", buckets=BATCH_SIZE_BUCKETS)
+text_emotion_path = registry.counter('bloom_text_emotion_path_total', "텍스트 감정을 결정한 경로 (empty/keyword/cache/model/fallback)", ('path',))
+
+
+# --- 요청별 추적 ---
+# 요청 스레드에서 단계별 시간을 모아 응답의 Server-Timing 헤더로 돌려줍니다. (X-Bloom-Trace 헤더를 보낸 요청만)
+_trace = threading.local()
+
+
+def start_trace():
+    _trace.stages = {}
+
+
+def finish_trace():
+    stages = getattr(_trace, 'stages', None)
+    _trace.stages = None
+    return stages
+
+
+def _add_to_trace(stage, seconds):
+    stages = getattr(_trace, 'stages', None)
+    if stages is not None:
+        total, count = stages.get(stage, (0.0, 0))
+        stages[stage] = (total + seconds, count + 1)
+
+
+# HTTP 헤더 값은 ASCII만 허용되므로 desc에는 호출 횟수를 n=3 형식으로 넣음
+def server_timing_header(stages):
+    return ', '.join(f'{stage};dur={total * 1000:.2f};desc="n={count}"' for stage, (total, count) in stages.items())
+
+
+def observe_stage(stage, seconds):
+    stage_seconds.observe(seconds, stage)
+    _add_to_trace(stage, seconds)
+
+
+def observe_db(op, seconds):
+    db_query_seconds.observe(seconds, op)
+    _add_to_trace('db', seconds)
+
+
+class timed:
+    """with timed('keyword'): ... 블록의 실행 시간을 단계별 히스토그램(과 요청 추적)에 기록합니다."""
+    __slots__ = ('stage', 'start')
+
+    def __init__(self, stage):
+        self.stage = stage
+
+    def __enter__(self):
+        self.start = time.perf_counter() if METRICS_ENABLED else None
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        if self.start is not None:
+            observe_stage(self.stage, time.perf_counter() - self.start)
+        return False
+
+
+# --- 샘플링 프로파일러 ---
+# 켜져 있는 동안 interval_ms마다 모든 스레드의 호출 스택을 기록합니다. (꺼져 있으면 비용 없음)
+# 결과는 flamegraph.pl / speedscope에서 바로 읽을 수 있는 collapsed stack 형식("함수;함수;함수 횟수")입니다.
+class SamplingProfiler:
+    def __init__(self, interval_ms=5, max_depth=64):
+        self.interval = max(1.0, float(interval_ms)) / 1000.0
+        self.max_depth = max_depth
+        self._stacks = _StackCounter()
+        self._samples = 0
+        self._thread = None
+        self._stop = threading.Event()
+        self._lock = threading.Lock()
+        self.started_at = None
+        self.stopped_at = None
+
+    @property
+    def running(self):
+        return self._thread is not None and self._thread.is_alive()
+
+    def start(self, duration_s=None):
+        """프로파일링을 시작합니다. duration_s가 지나면 자동으로 멈춥니다. 이미 실행 중이면 False"""
+        with self._lock:
+            if self.running:
+                return False
+            self._stacks = _StackCounter()
+            self._samples = 0
+            self._stop.clear()
+            self.started_at, self.stopped_at = time.time(), None
+            self._thread = threading.Thread(target=self._run, args=(duration_s,), name="bloom-profiler", daemon=True)
+            self._thread.start()
+            return True
+
+    def stop(self):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout=1.0)
+
+    def _run(self, duration_s):
+        own_id = threading.get_ident()
+        deadline = time.monotonic() + duration_s if duration_s else None
+        while not self._stop.wait(self.interval):
+            for thread_id, frame in sys._current_frames().items():
+                if thread_id == own_id:
+                    continue
+                stack = []
+                while frame is not None and len(stack) < self.max_depth:
+                    code = frame.f_code
+                    stack.append(f"{code.co_name} ({os.path.basename(code.co_filename)}:{frame.f_lineno})")
+                    frame = frame.f_back
+                key = ';'.join(reversed(stack))
+                with self._lock:
+                    self._stacks[key] += 1
+            self._samples += 1
+            if deadline is not None and time.monotonic() >= deadline:
+                break
+        self.stopped_at = time.time()
+
+    def status(self):
+        return {
+            "running": self.running,
+            "samples": self._samples,
+            "interval_ms": round(self.interval * 1000, 1),
+            "started_at": self.started_at,
+            "stopped_at": self.stopped_at,
+        }
+
+    def collapsed(self, limit=None):
+        with self._lock:
+            stacks = self._stacks.most_common(limit)
+        return '\n'.join(f"{stack} {count}" for stack, count in stacks) + '\n'
+
+
+profiler = SamplingProfiler(interval_ms=float(os.environ.get('BLOOM_PROFILER_INTERVAL_MS', 5)))
@@ -0,0 +1,202 @@
+import threading
+import time
+from datetime import datetime
+
+from db import PENDING_STATUS, get_connection, release_connection
+
+
+# --- 기록 재채점 작업 ---
+# scoring_version이 현재 버전과 다른 기록을 id 순서(keyset)로 조금씩 읽어 다시 채점합니다.
+# 배치마다 결과와 진행 위치(last_record_id)를 같은 트랜잭션으로 저장하므로
+# 서버가 재시작되어도 마지막 체크포인트부터 이어서 진행합니다. 한 번 끝까지 진행한 뒤 다시 실행하면
+# 처음(id 0)부터 다시 훑어, 체크포인트보다 앞에서 나중에 다시 채점 대상이 된 기록
+# (진행 중에 채점을 기다리다 키워드 분석으로 채점된 비동기 기록 등)도 처리합니다.
+# 입력값(mood, sleep, activity)이 저장되지 않은 예전 기록은 다시 계산할 수 없어 건너뜁니다.
+# 비동기 분석을 기다리는 기록은 분석 워커가 처리하므로 제외합니다.
+STALE_CONDITION = ("(scoring_version IS NULL OR scoring_version != ?) AND mood IS NOT NULL AND sleep IS NOT NULL AND activity IS NOT NULL"
+                   f" AND status != '{PENDING_STATUS}'")
+# 모델 오류로 다시 채점하지 못했을 때 같은 배치를 다시 시도하기 전 기다리는 시간(초). 실패할 때마다 두 배로 늘림
+RETRY_WAIT_S = 5.0
+MAX_RETRY_WAIT_S = 60.0
+# 같은 배치가 이 횟수를 넘게 실패하면 채점한 기록만 저장하고 실패한 기록은 건너뛰어 다음 배치로 진행
+# (건너뛴 기록은 다음 실행 때 처음부터 다시 훑으며 다시 시도)
+MAX_RETRIES = 5
+
+
+class RescoreRetryError(RuntimeError):
+    """rescore_fn이 모델 대신 키워드 분석으로 채점하게 되었을 때 발생합니다. (배치를 저장하지 않고 다시 시도)
+    updates: 모델로 채점한 기록의 UPDATE 값, failed_ids: 채점하지 못한 기록 ID"""
+
+    def __init__(self, message, updates=(), failed_ids=()):
+        super().__init__(message)
+        self.updates = list(updates)
+        self.failed_ids = list(failed_ids)
+
+
+class RescoreJob:
+    def __init__(self, scoring_version, rescore_fn, batch_size=32, pause_s=0.05, is_busy=None, is_ready=None):
+        """
+        rescore_fn: 기록 행(id, mood, sleep, activity, text) 목록을 받아
+                    (score, status, text_emotion, scoring_version, id) 목록을 돌려주는 함수.
+                    모델로 채점하지 못한 기록이 있으면 RescoreRetryError를 발생 (잠시 후 같은 배치를 다시 시도하고,
+                    MAX_RETRIES번 넘게 실패하면 채점한 기록만 저장한 뒤 건너뜀)
+        is_busy: 실시간 요청이 밀려 있으면 True를 돌려주는 함수 (그동안 재채점을 쉼)
+        is_ready: 모델이 준비되었는지 확인하는 함수 (준비될 때까지 기다림)
+        """
+        self.scoring_version = scoring_version
+        self.rescore_fn = rescore_fn
+        self.batch_size = max(1, int(batch_size))
+        self.pause_s = max(0.0, float(pause_s))
+        self.is_busy = is_busy or (lambda: False)
+        self.is_ready = is_ready or (lambda: True)
+        self.state = 'idle'  # idle / starting / waiting / running / paused / done / failed / stopped
+        self.error = None
+        self.total = 0
+        self.processed = 0
+        self.unscorable = 0
+        self.skipped = 0
+        self.last_record_id = 0
+        self.started_at = None
+        self._session_processed = 0
+        self._thread = None
+        self._stop = threading.Event()
+        self._lock = threading.Lock()
+
+    # --- 체크포인트 ---
+    def _load_checkpoint(self, conn):
+        row = conn.execute("SELECT last_record_id, processed, finished_at FROM rescore_jobs WHERE scoring_version = ?",
+                           (self.scoring_version,)).fetchone()
+        if row and row['finished_at'] is not None:
+            # 지난 실행이 끝까지 진행했으면 처음부터 다시 훑음
+            self.last_record_id, self.processed = 0, 0
+            conn.execute("UPDATE rescore_jobs SET last_record_id = 0, processed = 0, started_at = ?, updated_at = ?, finished_at = NULL "
+                         "WHERE scoring_version = ?", (_now(), _now(), self.scoring_version))
+            conn.commit()
+        elif row:
+            self.last_record_id, self.processed = row['last_record_id'], row['processed']
+        else:
+            self.last_record_id, self.processed = 0, 0
+            conn.execute("INSERT INTO rescore_jobs (scoring_version, last_record_id, processed, started_at, updated_at) VALUES (?, 0, 0, ?, ?)",
+                         (self.scoring_version, _now(), _now()))
+            conn.commit()
+
+    def _count_remaining(self, conn):
+        return conn.execute(f"SELECT COUNT(*) FROM records WHERE id > ? AND {STALE_CONDITION}",
+                            (self.last_record_id, self.scoring_version)).fetchone()[0]
+
+    def _count_unscorable(self, conn):
+        return conn.execute("SELECT COUNT(*) FROM records WHERE mood IS NULL OR sleep IS NULL OR activity IS NULL").fetchone()[0]
+
+    # --- 실행 ---
+    def start(self):
+        """백그라운드 스레드에서 재채점을 시작합니다. 이미 실행 중이면 아무것도 하지 않습니다."""
+        with self._lock:
+            if self._thread is not None and self._thread.is_alive():
+                return False
+            self._stop.clear()
+            self.state = 'starting'
+            self._thread = threading.Thread(target=self.run, name="bloom-rescore", daemon=True)
+            self._thread.start()
+            return True
+
+    def stop(self):
+        self._stop.set()
+
+    def run(self, on_progress=None):
+        """현재 스레드에서 재채점을 끝까지 진행합니다. (CLI에서는 직접 호출)"""
+        conn = get_connection()
+        try:
+            self.error = None
+            self._load_checkpoint(conn)
+            self.total = self.processed + self._count_remaining(conn)
+            self.unscorable = self._count_unscorable(conn)
+            self.started_at = time.monotonic()
+            self._session_processed = 0
+            self.skipped = 0
+            retries = 0
+
+            while not self._stop.is_set():
+                if not self.is_ready():
+                    self.state = 'waiting'
+                    self._stop.wait(1.0)
+                    continue
+                if self.is_busy():
+                    self.state = 'paused'
+                    self._stop.wait(self.pause_s or 0.05)
+                    continue
+
+                self.state = 'running'
+                rows = conn.execute(
+                    f"SELECT id, mood, sleep, activity, text FROM records WHERE id > ? AND {STALE_CONDITION} ORDER BY id LIMIT ?",
+                    (self.last_record_id, self.scoring_version, self.batch_size)).fetchall()
+                if not rows:
+                    conn.execute("UPDATE rescore_jobs SET finished_at = ?, updated_at = ? WHERE scoring_version = ?",
+                                 (_now(), _now(), self.scoring_version))
+                    conn.commit()
+                    self.state = 'done'
+                    break
+
+                try:
+                    updates = self.rescore_fn(rows)
+                    self.error = None
+                except RescoreRetryError as e:
+                    self.error = str(e)
+                    if retries < MAX_RETRIES:
+                        # 체크포인트를 옮기지 않았으므로 기다렸다가 같은 배치부터 다시 시도
+                        self.state = 'waiting'
+                        self._stop.wait(min(RETRY_WAIT_S * 2 ** retries, MAX_RETRY_WAIT_S))
+                        retries += 1
+                        continue
+                    updates = e.updates
+                    self.skipped += len(e.failed_ids)
+                    print(f"기록 {len(e.failed_ids)}건을 {MAX_RETRIES}번 다시 시도해도 채점하지 못해 건너뜁니다: {e.failed_ids}")
+                retries = 0
+                last_id = rows[-1]['id']
+                conn.execute("BEGIN IMMEDIATE")
+                try:
+                    conn.executemany("UPDATE records SET score = ?, status = ?, text_emotion = ?, scoring_version = ? WHERE id = ?", updates)
+                    conn.execute("UPDATE rescore_jobs SET last_record_id = ?, processed = processed + ?, updated_at = ? WHERE scoring_version = ?",
+                                 (last_id, len(rows), _now(), self.scoring_version))
+                    conn.commit()
+                except Exception:
+                    conn.rollback()
+                    raise
+                self.last_record_id = last_id
+                self.processed += len(rows)
+                self._session_processed += len(rows)
+                if on_progress:
+                    on_progress(self.status())
+                # 실시간 /analyze 요청에 CPU를 양보
+                if self.pause_s:
+                    self._stop.wait(self.pause_s)
+            else:
+                self.state = 'stopped'
+        except Exception as e:
+            self.state = 'failed'
+            self.error = str(e)
+            print(f"기록 재채점 중 오류 발생: {e}")
+        finally:
+            release_connection(conn)
+        return self.status()
+
+    def status(self):
+        elapsed = time.monotonic() - self.started_at if self.started_at else 0.0
+        rate = self._session_processed / elapsed if elapsed > 0 else 0.0
+        remaining = max(0, self.total - self.processed)
+        return {
+            "scoring_version": self.scoring_version,
+            "state": self.state,
+            "processed": self.processed,
+            "total": self.total,
+            "remaining": remaining,
+            "unscorable": self.unscorable,
+            "skipped": self.skipped,
+            "last_record_id": self.last_record_id,
+            "rows_per_second": round(rate, 1),
+            "eta_seconds": round(remaining / rate, 1) if rate > 0 else None,
+            "error": self.error,
+        }
+
+
+def _now():
+    return datetime.now().strftime("%Y-%m-%d %H:%M:%S")
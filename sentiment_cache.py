@@ -0,0 +1,113 @@
+import sqlite3
+import hashlib
+import threading
+from collections import OrderedDict
+from datetime import datetime
+
+import numpy as np
+
+
+# 캐시 키 생성 전 텍스트 정규화 (앞뒤 공백 제거, 연속 공백 하나로)
+# BERT 토크나이저는 공백 개수를 구분하지 않으므로 모델 결과에는 영향이 없습니다.
+def normalize_text(text):
+    return " ".join(text.split())
+
+
+# --- 감성 분석 결과 캐시 ---
+# 1차: 메모리 LRU (최대 max_size개), 2차: SQLite 파일 (선택, 재시작 후에도 유지)
+# 캐시 키에 모델 이름과 키워드 목록 버전이 포함되므로 둘 중 하나가 바뀌면 자동으로 무효화됩니다.
+# 결과에 문장 임베딩이 함께 있으면 메모리 캐시에만 float16으로 보관합니다. (SQLite에는 라벨/점수만 저장)
+class SentimentCache:
+    def __init__(self, model_name, keywords_version, max_size=10000, db_path=None):
+        self.version = f"{model_name}:{keywords_version}"
+        self.max_size = max(0, int(max_size))
+        self.db_path = db_path or None
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.persistent_hits = 0
+        self._items = OrderedDict()
+        self._lock = threading.Lock()
+        self._db = None
+        if self.db_path:
+            self._open_db()
+
+    def _open_db(self):
+        try:
+            self._db = sqlite3.connect(self.db_path, check_same_thread=False)
+            self._db.execute("CREATE TABLE IF NOT EXISTS sentiment_cache (key TEXT PRIMARY KEY, version TEXT NOT NULL, label TEXT NOT NULL, score REAL NOT NULL, created_at TEXT NOT NULL)")
+            # 모델/키워드 버전이 바뀐 이전 결과는 정리
+            self._db.execute("DELETE FROM sentiment_cache WHERE version != ?", (self.version,))
+            self._db.commit()
+        except sqlite3.Error as e:
+            print(f"감성 분석 캐시 DB를 열 수 없습니다 (메모리 캐시만 사용): {e}")
+            self._db = None
+
+    def make_key(self, text):
+        raw = f"{self.version}\n{normalize_text(text)}"
+        return hashlib.sha256(raw.encode('utf-8')).hexdigest()
+
+    def get(self, text):
+        key = self.make_key(text)
+        with self._lock:
+            if key in self._items:
+                self._items.move_to_end(key)
+                self.hits += 1
+                return self._items[key]
+
+            if self._db is not None:
+                row = self._db.execute("SELECT label, score FROM sentiment_cache WHERE key = ?", (key,)).fetchone()
+                if row:
+                    self.hits += 1
+                    self.persistent_hits += 1
+                    self._store(key, (row[0], row[1]))
+                    return row[0], row[1]
+
+            self.misses += 1
+            return None
+
+    def put(self, text, result):
+        label, score = result[0], float(result[1])
+        embedding = result[2] if len(result) > 2 else None
+        key = self.make_key(text)
+        with self._lock:
+            if embedding is not None:
+                self._store(key, (label, score, np.asarray(embedding, dtype=np.float16)))
+            else:
+                self._store(key, (label, score))
+            if self._db is not None:
+                try:
+                    self._db.execute("INSERT OR REPLACE INTO sentiment_cache (key, version, label, score, created_at) VALUES (?, ?, ?, ?, ?)",
+                                     (key, self.version, label, score, datetime.now().strftime("%Y-%m-%d %H:%M:%S")))
+                    self._db.commit()
+                except sqlite3.Error as e:
+                    print(f"감성 분석 캐시 저장 중 오류: {e}")
+
+    def _store(self, key, value):
+        if self.max_size == 0:
+            return
+        self._items[key] = value
+        self._items.move_to_end(key)
+        while len(self._items) > self.max_size:
+            self._items.popitem(last=False)
+            self.evictions += 1
+
+    def clear(self):
+        with self._lock:
+            self._items.clear()
+            if self._db is not None:
+                self._db.execute("DELETE FROM sentiment_cache")
+                self._db.commit()
+
+    def stats(self):
+        with self._lock:
+            total = self.hits + self.misses
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "persistent_hits": self.persistent_hits,
+                "size": len(self._items),
+                "max_size": self.max_size,
+                "hit_rate": round(self.hits / total, 4) if total else 0.0,
+            }
@@ -0,0 +1,141 @@
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+
+from itsdangerous import BadSignature, URLSafeTimedSerializer
+from werkzeug.security import check_password_hash, generate_password_hash
+
+
+# --- 만료 시간이 있는 LRU 캐시 ---
+# 사용자 ID 조회(username → id)와 검증된 세션 토큰(token → 사용자)을 보관합니다.
+# 최대 크기를 넘으면 가장 오래 사용하지 않은 항목부터, ttl_s가 지난 항목은 조회 시점에 버립니다.
+class TTLCache:
+    def __init__(self, max_size=10000, ttl_s=300):
+        self.max_size = max(1, int(max_size))
+        self.ttl_s = float(ttl_s)
+        self._items = OrderedDict()  # key → (value, 만료 시각)
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key):
+        now = time.monotonic()
+        with self._lock:
+            item = self._items.get(key)
+            if item is None or item[1] <= now:
+                if item is not None:
+                    del self._items[key]
+                self.misses += 1
+                return None
+            self._items.move_to_end(key)
+            self.hits += 1
+            return item[0]
+
+    def put(self, key, value):
+        with self._lock:
+            self._items[key] = (value, time.monotonic() + self.ttl_s)
+            self._items.move_to_end(key)
+            while len(self._items) > self.max_size:
+                self._items.popitem(last=False)
+
+    def pop(self, key):
+        with self._lock:
+            self._items.pop(key, None)
+
+    def discard_values(self, predicate):
+        """값이 조건에 맞는 항목을 모두 지웁니다. (사용자 한 명의 캐시를 무효화할 때 사용)"""
+        with self._lock:
+            for key in [k for k, (value, _) in self._items.items() if predicate(value)]:
+                del self._items[key]
+
+    def stats(self):
+        with self._lock:
+            total = self.hits + self.misses
+            return {"hits": self.hits, "misses": self.misses, "size": len(self._items),
+                    "hit_rate": round(self.hits / total, 4) if total else 0.0}
+
+
+# --- 세션 토큰 ---
+# 로그인 시 사용자 ID와 아이디를 서명한 토큰을 발급합니다. 서명과 만료 시간만 확인하면 되므로
+# 요청마다 users 테이블을 조회하지 않으며, 검증 결과는 짧게 캐시해 서명 계산도 반복하지 않습니다.
+class SessionTokens:
+    def __init__(self, secret_key, max_age_s=30 * 24 * 3600, cache_size=10000, cache_ttl_s=300):
+        self.max_age_s = int(max_age_s)
+        self._serializer = URLSafeTimedSerializer(secret_key, salt='bloom-session')
+        # 캐시에 남아 있어도 토큰 자체의 만료 시간은 넘기지 않도록 캐시 유지 시간을 제한
+        self._verified = TTLCache(cache_size, min(float(cache_ttl_s), self.max_age_s))
+
+    def issue(self, user_id, username):
+        return self._serializer.dumps({"uid": user_id, "name": username})
+
+    def verify(self, token):
+        """유효한 토큰이면 (user_id, username), 아니면 None을 반환합니다."""
+        identity = self._verified.get(token)
+        if identity is not None:
+            return identity
+        try:
+            payload = self._serializer.loads(token, max_age=self.max_age_s)
+            identity = (int(payload["uid"]), payload["name"])
+        except (BadSignature, KeyError, TypeError, ValueError):
+            return None
+        self._verified.put(token, identity)
+        return identity
+
+    def invalidate_user(self, user_id):
+        """캐시에 남아 있는 이 사용자의 검증 결과를 지웁니다."""
+        self._verified.discard_values(lambda identity: identity[0] == user_id)
+
+    def stats(self):
+        return self._verified.stats()
+
+
+# --- 비밀번호 해시 ---
+# 해시 계산(scrypt/pbkdf2)은 요청 스레드가 아닌 전용 스레드에서 실행해 동시에 계산하는 수를 제한합니다.
+# (hashlib이 계산 중 GIL을 놓으므로 그동안 다른 요청 스레드는 계속 처리됨)
+# 스레드를 기다리는 요청은 max_pending개까지만 받고, 넘으면 요청 스레드를 붙잡지 않고 바로 PasswordHasherBusy를 발생시킵니다.
+# (대기 중인 요청도 timeout_s가 지나면 FutureTimeoutError, 작업 수는 스레드에서 계산이 실제로 끝날 때 줄임)
+class PasswordHasherBusy(RuntimeError):
+    pass
+
+
+class PasswordHasher:
+    def __init__(self, workers=1, timeout_s=10, max_pending=None):
+        self.workers = max(1, int(workers))
+        self.timeout_s = float(timeout_s)
+        self.max_pending = self.workers if max_pending is None else max(0, int(max_pending))
+        self.running = 0  # 계산 중 + 대기 중인 작업 수
+        self.rejected = 0
+        self._executor = None
+        self._lock = threading.Lock()
+
+    def _get_executor(self):
+        # fork 이후 각 프로세스에서 따로 생성되도록 첫 사용 시점에 만듦
+        with self._lock:
+            if self._executor is None:
+                self._executor = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="bloom-password")
+            return self._executor
+
+    def _release(self, _future):
+        with self._lock:
+            self.running -= 1
+
+    def _run(self, fn, *args):
+        with self._lock:
+            if self.running >= self.workers + self.max_pending:
+                self.rejected += 1
+                raise PasswordHasherBusy("비밀번호 해시 대기열이 가득 찼습니다.")
+            self.running += 1
+        try:
+            future = self._get_executor().submit(fn, *args)
+        except Exception:
+            self._release(None)
+            raise
+        future.add_done_callback(self._release)
+        return future.result(timeout=self.timeout_s)
+
+    def hash(self, password):
+        return self._run(generate_password_hash, password)
+
+    def verify(self, password_hash, password):
+        return self._run(check_password_hash, password_hash, password)
@@ -1,8 +1,11 @@
 document.addEventListener('DOMContentLoaded', () => {
     // --- 전역 변수 및 요소 선택 ---
     let currentUser = null; 
+    let authToken = localStorage.getItem('bloomToken'); // 로그인 시 받은 세션 토큰 (새로고침 후 재로그인에 사용)
     let emotionChart = null; 
     let currentRecordId = null; 
+    let historyRecords = []; // 불러온 기록 (새 기록만 추가로 받아 합침)
+    const HISTORY_PAGE_SIZE = 200;
 
     const sections = { auth: document.getElementById('auth-section'), main: document.getElementById('main-section') };
     const forms = { login: document.getElementById('login-form'), register: document.getElementById('register-form') };
@@ -12,6 +15,11 @@ document.addEventListener('DOMContentLoaded', () => {
     const analysisResultEl = document.getElementById('analysis-result');
     const chatbotIntro = document.getElementById('chatbot-intro'); // 챗봇 안내 문구 요소 선택
 
+    // 세션 토큰을 담은 요청 헤더
+    function authHeaders(headers = {}) {
+        return authToken ? { ...headers, 'Authorization': `Bearer ${authToken}` } : headers;
+    }
+
     // --- 이벤트 리스너 ---
     document.getElementById('show-register').addEventListener('click', () => toggleForms(false));
     document.getElementById('show-login').addEventListener('click', () => toggleForms(true));
@@ -47,9 +55,8 @@ document.addEventListener('DOMContentLoaded', () => {
 
             const response = await fetch('/feedback', {
                 method: 'POST',
-                headers: { 'Content-Type': 'application/json' },
+                headers: authHeaders({ 'Content-Type': 'application/json' }),
                 body: JSON.stringify({
-                    username: currentUser,
                     record_id: recordId,
                     challenge_title: challengeTitle,
                     rating: rating
@@ -58,6 +65,7 @@ document.addEventListener('DOMContentLoaded', () => {
 
             const result = await response.json();
             if (response.ok && result.success) {
+                applyFeedbackToHistory(recordId, challengeTitle, rating);
                 const buttonsInGroup = button.parentElement.querySelectorAll('.feedback-btn');
                 buttonsInGroup.forEach(btn => {
                     btn.disabled = true;
@@ -141,47 +149,139 @@ document.addEventListener('DOMContentLoaded', () => {
         const formData = new FormData(e.target);
         const data = Object.fromEntries(formData.entries());
         const response = await fetch('/login', { method: 'POST', headers: { 'Content-Type': 'application/json' }, body: JSON.stringify(data) });
+        const result = await response.json();
         if (response.ok) {
-            currentUser = data.username;
-            document.getElementById('username-display').textContent = `${currentUser}님, 안녕하세요!`;
-            switchView('main');
-            switchTab('nav-home');
-            await loadUserData();
+            await startSession(result);
         } else {
-            const result = await response.json();
             showAuthError('login', result.message);
         }
     }
 
+    // 저장된 토큰으로 다시 로그인 (비밀번호 없이 새 토큰만 받음)
+    async function resumeSession() {
+        if (!authToken) return;
+        const response = await fetch('/login', { method: 'POST', headers: authHeaders({ 'Content-Type': 'application/json' }), body: '{}' });
+        if (response.ok) { await startSession(await response.json()); }
+        else { authToken = null; localStorage.removeItem('bloomToken'); }
+    }
+
+    async function startSession(result) {
+        currentUser = result.username;
+        authToken = result.token;
+        localStorage.setItem('bloomToken', authToken);
+        document.getElementById('username-display').textContent = `${currentUser}님, 안녕하세요!`;
+        switchView('main');
+        switchTab('nav-home');
+        await loadUserData();
+    }
+
     function handleLogout() {
         currentUser = null;
+        authToken = null;
+        localStorage.removeItem('bloomToken');
+        historyRecords = [];
         document.getElementById('login-form-tag').reset();
         switchView('auth');
         if (emotionChart) { emotionChart.destroy(); emotionChart = null; }
     }
     
+    // 기록을 화면용 형식으로 변환: challenges(추천 챌린지 목록), feedbackGiven(챌린지 제목 → 평가)
+    // /get_data?fields=compact 기록은 응답의 challenges(ID → 챌린지)로 채우고, 분석 응답의 기록은 JSON 문자열을 읽음
+    function normalizeRecord(record, catalog = {}) {
+        const { challenge_ids, feedback, recommended_challenges_json, feedback_given_json, ...rest } = record;
+        if (challenge_ids) {
+            const feedbackGiven = {};
+            Object.entries(feedback || {}).forEach(([id, rating]) => { if (catalog[id]) feedbackGiven[catalog[id].title] = rating; });
+            return { ...rest, challenges: challenge_ids.map(id => catalog[id]).filter(Boolean), feedbackGiven };
+        }
+        return {
+            ...rest,
+            challenges: recommended_challenges_json ? JSON.parse(recommended_challenges_json) : [],
+            feedbackGiven: feedback_given_json ? JSON.parse(feedback_given_json) : {},
+        };
+    }
+
+    // 전체 기록을 페이지 단위로 불러오기 (챌린지는 페이지마다 한 번씩만 받음)
     async function loadUserData() {
         if (!currentUser) return;
-        const response = await fetch(`/get_data?username=${currentUser}`);
-        const result = await response.json();
-        if (result.success) { updateHistory(result.data); } 
-        else { console.error("데이터 로드 실패:", result.message); }
+        const records = [];
+        let cursor = null;
+        do {
+            const params = new URLSearchParams({ limit: HISTORY_PAGE_SIZE, fields: 'compact' });
+            if (cursor) params.set('cursor', cursor);
+            const response = await fetch(`/get_data?${params}`, { headers: authHeaders() });
+            const result = await response.json();
+            if (!result.success) { console.error("데이터 로드 실패:", result.message); return; }
+            records.push(...result.data.map(item => normalizeRecord(item, result.challenges)));
+            cursor = result.next_cursor;
+        } while (cursor);
+        historyRecords = records;
+        updateHistory(historyRecords);
+        await loadTrends();
+    }
+
+    // 분석 응답에 포함된 새 기록을 목록에 추가 (같은 ID가 있으면 교체, 서버에서 목록을 다시 받지 않음)
+    function upsertHistoryRecord(record) {
+        if (!record) return;
+        record = normalizeRecord(record);
+        historyRecords = historyRecords.filter(item => item.id !== record.id).concat([record])
+            .sort((a, b) => a.date === b.date ? a.id - b.id : (a.date < b.date ? -1 : 1));
+        updateHistory(historyRecords);
+    }
+
+    // 비동기 분석 결과 기다리기: SSE로 받고, 연결이 끊기거나 지원되지 않으면 폴링
+    function waitForAnalysis(recordId) {
+        // EventSource는 헤더를 보낼 수 없으므로 토큰을 쿼리 파라미터로 전달
+        const params = new URLSearchParams({ token: authToken });
+        return new Promise((resolve, reject) => {
+            const poll = async () => {
+                try {
+                    const response = await fetch(`/analyze/${recordId}`, { headers: authHeaders() });
+                    if (response.status === 202) { setTimeout(poll, 500); return; }
+                    resolve(await response.json());
+                } catch (err) { reject(err); }
+            };
+            if (!window.EventSource) { poll(); return; }
+            const source = new EventSource(`/analyze/${recordId}/events?${params}`);
+            const finish = (e) => { source.close(); resolve(JSON.parse(e.data)); };
+            source.addEventListener('result', finish);
+            source.addEventListener('error', (e) => {
+                source.close();
+                if (e.data) resolve(JSON.parse(e.data)); else poll();
+            });
+            source.addEventListener('timeout', () => { source.close(); poll(); });
+        });
+    }
+
+    // 피드백 저장 후 서버에서 다시 받지 않고 불러온 기록에 바로 반영
+    function applyFeedbackToHistory(recordId, challengeTitle, rating) {
+        const record = historyRecords.find(item => item.id === recordId);
+        if (!record) return;
+        record.feedbackGiven[challengeTitle] = rating;
+        updateHistory(historyRecords);
     }
 
     async function handleAnalysis() {
         const payload = {
-            username: currentUser,
             mood: parseInt(document.getElementById('mood-slider').value),
             sleep: parseInt(document.getElementById('sleep-slider').value),
             activity: parseInt(document.getElementById('activity-slider').value),
             feeling_text: document.getElementById('feeling-text').value,
         };
-        const response = await fetch('/analyze', { method: 'POST', headers: { 'Content-Type': 'application/json' }, body: JSON.stringify(payload) });
-        const result = await response.json();
+        payload.async = true;
+        const response = await fetch('/analyze', { method: 'POST', headers: authHeaders({ 'Content-Type': 'application/json' }), body: JSON.stringify(payload) });
+        let result = await response.json();
+        if (result.success && result.state === 'pending') {
+            currentRecordId = result.record_id;
+            analysisResultEl.innerHTML = '<h3>분석 중...</h3>';
+            analysisResultEl.style.display = 'block';
+            result = await waitForAnalysis(result.record_id);
+        }
         if (result.success) {
             currentRecordId = result.record_id;
             displayAnalysisResult(result, {});
-            await loadUserData(); 
+            upsertHistoryRecord(result.record);
+            loadTrends();
         } else {
             alert("분석 실패: " + result.message);
         }
@@ -226,8 +326,8 @@ document.addEventListener('DOMContentLoaded', () => {
     function updateHistory(historyData) {
         historyListEl.innerHTML = historyData.length > 0
             ? historyData.map(item => {
-                const feedbackGiven = item.feedback_given_json ? JSON.parse(item.feedback_given_json) : {};
-                const recommendedChallenges = item.recommended_challenges_json ? JSON.parse(item.recommended_challenges_json) : [];
+                const feedbackGiven = item.feedbackGiven;
+                const recommendedChallenges = item.challenges;
                 
                 let recommendationsHTML = '<h5>추천된 챌린지:</h5><ul>';
                 if (recommendedChallenges.length > 0) {
@@ -261,14 +361,27 @@ document.addEventListener('DOMContentLoaded', () => {
                          </li>`
             }).join('')
             : '<li>기록이 없습니다.</li>';
+    }
+
+    // 감정 점수 추이 차트: 서버에서 일별 평균과 이동 평균을 받아 그림 (기록 수와 관계없이 점 수가 일정)
+    async function loadTrends() {
+        if (!currentUser) return;
+        const canvas = document.getElementById('emotion-chart');
+        const points = Math.min(200, Math.max(30, Math.floor(canvas.clientWidth / 4) || 120));
+        const params = new URLSearchParams({ bucket: 'day', window: 7, points });
+        const response = await fetch(`/trends?${params}`, { headers: authHeaders() });
+        const result = await response.json();
+        if (!result.success) { console.error("추이 로드 실패:", result.message); return; }
 
-        const ctx = document.getElementById('emotion-chart').getContext('2d');
         if (emotionChart) { emotionChart.destroy(); }
-        emotionChart = new Chart(ctx, {
+        emotionChart = new Chart(canvas.getContext('2d'), {
             type: 'line',
             data: {
-                labels: historyData.map(item => item.date.substring(5, 16)), 
-                datasets: [{ label: '일별 감정 점수', data: historyData.map(item => item.score), borderColor: 'rgb(75, 192, 192)', tension: 0.1 }]
+                labels: result.series.map(item => item.date),
+                datasets: [
+                    { label: '일별 감정 점수', data: result.series.map(item => item.mean), borderColor: 'rgb(75, 192, 192)', tension: 0.1 },
+                    { label: `${result.window}일 이동 평균`, data: result.series.map(item => item.moving_avg), borderColor: 'rgb(255, 159, 64)', pointRadius: 0, tension: 0.3 }
+                ]
             },
             options: { scales: { y: { beginAtZero: true, max: 10 } } }
         });
@@ -328,6 +441,7 @@ document.addEventListener('DOMContentLoaded', () => {
     // 초기 화면 설정
     switchView('auth');
     toggleForms(true);
+    resumeSession();
 
     // 슬라이더 값 표시 업데이트
     document.querySelectorAll('.slider-group input[type="range"]').forEach(slider => {
@@ -0,0 +1,8 @@
+import os
+import sys
+
+# 테스트는 저장소 루트의 모듈과 benchmarks/의 비교 기준 구현(legacy_*)을 그대로 사용
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+for path in (ROOT_DIR, os.path.join(ROOT_DIR, 'benchmarks')):
+    if path not in sys.path:
+        sys.path.insert(0, path)
@@ -0,0 +1,90 @@
+"""/feedback와 /feedback/batch가 같은 기록에 동시에 저장해도 평가가 유실되지 않는지 확인
+(benchmarks/bench_feedback_writes.py의 json_patch 모드와 같은 상황을 라우트로 재현)"""
+import importlib
+import json
+import os
+import threading
+
+import pytest
+
+import db
+
+THREADS = 4
+WRITES = 20
+BATCH_SIZE = 5
+
+
+@pytest.fixture(scope='module')
+def app_module(tmp_path_factory):
+    # 모델 없이 키워드 분석만 사용하고, 시작 시 백그라운드 작업은 실행하지 않음
+    tmp = tmp_path_factory.mktemp('feedback')
+    os.environ.update(BLOOM_DATABASE=str(tmp / 'feedback.db'), BLOOM_MODEL_DIR=str(tmp / 'no-model'),
+                      BLOOM_COMPACT_ON_START='0', BLOOM_METRICS='0')
+    db.set_database(str(tmp / 'feedback.db'))
+    app = importlib.import_module('app')
+    yield app
+    db.pool.close_all()
+
+
+@pytest.fixture
+def records(app_module):
+    conn = db.get_connection()
+    try:
+        username = f"feedback{conn.execute('SELECT COUNT(*) FROM users').fetchone()[0]}"
+        user_id = conn.execute("INSERT INTO users (username, password) VALUES (?, 'x')", (username,)).lastrowid
+        # challenge_ids가 NULL이면 예전 형식(feedback_given_json에 제목으로), ''이면 챌린지 ID 형식(feedback_json)으로 저장됨
+        record_ids = {kind: conn.execute(app_module.INSERT_RECORD_SQL, (user_id, "2024-01-01 00:00", 5, "보통", "", challenge_ids, None,
+                                                                       5, 7, 5, "Neutral", app_module.SCORING_VERSION)).lastrowid
+                      for kind, challenge_ids in (('legacy', None), ('compact', ''))}
+        conn.commit()
+    finally:
+        db.release_connection(conn)
+    return username, record_ids
+
+
+def _write_concurrently(app_module, username, record_id):
+    # 카탈로그에 있는 제목만 저장되므로 미리 등록
+    titles = [[f"동시 저장 {record_id}-{t}-{i}" for i in range(WRITES)] for t in range(THREADS)]
+    app_module.challenge_store.ensure([{'title': title} for group in titles for title in group])
+    responses, lock = [], threading.Lock()
+
+    def worker(t):
+        client = app_module.app.test_client()
+        items = [{"record_id": record_id, "challenge_title": title, "rating": 1 if i % 2 else -1} for i, title in enumerate(titles[t])]
+        # 스레드마다 앞 절반은 /feedback으로 하나씩, 나머지는 /feedback/batch로 묶어서 저장
+        half = len(items) // 2
+        results = [client.post('/feedback', json=dict(item, username=username)) for item in items[:half]]
+        results += [client.post('/feedback/batch', json={"username": username, "ratings": items[i:i + BATCH_SIZE]})
+                    for i in range(half, len(items), BATCH_SIZE)]
+        with lock:
+            responses.extend(results)
+
+    workers = [threading.Thread(target=worker, args=(t,)) for t in range(THREADS)]
+    for w in workers:
+        w.start()
+    for w in workers:
+        w.join()
+    assert all(r.status_code == 200 and r.get_json()['success'] for r in responses)
+    return {title: 1 if i % 2 else -1 for group in titles for i, title in enumerate(group)}
+
+
+def _row(record_id):
+    conn = db.get_connection()
+    try:
+        return conn.execute("SELECT challenge_ids, feedback_json, feedback_given_json FROM records WHERE id = ?", (record_id,)).fetchone()
+    finally:
+        db.release_connection(conn)
+
+
+def test_concurrent_feedback_on_legacy_record_loses_nothing(app_module, records):
+    username, record_ids = records
+    expected = _write_concurrently(app_module, username, record_ids['legacy'])
+    assert json.loads(_row(record_ids['legacy'])['feedback_given_json']) == expected
+
+
+def test_concurrent_feedback_on_compact_record_loses_nothing(app_module, records):
+    username, record_ids = records
+    expected = _write_concurrently(app_module, username, record_ids['compact'])
+    row = _row(record_ids['compact'])
+    store = app_module.challenge_store
+    assert {store.title(challenge_id): rating for challenge_id, rating in store.record_feedback(row).items()} == expected
@@ -0,0 +1,17 @@
+"""KeywordMatcher가 기존 키워드 반복문(benchmarks/bench_keywords.py의 legacy_keyword_emotion)과 같은 결과를 내는지 확인"""
+import pytest
+
+from bench_keywords import PARITY_CORPUS, _long_entries, _random_corpus, legacy_keyword_emotion
+from keywords import keyword_matcher
+
+
+@pytest.mark.parametrize('text', PARITY_CORPUS)
+def test_matches_legacy_on_edge_cases(text):
+    assert keyword_matcher.match(text) == legacy_keyword_emotion(text)
+
+
+def test_matches_legacy_on_random_corpus():
+    corpus = _random_corpus(20000) + list(_long_entries().values())
+    mismatches = [(text, legacy_keyword_emotion(text), keyword_matcher.match(text))
+                  for text in corpus if keyword_matcher.match(text) != legacy_keyword_emotion(text)]
+    assert mismatches == []
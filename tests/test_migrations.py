@@ -0,0 +1,104 @@
+"""마이그레이션이 빈 DB와 마이그레이션 도입 전 스키마의 DB 모두에 적용되고, 주요 쿼리가 인덱스를 사용하는지 확인"""
+import pytest
+
+import db
+from check_query_plans import QUERIES, plan_uses_index, query_plan
+
+# 마이그레이션 도입 전 app.py가 서버 시작 시 executescript로 만들던 스키마
+BASELINE_SCHEMA = """
+CREATE TABLE IF NOT EXISTS users (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    username TEXT UNIQUE NOT NULL,
+    password TEXT NOT NULL,
+    name TEXT,
+    birthdate TEXT,
+    gender TEXT,
+    region_si_do TEXT,
+    region_gu TEXT
+);
+CREATE TABLE IF NOT EXISTS records (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    user_id INTEGER NOT NULL,
+    date TEXT NOT NULL,
+    score REAL NOT NULL,
+    status TEXT NOT NULL,
+    text TEXT,
+    recommended_challenges_json TEXT,
+    feedback_given_json TEXT,
+    FOREIGN KEY (user_id) REFERENCES users (id)
+);
+CREATE TABLE IF NOT EXISTS challenge_feedback (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    user_id INTEGER NOT NULL,
+    record_id INTEGER NOT NULL,
+    challenge_title TEXT NOT NULL,
+    rating INTEGER NOT NULL,
+    timestamp TEXT NOT NULL,
+    FOREIGN KEY (user_id) REFERENCES users (id),
+    FOREIGN KEY (record_id) REFERENCES records (id)
+);
+INSERT INTO users (username, password) VALUES ('baseline', 'x');
+INSERT INTO records (user_id, date, score, status, text, recommended_challenges_json, feedback_given_json)
+VALUES (1, '2024-01-01 09:00', 6.5, '보통', '그냥 그런 하루', '[{"title": "산책하기", "url": "#"}]', '{"산책하기": 1}'),
+       (1, '2024-01-01 21:00', 8.5, '좋음', '행복', '[]', '{}');
+INSERT INTO challenge_feedback (user_id, record_id, challenge_title, rating, timestamp)
+VALUES (1, 1, '산책하기', 1, '2024-01-01 10:00');
+"""
+
+ALL_VERSIONS = [version for version, _, _ in db.MIGRATIONS]
+
+
+@pytest.fixture
+def conn(tmp_path):
+    db.set_database(str(tmp_path / 'test.db'))
+    conn = db.get_connection()
+    yield conn
+    db.release_connection(conn)
+    db.pool.close_all()
+
+
+@pytest.fixture
+def baseline_conn(conn):
+    conn.executescript(BASELINE_SCHEMA)
+    conn.commit()
+    return conn
+
+
+def _names(conn, kind):
+    return {row[0] for row in conn.execute("SELECT name FROM sqlite_master WHERE type = ?", (kind,))}
+
+
+def _assert_migrated(conn):
+    assert db.schema_version(conn) == ALL_VERSIONS[-1]
+    assert {row[0] for row in conn.execute("SELECT version FROM schema_migrations")} == set(ALL_VERSIONS)
+    assert {'challenge_scores', 'daily_scores', 'rescore_jobs', 'challenges', 'job_leases', 'app_settings'} <= _names(conn, 'table')
+    assert {index.split(' ')[0] for _, _, _, index in QUERIES if index.startswith('idx_')} <= _names(conn, 'index')
+    # 다시 실행해도 적용할 마이그레이션이 없음
+    assert db.migrate(conn) == []
+
+
+def test_migrations_apply_to_fresh_db(conn):
+    assert db.migrate(conn) == ALL_VERSIONS
+    _assert_migrated(conn)
+
+
+def test_migrations_apply_to_baseline_db(baseline_conn):
+    conn = baseline_conn
+    assert db.migrate(conn) == ALL_VERSIONS
+    _assert_migrated(conn)
+    # 기존 데이터는 그대로이고, 집계 테이블은 기존 데이터로 채워짐
+    assert conn.execute("SELECT COUNT(*) FROM records WHERE challenge_ids IS NULL").fetchone()[0] == 2
+    assert tuple(conn.execute("SELECT score, feedback_count FROM challenge_scores WHERE challenge_title = '산책하기'").fetchone()) == (1, 1)
+    assert tuple(conn.execute("SELECT record_count, score_sum FROM daily_scores WHERE user_id = 1 AND day = '2024-01-01'").fetchone()) == (2, 15.0)
+    assert conn.execute("SELECT data_version FROM users WHERE id = 1").fetchone()[0] == 0
+
+
+@pytest.mark.parametrize('name, sql, params, index', QUERIES, ids=[query[0] for query in QUERIES])
+@pytest.mark.parametrize('schema', ['fresh', 'baseline'])
+def test_hot_queries_use_indexes(conn, schema, name, sql, params, index):
+    if schema == 'baseline':
+        conn.executescript(BASELINE_SCHEMA)
+        conn.commit()
+    db.migrate(conn)
+    plan = query_plan(conn, sql, params)
+    assert plan_uses_index(plan, index), plan
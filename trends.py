@@ -0,0 +1,96 @@
+import numpy as np
+
+
+# --- 감정 점수 추이 계산 ---
+# daily_scores(사용자별 일별 집계)를 구간(일/주/월)으로 묶은 행을 받아 이동 평균, 분산을 계산하고
+# 차트에 그릴 점 수만큼 LTTB로 줄입니다. 기록이 몇 년치여도 집계 행 수(일 단위)만큼만 계산합니다.
+BUCKETS = ('day', 'week', 'month')
+
+# 구간 시작일 SQL 식 (주는 월요일 시작)
+BUCKET_SQL = {
+    'day': "day",
+    'week': "date(day, '-' || ((CAST(strftime('%w', day) AS INTEGER) + 6) % 7) || ' days')",
+    'month': "substr(day, 1, 7) || '-01'",
+}
+
+
+def trend_rows_sql(bucket):
+    """(구간 시작일, 기록 수, 점수 합, 제곱 합, 최소, 최대)를 날짜 순으로 돌려주는 SQL"""
+    if bucket == 'day':
+        # 일 단위는 집계 행을 기본 키 순서 그대로 읽음 (GROUP BY 불필요)
+        return ("SELECT day, record_count, score_sum, score_sq_sum, score_min, score_max "
+                "FROM daily_scores WHERE user_id = ? AND day >= ? AND day <= ? ORDER BY day")
+    key = BUCKET_SQL[bucket]
+    return (f"SELECT {key} AS period, SUM(record_count), SUM(score_sum), SUM(score_sq_sum), MIN(score_min), MAX(score_max) "
+            f"FROM daily_scores WHERE user_id = ? AND day >= ? AND day <= ? GROUP BY period ORDER BY period")
+
+
+def moving_average(sums, counts, window):
+    """기록이 있는 구간 window개의 가중 이동 평균 (구간마다 기록 수로 가중). 앞쪽은 있는 구간만으로 계산"""
+    window = max(1, int(window))
+    total = np.concatenate(([0.0], np.cumsum(sums)))
+    count = np.concatenate(([0.0], np.cumsum(counts)))
+    end = np.arange(1, len(sums) + 1)
+    start = np.maximum(end - window, 0)
+    return (total[end] - total[start]) / (count[end] - count[start])
+
+
+def lttb(x, y, threshold):
+    """Largest-Triangle-Three-Buckets: 모양을 유지하면서 threshold개 점으로 줄일 때 남길 인덱스를 반환합니다."""
+    n = len(x)
+    if threshold >= n or threshold < 3:
+        return np.arange(n)
+    # 처음과 끝 점은 항상 남기고, 나머지를 threshold - 2개 구간으로 나눠 구간마다 한 점씩 고름
+    edges = np.linspace(1, n - 1, threshold - 1).astype(int)
+    selected = np.empty(threshold, dtype=int)
+    selected[0], selected[-1] = 0, n - 1
+    a = 0
+    for i in range(threshold - 2):
+        lo, hi = edges[i], edges[i + 1]
+        # 다음 구간의 평균 점 (마지막 구간이면 끝 점)
+        nlo, nhi = (edges[i + 1], edges[i + 2]) if i + 2 < len(edges) else (n - 1, n)
+        avg_x, avg_y = x[nlo:nhi].mean(), y[nlo:nhi].mean()
+        # 직전에 고른 점, 다음 구간 평균 점과 만드는 삼각형 넓이가 가장 큰 점 선택
+        area = np.abs((x[a] - avg_x) * (y[lo:hi] - y[a]) - (x[a] - x[lo:hi]) * (avg_y - y[a]))
+        a = lo + int(np.argmax(area))
+        selected[i + 1] = a
+    return selected
+
+
+def build_trends(rows, window=7, points=None):
+    """구간별 집계 행으로 차트용 시계열과 전체 요약을 만듭니다."""
+    if not rows:
+        return [], {"record_count": 0}
+    periods = [row[0] for row in rows]
+    counts, sums, sq_sums, mins, maxs = np.array([row[1:] for row in rows], dtype=float).T
+    means = sums / counts
+    # 모분산 E[x²] - E[x]² (반올림 오차로 음수가 되지 않게 0에서 자름)
+    variances = np.maximum(sq_sums / counts - means ** 2, 0.0)
+    averages = moving_average(sums, counts, window)
+
+    total = counts.sum()
+    overall_mean = sums.sum() / total
+    summary = {
+        "record_count": int(total),
+        "mean": round(float(overall_mean), 3),
+        "min": round(float(mins.min()), 2),
+        "max": round(float(maxs.max()), 2),
+        "variance": round(float(max(sq_sums.sum() / total - overall_mean ** 2, 0.0)), 3),
+        "first": periods[0],
+        "last": periods[-1],
+    }
+
+    indices = np.arange(len(rows))
+    if points:
+        x = np.array(periods, dtype='datetime64[D]').astype(float)
+        indices = lttb(x, means, points)
+    series = [{
+        "date": periods[i],
+        "count": int(counts[i]),
+        "mean": round(float(means[i]), 3),
+        "min": round(float(mins[i]), 2),
+        "max": round(float(maxs[i]), 2),
+        "variance": round(float(variances[i]), 3),
+        "moving_avg": round(float(averages[i]), 3),
+    } for i in indices]
+    return series, summary